@@ -16,9 +16,11 @@
 from gofer.agent.decorator import Actions
 from gofer.agent.reporting import loaded
 from gofer.decorators import options
+from gofer.messaging import auth
 from gofer.rmi.tracker import Tracker
 from gofer.rmi.criteria import Builder
 from gofer.rmi.dispatcher import Dispatcher
+from gofer.rmi.memo import Memo
 from gofer.threadpool import ThreadPool
 
 
@@ -56,21 +58,70 @@ class Admin:
         :raise Exception, on (sn) not found.
         :see: gofer.rmi.criteria
         """
-        sn_list = []
         cancelled = []
         tracker = Tracker()
-        if sn:
-            sn_list = [sn]
         if criteria:
             b = Builder()
-            criteria = b.build(criteria)
-            sn_list = tracker.find(criteria)
-        for sn in sn_list:
+            criteria = b.compile(criteria)
+            return tracker.cancel_matching(criteria)
+        if sn:
             _sn = tracker.cancel(sn)
             if _sn:
                 cancelled.append(_sn)
         return cancelled
 
+    @remote
+    def pools(self):
+        """
+        Report the thread pool (size) of each loaded plugin.
+        :return: Pool description by plugin name.
+        :rtype: dict
+        """
+        pools = {}
+        for plugin in self.container.all():
+            pools[plugin.name] = repr(plugin.pool)
+        return pools
+
+    @remote
+    def pending(self):
+        """
+        Report the pending request restore progress of each loaded plugin.
+        :return: Progress {opened:, total:, restored:, queued:, held:} by plugin name.
+        :rtype: dict
+        """
+        progress = {}
+        for plugin in self.container.all():
+            progress[plugin.name] = plugin.scheduler.pending.progress
+        return progress
+
+    @remote
+    def tracker(self):
+        """
+        Report request tracking statistics.
+        :return: {tracked:, cancelled:, memory:}
+        :rtype: dict
+        """
+        tracker = Tracker()
+        return tracker.stats()
+
+    @remote
+    def cached(self):
+        """
+        Report memoization statistics for methods decorated with @cached.
+        :return: {hits:, misses:, coalesced:, size:} by method name.
+        :rtype: dict
+        """
+        return Memo.stats_all()
+
+    @remote
+    def timing(self):
+        """
+        Report message authentication (sign|validate) timing.
+        :return: {count:, total:, mean:, max:} (seconds) by operation.
+        :rtype: dict
+        """
+        return auth.timing.stats()
+
     @remote
     def echo(self, text):
         """
@@ -132,6 +183,14 @@ class Builtin(object):
     def authenticator(self):
         return self.plugin.authenticator
 
+    @property
+    def node(self):
+        return self.plugin.node
+
+    @property
+    def scheduler(self):
+        return self.plugin.scheduler
+
     def provides(self, name):
         """
         Get whether the plugin provides the name.
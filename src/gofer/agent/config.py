@@ -16,6 +16,14 @@
 from gofer import NAME, Singleton
 from gofer.config import Config, Graph
 from gofer.config import REQUIRED, OPTIONAL, ANY, BOOL, NUMBER, FLOAT
+from gofer.messaging import codec, transport
+
+
+# The registered wire codecs.
+CODEC = '(%s)' % '|'.join(['^%s$' % name for name in sorted(codec.codecs)])
+
+# The registered compression codecs.
+COMPRESSION = '(%s)' % '|'.join(['^%s$' % name for name in sorted(transport.codecs)])
 
 #
 # The gofer server configuration
@@ -38,6 +46,14 @@ from gofer.config import REQUIRED, OPTIONAL, ANY, BOOL, NUMBER, FLOAT
 #   service
 #      The default PAM service for authentication.  Default:passwd
 #
+# [journal]
+#   fsync
+#      The pending request journal fsync policy (never|always|<milliseconds>).
+#      When <milliseconds>, concurrent writes are batched and synced together.
+#      Default:never
+#   segment
+#      The pending request journal segment size (bytes).  Default:4194304
+#
 
 AGENT_SCHEMA = (
     ('management', REQUIRED,
@@ -55,6 +71,12 @@ AGENT_SCHEMA = (
             ('service', OPTIONAL, ANY),
         )
     ),
+    ('journal', OPTIONAL,
+        (
+            ('fsync', OPTIONAL, '(^never$|^always$|^\d+$)'),
+            ('segment', OPTIONAL, NUMBER),
+        )
+    ),
 )
 
 #
@@ -68,6 +90,18 @@ AGENT_SCHEMA = (
 #      The (optional) fully qualified module to be loaded from the PYTHON path.
 #   threads
 #      The (optional) number of threads for the RMI dispatcher.
+#   threads_min
+#      The (optional) minimum number of threads for the RMI dispatcher.  Default: threads.
+#   threads_max
+#      The (optional) maximum number of threads for the RMI dispatcher.  The thread pool is
+#      elastic when threads_max > threads_min.  Default: threads_min.
+#   threads_idle
+#      The (optional) number of seconds an elastic pool thread may be idle before it is retired.
+#   threads_wait
+#      The (optional) request queue wait (seconds) that triggers adding elastic pool threads.
+#   threads_crypto
+#      The (optional) number of threads used to authenticate received requests and
+#      sign the accepted status.  Default: 0 (the request consumer thread).
 #   accept
 #      Accept forwarding from.  A comma (,) separated list of plugin names (,=none|*=all).
 #   forward
@@ -87,6 +121,17 @@ AGENT_SCHEMA = (
 #      The (optional) flag indicates SSL host validation should be performed.
 #   authenticator
 #      The (optional) fully qualified Authenticator to be loaded from the PYTHON path.
+#   compression
+#      The (optional) codec used to compress large messages (none|zlib|bz2).
+#      Compression and chunking are enabled only when specified.
+#   compression_threshold
+#      The (optional) size (bytes) above which messages are compressed.
+#   chunk_size
+#      The (optional) maximum (compressed) message size (bytes).  Larger messages are chunked.
+#   reassembly_memory
+#      The (optional) maximum size (bytes) of chunks held for reassembly.
+#   reassembly_timeout
+#      The (optional) seconds chunks are held for reassembly.
 #
 # [model]
 #
@@ -100,6 +145,9 @@ AGENT_SCHEMA = (
 #      Format: <exchange>/<queue> where *exchange* is optional.
 #   expiration
 #      The (optional) auto-deleted queue expiration (seconds).
+#   priority
+#      The (optional) AMQP queue name for high priority requests.
+#      Format: <exchange>/<queue> where *exchange* is optional.
 #
 
 PLUGIN_SCHEMA = (
@@ -109,6 +157,11 @@ PLUGIN_SCHEMA = (
             ('name', OPTIONAL, ANY),
             ('plugin', OPTIONAL, ANY),
             ('threads', OPTIONAL, NUMBER),
+            ('threads_min', OPTIONAL, NUMBER),
+            ('threads_max', OPTIONAL, NUMBER),
+            ('threads_idle', OPTIONAL, NUMBER),
+            ('threads_wait', OPTIONAL, FLOAT),
+            ('threads_crypto', OPTIONAL, NUMBER),
             ('latency', OPTIONAL, FLOAT),
             ('accept', OPTIONAL, ANY),
             ('forward', OPTIONAL, ANY),
@@ -124,13 +177,20 @@ PLUGIN_SCHEMA = (
             ('host_validation', OPTIONAL, BOOL),
             ('authenticator', OPTIONAL, ANY),
             ('heartbeat', OPTIONAL, NUMBER),
+            ('codec', OPTIONAL, CODEC),
+            ('compression', OPTIONAL, COMPRESSION),
+            ('compression_threshold', OPTIONAL, NUMBER),
+            ('chunk_size', OPTIONAL, NUMBER),
+            ('reassembly_memory', OPTIONAL, NUMBER),
+            ('reassembly_timeout', OPTIONAL, NUMBER),
         )
     ),
     ('model', OPTIONAL,
         (
             ('managed', OPTIONAL, '(0|1|2)'),
             ('queue', OPTIONAL, ANY),
-            ('expiration', OPTIONAL, NUMBER)
+            ('expiration', OPTIONAL, NUMBER),
+            ('priority', OPTIONAL, ANY),
         )
     ),
 )
@@ -146,6 +206,10 @@ AGENT_DEFAULTS = {
     },
     'pam': {
         'service': 'passwd'
+    },
+    'journal': {
+        'fsync': 'never',
+        'segment': '4194304'
     }
 }
 
@@ -154,6 +218,8 @@ PLUGIN_DEFAULTS = {
     'main': {
         'enabled': '0',
         'threads': '1',
+        'threads_idle': '60',
+        'threads_wait': '1',
         'latency': '0',
         'accept': ',',
         'forward': ','
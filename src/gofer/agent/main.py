@@ -32,6 +32,7 @@ from gofer.agent.plugin import Plugin, PluginLoader
 from gofer.agent.manager import Manager
 from gofer.agent.lock import Lock, LockFailed
 from gofer.agent.config import AgentConfig
+from gofer.rmi.journal import Journal
 
 log = logging.getLogger(__name__)
 
@@ -120,6 +121,7 @@ def start(daemon=True):
     if daemon:
         start_daemon(lock)
     try:
+        setup_journal()
         PluginLoader.load_all()
         agent = Agent()
         agent.start()
@@ -183,6 +185,16 @@ def setup_logging():
             log.error(utf8(e))
 
 
+def setup_journal():
+    """
+    Set the journal defaults based on configuration.
+    Must be called before plugins are loaded.
+    """
+    cfg = AgentConfig()
+    Journal.FSYNC = cfg.journal.fsync
+    Journal.SEGMENT = int(cfg.journal.segment)
+
+
 def main():
     daemon = True
     setup_logging()
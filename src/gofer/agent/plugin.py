@@ -172,6 +172,8 @@ class Plugin(object):
     :type path: str
     :ivar pool: The main thread pool.
     :type pool: ThreadPool
+    :ivar crypto: The (optional) thread pool used to authenticate requests.
+    :type crypto: ThreadPool
     :ivar impl: The plugin implementation.
     :ivar impl: module
     :ivar actions: List of: gofer.action.Action.
@@ -184,6 +186,8 @@ class Plugin(object):
     :type authenticator: gofer.messaging.auth.Authenticator
     :ivar consumer: An AMQP request consumer.
     :type consumer: gofer.rmi.consumer.RequestConsumer.
+    :ivar priority_consumer: An (optional) AMQP high priority request consumer.
+    :type priority_consumer: gofer.rmi.consumer.RequestConsumer.
     """
 
     container = Container()
@@ -233,6 +237,37 @@ class Plugin(object):
         """
         return Plugin.container.all()
 
+    @staticmethod
+    def _pool(descriptor):
+        """
+        Build the main thread pool.
+        :param descriptor: The plugin descriptor.
+        :type descriptor: PluginDescriptor
+        :return: The thread pool.
+        :rtype: ThreadPool
+        """
+        main = descriptor.main
+        capacity = int(main.threads_min or main.threads or 1)
+        maximum = int(main.threads_max or capacity)
+        return ThreadPool(
+            capacity,
+            maximum=maximum,
+            timeout=int(main.threads_idle or 60),
+            latency=float(main.threads_wait or 1))
+
+    @staticmethod
+    def _crypto(descriptor):
+        """
+        Build the (optional) crypto thread pool.
+        :param descriptor: The plugin descriptor.
+        :type descriptor: PluginDescriptor
+        :return: The thread pool or None when not configured.
+        :rtype: ThreadPool
+        """
+        capacity = int(descriptor.main.threads_crypto or 0)
+        if capacity > 0:
+            return ThreadPool(capacity)
+
     def __init__(self, descriptor, path):
         """
         :param descriptor: The plugin descriptor.
@@ -243,7 +278,8 @@ class Plugin(object):
         self.__mutex = RLock()
         self.path = path
         self.descriptor = descriptor
-        self.pool = ThreadPool(int(descriptor.main.threads or 1))
+        self.pool = Plugin._pool(descriptor)
+        self.crypto = Plugin._crypto(descriptor)
         self.impl = None
         self.actions = []
         self.dispatcher = Dispatcher()
@@ -252,6 +288,7 @@ class Plugin(object):
         self.delegate = Delegate()
         self.authenticator = None
         self.consumer = None
+        self.priority_consumer = None
 
     @property
     def name(self):
@@ -312,6 +349,8 @@ class Plugin(object):
         if self.is_started:
             # already started
             return
+        if self.crypto:
+            self.crypto.start()
         self.attach()
         self.scheduler.start()
         self.pool.start()
@@ -337,6 +376,8 @@ class Plugin(object):
             # not started
             return []
         self.detach(teardown)
+        if self.crypto:
+            self.crypto.shutdown()
         pending = self.pool.shutdown(hard=hard)
         self.scheduler.shutdown()
         self.scheduler.join()
@@ -350,6 +391,12 @@ class Plugin(object):
         connector = Connector(self.url)
         messaging = self.cfg.messaging
         connector.heartbeat = get_integer(messaging.heartbeat)
+        connector.codec = messaging.codec
+        connector.compression = messaging.compression
+        connector.compression_threshold = get_integer(messaging.compression_threshold)
+        connector.chunk_size = get_integer(messaging.chunk_size)
+        connector.reassembly_memory = get_integer(messaging.reassembly_memory)
+        connector.reassembly_timeout = get_integer(messaging.reassembly_timeout)
         connector.ssl.ca_certificate = messaging.cacert
         connector.ssl.client_key = messaging.clientkey
         connector.ssl.client_certificate = messaging.clientcert
@@ -372,6 +419,13 @@ class Plugin(object):
         consumer.start()
         self.consumer = consumer
         log.info('plugin:%s, attached => %s', self.name, self.node)
+        if model.priority_queue:
+            node = Node(model.priority_queue)
+            consumer = RequestConsumer(node, self, BrokerModel.PRIORITY)
+            consumer.authenticator = self.authenticator
+            consumer.start()
+            self.priority_consumer = consumer
+            log.info('plugin:%s, attached => %s', self.name, model.priority_node)
 
     @synchronized
     def detach(self, teardown=True):
@@ -383,9 +437,13 @@ class Plugin(object):
         if not self.consumer:
             # not attached
             return
-        self.consumer.shutdown()
-        self.consumer.join()
+        for consumer in (self.consumer, self.priority_consumer):
+            if not consumer:
+                continue
+            consumer.shutdown()
+            consumer.join()
         self.consumer = None
+        self.priority_consumer = None
         log.info('plugin:%s, detached [%s]', self.name, self.node)
         if teardown:
             model = BrokerModel(self)
@@ -484,7 +542,7 @@ class Plugin(object):
                 if isinstance(call.fn, Task):
                     task = call.fn
                     task.transaction.plugin = plugin
-                plugin.pool.queue.put(call)
+                plugin.pool.put(call)
             plugin.start()
         log.info('plugin:%s, reloaded', self.name)
         return plugin
@@ -493,10 +551,14 @@ class Plugin(object):
 class BrokerModel(object):
     """
     Provides AMQP broker model management.
+    :cvar PRIORITY: The priority of requests read from the priority queue.
+    :type PRIORITY: int
     :ivar plugin: A gofer plugin.
     :type plugin: Plugin
     """
 
+    PRIORITY = 9
+
     @staticmethod
     def split(node):
         """
@@ -547,6 +609,18 @@ class BrokerModel(object):
     def queue(self):
         return BrokerModel.split(self.node)[1]
 
+    @property
+    def priority_node(self):
+        return self.cfg.priority
+
+    @property
+    def priority_exchange(self):
+        return BrokerModel.split(self.priority_node)[0]
+
+    @property
+    def priority_queue(self):
+        return BrokerModel.split(self.priority_node)[1]
+
     @released
     def setup(self):
         """
@@ -563,6 +637,15 @@ class BrokerModel(object):
         if self.exchange:
             exchange = Exchange(self.exchange)
             exchange.bind(queue, url)
+        if not self.priority_queue:
+            return
+        queue = Queue(self.priority_queue)
+        queue.auto_delete = self.expiration > 0
+        queue.expiration = self.expiration
+        queue.declare(url)
+        if self.priority_exchange:
+            exchange = Exchange(self.priority_exchange)
+            exchange.bind(queue, url)
 
     @released
     def teardown(self):
@@ -571,13 +654,16 @@ class BrokerModel(object):
         """
         if self.managed < 2:
             return
-        try:
-            url = self.plugin.url
-            queue = Queue(self.queue)
-            queue.purge(url)
-            queue.delete(url)
-        except NotFound:
-            pass
+        url = self.plugin.url
+        for name in (self.queue, self.priority_queue):
+            if not name:
+                continue
+            try:
+                queue = Queue(name)
+                queue.purge(url)
+                queue.delete(url)
+            except NotFound:
+                pass
 
 
 class PluginDescriptor(Graph):
@@ -14,14 +14,19 @@
 #
 
 from time import time, sleep
+from threading import Event, RLock
 from logging import getLogger
 
 from gofer.agent.builtin import Builtin
-from gofer.common import Thread, released
+from gofer.common import Thread, nvl, released, synchronized
 from gofer.messaging import Document, Producer
 from gofer.metrics import Timer, timestamp
-from gofer.rmi.context import Cancelled, Context, Progress
+from gofer.rmi.batch import batched, unbatched
+from gofer.rmi.context import Cancelled, Context, Progress, Stream
+from gofer.rmi.dispatcher import Return
 from gofer.rmi.store import Pending, Empty
+from gofer.rmi.tracker import Tracker
+from gofer.threadpool import Call
 
 
 log = getLogger(__name__)
@@ -37,16 +42,21 @@ class Task(object):
     """
 
     @staticmethod
-    def _producer(plugin):
+    def _producer(plugin, request):
         """
         Get a configured producer.
+        Replies are sent using the codec of the request.
         :param plugin: A plugin.
         :type plugin: gofer.agent.plugin.Plugin
+        :param request: The received request.
+        :type request: Document
         :return: A producer.
         :rtype: Producer
         """
         producer = Producer(plugin.url)
         producer.authenticator = plugin.authenticator
+        producer.origin = plugin.node
+        producer.codec = nvl(request.wire_codec, producer.codec)
         return producer
 
     def __init__(self, transaction):
@@ -79,21 +89,41 @@ class Task(object):
         if not self.plugin.url or cancelled():
             self.discard()
             return
-        producer = self._producer(self.plugin)
+        producer = self._producer(self.plugin, request)
         progress = Progress(request, producer)
-        context = Context(request.sn, progress, cancelled)
+        stream = None
+        if request.replyto:
+            stream = Stream(request, producer)
+        context = Context(request.sn, progress, cancelled, stream)
         Context.set(context)
         producer.open()
         try:
             self.producer = producer
             self.send_started(request)
-            result = self.plugin.dispatch(request)
+            result = self.dispatch(request)
             self.send_reply(request, result)
             self.commit()
         finally:
             producer.close()
             Context.set()
 
+    def dispatch(self, request):
+        """
+        Dispatch the request to the plugin.
+        :param request: The received request.
+        :type request: Document
+        :return: The request result.
+        :rtype: gofer.rmi.dispatcher.Return
+        """
+        if batched(request.request):
+            # items produced by calls within a batch are not streamed
+            context = Context.current()
+            if context is not None:
+                context = Context(context.sn, context.progress, context.cancelled)
+            dispatch = BatchDispatch(self.plugin, request, context)
+            return dispatch()
+        return self.plugin.dispatch(request)
+
     def commit(self):
         """
         Commit the transaction.
@@ -155,6 +185,101 @@ class Task(object):
             log.exception('Send: reply, failed: %s', result)
 
 
+class BatchDispatch(object):
+    """
+    Dispatch the calls contained in a batched request.
+    Each call is routed to the plugin that provides the called class.
+    Parallel calls are queued on the plugin thread pool.  Calls not yet
+    started by a worker are run by the calling thread so the batch
+    completes even when the pool is saturated.
+    :ivar plugin: A plugin.
+    :type plugin: gofer.agent.plugin.Plugin
+    :ivar plugins: The plugin selected for each call.
+    :type plugins: list
+    :ivar context: The context of the batched request.
+    :type context: Context
+    :ivar calls: A request document for each call.
+    :type calls: list
+    :ivar parallel: Execute the calls in parallel.
+    :type parallel: bool
+    :ivar results: The Return for each call.
+    :type results: list
+    """
+
+    def __init__(self, plugin, request, context=None):
+        """
+        :param plugin: A plugin.
+        :type plugin: gofer.agent.plugin.Plugin
+        :param request: The batched request.
+        :type request: Document
+        :param context: The context of the batched request.
+        :type context: Context
+        """
+        self.plugin = plugin
+        self.context = context
+        self.calls = []
+        for call in unbatched(request.request):
+            document = Document(request)
+            document.request = call
+            self.calls.append(document)
+        scheduler = plugin.scheduler
+        self.plugins = [scheduler.select_plugin(c) for c in self.calls]
+        self.parallel = bool(Document(request.request).parallel)
+        self.results = [None] * len(self.calls)
+        self.claimed = [False] * len(self.calls)
+        self.finished = [Event() for _ in self.calls]
+        self.__mutex = RLock()
+
+    @synchronized
+    def claim(self, index):
+        """
+        Claim a call to be run by the calling thread.
+        :param index: The call index.
+        :type index: int
+        :return: True if claimed.
+        :rtype: bool
+        """
+        if self.claimed[index]:
+            return False
+        self.claimed[index] = True
+        return True
+
+    def run(self, index):
+        """
+        Run the call when not already claimed.
+        :param index: The call index.
+        :type index: int
+        """
+        if not self.claim(index):
+            return
+        context = Context.current()
+        Context.set(self.context)
+        try:
+            self.results[index] = self.plugins[index].dispatch(self.calls[index])
+        except Exception:
+            log.exception(self.calls[index].sn)
+            self.results[index] = Return.exception()
+        finally:
+            Context.set(context)
+            self.finished[index].set()
+
+    def __call__(self):
+        """
+        Dispatch the calls.
+        :return: The Return for each call.
+        :rtype: Return
+        """
+        if self.parallel:
+            for index in range(1, len(self.calls)):
+                call = Call(self.run, (index,))
+                self.plugins[index].pool.put(call)
+        for index in range(len(self.calls)):
+            self.run(index)
+        for event in self.finished:
+            event.wait()
+        return Return.succeed(self.results)
+
+
 class Transaction(object):
     """
     A request transaction.
@@ -184,16 +309,20 @@ class Transaction(object):
     def commit(self):
         """
         Commit the transaction.
-        The commit is propagated to the pending queue.
+        The commit is propagated to the pending queue
+        and the request is no longer tracked.
         """
         self.pending.commit(self.request.sn)
+        Tracker().remove(self.request.sn)
         log.info('Request: %s, committed', self.id)
 
     def discard(self):
         """
         Discard the transaction.
+        The request is no longer tracked.
         """
         self.pending.commit(self.request.sn)
+        Tracker().remove(self.request.sn)
         log.info('Request: %s, discarded', self.id)
 
 
@@ -230,25 +359,32 @@ class Scheduler(Thread):
                 plugin = self.select_plugin(request)
                 transaction = Transaction(plugin, self.pending, request)
                 task = Task(transaction)
-                plugin.pool.run(task)
+                call = Call(task, priority=request.priority)
+                plugin.pool.put(call)
             except Exception:
-                self.pending.commit(request.sn)
                 log.exception(request.sn)
+                transaction = Transaction(self.plugin, self.pending, request)
+                transaction.discard()
 
     def select_plugin(self, request):
         """
         Select the plugin based on the request.
+        Batched requests are selected to the builtin plugin only when all
+        of the calls are provided by the builtin plugin.  Each call in the
+        batch is routed by the BatchDispatch.
         :param request: A request to be scheduled.
         :rtype request: gofer.messaging.Document
         :return: The appropriate plugin.
         :rtype: gofer.agent.plugin.Plugin
         """
-        call = Document(request.request)
-        if self.builtin.provides(call.classname):
-            plugin = self.builtin
+        if batched(request.request):
+            calls = unbatched(request.request)
         else:
-            plugin = self.plugin
-        return plugin
+            calls = [Document(request.request)]
+        for call in calls:
+            if not self.builtin.provides(call.classname):
+                return self.plugin
+        return self.builtin
 
     def add(self, request):
         """
@@ -18,7 +18,10 @@ import inspect
 import errno
 import new as _new
 
+from time import time
 from copy import copy
+from heapq import heappush, heappop
+from Queue import Queue as _Queue
 from threading import local as _Local
 from threading import Thread as _Thread
 from threading import currentThread as current_thread
@@ -249,6 +252,10 @@ class ThreadSingleton(type):
     def all():
         return ThreadSingleton._inst.all
 
+    @staticmethod
+    def install(registry):
+        ThreadSingleton._inst.all = registry
+
     @staticmethod
     def purge():
         d = ThreadSingleton.all()
@@ -407,3 +414,220 @@ class List(object):
     @synchronized
     def __iter__(self):
         return iter(self._list[:])
+
+
+class LRU(object):
+    """
+    A thread-safe, least recently used (LRU) cache.
+    Items may (optionally) expire.  Expired items are removed when
+    accessed or evicted as the least recently used.
+    Items are linked in a (circular) doubly linked list ordered by
+    least recently used first.  Each link is: [prev, next, key, expiration, value].
+    :ivar maxsize: The maximum number of cached items.
+    :type maxsize: int
+    :ivar ttl: The (default) seconds an item is cached.
+        Items do not expire when None.
+    :type ttl: float
+    """
+
+    PREV, NEXT, KEY, EXPIRATION, VALUE = range(5)
+
+    def __init__(self, maxsize=100, ttl=None):
+        """
+        :param maxsize: The maximum number of cached items.
+        :type maxsize: int
+        :param ttl: The (default) seconds an item is cached.
+            Items do not expire when None.
+        :type ttl: float
+        """
+        self.__mutex = RLock()
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._cache = {}
+        self._root = []
+        self._root[:] = [self._root, self._root, None, None, None]
+
+    @staticmethod
+    def expired(link):
+        """
+        Get whether a linked item has expired.
+        :param link: A link.
+        :type link: list
+        :rtype: bool
+        """
+        expiration = link[LRU.EXPIRATION]
+        return expiration is not None and expiration <= time()
+
+    def _unlink(self, link):
+        link[self.PREV][self.NEXT] = link[self.NEXT]
+        link[self.NEXT][self.PREV] = link[self.PREV]
+
+    def _append(self, link):
+        last = self._root[self.PREV]
+        link[self.PREV] = last
+        link[self.NEXT] = self._root
+        last[self.NEXT] = link
+        self._root[self.PREV] = link
+
+    @synchronized
+    def get(self, key, default=None):
+        """
+        Get a cached item.
+        The item becomes the most recently used.
+        :param key: The item key.
+        :param default: The value returned when not cached (or expired).
+        :return: The cached item.
+        """
+        link = self._cache.get(key)
+        if link is None:
+            return default
+        self._unlink(link)
+        if self.expired(link):
+            del self._cache[key]
+            return default
+        self._append(link)
+        return link[self.VALUE]
+
+    @synchronized
+    def put(self, key, value, ttl=None):
+        """
+        Cache an item.
+        The least recently used item is evicted when full.
+        :param key: The item key.
+        :param value: The item to cache.
+        :param ttl: The seconds the item is cached.  Default: (self.ttl).
+        :type ttl: float
+        """
+        ttl = nvl(ttl, self.ttl)
+        if ttl is not None:
+            expiration = time() + ttl
+        else:
+            expiration = None
+        link = self._cache.pop(key, None)
+        if link is not None:
+            self._unlink(link)
+        link = [None, None, key, expiration, value]
+        self._cache[key] = link
+        self._append(link)
+        while len(self._cache) > self.maxsize:
+            first = self._root[self.NEXT]
+            self._unlink(first)
+            del self._cache[first[self.KEY]]
+
+    @synchronized
+    def pop(self, key, default=None):
+        """
+        Remove a cached item.
+        :param key: The item key.
+        :param default: The value returned when not cached (or expired).
+        :return: The removed item.
+        """
+        link = self._cache.pop(key, None)
+        if link is None:
+            return default
+        self._unlink(link)
+        if self.expired(link):
+            return default
+        return link[self.VALUE]
+
+    @synchronized
+    def keys(self):
+        """
+        Get the keys of cached items.
+        :return: The keys ordered by least recently used first.
+        :rtype: list
+        """
+        keys = []
+        link = self._root[self.NEXT]
+        while link is not self._root:
+            if not self.expired(link):
+                keys.append(link[self.KEY])
+            link = link[self.NEXT]
+        return keys
+
+    @synchronized
+    def clear(self):
+        """
+        Clear the cache.
+        """
+        self._cache.clear()
+        self._root[:] = [self._root, self._root, None, None, None]
+
+    @synchronized
+    def __contains__(self, key):
+        link = self._cache.get(key)
+        return link is not None and not self.expired(link)
+
+    @synchronized
+    def __len__(self):
+        return len(self._cache)
+
+
+class PriorityQueue(_Queue):
+    """
+    A queue that gets the item with the highest priority first.
+    Items with equal priority are gotten in the order queued.  To prevent
+    starvation, queued items are aged so that the effective priority of an
+    item is increased by one for each *aging* seconds it has been queued.
+    The item priority is the (optional) *priority* attribute.  The time an
+    item was (originally) queued is the (optional) *queued* attribute.
+    :ivar aging: The seconds queued for the priority to be increased by one.
+        Aging is disabled when (0).
+    :type aging: float
+    """
+
+    @staticmethod
+    def priority(item):
+        """
+        Get the priority of an item.
+        :param item: A queued item.
+        :return: The item priority.  Default: 0.
+        :rtype: int
+        """
+        try:
+            return int(getattr(item, 'priority', 0) or 0)
+        except (TypeError, ValueError):
+            return 0
+
+    @staticmethod
+    def queued(item):
+        """
+        Get the time an item was queued.
+        :param item: A queued item.
+        :return: The time queued.  Default: now.
+        :rtype: float
+        """
+        try:
+            return float(getattr(item, 'queued', None) or time())
+        except (TypeError, ValueError):
+            return time()
+
+    def __init__(self, maxsize=0, aging=10):
+        """
+        :param maxsize: The maximum number of queued items (0=unbounded).
+        :type maxsize: int
+        :param aging: The seconds queued for the priority to be increased by one.
+        :type aging: float
+        """
+        self.aging = float(aging)
+        self.sequence = 0
+        _Queue.__init__(self, maxsize)
+
+    def _init(self, maxsize):
+        self.queue = []
+
+    def _qsize(self, len=len):
+        return len(self.queue)
+
+    def _put(self, item):
+        # Since all items age at the same rate, the relative order of items
+        # is fixed when queued.  The key is the (negated) effective priority
+        # offset by the time queued.
+        key = -PriorityQueue.priority(item)
+        if self.aging:
+            key += PriorityQueue.queued(item) / self.aging
+        heappush(self.queue, (key, self.sequence, item))
+        self.sequence += 1
+
+    def _get(self):
+        return heappop(self.queue)[-1]
@@ -13,10 +13,12 @@
 # Jeff Ortel <jortel@redhat.com>
 #
 
+import sys
 import inspect
 
 from gofer import NAME, Options
 from gofer.rmi.decorator import Remote
+from gofer.rmi.memo import Memo
 from gofer.rmi.model import DIRECT, FORK, valid_model
 from gofer.agent.decorator import Actions
 from gofer.agent.decorator import Delegate
@@ -40,7 +42,7 @@ def options(fn):
     return opt
 
 
-def remote(fx=None, model=DIRECT, secret=None):
+def remote(fx=None, model=DIRECT, secret=None, cacheable=None):
     """
     The *remote* decorator.
     Used to expose function/methods as RMI targets.
@@ -50,11 +52,16 @@ def remote(fx=None, model=DIRECT, secret=None):
     :type model: str
     :param secret: An optional shared secret. *DEPRECATED*
     :type secret: str
+    :param cacheable: The (optional) seconds the returned value
+        may be cached by the caller.
+    :type cacheable: int
     :return: The decorated function.
     """
     def inner(fn):
         opt = options(fn)
         opt.call.model = valid_model(model)
+        if cacheable:
+            opt.call.cacheable = cacheable
         if secret:
             required = Options()
             required.secret = secret
@@ -68,6 +75,54 @@ def remote(fx=None, model=DIRECT, secret=None):
         return inner
 
 
+def qualname(fn, frame):
+    """
+    Get the qualified name of a function being decorated.
+    Methods are qualified by the class being defined in the frame.
+    :param fn: The function being decorated.
+    :type fn: function
+    :param frame: The frame in which the decorator is applied.
+    :type frame: frame
+    :return: The name: <module>[.<class>].<function>
+    :rtype: str
+    """
+    code = frame.f_code
+    if '__module__' in frame.f_locals and code.co_name != '<module>':
+        return '.'.join((fn.__module__, code.co_name, fn.__name__))
+    else:
+        return '.'.join((fn.__module__, fn.__name__))
+
+
+def cached(fx=None, ttl=Memo.TTL, maxsize=Memo.MAXSIZE):
+    """
+    The *cached* decorator.
+    Used to memoize (expensive) remote methods.  The reply is
+    cached (by the agent) keyed by the call arguments.  Concurrent
+    identical calls wait for a single execution.  The memo is named:
+    <module>[.<class>].<function> so that same named methods of different
+    classes are cached separately.  A memo replaces the memo of the
+    same name (the module has been reloaded).
+    :param fx: The function being decorated when called without params.
+    :type fx: function
+    :param ttl: The seconds a reply is cached.
+    :type ttl: int
+    :param maxsize: The maximum number of cached replies.
+    :type maxsize: int
+    :return: The decorated function.
+    """
+    frame = sys._getframe(1)
+
+    def inner(fn):
+        opt = options(fn)
+        name = qualname(fn, frame)
+        opt.call.memo = Memo(name, ttl, maxsize)
+        return fn
+    if inspect.isfunction(fx):
+        return inner(fx)
+    else:
+        return inner
+
+
 def direct(fn):
     """
     The *direct* decorator used to specify the *direct* model.
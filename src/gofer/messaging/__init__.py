@@ -11,6 +11,7 @@
 
 from gofer.messaging.model import \
     Document, \
+    LazyDocument, \
     ModelError, \
     DocumentError, \
     VersionError
@@ -39,4 +40,5 @@ from gofer.messaging.adapter import \
     Reader, \
     Sender, \
     Producer, \
+    Pool, \
     NotFound
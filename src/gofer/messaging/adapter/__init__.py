@@ -33,5 +33,6 @@ from gofer.messaging.adapter.model import \
     Reader, \
     Sender, \
     Producer, \
+    Pool, \
     NotFound
 
@@ -13,15 +13,20 @@
 # Jeff Ortel <jortel@redhat.com>
 #
 
+from time import time
+from threading import RLock
+from contextlib import contextmanager
 from logging import getLogger
 
 from uuid import uuid4
 
-from gofer.common import Thread, valid_path, utf8
-from gofer.messaging.model import VERSION, Document
+from gofer.common import Thread, Singleton, ThreadSingleton
+from gofer.common import synchronized, valid_path, utf8
+from gofer.messaging.model import VERSION, Document, LazyDocument
 from gofer.messaging.adapter.url import URL
 from gofer.messaging.adapter.factory import Adapter
 from gofer.messaging.model import ModelError, validate
+from gofer.messaging.transport import Transport, Assembler
 from gofer.messaging import auth as auth
 
 
@@ -286,7 +291,8 @@ class Exchange(BaseExchange):
         url = url or self.url
         adapter = Adapter.find(url)
         impl = adapter.Exchange(self.name, self.policy)
-        impl.bind(queue, url)
+        with Pool().lease(url):
+            impl.bind(queue, url)
 
     @model
     def unbind(self, queue, url=None):
@@ -365,7 +371,8 @@ class Queue(BaseQueue):
         impl.auto_delete = self.auto_delete
         impl.expiration = self.expiration
         impl.exclusive = self.exclusive
-        impl.declare(url)
+        with Pool().lease(url):
+            impl.declare(url)
 
     @model
     def delete(self, url=None):
@@ -378,7 +385,8 @@ class Queue(BaseQueue):
         url = url or self.url
         adapter = Adapter.find(url)
         impl = adapter.Queue(self.name)
-        impl.delete(url)
+        with Pool().lease(url):
+            impl.delete(url)
 
     @model
     def purge(self, url=None):
@@ -511,6 +519,51 @@ class Message(Model):
         return utf8(self)
 
 
+class Reassembled(Message):
+    """
+    A message reassembled from chunks.
+    Contains the last chunk received.  The messages containing the
+    other chunks are acknowledged (or rejected) with this message.
+    :ivar message: The message containing the last chunk.
+    :type message: Message
+    :ivar held: The messages containing the other chunks.
+    :type held: list
+    """
+
+    def __init__(self, message, held):
+        """
+        :param message: The message containing the last chunk.
+        :type message: Message
+        :param held: The messages containing the other chunks.
+        :type held: list
+        """
+        Message.__init__(self, message._reader, message._impl, message.body)
+        self.message = message
+        self.held = held
+
+    @model
+    def ack(self):
+        """
+        Ack this message and the held messages.
+        :raise: ModelError
+        """
+        for message in self.held:
+            message.ack()
+        self.message.ack()
+
+    @model
+    def reject(self, requeue=True):
+        """
+        Reject this message and the held messages.
+        :param requeue: Requeue the message or discard it.
+        :type requeue: bool
+        :raise: ModelError
+        """
+        for message in self.held:
+            message.reject(requeue)
+        self.message.reject(requeue)
+
+
 class BaseReader(Messenger):
     """
     An AMQP message reader.
@@ -560,6 +613,8 @@ class Reader(BaseReader):
     An AMQP queue reader.
     :ivar authenticator: A message authenticator.
     :type authenticator: gofer.messaging.auth.Authenticator
+    :ivar assembler: Decodes compressed and chunked messages.
+    :type assembler: Assembler
     """
 
     def __init__(self, node, url=None):
@@ -574,6 +629,10 @@ class Reader(BaseReader):
         adapter = Adapter.find(url)
         self._impl = adapter.Reader(node, url)
         self.authenticator = None
+        connector = Connector.find(url or DEFAULT_URL)
+        self.assembler = Assembler(
+            memory=connector.reassembly_memory,
+            timeout=connector.reassembly_timeout)
 
     @model
     def is_open(self):
@@ -642,27 +701,80 @@ class Reader(BaseReader):
         message.reject(requeue)
 
     @model
-    def next(self, timeout=90):
+    def receive(self, timeout=90):
         """
-        Get the next valid *document* from the queue.
+        Get the next (complete) message from the queue.
+        Messages containing chunks of incomplete (chunked) messages
+        are held (not acknowledged) until the message has been reassembled.
+        The returned (reassembled) message contains the last chunk received
+        and acknowledges the held messages when acknowledged.
         :param timeout: The read timeout in seconds.
         :type timeout: int
-        :return: The next document.
-        :rtype: tuple: (Message, Document)
-        :raises: model.DocumentError
+        :return: tuple: (Message, body) or (None, None) when no message.
+        :rtype: tuple
+        :raise: ModelError
         """
-        message = self.get(timeout)
-        if message:
+        while True:
+            message = self.get(timeout)
+            if not message:
+                return None, None
             try:
-                document = auth.validate(self.authenticator, message.body)
-                validate(document)
+                body, held = self.assembler.reassemble(message.body, message)
             except ModelError:
                 message.ack()
                 raise
-            log.debug('read next: %s', document)
-            return message, document
-        else:
+            if body is None:
+                continue
+            if held:
+                message = Reassembled(message, held)
+            return message, body
+
+    def authenticate(self, body, lazy=False):
+        """
+        Authenticate and validate the (complete) message body.
+        Only the envelope is decoded before the document is validated
+        so rejected documents are not fully decoded.
+        Intended to be thread-safe so the (cpu bound) authentication
+        may be done by a worker thread.
+        :param body: The message body.
+        :type body: str
+        :param lazy: Return the document with the payload not yet decoded.
+            The payload is decoded when accessed.
+        :type lazy: bool
+        :return: The validated document.
+        :rtype: LazyDocument
+        :raises: model.DocumentError
+        """
+        document = auth.validate(self.authenticator, body, LazyDocument)
+        validate(document)
+        if not lazy:
+            document.materialize()
+        return document
+
+    @model
+    def next(self, timeout=90, lazy=False):
+        """
+        Get the next valid *document* from the queue.
+        See: receive() and authenticate().
+        :param timeout: The read timeout in seconds.
+        :type timeout: int
+        :param lazy: Return the document with the payload not yet decoded.
+            The payload is decoded when accessed.
+        :type lazy: bool
+        :return: The next document.
+        :rtype: tuple: (Message, LazyDocument)
+        :raises: model.DocumentError
+        """
+        message, body = self.receive(timeout)
+        if not message:
             return None, None
+        try:
+            document = self.authenticate(body, lazy)
+        except ModelError:
+            message.ack()
+            raise
+        log.debug('read next: %s', document)
+        return message, document
 
     @model
     def search(self, sn, timeout=90):
@@ -677,14 +789,14 @@ class Reader(BaseReader):
         :raise: ModelError
         """
         while not Thread.aborted():
-            message, document = self.next(timeout)
+            message, document = self.next(timeout, lazy=True)
             if message:
                 message.ack()
             else:
                 return
             if sn == document.sn:
                 # matched
-                return document
+                return document.materialize()
 
 
 # --- sender/producer --------------------------------------------------------
@@ -781,6 +893,12 @@ class Producer(Messenger):
     An AMQP message producer.
     :ivar authenticator: A message authenticator.
     :type authenticator: gofer.messaging.auth.Authenticator
+    :ivar origin: The (optional) origin included in the routing of sent documents.
+    :type origin: str
+    :ivar transport: Compresses and chunks large messages.
+    :type transport: Transport
+    :ivar codec: The wire codec name (default: json).
+    :type codec: str
     """
 
     def __init__(self, url=None):
@@ -792,6 +910,13 @@ class Producer(Messenger):
         adapter = Adapter.find(url)
         self._impl = adapter.Sender(url)
         self.authenticator = None
+        self.origin = None
+        connector = Connector.find(url or DEFAULT_URL)
+        self.transport = Transport(
+            threshold=connector.compression_threshold,
+            codec=connector.compression,
+            chunk=connector.chunk_size)
+        self.codec = connector.codec
 
     @model
     def is_open(self):
@@ -840,12 +965,13 @@ class Producer(Messenger):
         :raise: ModelError
         """
         sn = utf8(uuid4())
-        routing = (None, address)
+        routing = (self.origin, address)
         document = Document(sn=sn, version=VERSION, routing=routing)
         document += body
-        unsigned = document.dump()
+        unsigned = document.dump(self.codec)
         signed = auth.sign(self.authenticator, unsigned)
-        self._impl.send(address, signed, ttl)
+        for encoded in self.transport.encode(signed):
+            self._impl.send(address, encoded, ttl)
         return sn
 
 
@@ -947,6 +1073,223 @@ class Connection(BaseConnection):
         self._impl.close()
 
 
+# --- pool -------------------------------------------------------------------
+
+
+class Lease(object):
+    """
+    A pooled set of broker connections and an (optional) open producer.
+    While attached, the lease replaces the thread singleton registry of
+    the calling thread so that connections created (or found) by adapter
+    objects are those owned by the lease rather than the thread.
+    :ivar key: The pool key.
+    :type key: tuple
+    :ivar url: The broker URL.
+    :type url: str
+    :ivar authenticator: A message authenticator.
+    :type authenticator: gofer.messaging.auth.Authenticator
+    :ivar registry: The thread singleton registry owned by the lease.
+    :type registry: dict
+    :ivar used: The timestamp of last use.
+    :type used: float
+    """
+
+    def __init__(self, key, url, authenticator=None):
+        """
+        :param key: The pool key.
+        :type key: tuple
+        :param url: The broker URL.
+        :type url: str
+        :param authenticator: A message authenticator.
+        :type authenticator: gofer.messaging.auth.Authenticator
+        """
+        self.key = key
+        self.url = url
+        self.authenticator = authenticator
+        self.registry = {}
+        self.used = time()
+        self._producer = None
+        self._saved = []
+
+    @property
+    def producer(self):
+        """
+        The open producer.
+        Must be attached.
+        :rtype: Producer
+        """
+        if self._producer is None:
+            producer = Producer(self.url)
+            producer.authenticator = self.authenticator
+            producer.open()
+            self._producer = producer
+        return self._producer
+
+    def attach(self):
+        """
+        Replace the thread singleton registry of the calling thread.
+        """
+        self._saved.append(ThreadSingleton.all())
+        ThreadSingleton.install(self.registry)
+
+    def detach(self):
+        """
+        Restore the thread singleton registry of the calling thread.
+        """
+        ThreadSingleton.install(self._saved.pop())
+
+    def healthy(self):
+        """
+        Get whether the connections (and producer) are still open.
+        :return: True if healthy.
+        :rtype: bool
+        """
+        try:
+            if self._producer is not None and not self._producer.is_open():
+                return False
+            for thing in self.registry.values():
+                if not thing.is_open():
+                    return False
+            return True
+        except Exception:
+            return False
+
+    def close(self):
+        """
+        Close the producer and all connections.
+        """
+        things = self.registry.values()
+        if self._producer is not None:
+            things.insert(0, self._producer)
+        self._producer = None
+        self.registry = {}
+        for thing in things:
+            try:
+                thing.close()
+            except Exception:
+                log.debug(self.url, exc_info=True)
+
+
+class Pool(object):
+    """
+    A (client) pool of long-lived broker connections and producers
+    keyed by broker URL and authenticator.
+    :cvar SIZE: The max number of idle leases held for each key.
+        Zero disables pooling.
+    :type SIZE: int
+    :cvar IDLE: Idle leases are closed after this number of seconds.
+    :type IDLE: int
+    :ivar idle: Idle leases (ordered by last use) keyed by (url, identity).
+    :type idle: dict
+    """
+
+    __metaclass__ = Singleton
+
+    SIZE = 10
+    IDLE = 300
+
+    @staticmethod
+    def key(url, authenticator=None):
+        """
+        Get the pool key.
+        :param url: The broker URL.
+        :type url: str
+        :param authenticator: A message authenticator.
+        :type authenticator: gofer.messaging.auth.Authenticator
+        :return: (url, identity) using the canonical url and the
+            stable identity of the authenticator.
+        :rtype: tuple
+        """
+        if url:
+            parsed = URL(url)
+            url = (parsed.adapter, parsed.canonical)
+        return url, auth.identity(authenticator)
+
+    def __init__(self):
+        self.idle = {}
+        self.__mutex = RLock()
+
+    @synchronized
+    def checkout(self, url, authenticator=None):
+        """
+        Checkout a healthy lease.
+        :param url: The broker URL.
+        :type url: str
+        :param authenticator: A message authenticator.
+        :type authenticator: gofer.messaging.auth.Authenticator
+        :return: The lease.
+        :rtype: Lease
+        """
+        self.evict()
+        key = self.key(url, authenticator)
+        idle = self.idle.get(key, [])
+        while idle:
+            lease = idle.pop()
+            if lease.healthy():
+                return lease
+            lease.close()
+        return Lease(key, url, authenticator)
+
+    @synchronized
+    def checkin(self, lease):
+        """
+        Return a lease to the pool.
+        :param lease: A lease.
+        :type lease: Lease
+        """
+        lease.used = time()
+        idle = self.idle.setdefault(lease.key, [])
+        idle.append(lease)
+        while len(idle) > self.SIZE:
+            idle.pop(0).close()
+        if not idle:
+            del self.idle[lease.key]
+
+    @synchronized
+    def evict(self):
+        """
+        Close leases idle longer than IDLE seconds.
+        """
+        expired = time() - self.IDLE
+        for key, idle in self.idle.items():
+            while idle and idle[0].used < expired:
+                idle.pop(0).close()
+            if not idle:
+                del self.idle[key]
+
+    @synchronized
+    def clear(self):
+        """
+        Close all idle leases.
+        """
+        for idle in self.idle.values():
+            for lease in idle:
+                lease.close()
+        self.idle = {}
+
+    @contextmanager
+    def lease(self, url, authenticator=None):
+        """
+        Lease pooled connections for the duration of the block.
+        Usage: with Pool().lease(url) as lease: ...
+        The lease is closed (not returned) when the block fails.
+        :param url: The broker URL.
+        :type url: str
+        :param authenticator: A message authenticator.
+        :type authenticator: gofer.messaging.auth.Authenticator
+        """
+        lease = self.checkout(url, authenticator)
+        lease.attach()
+        try:
+            yield lease
+        except Exception:
+            lease.detach()
+            lease.close()
+            raise
+        lease.detach()
+        self.checkin(lease)
+
+
 # --- broker -----------------------------------------------------------------
 
 
@@ -1004,6 +1347,21 @@ class Connector(Model):
     :type heartbeat: int|None
     :ivar ssl: The SSL configuration.
     :type ssl: SSL
+    :ivar codec: The wire codec name used to send documents.
+    :type codec: str|None
+    :ivar compression: The codec name used to compress large messages.
+    :type compression: str|None
+    :ivar compression_threshold: Messages larger (bytes) are compressed.
+    :type compression_threshold: int|None
+    :ivar chunk_size: The maximum (compressed) size (bytes) of each message.
+        Larger messages are sent in chunks.
+    :type chunk_size: int|None
+    :ivar reassembly_memory: The maximum size (bytes) of chunks held
+        while reassembling received messages.
+    :type reassembly_memory: int|None
+    :ivar reassembly_timeout: The seconds chunks are held while
+        reassembling received messages.
+    :type reassembly_timeout: int|None
     """
 
     @staticmethod
@@ -1030,6 +1388,12 @@ class Connector(Model):
         self.url = URL(url or DEFAULT_URL)
         self.heartbeat = None
         self.ssl = SSL()
+        self.codec = None
+        self.compression = None
+        self.compression_threshold = None
+        self.chunk_size = None
+        self.reassembly_memory = None
+        self.reassembly_timeout = None
 
     @property
     def domain_id(self):
@@ -14,19 +14,35 @@
 #
 """
 Message authentication plumbing.
+Signed messages have a (detached) signature prepended to the message:
+  SIGNED + <length> + <signature> + <message>
+The length is a 4 byte (network order) unsigned integer.
+The duration of each sign and validate operation is recorded in: timing.
 """
 
+from struct import pack, unpack_from, calcsize
 from hashlib import sha256
 from logging import getLogger
 from base64 import b64encode, b64decode
 
 from gofer.common import utf8
+from gofer.metrics import Timing
 from gofer.messaging.model import Document, DocumentError
 
 
 log = getLogger(__name__)
 
 
+# Detached signature marker
+SIGNED = '\x01'
+
+# Signature length format
+LENGTH = '!I'
+
+# Authenticator (sign|validate) timing
+timing = Timing()
+
+
 class ValidationFailed(DocumentError):
     """
     Message validation failed.
@@ -79,18 +95,37 @@ class Authenticator(object):
         raise NotImplementedError()
 
 
+def identity(authenticator):
+    """
+    Get a stable identity of the specified authenticator used to key
+    shared resources such as pooled connections and reply queues.
+    Authenticators may define an *id* to distinguish instances.
+    Otherwise, the qualified class name is used.
+    :param authenticator: A message authenticator.
+    :type authenticator: Authenticator
+    :return: The identity.
+    :rtype: str
+    """
+    if authenticator is None:
+        return None
+    _id = getattr(authenticator, 'id', None)
+    if _id is not None:
+        return _id
+    cls = authenticator.__class__
+    return '.'.join((cls.__module__, cls.__name__))
+
+
 def sign(authenticator, message):
     """
     Sign the message using the specified validator.
-    signed document:
-      {
-        message: <message>,
-        signature: <signature>
-      }
+    The signature is prepended to the (unchanged) message:
+      SIGNED + <length> + <signature> + <message>
     :param authenticator: A message authenticator.
     :type authenticator: Authenticator
-    :param message: A (signed) json encoded AMQP message.
-    :rtype message: str
+    :param message: An encoded AMQP message.
+    :type message: str
+    :return: The signed message.
+    :rtype: str
     """
     if not authenticator:
         return message
@@ -98,38 +133,37 @@ def sign(authenticator, message):
         h = sha256()
         h.update(message)
         digest = h.hexdigest()
-        signature = authenticator.sign(digest)
-        signed = Document(message=message, signature=encode(signature))
-        message = signed.dump()
+        with timing('sign'):
+            signature = authenticator.sign(digest) or ''
+        message = ''.join((SIGNED, pack(LENGTH, len(signature)), signature, message))
     except Exception, e:
         log.info(utf8(e))
         log.debug(message, exc_info=True)
     return message
 
 
-def validate(authenticator, message):
+def validate(authenticator, message, factory=None):
     """
     Validate the document using the specified validator.
-    signed document:
-      {
-        message: <message>,
-        signature: <signature>
-      }
+    See: peal() for supported formats.
     :param authenticator: A message authenticator.
     :type authenticator: Authenticator
     :param message: A json encoded AMQP message.
     :rtype message: str
+    :param factory: The (optional) document class (default: Document).
+    :type factory: type
     :return: The authenticated document.
     :rtype: Document
     :raises ValidationFailed: when message is not valid.
     """
-    document, original, signature = peal(message)
+    document, original, signature = peal(message, factory)
     try:
         if authenticator:
             h = sha256()
             h.update(original)
             digest = h.hexdigest()
-            authenticator.validate(document, digest, decode(signature))
+            with timing('validate'):
+                authenticator.validate(document, digest, decode(signature))
         return document
     except ValidationFailed, de:
         de.document = document
@@ -143,10 +177,11 @@ def validate(authenticator, message):
         raise de
 
 
-def peal(message):
+def peal(message, factory=None):
     """
     Peal the incoming message. The message one of:
-     - A signed document:
+     - A signed message: SIGNED + <length> + <signature> + <message>
+     - A signed document (nested format used by earlier versions):
         {
           message: <message>,
           signature: <signature>
@@ -158,29 +193,57 @@ def peal(message):
     - The signature.
     :param message: A json encoded AMQP message.
     :type message: str
+    :param factory: The (optional) document class (default: Document).
+    :type factory: type
     :return: tuple of: (document, original, signature)
     :rtype: tuple
     """
-    document = load(message)
+    if isinstance(message, str) and message.startswith(SIGNED):
+        return detached(message, factory)
+    document = load(message, factory)
     signature = document.signature
     original = document.message
     if original:
-        document = load(original)
+        document = load(original, factory)
     else:
         original = message
     return document, original, signature
 
 
-def load(json):
+def detached(message, factory=None):
+    """
+    Peal a message with a detached signature.
+    :param message: A signed message.
+    :type message: str
+    :param factory: The (optional) document class (default: Document).
+    :type factory: type
+    :return: tuple of: (document, original, signature)
+    :rtype: tuple
+    """
+    offset = len(SIGNED)
+    try:
+        length = unpack_from(LENGTH, message, offset)[0]
+    except Exception:
+        length = 0
+    offset += calcsize(LENGTH)
+    signature = message[offset:offset + length]
+    original = message[offset + length:]
+    document = load(original, factory)
+    return document, original, encode(signature)
+
+
+def load(json, factory=None):
     """
     Load the json document.
     Decoding errors are intentionally ignored.
     :param json: A json string.
     :type json: str
+    :param factory: The (optional) document class (default: Document).
+    :type factory: type
     :return: The loaded document.
     :rtype: Document
     """
-    document = Document()
+    document = (factory or Document)()
     try:
         document.load(json)
     except (TypeError, ValueError):
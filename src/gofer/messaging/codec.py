@@ -0,0 +1,447 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+Wire codecs used to encode and decode documents.
+JSON encoded documents are sent as-is for compatibility.
+Documents encoded by other codecs are prefixed with a header
+that identifies the codec:
+  \\x00<name>\\x00<encoded>
+Pre-encoded values (Fragment) are spliced into the encoded
+document so large values are encoded only once.
+"""
+
+from uuid import uuid4
+from struct import pack, unpack_from, calcsize
+
+from gofer.common import json, Options
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+# The header delimiter
+MAGIC = '\x00'
+
+
+def encoder(thing):
+    """
+    Encoder hook used to serialize objects not natively
+    supported by the codec.
+    Options may define __fields__() to provide the fields to be encoded.
+    :param thing: An object to be encoded.
+    :return: The object to be encoded instead.
+    :raise TypeError: when not supported.
+    """
+    if isinstance(thing, Options):
+        fields = getattr(type(thing), '__fields__', None)
+        if fields:
+            return fields(thing)
+        return thing.__dict__
+    if isinstance(thing, Fragment):
+        return thing.thing
+    raise TypeError('%r is not serializable' % thing)
+
+
+class Fragment(object):
+    """
+    A pre-encoded value.
+    The value is encoded when created (which validates it) and the
+    encoding is spliced into documents containing the fragment.
+    :ivar thing: The (decoded) value.
+    :ivar token: A unique placeholder used for splicing.
+    :type token: str
+    :ivar encoded: The encoded value keyed by codec name.
+    :type encoded: dict
+    """
+
+    def __init__(self, thing, name=None):
+        """
+        :param thing: The value to encode.
+        :param name: The codec name (default: json).
+        :type name: str
+        :raise TypeError: when not serializable.
+        """
+        self.thing = thing
+        self.token = uuid4().hex
+        self.encoded = {}
+        self.encode(find(name))
+
+    def encode(self, codec):
+        """
+        Get the value encoded using the specified codec.
+        The value is encoded on first use by each codec.
+        :param codec: A codec.
+        :type codec: Codec
+        :return: The encoded value (without header).
+        :rtype: str
+        """
+        try:
+            return self.encoded[codec.NAME]
+        except KeyError:
+            splicer = Splicer()
+            encoded = splicer.splice(codec, codec.dumps(self.thing, splicer))
+            self.encoded[codec.NAME] = encoded
+            return encoded
+
+
+class Splicer(object):
+    """
+    Encoder hook that replaces fragments with a placeholder
+    and splices in the fragment encoding.
+    :ivar fragments: The fragments found while encoding.
+    :type fragments: list
+    """
+
+    def __init__(self):
+        self.fragments = []
+
+    def __call__(self, thing):
+        """
+        Encoder hook.
+        :param thing: An object to be encoded.
+        :return: The object to be encoded instead.
+        """
+        if isinstance(thing, Fragment):
+            self.fragments.append(thing)
+            return thing.token
+        return encoder(thing)
+
+    def splice(self, codec, encoded):
+        """
+        Splice fragments into the encoded document.
+        :param codec: The codec used to encode the document.
+        :type codec: Codec
+        :param encoded: The encoded document.
+        :type encoded: str
+        :return: The document with fragments spliced in.
+        :rtype: str
+        """
+        for fragment in self.fragments:
+            placeholder = codec.dumps(fragment.token)
+            encoded = encoded.replace(placeholder, fragment.encode(codec), 1)
+        return encoded
+
+
+class Codec(object):
+    """
+    A wire codec.
+    :cvar NAME: The codec name (identified in the header).
+    :type NAME: str
+    """
+
+    NAME = None
+
+    def dumps(self, thing, default=encoder, last=()):
+        """
+        Encode an object.
+        :param thing: The object to encode.
+        :param default: The hook used to encode objects not natively supported.
+        :type default: callable
+        :param last: Top level fields to be encoded last (when supported).
+        :type last: tuple
+        :return: The encoded string.
+        :rtype: str
+        """
+        raise NotImplementedError()
+
+    def loads(self, s):
+        """
+        Decode an encoded string.
+        :param s: An encoded string (without the header).
+        :type s: str
+        :return: The decoded object.
+        """
+        raise NotImplementedError()
+
+
+class Json(Codec):
+    """
+    The JSON codec (default).
+    """
+
+    NAME = 'json'
+
+    def dumps(self, thing, default=encoder, last=()):
+        fields = thing
+        if isinstance(thing, Options):
+            fields = default(thing)
+        if not isinstance(fields, dict) or not [k for k in last if k in fields]:
+            return json.dumps(thing, sort_keys=True, default=default)
+        head = dict([(k, v) for k, v in fields.items() if k not in last])
+        encoded = [json.dumps(head, sort_keys=True, default=default)[:-1]]
+        for key in [k for k in last if k in fields]:
+            if head or len(encoded) > 1:
+                encoded.append(', ')
+            encoded.append(json.dumps(key))
+            encoded.append(': ')
+            encoded.append(json.dumps(fields[key], sort_keys=True, default=default))
+        encoded.append('}')
+        return ''.join(encoded)
+
+    def loads(self, s):
+        return json.loads(s)
+
+
+class MsgPack(Codec):
+    """
+    The msgpack codec.
+    Requires the (optional) msgpack package.
+    """
+
+    NAME = 'msgpack'
+
+    def dumps(self, thing, default=encoder, last=()):
+        return msgpack.packb(thing, default=default, use_bin_type=True)
+
+    def loads(self, s):
+        return msgpack.unpackb(s, raw=False)
+
+
+class Binary(Codec):
+    """
+    A restricted binary codec.
+    Supports only: None, bool, int, long, float, str, unicode,
+    list, tuple, dict and Options.  Each value is encoded as
+    a one byte tag followed by a fixed size or length-prefixed value.
+    """
+
+    NAME = 'binary'
+
+    NONE = 'N'
+    TRUE = 'T'
+    FALSE = 'F'
+    INT = 'i'
+    LONG = 'l'
+    FLOAT = 'd'
+    STR = 's'
+    UNICODE = 'u'
+    LIST = 'a'
+    DICT = 'm'
+
+    LENGTH = '!I'
+    NUMBER = '!q'
+    REAL = '!d'
+
+    MAX_INT = 0x7FFFFFFFFFFFFFFF
+    MIN_INT = -MAX_INT - 1
+
+    def dumps(self, thing, default=encoder, last=()):
+        encoded = []
+        self._dump(thing, encoded, default)
+        return ''.join(encoded)
+
+    def loads(self, s):
+        thing, offset = self._load(s, 0)
+        if offset != len(s):
+            raise ValueError('%d trailing bytes' % (len(s) - offset))
+        return thing
+
+    def _dump(self, thing, encoded, default):
+        """
+        Encode an object.
+        :param thing: The object to encode.
+        :param encoded: The list of encoded strings.
+        :type encoded: list
+        :param default: The hook used to encode objects not natively supported.
+        :type default: callable
+        :raise TypeError: when not supported.
+        """
+        if thing is None:
+            encoded.append(self.NONE)
+        elif thing is True:
+            encoded.append(self.TRUE)
+        elif thing is False:
+            encoded.append(self.FALSE)
+        elif isinstance(thing, (int, long)):
+            if self.MIN_INT <= thing <= self.MAX_INT:
+                encoded.append(self.INT + pack(self.NUMBER, thing))
+            else:
+                self._string(self.LONG, str(thing), encoded)
+        elif isinstance(thing, float):
+            encoded.append(self.FLOAT + pack(self.REAL, thing))
+        elif isinstance(thing, str):
+            self._string(self.STR, thing, encoded)
+        elif isinstance(thing, unicode):
+            self._string(self.UNICODE, thing.encode('utf8'), encoded)
+        elif isinstance(thing, (list, tuple)):
+            encoded.append(self.LIST + pack(self.LENGTH, len(thing)))
+            for item in thing:
+                self._dump(item, encoded, default)
+        elif isinstance(thing, dict):
+            encoded.append(self.DICT + pack(self.LENGTH, len(thing)))
+            for k, v in sorted(thing.items()):
+                self._dump(k, encoded, default)
+                self._dump(v, encoded, default)
+        else:
+            self._dump(default(thing), encoded, default)
+
+    def _string(self, tag, s, encoded):
+        encoded.append(tag + pack(self.LENGTH, len(s)))
+        encoded.append(s)
+
+    def _load(self, s, offset):
+        """
+        Decode the object at the specified offset.
+        :param s: An encoded string.
+        :type s: str
+        :param offset: The offset of the object.
+        :type offset: int
+        :return: tuple of: (object, offset of the next object)
+        :rtype: tuple
+        :raise ValueError: on invalid (or truncated) input.
+        """
+        try:
+            tag = s[offset]
+        except IndexError:
+            raise ValueError('truncated')
+        offset += 1
+        if tag == self.NONE:
+            return None, offset
+        if tag == self.TRUE:
+            return True, offset
+        if tag == self.FALSE:
+            return False, offset
+        if tag == self.INT:
+            return self._unpack(self.NUMBER, s, offset)
+        if tag == self.FLOAT:
+            return self._unpack(self.REAL, s, offset)
+        if tag in (self.STR, self.UNICODE, self.LONG):
+            length, offset = self._unpack(self.LENGTH, s, offset)
+            end = offset + length
+            if end > len(s):
+                raise ValueError('truncated')
+            value = s[offset:end]
+            if tag == self.UNICODE:
+                value = value.decode('utf8')
+            if tag == self.LONG:
+                value = long(value)
+            return value, end
+        if tag == self.LIST:
+            length, offset = self._unpack(self.LENGTH, s, offset)
+            thing = []
+            for n in xrange(length):
+                item, offset = self._load(s, offset)
+                thing.append(item)
+            return thing, offset
+        if tag == self.DICT:
+            length, offset = self._unpack(self.LENGTH, s, offset)
+            thing = {}
+            for n in xrange(length):
+                k, offset = self._load(s, offset)
+                v, offset = self._load(s, offset)
+                thing[k] = v
+            return thing, offset
+        raise ValueError('tag: %r not supported' % tag)
+
+    @staticmethod
+    def _unpack(fmt, s, offset):
+        try:
+            value = unpack_from(fmt, s, offset)[0]
+        except Exception:
+            raise ValueError('truncated')
+        return value, offset + calcsize(fmt)
+
+
+DEFAULT = Json.NAME
+
+codecs = {
+    Json.NAME: Json(),
+    Binary.NAME: Binary(),
+}
+
+if msgpack is not None:
+    codecs[MsgPack.NAME] = MsgPack()
+
+
+def register(codec):
+    """
+    Register a wire codec.
+    :param codec: A codec.
+    :type codec: Codec
+    """
+    codecs[codec.NAME] = codec
+
+
+def find(name=None):
+    """
+    Find a registered codec by name.
+    :param name: The codec name (default: json).
+    :type name: str
+    :return: The codec.
+    :rtype: Codec
+    :raise ValueError: when not found.
+    """
+    try:
+        return codecs[name or DEFAULT]
+    except KeyError:
+        raise ValueError('codec: %s, not found' % name)
+
+
+def detect(s):
+    """
+    Detect the codec used to encode the string.
+    :param s: An encoded string.
+    :type s: str
+    :return: tuple of: (codec, encoded string without the header).
+    :rtype: tuple
+    :raise ValueError: when not found.
+    """
+    if not isinstance(s, basestring) or not s.startswith(MAGIC):
+        return find(DEFAULT), s
+    end = s.find(MAGIC, 1)
+    if end < 0:
+        raise ValueError('invalid header')
+    return find(s[1:end]), s[end + 1:]
+
+
+def dumps(thing, name=None, last=()):
+    """
+    Encode an object using the named codec.
+    :param thing: The object to encode.
+    :param name: The codec name (default: json).
+    :type name: str
+    :param last: Top level fields to be encoded last (when supported).
+    :type last: tuple
+    :return: The encoded string.
+    :rtype: str
+    """
+    codec = find(name)
+    splicer = Splicer()
+    encoded = splicer.splice(codec, codec.dumps(thing, splicer, last))
+    if codec.NAME == DEFAULT:
+        return encoded
+    return ''.join((MAGIC, codec.NAME, MAGIC, encoded))
+
+
+def loads(s):
+    """
+    Decode a string encoded by any registered codec.
+    :param s: An encoded string.
+    :type s: str
+    :return: The decoded object.
+    :raise ValueError: on decoding failed.
+    """
+    codec, encoded = detect(s)
+    return codec.loads(encoded)
+
+
+def name(s):
+    """
+    Get the name of the codec used to encode the string.
+    :param s: An encoded string.
+    :type s: str
+    :return: The codec name.
+    :rtype: str
+    """
+    return detect(s)[0].NAME
@@ -9,22 +9,97 @@
 # have received a copy of GPLv2 along with this software; if not, see
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
+import sys
+
 from time import sleep
+from collections import deque
+from threading import Event
 from logging import getLogger
 
 from gofer.common import Thread, released
-from gofer.messaging.model import DocumentError
+from gofer.messaging.model import ModelError, DocumentError
 from gofer.messaging.adapter.model import Reader
 
 
 log = getLogger(__name__)
 
 
+class Authentication(object):
+    """
+    A received message to be authenticated (and prepared) by a pool worker.
+    :ivar consumer: The consumer that received the message.
+    :type consumer: ConsumerThread
+    :ivar message: The received message.
+    :type message: gofer.messaging.adapter.model.Message
+    :ivar body: The (complete) message body.
+    :type body: str
+    :ivar document: The authenticated document.
+    :type document: gofer.messaging.Document
+    :ivar exc_info: The exception raised by the worker.
+    :type exc_info: tuple
+    :ivar finished: Set when finished by the worker.
+    :type finished: Event
+    """
+
+    def __init__(self, consumer, message, body):
+        """
+        :param consumer: The consumer that received the message.
+        :type consumer: ConsumerThread
+        :param message: The received message.
+        :type message: gofer.messaging.adapter.model.Message
+        :param body: The (complete) message body.
+        :type body: str
+        """
+        self.consumer = consumer
+        self.message = message
+        self.body = body
+        self.document = None
+        self.exc_info = None
+        self.finished = Event()
+
+    def __call__(self):
+        """
+        Authenticate and prepare the document.
+        Called by the pool worker.
+        """
+        try:
+            document = self.consumer.reader.authenticate(self.body)
+            self.consumer.prepare(document)
+            self.document = document
+        except Exception:
+            self.exc_info = sys.exc_info()
+        finally:
+            self.finished.set()
+
+    def result(self):
+        """
+        Get the result.
+        The message is acknowledged when authentication failed.
+        :return: tuple: (Message, Document)
+        :rtype: tuple
+        :raises: Exception raised by the worker.
+        """
+        if self.exc_info is None:
+            return self.message, self.document
+        if isinstance(self.exc_info[1], ModelError):
+            self.message.ack()
+        raise self.exc_info[0], self.exc_info[1], self.exc_info[2]
+
+
 class ConsumerThread(Thread):
     """
     An AMQP (abstract) consumer.
+    :ivar pool: The (optional) thread pool used to authenticate (and prepare)
+        received documents.  Documents are authenticated in parallel and
+        dispatched in the order received.
+    :type pool: gofer.threadpool.ThreadPool
+    :ivar pending: Received messages being authenticated by the pool.
+    :type pending: deque
     """
 
+    # Seconds waited for a message while others are being authenticated.
+    POLL = 0.1
+
     def __init__(self, node, url, wait=3):
         """
         :param node: An AMQP queue.
@@ -40,6 +115,8 @@ class ConsumerThread(Thread):
         self.wait = wait
         self.authenticator = None
         self.reader = None
+        self.pool = None
+        self.pending = deque()
         self.setDaemon(True)
 
     def shutdown(self):
@@ -77,7 +154,10 @@ class ConsumerThread(Thread):
     def close(self):
         """
         Close the reader.
+        Messages being authenticated are discarded (not acknowledged)
+        and will be redelivered.
         """
+        self.pending.clear()
         try:
             self.reader.close()
         except Exception:
@@ -88,9 +168,12 @@ class ConsumerThread(Thread):
         Read and process incoming documents.
         """
         try:
-            wait = self.wait
-            reader = self.reader
-            message, document = reader.next(wait)
+            if self.pool is None:
+                message, document = self.reader.next(self.wait)
+                if message is not None:
+                    self.prepare(document)
+            else:
+                message, document = self.authenticated()
             if message is None:
                 # wait expired
                 return
@@ -105,6 +188,48 @@ class ConsumerThread(Thread):
             self.close()
             self.open()
 
+    def authenticated(self):
+        """
+        Get the next document authenticated by the pool.
+        Received messages are queued to the pool (up to twice the pool
+        capacity) and the oldest is returned when finished so that
+        documents are dispatched in the order received.
+        :return: tuple: (Message, Document) or (None, None) when nothing finished.
+        :rtype: tuple
+        :raises: DocumentError when the oldest failed authentication.
+        """
+        pending = self.pending
+        backlog = max(1, self.pool.capacity * 2)
+        while len(pending) < backlog and not (pending and pending[0].finished.isSet()):
+            message, body = self.reader.receive(self.POLL if pending else self.wait)
+            if message is None:
+                break
+            authentication = Authentication(self, message, body)
+            pending.append(authentication)
+            self.pool.run(authentication)
+        if not pending:
+            return None, None
+        oldest = pending[0]
+        if len(pending) < backlog:
+            oldest.finished.wait(self.POLL)
+        else:
+            oldest.finished.wait(self.wait)
+        if not oldest.finished.isSet():
+            return None, None
+        pending.popleft()
+        return oldest.result()
+
+    def prepare(self, document):
+        """
+        Called to prepare the (authenticated) document to be dispatched.
+        Called by a pool worker (when configured) so documents may be
+        prepared in parallel.
+        This method intended to be overridden by subclasses.
+        :param document: The received document.
+        :type document: gofer.messaging.Document
+        """
+        pass
+
     def rejected(self, code, description, document, details):
         """
         Called to process the received (invalid) document.
@@ -9,9 +9,19 @@
 # have received a copy of GPLv2 along with this software; if not, see
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
+import re
+
 from logging import getLogger
+from json.decoder import JSONDecoder, scanstring
+
+try:
+    from json.scanner import make_scanner
+except ImportError:
+    # python 2.6
+    make_scanner = None
 
-from gofer.common import utf8, json, Options
+from gofer.common import utf8, Options
+from gofer.messaging import codec
 
 
 log = getLogger(__name__)
@@ -21,6 +31,10 @@ log = getLogger(__name__)
 
 VERSION = '2.0'
 
+# Envelope fields containing the (large) payload.
+# Encoded after all other fields so they can be decoded lazily.
+PAYLOAD = ('request', 'result')
+
 
 # --- exceptions -------------------------------------------------------------
 
@@ -76,6 +90,26 @@ class VersionError(DocumentError):
             self.DETAILS % (expected, found))
 
 
+class DecodeError(DocumentError):
+
+    CODE = 'model.decode'
+    DESCRIPTION = 'MODEL: document decoding failed'
+
+    def __init__(self, document, details):
+        """
+        :param document: The invalid document.
+        :type document: Document
+        :param details: A detailed description of what failed.
+        :type details: str
+        """
+        DocumentError.__init__(
+            self,
+            self.CODE,
+            self.DESCRIPTION,
+            document,
+            details)
+
+
 # --- utils ------------------------------------------------------------------
 
 
@@ -92,45 +126,193 @@ def validate(document):
         raise error
 
 
+def raw_scanner(decoder):
+    """
+    Get a scanner that decodes the json value at an offset
+    using JSONDecoder.raw_decode().  Used when make_scanner()
+    is not available (python 2.6).
+    :param decoder: A json decoder.
+    :type decoder: JSONDecoder
+    :return: A function: scan(s, idx) returning tuple of: (value, end offset).
+    :rtype: callable
+    """
+    def scan(s, idx):
+        return decoder.raw_decode(s, idx=idx)
+    return scan
+
+
+def scanner(decoder):
+    """
+    Get a scanner that decodes the json value at an offset.
+    :param decoder: A json decoder.
+    :type decoder: JSONDecoder
+    :return: A function: scan(s, idx) returning tuple of: (value, end offset).
+    :rtype: callable
+    """
+    if make_scanner is not None:
+        return make_scanner(decoder)
+    else:
+        return raw_scanner(decoder)
+
+
 # --- model ------------------------------------------------------------------
 
 
 class Document(Options):
     """
     Extends the dict-like object that also provides
-    JSON serialization.
+    serialization using a wire codec.  See: gofer.messaging.codec.
+    :ivar _wire_codec: The name of the codec used to encode the loaded document.
+    :type _wire_codec: str
     """
 
+    __slots__ = ('_wire_codec',)
+
+    def __init__(self, *things, **keywords):
+        Options.__init__(self, *things, **keywords)
+        for thing in things:
+            if isinstance(thing, Document):
+                self._wire_codec = thing.wire_codec
+
+    @property
+    def wire_codec(self):
+        """
+        The name of the codec used to encode the loaded document.
+        Copied by the copy constructor.
+        :return: The codec name or None when not loaded.
+        :rtype: str
+        """
+        return self._wire_codec
+
     def load(self, s):
         """
-        Load using a json string.
-        :param s: A json encoded string.
+        Load using an encoded string.
+        The codec is detected using the header.
+        :param s: An encoded (json) string.
         :type s: str
         """
-        d = json.loads(s)
+        d = codec.loads(s)
         self.__dict__.update(d)
+        self._wire_codec = codec.name(s)
         return self
 
-    def dump(self):
+    def dump(self, name=None):
         """
-        Dump to a json string.
-        :return: A json encoded string.
+        Dump to an encoded string.
+        Nested Options are serialized directly by the codec.
+        The PAYLOAD fields are encoded last.
+        :param name: The (optional) codec name (default: json).
+        :type name: str
+        :return: An encoded (json) string.
         :rtype: str
         """
-        def fn(thing):
-            if isinstance(thing, Options):
-                thing = dict(thing.__dict__)
-                for k, v in thing.items():
-                    thing[k] = fn(v)
-                return thing
-            if isinstance(thing, dict):
-                thing = dict(thing)
-                for k, v in thing.items():
-                    thing[k] = fn(v)
-                return thing
-            if isinstance(thing, (tuple, list)):
-                thing = [fn(e) for e in thing]
-                return thing
-            return thing
-        d = fn(self)
-        return json.dumps(d, sort_keys=True)
+        return codec.dumps(self, name, PAYLOAD)
+
+
+class LazyDocument(Document):
+    """
+    A document with lazily decoded PAYLOAD fields.
+    Only the envelope fields (encoded before the payload) are decoded
+    when loaded.  The payload is decoded when accessed or materialized.
+    Documents encoded by earlier versions (payload not last) and by
+    codecs other than json are decoded when loaded.
+    :ivar _pending: The encoded string and the offset of the
+        fields not yet decoded.
+    :type _pending: tuple
+    """
+
+    __slots__ = ('_pending',)
+
+    WS = re.compile(r'[ \t\n\r]*')
+    scan = staticmethod(scanner(JSONDecoder()))
+
+    def __init__(self, *things, **keywords):
+        self._pending = None
+        Document.__init__(self, *things, **keywords)
+
+    def load(self, s):
+        """
+        Load using an encoded string.
+        :param s: An encoded (json) string.
+        :type s: str
+        """
+        _codec, encoded = codec.detect(s)
+        self._wire_codec = _codec.NAME
+        if _codec.NAME != codec.DEFAULT:
+            return Document.load(self, s)
+        try:
+            idx = self.WS.match(encoded, 0).end()
+            if encoded[idx] != '{':
+                raise ValueError(idx)
+            fields, idx = self._fields(encoded, idx + 1, True)
+        except (ValueError, IndexError, StopIteration):
+            return Document.load(self, s)
+        self.__dict__.update(fields)
+        if idx is not None:
+            self._pending = (encoded, idx)
+        return self
+
+    def materialize(self):
+        """
+        Decode the pending (payload) fields.
+        :return: self
+        :rtype: LazyDocument
+        :raise DecodeError: on decoding failed.
+        """
+        pending = self._pending
+        if not pending:
+            return self
+        self._pending = None
+        try:
+            fields, idx = self._fields(pending[0], pending[1], False)
+        except (ValueError, IndexError, StopIteration), e:
+            raise DecodeError(self, utf8(e) or 'invalid json')
+        self.__dict__.update(fields)
+        return self
+
+    def _fields(self, s, idx, lazy):
+        """
+        Decode the fields of the (top level) json object.
+        :param s: An encoded json object.
+        :type s: str
+        :param idx: The offset of the first field (or end of object).
+        :type idx: int
+        :param lazy: Stop at the payload when encoded last.
+        :type lazy: bool
+        :return: tuple of: (fields, offset of the pending fields or None)
+        :rtype: tuple
+        :raise ValueError: on decoding failed.
+        """
+        fields = {}
+        idx = self.WS.match(s, idx).end()
+        if s[idx] == '}':
+            return fields, None
+        while True:
+            start = idx
+            if s[idx] != '"':
+                raise ValueError(idx)
+            key, idx = scanstring(s, idx + 1)
+            idx = self.WS.match(s, idx).end()
+            if s[idx] != ':':
+                raise ValueError(idx)
+            idx = self.WS.match(s, idx + 1).end()
+            if lazy and key in PAYLOAD and 'version' in fields:
+                # encoded last
+                return fields, start
+            fields[key], idx = self.scan(s, idx)
+            idx = self.WS.match(s, idx).end()
+            if s[idx] == '}':
+                return fields, None
+            if s[idx] != ',':
+                raise ValueError(idx)
+            idx = self.WS.match(s, idx + 1).end()
+
+    def __getattr__(self, name):
+        if name in PAYLOAD and self._pending:
+            self.materialize()
+        return Document.__getattr__(self, name)
+
+    def __getitem__(self, name):
+        if name in PAYLOAD and self._pending:
+            self.materialize()
+        return Document.__getitem__(self, name)
@@ -0,0 +1,393 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+Large message transport.
+When enabled (a codec is specified), message bodies above a threshold
+are compressed and bodies that are still too large are split into chunks
+sent as separate messages.  Disabled by default because peers that do
+not support the transport cannot decode encoded messages.
+Encoded (transport) messages:
+  {
+    transport: {
+      codec: <codec>,
+      chunk: [<id>, <index>, <total>],
+      payload: <base64 encoded (compressed) body>
+    }
+  }
+Messages that are not encoded are passed through unchanged.
+"""
+
+import bz2
+import zlib
+
+from time import time
+from uuid import uuid4
+from base64 import b64encode, b64decode
+from collections import deque
+from logging import getLogger
+
+from gofer.common import LRU, nvl, utf8
+from gofer.messaging.model import Document, DocumentError
+
+
+log = getLogger(__name__)
+
+
+# The (sorted) json encoded transport document starts with
+PREFIX = '{"transport": '
+
+# No compression
+NONE = 'none'
+
+
+class Codec(object):
+    """
+    A compression codec.
+    :ivar name: The codec name.
+    :type name: str
+    """
+
+    def __init__(self, name, compress, decompress):
+        """
+        :param name: The codec name.
+        :type name: str
+        :param compress: The compress function.
+        :type compress: callable
+        :param decompress: The decompress function.
+        :type decompress: callable
+        """
+        self.name = name
+        self.compress = compress
+        self.decompress = decompress
+
+
+codecs = {
+    NONE: Codec(NONE, str, str),
+    'zlib': Codec('zlib', zlib.compress, zlib.decompress),
+    'bz2': Codec('bz2', bz2.compress, bz2.decompress),
+}
+
+
+def register(codec):
+    """
+    Register a compression codec.
+    :param codec: A codec.
+    :type codec: Codec
+    """
+    codecs[codec.name] = codec
+
+
+class TransportError(DocumentError):
+    """
+    Transport (decoding) failed.
+    """
+
+    CODE = 'transport.decode'
+    DESCRIPTION = 'TRANSPORT: message decoding failed'
+
+    def __init__(self, details=None):
+        """
+        :param details: A detailed description.
+        :type details: str
+        """
+        DocumentError.__init__(
+            self,
+            self.CODE,
+            self.DESCRIPTION,
+            Document(),
+            details)
+
+
+class Transport(object):
+    """
+    Encodes message bodies to be sent.
+    :ivar threshold: Bodies larger (bytes) are compressed.
+    :type threshold: int
+    :ivar codec: The compression codec name.
+        None disables the transport (bodies are sent unchanged).
+    :type codec: str
+    :ivar chunk: The maximum (encoded) payload (bytes) of each message.
+    :type chunk: int
+    """
+
+    THRESHOLD = 0x10000
+    CODEC = None
+    CHUNK = 0x100000
+
+    def __init__(self, threshold=None, codec=None, chunk=None):
+        """
+        :param threshold: Bodies larger (bytes) are compressed.
+            Default: THRESHOLD.
+        :type threshold: int
+        :param codec: The compression codec name.  Default: CODEC.
+        :type codec: str
+        :param chunk: The maximum (encoded) payload (bytes) of each message.
+            Default: CHUNK.
+        :type chunk: int
+        """
+        self.threshold = nvl(threshold, self.THRESHOLD)
+        self.codec = nvl(codec, self.CODEC)
+        self.chunk = nvl(chunk, self.CHUNK)
+
+    def encode(self, body):
+        """
+        Encode the message body.
+        :param body: A (json) message body.
+        :type body: str
+        :return: List of message bodies to send.
+        :rtype: list
+        """
+        if not self.codec or len(body) <= self.threshold:
+            return [body]
+        codec = codecs[self.codec]
+        payload = b64encode(codec.compress(utf8(body)))
+        if len(payload) <= self.chunk:
+            transport = dict(codec=codec.name, payload=payload)
+            return [Document(transport=transport).dump()]
+        _id = str(uuid4())
+        total = (len(payload) + self.chunk - 1) // self.chunk
+        encoded = []
+        for index in range(total):
+            start = index * self.chunk
+            transport = dict(
+                codec=codec.name,
+                chunk=(_id, index, total),
+                payload=payload[start:start + self.chunk])
+            encoded.append(Document(transport=transport).dump())
+        return encoded
+
+
+class Partial(object):
+    """
+    A partially received (chunked) message.
+    :ivar codec: The compression codec name.
+    :type codec: str
+    :ivar total: The total number of chunks.
+    :type total: int
+    :ivar chunks: Received payloads keyed by index.
+    :type chunks: dict
+    :ivar size: The total size (bytes) of received payloads.
+    :type size: int
+    :ivar created: When the first chunk was received.
+    :type created: float
+    :ivar messages: The (not yet acknowledged) received chunk messages.
+    :type messages: list
+    """
+
+    def __init__(self, codec, total):
+        """
+        :param codec: The compression codec name.
+        :type codec: str
+        :param total: The total number of chunks.
+        :type total: int
+        """
+        self.codec = codec
+        self.total = total
+        self.chunks = {}
+        self.size = 0
+        self.created = time()
+        self.messages = []
+
+    def add(self, index, payload, message=None):
+        """
+        Add a chunk.
+        :param index: The chunk index.
+        :type index: int
+        :param payload: The chunk payload.
+        :type payload: str
+        :param message: The (optional) received message.
+        :type message: gofer.messaging.adapter.model.Message
+        :return: True if added.  False when already received.
+        :rtype: bool
+        """
+        if index in self.chunks:
+            return False
+        self.chunks[index] = payload
+        self.size += len(payload)
+        if message is not None:
+            self.messages.append(message)
+        return True
+
+    def complete(self):
+        return len(self.chunks) == self.total
+
+    def payload(self):
+        return ''.join([self.chunks[n] for n in range(self.total)])
+
+
+class Assembler(object):
+    """
+    Decodes received message bodies and reassembles chunks.
+    The messages containing chunks are held (not acknowledged) until the
+    message has been reassembled and returned to the caller to be
+    acknowledged with the message containing the last chunk once
+    processed.  The messages held for discarded messages are acknowledged.
+    :ivar memory: The maximum size (bytes) of partial messages held.
+    :type memory: int
+    :ivar timeout: Seconds partial messages are held.
+    :type timeout: int
+    :ivar partial: Partial messages keyed by id.
+    :type partial: dict
+    :ivar arrived: The ids of partial messages in the order received.
+    :type arrived: deque
+    :ivar discarded: The ids of discarded partial messages.
+        Chunks received later are ignored.
+    :type discarded: LRU
+    """
+
+    MEMORY = 0x4000000
+    TIMEOUT = 300
+    DISCARDED = 1000
+
+    def __init__(self, memory=None, timeout=None):
+        """
+        :param memory: The maximum size (bytes) of partial messages held.
+            Default: MEMORY.
+        :type memory: int
+        :param timeout: Seconds partial messages are held.  Default: TIMEOUT.
+        :type timeout: int
+        """
+        self.memory = nvl(memory, self.MEMORY)
+        self.timeout = nvl(timeout, self.TIMEOUT)
+        self.partial = {}
+        self.arrived = deque()
+        self.discarded = LRU(self.DISCARDED, self.timeout)
+
+    @property
+    def size(self):
+        return sum([p.size for p in self.partial.values()])
+
+    @staticmethod
+    def ack(messages):
+        """
+        Acknowledge held messages.
+        :param messages: A list of messages.
+        :type messages: list
+        """
+        for message in messages:
+            message.ack()
+
+    def decode(self, body, message=None):
+        """
+        Decode the message body.
+        See: reassemble().
+        :param body: A received message body.
+        :type body: str
+        :param message: The (optional) received message.
+        :type message: gofer.messaging.adapter.model.Message
+        :return: The decoded body or None when a chunk of an
+            incomplete message has been received.
+        :rtype: str
+        :raise TransportError: on decoding failed.
+        """
+        return self.reassemble(body, message)[0]
+
+    def reassemble(self, body, message=None):
+        """
+        Decode the message body.
+        :param body: A received message body.
+        :type body: str
+        :param message: The (optional) received message.
+            Held (not acknowledged) until the message is reassembled.
+        :type message: gofer.messaging.adapter.model.Message
+        :return: tuple of: (body, held).  The body is the decoded body or
+            None when a chunk of an incomplete message has been received.
+            The held messages contain the other chunks of the reassembled
+            message and must be acknowledged by the caller.
+        :rtype: tuple
+        :raise TransportError: on decoding failed.
+        """
+        held = []
+        if not isinstance(body, basestring) or not body.startswith(PREFIX):
+            return body, held
+        try:
+            transport = Document().load(body).transport
+            codec = codecs[transport['codec']]
+            chunk = transport.get('chunk')
+            payload = transport['payload']
+            if chunk:
+                partial = self.add(codec.name, chunk, payload, message)
+                if partial is None:
+                    return None, held
+                payload = partial.payload()
+                held = [m for m in partial.messages if m is not message]
+            return codec.decompress(b64decode(payload)), held
+        except Exception, e:
+            log.debug(body[:1024], exc_info=True)
+            self.ack(held)
+            raise TransportError(utf8(e))
+
+    def add(self, codec, chunk, payload, message=None):
+        """
+        Add a received chunk.
+        Messages containing ignored chunks are acknowledged.
+        :param codec: The compression codec name.
+        :type codec: str
+        :param chunk: The chunk: (id, index, total).
+        :type chunk: list
+        :param payload: The chunk payload.
+        :type payload: str
+        :param message: The (optional) received message.
+        :type message: gofer.messaging.adapter.model.Message
+        :return: The completed partial or None when incomplete.
+        :rtype: Partial
+        """
+        _id, index, total = chunk
+        self.purge()
+        held = [m for m in (message,) if m is not None]
+        if _id in self.discarded:
+            self.ack(held)
+            return None
+        partial = self.partial.get(_id)
+        if partial is None:
+            partial = Partial(codec, total)
+            self.partial[_id] = partial
+            self.arrived.append(_id)
+        if not partial.add(index, payload, message):
+            self.ack(held)
+            return None
+        if partial.complete():
+            del self.partial[_id]
+            self.arrived.remove(_id)
+            return partial
+        self.evict()
+
+    def discard(self, _id):
+        """
+        Discard a partial message.
+        The held messages are acknowledged.
+        :param _id: The message id.
+        :type _id: str
+        """
+        partial = self.partial.pop(_id)
+        self.arrived.remove(_id)
+        self.discarded.put(_id, None)
+        self.ack(partial.messages)
+
+    def purge(self):
+        """
+        Discard partial messages held longer than the timeout.
+        """
+        now = time()
+        for _id, partial in self.partial.items():
+            if now - partial.created > self.timeout:
+                log.warn('transport: %s, incomplete, discarded', _id)
+                self.discard(_id)
+
+    def evict(self):
+        """
+        Discard the oldest partial messages when the memory is exceeded.
+        """
+        while self.partial and self.size > self.memory:
+            _id = self.arrived[0]
+            log.warn('transport: %s, memory exceeded, discarded', _id)
+            self.discard(_id)
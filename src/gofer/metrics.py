@@ -23,8 +23,9 @@ import time
 
 from math import modf
 from datetime import datetime
+from threading import RLock
 
-from gofer.common import utf8
+from gofer.common import utf8, synchronized
 
 
 def timestamp():
@@ -121,3 +122,78 @@ class Memory(object):
         elif hasattr(thing, '__dict__'):
             n_bytes += Memory._sizeof(thing.__dict__, history)
         return n_bytes
+
+
+class Timing(object):
+    """
+    Accumulated (per-operation) timing.
+    :ivar operations: The [count, total, max] seconds keyed by operation.
+    :type operations: dict
+    """
+
+    def __init__(self):
+        self.operations = {}
+        self.__mutex = RLock()
+
+    @synchronized
+    def record(self, operation, duration):
+        """
+        Record the duration of an operation.
+        :param operation: The operation name.
+        :type operation: str
+        :param duration: The duration (seconds).
+        :type duration: float
+        """
+        sample = self.operations.setdefault(operation, [0, 0.0, 0.0])
+        sample[0] += 1
+        sample[1] += duration
+        sample[2] = max(sample[2], duration)
+
+    def __call__(self, operation):
+        """
+        Time an operation.
+        Usage: with timing('sign'): ...
+        :param operation: The operation name.
+        :type operation: str
+        :return: A context manager.
+        """
+        return _Timed(self, operation)
+
+    @synchronized
+    def stats(self):
+        """
+        Get statistics.
+        :return: {count:, total:, mean:, max:} (seconds) keyed by operation.
+        :rtype: dict
+        """
+        stats = {}
+        for operation, (count, total, longest) in self.operations.items():
+            stats[operation] = dict(
+                count=count,
+                total=total,
+                mean=total / count,
+                max=longest)
+        return stats
+
+    @synchronized
+    def clear(self):
+        """
+        Clear accumulated timing.
+        """
+        self.operations.clear()
+
+
+class _Timed(object):
+
+    def __init__(self, timing, operation):
+        self.timing = timing
+        self.operation = operation
+        self.timer = Timer()
+
+    def __enter__(self):
+        self.timer.start()
+        return self.timer
+
+    def __exit__(self, *unused):
+        self.timer.stop()
+        self.timing.record(self.operation, self.timer.duration())
@@ -14,6 +14,9 @@
 #
 
 from gofer.rmi.container import Container
+from gofer.rmi.policy import Future, as_completed, wait_all
+from gofer.rmi.batch import Batch
+from gofer.rmi.cache import Cache
 
 
 class Agent(Container):
@@ -31,6 +34,42 @@ class Agent(Container):
         super(Agent, self).__init__(url, address, **options)
 
 
+class AsyncAgent(Container):
+    """
+    A remote agent used by event loop (asyncio) applications.
+    RMI calls return a future of the event loop.
+    """
+
+    def __init__(self, url, address, loop, **options):
+        """
+        :param url: The agent URL.
+        :type url: str
+        :param address: The AMQP address to the agent.
+        :type address: str
+        :param loop: An event loop.
+        :type loop: object
+        """
+        options['loop'] = loop
+        super(AsyncAgent, self).__init__(url, address, **options)
+
+
+def fanout(url, addresses, **options):
+    """
+    Get a proxy for many remote agents.
+    Each RMI is sent to all of the agents and returns an iterator
+    of AgentReply as each reply arrives.  Agents that do not reply
+    within the *wait* are reported as timed-out.
+    :param url: The broker URL.
+    :type url: str
+    :param addresses: A list of AMQP addresses or a topic exchange address.
+    :type addresses: (list|str)
+    :return: An agent (proxy).
+    :rtype: Agent
+    """
+    options['fanout'] = True
+    return Agent(url, addresses, **options)
+
+
 def agent(url, address, **options):
     """
     Get a proxy for the remote Agent.
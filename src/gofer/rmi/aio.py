@@ -0,0 +1,162 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+Provides RMI for event loop (asyncio) applications.
+Calls return a future of the event loop that can be awaited (or yielded
+from) by coroutines.  Requests are sent in the loop's executor and replies
+are delivered by the shared reply router so the loop is never blocked.
+The loop is duck typed and must support: create_future(),
+call_soon_threadsafe(), run_in_executor() and create_task().
+
+Usage:
+  agent = AsyncAgent(url, address, loop)
+  dog = agent.Dog()
+  barked = yield from dog.bark('hello')
+"""
+
+from inspect import isgenerator
+from logging import getLogger
+
+from gofer.rmi.policy import Policy, Trigger, Future
+
+
+log = getLogger(__name__)
+
+
+def awaitable(thing):
+    """
+    Get whether the object returned by a callback must be
+    scheduled as a task on the event loop.
+    :param thing: Anything.
+    :return: True if a coroutine.
+    :rtype: bool
+    """
+    return isgenerator(thing) or hasattr(thing, '__await__')
+
+
+def chain(future, waiter):
+    """
+    Transfer the outcome of a resolved (gofer) future to a future
+    of the event loop.  Must be called on the event loop thread.
+    :param future: A resolved future.
+    :type future: gofer.rmi.policy.Future
+    :param waiter: A future of the event loop.
+    """
+    if waiter.done():
+        # cancelled
+        return
+    exception = future.exception(0)
+    if exception is not None:
+        waiter.set_exception(exception)
+    else:
+        waiter.set_result(future.result(0))
+
+
+def bridge(future, loop, waiter=None):
+    """
+    Get a future of the event loop resolved with the (gofer) future.
+    :param future: A (gofer) future.
+    :type future: gofer.rmi.policy.Future
+    :param loop: An event loop.
+    :param waiter: An (optional) future of the event loop to be resolved.
+        When not specified, one is created.
+    :return: A future of the event loop.
+    """
+    if waiter is None:
+        waiter = loop.create_future()
+
+    def resolved(f):
+        loop.call_soon_threadsafe(chain, f, waiter)
+
+    future.add_done_callback(resolved)
+    return waiter
+
+
+class AsyncPolicy(Policy):
+    """
+    The event loop invocation policy.
+    Synchronous calls return a future of the event loop.
+    Progress is reported on the event loop thread.
+    """
+
+    @property
+    def loop(self):
+        return self.options.loop
+
+    @property
+    def futures(self):
+        return True
+
+    def on_progress(self, document):
+        """
+        Handle the progress report on the event loop thread.
+        :param document: The status document.
+        :type document: Document
+        """
+        reporter = self.progress
+        if not callable(reporter):
+            return
+        report = dict(
+            sn=document.sn,
+            data=document.data,
+            total=document.total,
+            completed=document.completed,
+            details=document.details)
+        self.loop.call_soon_threadsafe(self.report, reporter, report)
+
+    def report(self, reporter, report):
+        """
+        Invoke the progress reporter.
+        Coroutines returned by the reporter are scheduled as tasks.
+        :param reporter: The progress callback.
+        :type reporter: callable
+        :param report: The progress report.
+        :type report: dict
+        """
+        try:
+            thing = reporter(report)
+            if awaitable(thing):
+                self.loop.create_task(thing)
+        except Exception:
+            log.error('progress callback failed', exc_info=1)
+
+    def __call__(self, request):
+        """
+        Send the request in the loop executor.
+        :param request: A request to send.
+        :type request: object
+        :return: A future of the event loop resolved with the returned
+            value (or serial number for asynchronous requests).
+        """
+        trigger = Trigger(self, request)
+        if self.trigger == Trigger.MANUAL:
+            return trigger
+        loop = self.loop
+        waiter = loop.create_future()
+
+        def sent(f):
+            if waiter.done():
+                # cancelled
+                return
+            exception = f.exception()
+            if exception is not None:
+                waiter.set_exception(exception)
+                return
+            result = f.result()
+            if isinstance(result, Future):
+                bridge(result, loop, waiter)
+            else:
+                waiter.set_result(result)
+
+        sending = loop.run_in_executor(None, trigger)
+        sending.add_done_callback(sent)
+        return waiter
@@ -19,7 +19,8 @@ Provides async AMQP message consumer classes.
 
 from logging import getLogger
 
-from gofer.common import utf8
+from gofer.common import LRU, utf8
+from gofer.threadpool import KeyedPool
 from gofer.messaging import Document, Consumer
 from gofer.rmi.dispatcher import Reply, Return, RemoteException
 
@@ -27,16 +28,64 @@ from gofer.rmi.dispatcher import Reply, Return, RemoteException
 log = getLogger(__name__)
 
 
+class Blacklist(object):
+    """
+    A bounded set of serial numbers that expire.
+    :ivar entries: The serial numbers.
+    :type entries: LRU
+    """
+
+    MAXSIZE = 10000
+    TTL = 600
+
+    def __init__(self, maxsize=MAXSIZE, ttl=TTL):
+        """
+        :param maxsize: The maximum number of entries.
+        :type maxsize: int
+        :param ttl: The seconds an entry is kept.
+        :type ttl: int
+        """
+        self.entries = LRU(maxsize, ttl)
+
+    @property
+    def maxsize(self):
+        return self.entries.maxsize
+
+    @property
+    def ttl(self):
+        return self.entries.ttl
+
+    def add(self, sn):
+        """
+        Add a serial number.
+        The oldest (above maxsize) entries are evicted.
+        :param sn: A serial number.
+        :type sn: str
+        """
+        self.entries.put(sn, None)
+
+    def clear(self):
+        self.entries.clear()
+
+    def __contains__(self, sn):
+        return sn in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+
 class ReplyConsumer(Consumer):
     """
     A request, reply consumer.
     :ivar listener: An reply listener.
     :type listener: any
-    :ivar blacklist: A set of serial numbers to ignore.
-    :type blacklist: set
+    :ivar blacklist: Serial numbers to ignore.
+    :type blacklist: Blacklist
+    :ivar pool: An (optional) pool used to notify the listener.
+    :type pool: KeyedPool
     """
 
-    def __init__(self, queue, url=None, authenticator=None):
+    def __init__(self, queue, url=None, authenticator=None, threads=0):
         """
         :param queue: The AMQP node.
         :type queue: gofer.messaging.adapter.model.Queue
@@ -44,11 +93,19 @@ class ReplyConsumer(Consumer):
         :type url: str
         :param authenticator: A message authenticator.
         :type authenticator: gofer.messaging.auth.Authenticator
+        :param threads: The number of threads used to notify the listener.
+            When 0, the listener is notified on the consumer thread.
+            Notifications for the same request are always ordered.
+        :type threads: int
         """
         Consumer.__init__(self, queue, url)
         self.authenticator = authenticator
         self.listener = None
-        self.blacklist = set()
+        self.blacklist = Blacklist()
+        if threads:
+            self.pool = KeyedPool(threads)
+        else:
+            self.pool = None
 
     def start(self, listener):
         """
@@ -58,9 +115,31 @@ class ReplyConsumer(Consumer):
         :type listener: Listener
         """
         self.listener = listener
-        self.blacklist = set()
+        self.blacklist.clear()
+        if self.pool is not None:
+            self.pool.start()
         Consumer.start(self)
 
+    def shutdown(self):
+        """
+        Shutdown the consumer.
+        Queued notifications are completed.
+        """
+        Consumer.shutdown(self)
+        if self.pool is not None:
+            self.pool.shutdown()
+
+    def notify(self, reply):
+        """
+        Notify the listener.
+        :param reply: The reply.
+        :type reply: AsyncReply
+        """
+        if self.pool is None:
+            reply.notify(self.listener)
+        else:
+            self.pool.run(reply.sn, reply.notify, self.listener)
+
     def dispatch(self, document):
         """
         Dispatch received request.
@@ -76,29 +155,33 @@ class ReplyConsumer(Consumer):
                 return
             if reply.accepted():
                 reply = Accepted(document)
-                reply.notify(self.listener)
+                self.notify(reply)
                 return
             if reply.rejected():
                 reply = Rejected(document)
-                reply.notify(self.listener)
+                self.notify(reply)
                 return
             if reply.started():
                 reply = Started(document)
-                reply.notify(self.listener)
+                self.notify(reply)
                 return
             if reply.progress():
                 reply = Progress(document)
-                reply.notify(self.listener)
+                self.notify(reply)
+                return
+            if reply.partial():
+                reply = Partial(document)
+                self.notify(reply)
                 return
             if reply.succeeded():
                 self.blacklist.add(document.sn)
                 reply = Succeeded(document)
-                reply.notify(self.listener)
+                self.notify(reply)
                 return
             if reply.failed():
                 self.blacklist.add(document.sn)
                 reply = Failed(document)
-                reply.notify(self.listener)
+                self.notify(reply)
                 return
         except Exception:
             log.exception(document)
@@ -360,6 +443,42 @@ class Progress(AsyncReply):
         return utf8(self)
 
 
+class Partial(AsyncReply):
+    """
+    Items streamed by a generator-returning remote method.
+    The final reply is sent after all of the items.
+    :ivar seq: The sequence number of the partial reply.
+    :type seq: int
+    :ivar items: The streamed items.
+    :type items: list
+    """
+
+    def __init__(self, document):
+        """
+        :param document: The received document.
+        :type document: Document
+        """
+        AsyncReply.__init__(self, document)
+        self.seq = document.seq
+        self.items = document.items or []
+
+    def notify(self, listener):
+        if callable(listener):
+            listener(self)
+        else:
+            listener.partial(self)
+
+    def __unicode__(self):
+        s = list()
+        s.append(AsyncReply.__unicode__(self))
+        s.append('       seq: %s' % unicode(self.seq))
+        s.append('     items: %s' % unicode(self.items))
+        return '\n'.join(s)
+
+    def __str__(self):
+        return utf8(self)
+
+
 class Listener:
     """
     An asynchronous operation callback listener.
@@ -412,3 +531,11 @@ class Listener:
         :type reply: Progress.
         """
         pass
+
+    def partial(self, reply):
+        """
+        Async items streamed.
+        :param reply: The request.
+        :type reply: Partial.
+        """
+        pass
@@ -0,0 +1,290 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+Provides batched RMI.
+Calls made (by the thread) on stubs within a batch are collected and
+sent to each agent as a single request.  The agent executes the calls
+and sends a single reply containing the Return for each call.
+
+Usage:
+  with Batch(parallel=True) as batch:
+      dog = agent.Dog()
+      barked = dog.bark('hello')
+      wagged = dog.wag(3)
+  print barked.result()
+"""
+
+from gofer.common import Local
+from gofer.messaging import Document
+from gofer.rmi.dispatcher import Request, Return, RemoteException
+from gofer.rmi.policy import Future
+
+
+def batched(request):
+    """
+    Get whether the RMI request is batched.
+    :param request: The RMI request (the *request* part of the document).
+    :type request: dict
+    :return: True if batched.
+    :rtype: bool
+    """
+    return Document(request or {}).batch is not None
+
+
+def unbatched(request):
+    """
+    Get the list of RMI requests contained in a batch.
+    :param request: The RMI request (the *request* part of the document).
+    :type request: dict
+    :return: List of: Request.
+    :rtype: list
+    """
+    return [Request(r) for r in Document(request).batch]
+
+
+class Result(object):
+    """
+    The (deferred) result of a call made within a batch.
+    :ivar group: The group containing the call.
+    :type group: Group
+    :ivar index: The index of the call in the group.
+    :type index: int
+    """
+
+    def __init__(self, group, index):
+        """
+        :param group: The group containing the call.
+        :type group: Group
+        :param index: The index of the call in the group.
+        :type index: int
+        """
+        self.group = group
+        self.index = index
+
+    def result(self):
+        """
+        Get the returned value.
+        Blocks until the batch reply has been received.
+        :return: The value returned by the remote method.
+        :raise Exception: The exception raised by the remote method.
+        """
+        exception = self.exception()
+        if exception is not None:
+            raise exception
+        return self.group.returned[self.index]
+
+    def exception(self):
+        """
+        Get the raised exception.
+        Blocks until the batch reply has been received.
+        :return: The exception raised by the remote method or None.
+        :rtype: Exception
+        """
+        self.group.wait()
+        if self.group.exception is not None:
+            return self.group.exception
+        return self.group.raised[self.index]
+
+
+class Group(object):
+    """
+    The calls within a batch made to the same agent.
+    :cvar SENDING: The (policy) options used to send the batch.
+    :type SENDING: tuple
+    :ivar policy: The policy of the first stub called.
+    :type policy: gofer.rmi.policy.Policy
+    :ivar requests: The collected requests.
+    :type requests: list
+    :ivar reply: The value returned by the policy.
+    :ivar returned: The returned value for each call.
+    :type returned: list
+    :ivar raised: The raised exception for each call.
+    :type raised: list
+    :ivar exception: Raised when the batch reply was not received.
+    :type exception: Exception
+    """
+
+    SENDING = (
+        'user',
+        'password',
+        'secret',
+        'wait',
+        'ttl',
+        'priority',
+        'progress',
+        'data',
+        'authenticator',
+        'exchange',
+    )
+
+    def __init__(self, policy):
+        """
+        :param policy: The policy of the first stub called.
+        :type policy: gofer.rmi.policy.Policy
+        """
+        self.policy = policy
+        self.requests = []
+        self.reply = None
+        self.returned = None
+        self.raised = None
+        self.exception = None
+
+    def accepts(self, policy):
+        """
+        Get whether calls made using the specified policy can be
+        sent within this group.  The options used to send the batch
+        must match the options of the first stub called.
+        :param policy: The policy of the stub called.
+        :type policy: gofer.rmi.policy.Policy
+        :return: True if accepted.
+        :rtype: bool
+        """
+        for name in self.SENDING:
+            if getattr(policy.options, name) != getattr(self.policy.options, name):
+                return False
+        return True
+
+    def add(self, request):
+        """
+        Add a request.
+        :param request: An RMI request.
+        :type request: Request
+        :return: The deferred result.
+        :rtype: Result
+        """
+        self.requests.append(request)
+        return Result(self, len(self.requests) - 1)
+
+    def send(self, parallel):
+        """
+        Send the collected requests as a single (batched) request.
+        :param parallel: The agent executes the calls in parallel.
+        :type parallel: bool
+        """
+        request = Request(batch=self.requests, parallel=parallel)
+        try:
+            self.reply = self.policy(request)
+        except Exception, e:
+            self.exception = e
+
+    def wait(self):
+        """
+        Wait for the batch reply and distribute the results.
+        :raise ValueError: The batch was not sent synchronously.
+        """
+        if self.returned is not None or self.exception is not None:
+            return
+        reply = self.reply
+        if isinstance(reply, Future):
+            try:
+                reply = reply.result()
+            except Exception, e:
+                self.exception = e
+                return
+        if not isinstance(reply, list):
+            raise ValueError('batch reply: %s, not synchronous' % reply)
+        returned = []
+        raised = []
+        for thing in reply:
+            thing = Return(thing)
+            if thing.succeeded():
+                returned.append(thing.retval)
+                raised.append(None)
+            else:
+                returned.append(None)
+                raised.append(RemoteException.instance(thing))
+        self.raised = raised
+        self.returned = returned
+
+
+class Batch(object):
+    """
+    A batch context.
+    Calls made by the thread on any stub within the context are
+    collected and grouped by agent (url, address).  Calls made to the
+    same agent must be sent using the same options.  See: Group.SENDING.
+    :ivar parallel: The agent executes the calls in parallel.
+    :type parallel: bool
+    :ivar groups: Calls grouped by: (url, address).
+    :type groups: dict
+    """
+
+    _current = Local()
+
+    @staticmethod
+    def current():
+        """
+        Get the batch active for the thread.
+        :return: The active batch or None.
+        :rtype: Batch
+        """
+        try:
+            return Batch._current.inst
+        except AttributeError:
+            return None
+
+    def __init__(self, parallel=False):
+        """
+        :param parallel: The agent executes the calls in parallel.
+        :type parallel: bool
+        """
+        self.parallel = parallel
+        self.groups = {}
+
+    @property
+    def replies(self):
+        """
+        The value returned by the policy for each group.
+        For asynchronous batches, this is the request serial number.
+        :return: dict of reply keyed by: (url, address).
+        :rtype: dict
+        """
+        return dict([(k, g.reply) for k, g in self.groups.items()])
+
+    def add(self, policy, request):
+        """
+        Add a request.
+        :param policy: The policy of the stub called.
+        :type policy: gofer.rmi.policy.Policy
+        :param request: An RMI request.
+        :type request: Request
+        :return: The deferred result.
+        :rtype: Result
+        :raise ValueError: The policy options used to send the batch
+            do not match those of calls already made to the agent.
+        """
+        key = (policy.url, policy.address)
+        group = self.groups.get(key)
+        if group is None:
+            group = Group(policy)
+            self.groups[key] = group
+        if not group.accepts(policy):
+            raise ValueError('batch options: %s, must match for: %s' % (Group.SENDING, key))
+        return group.add(request)
+
+    def send(self):
+        """
+        Send each group as a single request.
+        """
+        for group in self.groups.values():
+            group.send(self.parallel)
+
+    def __enter__(self):
+        if Batch.current() is not None:
+            raise ValueError('batch already active')
+        Batch._current.inst = self
+        return self
+
+    def __exit__(self, xtype, *unused):
+        Batch._current.inst = None
+        if xtype is None:
+            self.send()
@@ -0,0 +1,158 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+Provides the client (result) cache.
+Values returned by remote methods declared as cacheable by
+the agent are cached by the caller for the advertised TTL.
+"""
+
+from copy import deepcopy
+from threading import RLock
+
+from gofer.common import Singleton, LRU, synchronized
+
+
+class Key(tuple):
+    """
+    A cache key.
+    Fields: (url, address, classname, method, user, request)
+    """
+
+    def __new__(cls, url, address, classname, method, user, request):
+        """
+        :param url: The broker URL.
+        :type url: str
+        :param address: The AMQP address.
+        :type address: str
+        :param classname: The remote class name.
+        :type classname: str
+        :param method: The remote method name.
+        :type method: str
+        :param user: The (optional) authenticated user.
+        :type user: str
+        :param request: The encoded RMI request.
+            Includes the constructor arguments and arguments.
+        :type request: str
+        """
+        return tuple.__new__(cls, (url, address, classname, method, user, request))
+
+    def matched(self, url=None, address=None, classname=None, method=None):
+        """
+        Get whether the key is matched by the specified criteria.
+        Unspecified (None) criteria are ignored.
+        :rtype: bool
+        """
+        for field, value in zip(self, (url, address, classname, method)):
+            if value is not None and field != value:
+                return False
+        return True
+
+
+class Cache(object):
+    """
+    The process wide cache of returned values.
+    Entries are evicted when expired or least recently used.
+    :ivar entries: The cached values keyed by Key.
+    :type entries: LRU
+    :ivar hits: The number of cache hits.
+    :type hits: int
+    :ivar misses: The number of cache misses.
+    :type misses: int
+    """
+
+    __metaclass__ = Singleton
+
+    MAXSIZE = 1000
+
+    # not cached
+    MISSING = object()
+
+    def __init__(self, maxsize=MAXSIZE):
+        """
+        :param maxsize: The maximum number of entries.
+        :type maxsize: int
+        """
+        self.entries = LRU(maxsize)
+        self.hits = 0
+        self.misses = 0
+        self.__mutex = RLock()
+
+    @property
+    def maxsize(self):
+        return self.entries.maxsize
+
+    @synchronized
+    def get(self, key):
+        """
+        Get a cached value.
+        :param key: The cache key.
+        :type key: Key
+        :return: A tuple of: (found, value).
+        :rtype: tuple
+        """
+        value = self.entries.get(key, self.MISSING)
+        if value is self.MISSING:
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        return True, deepcopy(value)
+
+    @synchronized
+    def put(self, key, value, ttl):
+        """
+        Cache a value.
+        :param key: The cache key.
+        :type key: Key
+        :param value: The returned value.
+        :param ttl: The seconds the value is cached.
+        :type ttl: float
+        """
+        self.entries.put(key, deepcopy(value), ttl)
+
+    @synchronized
+    def invalidate(self, url=None, address=None, classname=None, method=None):
+        """
+        Invalidate entries matched by the specified criteria.
+        Unspecified (None) criteria are ignored.
+        :param url: The broker URL.
+        :type url: str
+        :param address: The AMQP address.
+        :type address: str
+        :param classname: The remote class name.
+        :type classname: str
+        :param method: The remote method name.
+        :type method: str
+        :return: The number of invalidated entries.
+        :rtype: int
+        """
+        matched = [k for k in self.entries.keys() if k.matched(url, address, classname, method)]
+        for key in matched:
+            self.entries.pop(key)
+        return len(matched)
+
+    @synchronized
+    def clear(self):
+        """
+        Clear all entries and counters.
+        """
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    @synchronized
+    def stats(self):
+        """
+        Get cache statistics.
+        :return: dict of: hits, misses and size.
+        :rtype: dict
+        """
+        return dict(hits=self.hits, misses=self.misses, size=len(self.entries))
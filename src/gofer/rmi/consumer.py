@@ -15,6 +15,7 @@
 
 from logging import getLogger
 
+from gofer.common import nvl
 from gofer.messaging import Consumer, Producer, Document
 from gofer.metrics import timestamp
 
@@ -26,17 +27,31 @@ class RequestConsumer(Consumer):
     Request consumer.
     Reads messages from AMQP, sends the accepted status then writes
     to local pending queue to be consumed by the scheduler.
+    When the plugin has a crypto pool, requests are authenticated and the
+    (signed) accepted status is sent by the pool.  Requests are written to
+    the pending queue in the order received.
+    :ivar scheduler: The plugin scheduler.
+    :type scheduler: gofer.agent.rmi.Scheduler
+    :ivar priority: The minimum priority of requests read.
+    :type priority: int
+    :ivar origin: The origin included in the routing of status replies.
+    :type origin: str
     """
 
-    def __init__(self, node, plugin):
+    def __init__(self, node, plugin, priority=0):
         """
         :param node: An AMQP node.
         :type node: gofer.messaging.Node
         :param plugin: A plugin.
         :type plugin: gofer.agent.plugin.Plugin
+        :param priority: The minimum priority of requests read.
+        :type priority: int
         """
         super(RequestConsumer, self).__init__(node, plugin.url)
         self.scheduler = plugin.scheduler
+        self.pool = plugin.crypto
+        self.priority = priority
+        self.origin = plugin.node
 
     def rejected(self, code, description, document, details):
         """
@@ -60,6 +75,7 @@ class RequestConsumer(Consumer):
     def send(self, request, status, **details):
         """
         Send a status update.
+        Sent using the codec of the request.
         :param request: The received (json) request.
         :type request: Document
         :param status: The status to send ('accepted'|'rejected')
@@ -71,6 +87,8 @@ class RequestConsumer(Consumer):
         try:
             producer = Producer(self.url)
             producer.authenticator = self.authenticator
+            producer.origin = self.origin
+            producer.codec = nvl(request.wire_codec, producer.codec)
             producer.open()
             try:
                 producer.send(
@@ -85,12 +103,22 @@ class RequestConsumer(Consumer):
         except Exception:
             log.exception('send (%s), failed', status)
 
+    def prepare(self, request):
+        """
+        Prepare the received request to be dispatched.
+        Send the accepted status.
+        :param request: The received request.
+        :type request: Document
+        """
+        self.send(request, 'accepted')
+
     def dispatch(self, request):
         """
         Dispatch received request.
-        Update the request: inject the inbound_url.
+        Update the request: raise the priority as needed.
         :param request: The received request.
         :type request: Document
         """
-        self.send(request, 'accepted')
+        if self.priority > (request.priority or 0):
+            request.priority = self.priority
         self.scheduler.add(request)
@@ -53,6 +53,19 @@ class Container(object):
       - data
           (object) User defined data that is round tripped.
           Used for asynchronous reply correlation and cancel criteria.
+      - priority
+          (int) The request priority (default:0).
+          Higher priority requests are processed by the agent first.
+      - futures
+          (bool) Synchronous calls return a Future (default:False).
+      - fanout
+          (bool) Calls are sent to a list of addresses (or a topic)
+          and the replies gathered (default:False).
+      - loop
+          (object) An event loop.  Calls return a future of the loop.
+      - cache
+          (bool) Use the client cache for methods declared
+          as cacheable (default:True).
 
     :ivar __id: The peer ID.
     :type __id: str
@@ -32,6 +32,8 @@ class Context(object):
     :type progress: Progress
     :ivar cancelled: Provides cancellation status.
     :type cancelled: Cancelled
+    :ivar stream: Provides streaming of generated items (optional).
+    :type stream: Stream
     """
 
     _current = Local(sn=None, progress=None, cancelled=None)
@@ -57,7 +59,7 @@ class Context(object):
         except AttributeError:
             return None
 
-    def __init__(self, sn, progress, cancelled):
+    def __init__(self, sn, progress, cancelled, stream=None):
         """
         :param sn: The current request serial number.
         :type  sn: str
@@ -65,10 +67,13 @@ class Context(object):
         :type  progress: Progress
         :param cancelled: Provides cancellation status.
         :type  cancelled: Cancelled
+        :param stream: Provides streaming of generated items (optional).
+        :type  stream: Stream
         """
         self.sn = sn
         self.progress = progress
         self.cancelled = cancelled
+        self.stream = stream
 
 
 class Progress(object):
@@ -121,6 +126,75 @@ class Progress(object):
             log.exception('Send: progress, failed')
 
 
+class Stream(object):
+    """
+    Provides streaming of the items produced by generator-returning
+    remote methods.  Items are sent in chunks as *partial* replies.
+    The generator is consumed only as each chunk is sent.
+    :ivar request: The current request.
+    :type request: gofer.messaging.Document
+    :ivar producer: An open AMQP producer.
+    :type producer: gofer.messaging.Producer
+    :ivar chunk: The maximum number of items in each partial reply.
+    :type chunk: int
+    """
+
+    CHUNK = 100
+
+    def __init__(self, request, producer, chunk=CHUNK):
+        """
+        :param request: The current request.
+        :type request: gofer.messaging.Document
+        :param producer: An open AMQP producer.
+        :type producer: gofer.messaging.Producer
+        :param chunk: The maximum number of items in each partial reply.
+        :type chunk: int
+        """
+        self.request = request
+        self.producer = producer
+        self.chunk = chunk
+
+    def __call__(self, items):
+        """
+        Send the items.
+        :param items: The generated items.
+        :type items: generator
+        :return: The number of items sent.
+        :rtype: int
+        """
+        seq = 0
+        sent = 0
+        chunk = []
+        for item in items:
+            chunk.append(item)
+            if len(chunk) < self.chunk:
+                continue
+            self.send(seq, chunk)
+            sent += len(chunk)
+            seq += 1
+            chunk = []
+        if chunk:
+            self.send(seq, chunk)
+            sent += len(chunk)
+        return sent
+
+    def send(self, seq, items):
+        """
+        Send a partial reply.
+        :param seq: The chunk sequence number.
+        :type seq: int
+        :param items: The chunk of items.
+        :type items: list
+        """
+        self.producer.send(
+            self.request.replyto,
+            sn=self.request.sn,
+            data=self.request.data,
+            status='partial',
+            seq=seq,
+            items=items)
+
+
 class Cancelled(object):
     """
     A callable added to the Context and used
@@ -141,10 +215,3 @@ class Cancelled(object):
 
     def __call__(self):
         return self.tracker.cancelled(self.sn)
-
-    def __del__(self):
-        try:
-            self.tracker.remove(self.sn)
-        except KeyError:
-            # already cleaned up
-            pass
@@ -9,6 +9,8 @@
 # have received a copy of GPLv2 along with this software; if not, see
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
+from gofer.common import LRU, json
+
 
 class InvalidOperator(Exception):
     pass
@@ -35,6 +37,26 @@ class Criteria(object):
         """
         raise NotImplementedError()
 
+    def select(self, index):
+        """
+        Select candidate locators using the index.
+        Candidates must still be matched.
+        :param index: A locator index.
+        :type index: gofer.rmi.tracker.Index
+        :return: The selected serial numbers or None when the
+            index cannot be used.
+        :rtype: set
+        """
+        return None
+
+    def compile(self):
+        """
+        Compile into a predicate.
+        :return: A function that matches a locator.
+        :rtype: callable
+        """
+        return self.match
+
     def __call__(self, locator):
         return self.match(locator)
 
@@ -49,6 +71,37 @@ class Match(Criteria):
                 return False
         return True
 
+    def select(self, index):
+        if not isinstance(self.criteria, dict) or not self.criteria:
+            return set()
+        selected = None
+        # a missing key is matched so keys that fewer locators
+        # are missing narrow the candidates first
+        items = sorted(self.criteria.items(), key=lambda i: index.unkeyed(i[0]))
+        for k, v in items:
+            try:
+                selected = index.matched(k, v, selected)
+            except TypeError:
+                # not hashable
+                return None
+            if not selected:
+                break
+        return selected
+
+    def compile(self):
+        if not isinstance(self.criteria, dict) or not self.criteria:
+            return lambda locator: False
+        items = self.criteria.items()
+
+        def match(locator):
+            if not locator or not isinstance(locator, dict):
+                return False
+            for k, v in items:
+                if v != locator.get(k, v):
+                    return False
+            return True
+        return match
+
     def _valid(self, locator):
         if not isinstance(self.criteria, dict):
             return False
@@ -66,30 +119,64 @@ class Equal(Criteria):
     def match(self, locator):
         return locator == self.criteria
 
+    def select(self, index):
+        return index.equal(self.criteria)
+
+    def compile(self):
+        criteria = self.criteria
+        return lambda locator: locator == criteria
+
 
 class NotEqual(Criteria):
 
     def match(self, locator):
         return locator != self.criteria
 
+    def compile(self):
+        criteria = self.criteria
+        return lambda locator: locator != criteria
+
 
 class Greater(Criteria):
 
     def match(self, locator):
         return locator > self.criteria
 
+    def compile(self):
+        criteria = self.criteria
+        return lambda locator: locator > criteria
+
 
 class Less(Criteria):
 
     def match(self, locator):
         return locator < self.criteria
 
+    def compile(self):
+        criteria = self.criteria
+        return lambda locator: locator < criteria
+
 
 class In(Criteria):
 
     def match(self, locator):
         return locator in self.criteria
 
+    def select(self, index):
+        if not isinstance(self.criteria, (list, tuple, set, frozenset)):
+            return None
+        selected = set()
+        for value in self.criteria:
+            matched = index.equal(value)
+            if matched is None:
+                return None
+            selected |= matched
+        return selected
+
+    def compile(self):
+        criteria = self.criteria
+        return lambda locator: locator in criteria
+
 
 class And(Criteria):
 
@@ -97,6 +184,22 @@ class And(Criteria):
         left, right = self.criteria
         return left.match(locator) and right.match(locator)
 
+    def select(self, index):
+        left, right = self.criteria
+        left = left.select(index)
+        right = right.select(index)
+        if left is None:
+            return right
+        if right is None:
+            return left
+        return left & right
+
+    def compile(self):
+        left, right = self.criteria
+        left = left.compile()
+        right = right.compile()
+        return lambda locator: left(locator) and right(locator)
+
 
 class Or(Criteria):
 
@@ -104,6 +207,49 @@ class Or(Criteria):
         left, right = self.criteria
         return left.match(locator) or right.match(locator)
 
+    def select(self, index):
+        left, right = self.criteria
+        left = left.select(index)
+        if left is None:
+            return None
+        right = right.select(index)
+        if right is None:
+            return None
+        return left | right
+
+    def compile(self):
+        left, right = self.criteria
+        left = left.compile()
+        right = right.compile()
+        return lambda locator: left(locator) or right(locator)
+
+
+class Compiled(Criteria):
+    """
+    Compiled criteria.
+    Matching uses the compiled predicate and selection
+    uses the criteria object graph.
+    :ivar predicate: The compiled predicate.
+    :type predicate: callable
+    """
+
+    def __init__(self, criteria):
+        """
+        :param criteria: The criteria object graph.
+        :type criteria: Criteria
+        """
+        Criteria.__init__(self, criteria)
+        self.predicate = criteria.compile()
+
+    def match(self, locator):
+        return self.predicate(locator)
+
+    def select(self, index):
+        return self.criteria.select(index)
+
+    def compile(self):
+        return self.predicate
+
 
 class Builder:
     """
@@ -121,6 +267,8 @@ class Builder:
       {'or':({'eq':10},{'or':({'eq':1},{'eq':2})}
     """
 
+    CACHE = LRU(100)
+
     METHODS = {
         'match': Match,
         'eq': Equal,
@@ -150,6 +298,30 @@ class Builder:
             else:
                 raise InvalidOperator('%s not supported' % k)
 
+    def compile(self, criteria):
+        """
+        Build and compile a Criteria object based on the specified
+        dict representation.  Compiled criteria are cached using the
+        canonical JSON representation as the key.
+        :param criteria: The criteria to compile.
+        :type criteria: dict
+        :rtype: Compiled
+        :raise Exception, on invalid criteria.
+        """
+        try:
+            key = json.dumps(criteria, sort_keys=True)
+        except (TypeError, ValueError):
+            key = None
+        compiled = Builder.CACHE.get(key)
+        if compiled is None:
+            built = self.build(criteria)
+            if built is None:
+                return None
+            compiled = Compiled(built)
+            if key is not None:
+                Builder.CACHE.put(key, compiled)
+        return compiled
+
     def _resolve(self, thing):
         if self._criteria(thing):
             return self.build(thing)
@@ -24,8 +24,10 @@ import traceback as tb
 from gofer import NAME
 from gofer.common import Options, utf8, new
 from gofer.messaging import Document
+from gofer.messaging.codec import Fragment
 from gofer.pam import authenticate as pam_authenticate
 from gofer.rmi.model import ALL
+from gofer.rmi.context import Context
 
 from logging import getLogger
 
@@ -235,13 +237,27 @@ class Reply(Document):
         :rtype: bool
         """
         return self.status == 'progress'
+
+    def partial(self):
+        """
+        Test whether the reply contains streamed items (partial).
+        :return: True when partial.
+        :rtype: bool
+        """
+        return self.status == 'partial'
     
 
 class Return(Document):
     """
     Return document.
+    The returned value is encoded once (validated) and the
+    encoding is spliced into the reply when sent.
+    :ivar _fragment: The encoded returned value.
+    :type _fragment: Fragment
     """
 
+    __slots__ = ('_fragment',)
+
     @classmethod
     def succeed(cls, x):
         """
@@ -252,7 +268,7 @@ class Return(Document):
         :rtype: Return
         """
         inst = Return(retval=x)
-        inst.dump()  # validate
+        inst._fragment = Fragment(x)  # validate
         return inst
 
     @classmethod
@@ -283,6 +299,20 @@ class Return(Document):
         """
         return 'exval' in self
 
+    def __fields__(self):
+        """
+        Get the fields to be encoded.
+        The encoded returned value is used when not replaced.
+        :return: The fields.
+        :rtype: dict
+        """
+        fragment = self._fragment
+        if fragment is None or fragment.thing is not self.retval:
+            return self.__dict__
+        fields = dict(self.__dict__)
+        fields['retval'] = fragment
+        return fields
+
     @classmethod
     def __exception(cls):
         """
@@ -437,22 +467,77 @@ class RMI(object):
         security = Security(self, fninfo)
         security.apply(self.auth)
 
+    def key(self):
+        """
+        Get the memo key.
+        :return: The encoded call arguments.
+        :rtype: str
+        """
+        request = Request(
+            cntr=self.request.cntr,
+            args=self.args,
+            kws=self.kwargs)
+        return request.dump()
+
     def __call__(self):
         """
         Invoke the method.
+        The reply of methods decorated with @cached is memoized.
         :return: The invocation result.
         :rtype: Return
         """
         try:
             self.permitted()
+            fninfo = RMI.fninfo(self.method)
+            memo = fninfo.call.memo
+            if memo is not None:
+                return memo(self.key(), self.invoke)
+            return self.invoke()
+        except Exception:
+            log.exception(utf8(self.method))
+            return Return.exception()
+
+    def invoke(self):
+        """
+        Invoke the method using the call model.
+        :return: The invocation result.
+        :rtype: Return
+        """
+        try:
             fninfo = RMI.fninfo(self.method)
             model = ALL[fninfo.call.model](self.method, *self.args, **self.kwargs)
             retval = model()
-            return Return.succeed(retval)
+            streamed = None
+            if inspect.isgenerator(retval):
+                retval, streamed = self.stream(retval)
+            reply = Return.succeed(retval)
+            if streamed is not None:
+                reply.streamed = streamed
+            if fninfo.call.cacheable:
+                reply.cacheable = fninfo.call.cacheable
+            return reply
         except Exception:
             log.exception(utf8(self.method))
             return Return.exception()
 
+    @staticmethod
+    def stream(generator):
+        """
+        Stream the items produced by a generator.
+        Items are returned (as a list) when streaming is not
+        supported by the context.
+        :param generator: The value returned by the method.
+        :type generator: generator
+        :return: A tuple of: (retval, streamed).
+        :rtype: tuple
+        """
+        context = Context.current()
+        stream = getattr(context, 'stream', None)
+        if stream is None:
+            return list(generator), None
+        else:
+            return None, stream(generator)
+
     def __unicode__(self):
         return unicode(self.request)
 
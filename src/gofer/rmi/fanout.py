@@ -0,0 +1,366 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+Provides scatter-gather (fan-out) RMI.
+A request is sent to a list of addresses (or a topic exchange) and the
+replies are collected on the shared reply queue.  Replies are yielded as
+each arrives with the status of each agent.  Each agent has a deadline
+(the wait) extended as replies from the agent arrive so agents that
+time out are reported while the others continue.
+"""
+
+from time import time
+from Queue import Queue, Empty
+from threading import RLock
+from logging import getLogger
+
+from gofer.common import synchronized
+from gofer.messaging import DocumentError
+from gofer.rmi.dispatcher import Return, RemoteException
+from gofer.rmi.policy import Policy, Trigger
+from gofer.rmi.router import ReplyRouter
+
+
+log = getLogger(__name__)
+
+
+class AgentReply(object):
+    """
+    The reply from one agent.
+    :ivar agent: The agent address (or reply origin for topics).
+    :type agent: str
+    :ivar sn: The request serial number.
+    :type sn: str
+    :ivar status: The status (succeeded|failed|timed-out).
+    :type status: str
+    :ivar retval: The returned value.
+    :ivar exception: The raised exception.
+    :type exception: Exception
+    """
+
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    TIMED_OUT = 'timed-out'
+
+    def __init__(self, agent, sn, status, retval=None, exception=None):
+        """
+        :param agent: The agent address (or reply origin for topics).
+        :type agent: str
+        :param sn: The request serial number.
+        :type sn: str
+        :param status: The status (succeeded|failed|timed-out).
+        :type status: str
+        :param retval: The returned value.
+        :param exception: The raised exception.
+        :type exception: Exception
+        """
+        self.agent = agent
+        self.sn = sn
+        self.status = status
+        self.retval = retval
+        self.exception = exception
+
+    def succeeded(self):
+        return self.status == AgentReply.SUCCEEDED
+
+    def result(self):
+        """
+        Get the returned value.
+        :return: The value returned by the remote method.
+        :raise Exception: The exception raised by the remote method.
+        """
+        if self.exception is not None:
+            raise self.exception
+        return self.retval
+
+    def __repr__(self):
+        return 'AgentReply(%s, %s)' % (self.agent, self.status)
+
+
+class Gather(object):
+    """
+    Collects replies routed by the reply router.
+    Iterate to get each agent reply as it arrives.
+    :ivar policy: The scatter policy.
+    :type policy: Scatter
+    :ivar router: The reply router.
+    :type router: ReplyRouter
+    :ivar expected: Agent (address) keyed by serial number.
+        Empty for topics where the agents are not known.
+    :type expected: dict
+    :ivar replied: Agents that have sent the final reply.
+    :type replied: set
+    :ivar items: Streamed items keyed by agent.
+    :type items: dict
+    :ivar deadlines: When the request to each agent times out (epoch
+        seconds) keyed by serial number.  Removed when the agent replies.
+    :type deadlines: dict
+    """
+
+    # wake up the iterator
+    EXPIRED = None
+
+    def __init__(self, policy, router):
+        """
+        :param policy: The scatter policy.
+        :type policy: Scatter
+        :param router: The reply router.
+        :type router: ReplyRouter
+        """
+        self.policy = policy
+        self.router = router
+        self.expected = {}
+        self.replied = set()
+        self.deadlines = {}
+        self.sn = []
+        self.items = {}
+        self._queue = Queue()
+        self.__mutex = RLock()
+
+    def register(self, sn, agent=None):
+        """
+        Register a serial number with the router.
+        :param sn: The request serial number.
+        :type sn: str
+        :param agent: The expected agent (address).
+        :type agent: str
+        """
+        self.sn.append(sn)
+        if agent is not None:
+            self.expected[sn] = agent
+        self.touch(sn)
+        self.router.register(sn, self)
+
+    @property
+    def deadline(self):
+        """
+        The earliest deadline of the agents that have not replied.
+        Used by the router to expire the request.
+        :return: The deadline (epoch seconds) or None.
+        :rtype: float
+        """
+        deadlines = self.deadlines.values()
+        if deadlines:
+            return min(deadlines)
+
+    @synchronized
+    def touch(self, sn):
+        """
+        Set (extend) the deadline of the request.
+        :param sn: The request serial number.
+        :type sn: str
+        """
+        self.deadlines[sn] = time() + float(self.policy.wait)
+
+    def unregister(self):
+        """
+        Unregister all serial numbers.
+        Replies that arrive later are dropped.
+        """
+        for sn in self.sn:
+            self.router.unregister(sn)
+
+    def agent(self, document):
+        """
+        Get the agent that sent the reply.
+        :param document: The reply document.
+        :type document: Document
+        :return: The agent.
+        :rtype: str
+        """
+        agent = self.expected.get(document.sn)
+        if agent is None:
+            routing = document.routing or (None,)
+            agent = routing[0] or document.sn
+        return agent
+
+    def put(self, document):
+        """
+        Process a reply routed by the reply router.
+        :param document: The reply document or rejection.
+        :type document: (Document|DocumentError)
+        """
+        if isinstance(document, DocumentError):
+            agent = self.agent(document.document)
+            self._put(AgentReply(
+                agent, document.document.sn, AgentReply.FAILED, exception=document))
+            return
+
+        agent = self.agent(document)
+        if document.sn in self.deadlines:
+            self.touch(document.sn)
+
+        # rejected
+        if document.status == 'rejected':
+            exception = DocumentError(
+                document.code,
+                document.description,
+                document.document,
+                document.details)
+            self._put(AgentReply(agent, document.sn, AgentReply.FAILED, exception=exception))
+            return
+
+        # accepted | started
+        if document.status in ('accepted', 'started'):
+            return
+
+        # progress reported
+        if document.status == 'progress':
+            self.policy.on_progress(document)
+            return
+
+        # streamed items
+        if document.status == 'partial':
+            self.items.setdefault(agent, []).extend(document.items or [])
+            return
+
+        # reply
+        reply = Return(document.result)
+        items = self.items.pop(agent, [])
+        if reply.succeeded():
+            retval = reply.retval
+            if reply.streamed is not None:
+                retval = items
+            self._put(AgentReply(
+                agent, document.sn, AgentReply.SUCCEEDED, retval=retval))
+        else:
+            self._put(AgentReply(
+                agent, document.sn, AgentReply.FAILED,
+                exception=RemoteException.instance(reply)))
+
+    @synchronized
+    def expire(self):
+        """
+        Expire requests with a deadline that has passed.
+        The agents are reported as timed out.  The iterator is
+        woken up when the (topic) request has timed out.
+        """
+        now = time()
+        for sn, deadline in self.deadlines.items():
+            if deadline > now:
+                continue
+            del self.deadlines[sn]
+            self.router.unregister(sn)
+            agent = self.expected.get(sn)
+            if agent is not None:
+                self._put(AgentReply(agent, sn, AgentReply.TIMED_OUT))
+            else:
+                self._queue.put(Gather.EXPIRED)
+
+    def done(self):
+        """
+        Get whether all expected agents have replied.
+        Never done for topics.
+        :return: True if done.
+        :rtype: bool
+        """
+        return bool(self.expected) and len(self.replied) >= len(self.expected)
+
+    def results(self):
+        """
+        Wait for all replies.
+        :return: Agent replies keyed by agent.
+        :rtype: dict
+        """
+        return dict([(r.agent, r) for r in self])
+
+    @synchronized
+    def _put(self, reply):
+        """
+        Queue the final reply.
+        Only the first final reply for each agent is queued.
+        :param reply: A final reply.
+        :type reply: AgentReply
+        """
+        if reply.agent in self.replied:
+            return
+        if reply.sn in self.expected:
+            self.deadlines.pop(reply.sn, None)
+        self.replied.add(reply.agent)
+        self._queue.put(reply)
+
+    def __iter__(self):
+        try:
+            while not self.done():
+                deadline = self.deadline
+                if deadline is None:
+                    break
+                timeout = max(0.0, deadline - time())
+                try:
+                    reply = self._queue.get(timeout=timeout)
+                except Empty:
+                    self.expire()
+                    continue
+                if reply is Gather.EXPIRED:
+                    break
+                yield reply
+            while True:
+                try:
+                    reply = self._queue.get(block=False)
+                except Empty:
+                    break
+                if reply is not Gather.EXPIRED:
+                    yield reply
+            for sn, agent in sorted(self.expected.items()):
+                if agent in self.replied:
+                    continue
+                yield AgentReply(agent, sn, AgentReply.TIMED_OUT)
+        finally:
+            self.unregister()
+
+
+class Scatter(Policy):
+    """
+    The scatter-gather invocation policy.
+    The address is either a list of addresses or a (single) topic
+    exchange address to which many agents are bound.
+    """
+
+    def __call__(self, request):
+        """
+        Send the request to all addresses.
+        :param request: A request to send.
+        :type request: object
+        :return: The gathered replies.
+        :rtype: Gather
+        """
+        router = ReplyRouter.get(self.url, self.exchange, self.authenticator)
+        gather = Gather(self, router)
+        if isinstance(self.address, (list, tuple)):
+            for address in self.address:
+                policy = Policy(self.url, address, self.options)
+                trigger = Trigger(policy, request)
+                gather.register(trigger.sn, address)
+                self._send(trigger, router, gather)
+        else:
+            trigger = Trigger(self, request)
+            gather.register(trigger.sn)
+            self._send(trigger, router, gather)
+        return gather
+
+    def _send(self, trigger, router, gather):
+        """
+        Send the request.
+        A failed send is reported as failed reply.
+        :param trigger: The trigger.
+        :type trigger: Trigger
+        :param router: The reply router.
+        :type router: ReplyRouter
+        :param gather: The reply collector.
+        :type gather: Gather
+        """
+        try:
+            trigger._send(reply=router.address)
+        except Exception, e:
+            log.exception(trigger.sn)
+            agent = gather.expected.get(trigger.sn, trigger.sn)
+            gather._put(AgentReply(agent, trigger.sn, AgentReply.FAILED, exception=e))
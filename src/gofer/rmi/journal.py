@@ -0,0 +1,675 @@
+#
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU Lesser General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (LGPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of LGPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/lgpl-2.0.txt.
+#
+# Jeff Ortel <jortel@redhat.com>
+#
+
+"""
+Provides a segmented, append-only (write-ahead) journal.
+
+The journal is a directory of segment files.  Each segment contains
+a sequence of records.  An entry is opened by a PUT record and closed
+by a COMMIT record.  When the active segment reaches the configured size,
+a new segment is started.  Segments are deleted (oldest first) when they
+no longer contain open entries.  The open entries in sparsely populated
+segments are relocated to the active segment during rollover so that the
+older segments can be deleted.
+
+Record:
+  kind (1), crc (4), seq (8), queued (8), priority (2), sn length (4),
+  body length (4), sn, body
+"""
+
+import os
+
+from time import sleep, time
+from struct import Struct
+from zlib import crc32
+from threading import RLock, Condition
+from logging import getLogger
+
+from gofer.common import mkdir, unlink, utf8, synchronized
+
+
+log = getLogger(__name__)
+
+
+# record kinds
+PUT = 'P'
+COMMIT = 'C'
+
+
+class Entry(object):
+    """
+    A journal entry.
+    :ivar sn: The entry serial number.
+    :type sn: str
+    :ivar seq: The journal sequence number.
+    :type seq: int
+    :ivar queued: The time the entry was written.
+    :type queued: float
+    :ivar priority: The entry priority.
+    :type priority: int
+    :ivar segment: The segment containing the entry.
+    :type segment: Segment
+    :ivar offset: The offset of the record within the segment.
+    :type offset: int
+    """
+
+    def __init__(self, sn, seq, queued, priority, segment, offset):
+        """
+        :param sn: The entry serial number.
+        :type sn: str
+        :param seq: The journal sequence number.
+        :type seq: int
+        :param queued: The time the entry was written.
+        :type queued: float
+        :param priority: The entry priority.
+        :type priority: int
+        :param segment: The segment containing the entry.
+        :type segment: Segment
+        :param offset: The offset of the record within the segment.
+        :type offset: int
+        """
+        self.sn = sn
+        self.seq = seq
+        self.queued = queued
+        self.priority = priority
+        self.segment = segment
+        self.offset = offset
+
+    def __repr__(self):
+        return 'entry: %s seq: %d segment: %s offset: %d' % (
+            self.sn, self.seq, self.segment.number, self.offset)
+
+
+class Segment(object):
+    """
+    A journal segment file.
+    :ivar path: The absolute path to the segment file.
+    :type path: str
+    :ivar number: The segment number.
+    :type number: int
+    :ivar size: The segment size (bytes).
+    :type size: int
+    :ivar records: The number of PUT records written to the segment.
+    :type records: int
+    :ivar live: The number of open entries in the segment.
+    :type live: int
+    """
+
+    FORMAT = '%010d.jnl'
+
+    @staticmethod
+    def number(name):
+        """
+        Get the segment number for the specified file name.
+        :param name: A file name.
+        :type name: str
+        :return: The segment number or None when not a segment.
+        :rtype: int
+        """
+        part = name.split('.')
+        if len(part) == 2 and part[1] == 'jnl' and part[0].isdigit():
+            return int(part[0])
+
+    def __init__(self, root, number):
+        """
+        :param root: The journal directory.
+        :type root: str
+        :param number: The segment number.
+        :type number: int
+        """
+        self.path = os.path.join(root, Segment.FORMAT % number)
+        self.number = number
+        self.size = 0
+        self.records = 0
+        self.live = 0
+
+    def __repr__(self):
+        return self.path
+
+
+class Journal(object):
+    """
+    A segmented, append-only journal.
+    :cvar FSYNC: The default fsync policy.
+    :type FSYNC: str
+    :cvar SEGMENT: The default segment size (bytes).
+    :type SEGMENT: int
+    :cvar COMPACT: Segments having less than this fraction of entries
+        open are compacted during rollover.
+    :type COMPACT: float
+    :ivar path: The absolute path to the journal directory.
+    :type path: str
+    :ivar fsync: The fsync policy (never|always|<milliseconds>).
+        - never: Never fsync.  Written records are flushed by the OS.
+        - always: Fsync after each write.  Concurrent writers share the fsync.
+        - <milliseconds>: Concurrent writes are batched and an fsync is
+          performed once per batch.
+        Default: FSYNC (when used).
+    :type fsync: str
+    :ivar limit: The segment size limit (bytes).  Default: SEGMENT (when used).
+    :type limit: int
+    :ivar segments: The list of segments (oldest first).
+    :type segments: list
+    :ivar index: Open entries keyed by serial number.
+    :type index: dict
+    :ivar seq: The next sequence number.
+    :type seq: int
+    """
+
+    NEVER = 'never'
+    ALWAYS = 'always'
+
+    FSYNC = NEVER
+    SEGMENT = 0x400000
+    COMPACT = 0.25
+
+    HEADER = Struct('>cIQdhII')
+
+    @staticmethod
+    def _record(kind, seq, queued, priority, sn, body):
+        """
+        Build a record.
+        :param kind: The record kind.
+        :type kind: str
+        :param seq: The sequence number.
+        :type seq: int
+        :param queued: The time queued.
+        :type queued: float
+        :param priority: The priority.
+        :type priority: int
+        :param sn: The entry serial number.
+        :type sn: str
+        :param body: The entry body.
+        :type body: str
+        :return: The record.
+        :rtype: str
+        """
+        fields = Journal.HEADER.pack(kind, 0, seq, queued, priority, len(sn), len(body))
+        crc = crc32(fields[5:] + sn + body) & 0xffffffff
+        header = Journal.HEADER.pack(kind, crc, seq, queued, priority, len(sn), len(body))
+        return ''.join((header, sn, body))
+
+    @staticmethod
+    def _parse(fp):
+        """
+        Read the next record.
+        :param fp: An open segment file.
+        :type fp: file
+        :return: (kind, seq, queued, priority, sn, body) or None when
+            the end of the segment has been reached or the record is not valid.
+        :rtype: tuple
+        """
+        header = fp.read(Journal.HEADER.size)
+        if len(header) < Journal.HEADER.size:
+            return
+        kind, crc, seq, queued, priority, sn_len, body_len = Journal.HEADER.unpack(header)
+        if kind not in (PUT, COMMIT):
+            return
+        sn = fp.read(sn_len)
+        body = fp.read(body_len)
+        if len(sn) < sn_len or len(body) < body_len:
+            return
+        if crc32(header[5:] + sn + body) & 0xffffffff != crc:
+            return
+        return kind, seq, queued, priority, sn, body
+
+    @staticmethod
+    def _scan(fp, size):
+        """
+        Read the header of the next record and skip the body.
+        The CRC is not validated.  Used to build the index without
+        reading record bodies.
+        :param fp: An open segment file.
+        :type fp: file
+        :param size: The segment file size.
+        :type size: int
+        :return: (kind, seq, queued, priority, sn) or None when
+            the end of the segment has been reached or the record is incomplete.
+        :rtype: tuple
+        """
+        offset = fp.tell()
+        header = fp.read(Journal.HEADER.size)
+        if len(header) < Journal.HEADER.size:
+            return
+        kind, crc, seq, queued, priority, sn_len, body_len = Journal.HEADER.unpack(header)
+        if kind not in (PUT, COMMIT):
+            return
+        end = offset + Journal.HEADER.size + sn_len + body_len
+        if end > size:
+            return
+        sn = fp.read(sn_len)
+        fp.seek(end)
+        return kind, seq, queued, priority, sn
+
+    def __init__(self, path, fsync=None, segment=None):
+        """
+        :param path: The absolute path to the journal directory.
+        :type path: str
+        :param fsync: The fsync policy (never|always|<milliseconds>).
+        :type fsync: str
+        :param segment: The segment size limit (bytes).
+        :type segment: int
+        """
+        self.__mutex = RLock()
+        self.__condition = Condition()
+        self.path = path
+        self.fsync = fsync
+        self.limit = segment
+        self.segments = []
+        self.index = {}
+        self.seq = 0
+        self.fd = None
+        self.written = 0
+        self.synced = 0
+        self.syncing = False
+
+    @property
+    def fsync(self):
+        """
+        The fsync policy.
+        The default is resolved when used so that the (configured) default
+        applies to journals created before it is set.
+        :rtype: str
+        """
+        return str(self._fsync_policy or Journal.FSYNC).strip().lower()
+
+    @fsync.setter
+    def fsync(self, fsync):
+        self._fsync_policy = fsync
+
+    @property
+    def limit(self):
+        """
+        The segment size limit (bytes).
+        The default is resolved when used so that the (configured) default
+        applies to journals created before it is set.
+        :rtype: int
+        """
+        return int(self._segment_limit or Journal.SEGMENT)
+
+    @limit.setter
+    def limit(self, limit):
+        self._segment_limit = limit
+
+    @property
+    def delay(self):
+        """
+        The group commit delay.
+        :return: The delay (seconds).
+        :rtype: float
+        """
+        if self.fsync in (Journal.NEVER, Journal.ALWAYS):
+            return 0.0
+        try:
+            return int(self.fsync) / 1000.0
+        except ValueError:
+            return 0.0
+
+    @property
+    def active(self):
+        """
+        The active segment.
+        :rtype: Segment
+        """
+        return self.segments[-1]
+
+    @synchronized
+    def open(self):
+        """
+        Open the journal.
+        Segment record headers are read and the index of open entries is built.
+        Record bodies are not read.  A torn record at the end of a segment
+        is truncated.
+        :return: The open entries sorted by sequence.
+        :rtype: list
+        """
+        mkdir(self.path)
+        numbers = []
+        for name in os.listdir(self.path):
+            n = Segment.number(name)
+            if n is not None:
+                numbers.append(n)
+        for n in sorted(numbers):
+            segment = Segment(self.path, n)
+            self._load(segment)
+            self.segments.append(segment)
+        if not self.segments or self.active.size >= self.limit:
+            self._segment()
+        else:
+            self.fd = os.open(self.active.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+        self._reclaim()
+        log.info('journal: %s opened, entries: %d', self.path, len(self.index))
+        return sorted(self.index.values(), key=lambda e: e.seq)
+
+    def _load(self, segment):
+        """
+        Load the segment (headers).
+        Update the index and sequence.
+        :param segment: The segment to load.
+        :type segment: Segment
+        """
+        size = os.path.getsize(segment.path)
+        fp = open(segment.path, 'rb')
+        try:
+            while True:
+                offset = fp.tell()
+                record = Journal._scan(fp, size)
+                if record is None:
+                    break
+                kind, seq, queued, priority, sn = record
+                self.seq = max(self.seq, seq + 1)
+                if kind == PUT:
+                    entry = Entry(sn, seq, queued, priority, segment, offset)
+                    self._index(entry)
+                    segment.records += 1
+                    continue
+                entry = self.index.pop(sn, None)
+                if entry:
+                    entry.segment.live -= 1
+            segment.size = offset
+        finally:
+            fp.close()
+        if segment.size < size:
+            log.warn('%s truncated at: %d', segment.path, segment.size)
+            fp = open(segment.path, 'r+b')
+            try:
+                fp.truncate(segment.size)
+            finally:
+                fp.close()
+
+    def _index(self, entry):
+        """
+        Add the entry to the index.
+        An entry already indexed (relocated) is replaced.
+        :param entry: The entry to index.
+        :type entry: Entry
+        """
+        found = self.index.get(entry.sn)
+        if found:
+            found.segment.live -= 1
+        self.index[entry.sn] = entry
+        entry.segment.live += 1
+
+    def write(self, sn, body, priority=0, sync=True):
+        """
+        Write (PUT) an entry.
+        Returns after the record has been written and synced
+        according to the fsync policy.
+        :param sn: The entry serial number.
+        :type sn: str
+        :param body: The entry body.
+        :type body: str
+        :param priority: The entry priority.
+        :type priority: int
+        :param sync: Sync the journal.  When False, the caller
+            is expected to call sync() after a batch of writes.
+        :type sync: bool
+        :return: The written entry.
+        :rtype: Entry
+        """
+        entry, ticket = self._write(utf8(sn), body, priority)
+        if sync:
+            self._sync(ticket)
+        return entry
+
+    def sync(self):
+        """
+        Sync all written records according to the fsync policy.
+        """
+        self.__mutex.acquire()
+        try:
+            ticket = self.written
+        finally:
+            self.__mutex.release()
+        self._sync(ticket)
+
+    @synchronized
+    def _write(self, sn, body, priority):
+        """
+        Append a PUT record to the active segment and index the entry.
+        :param sn: The entry serial number.
+        :type sn: str
+        :param body: The entry body.
+        :type body: str
+        :param priority: The entry priority.
+        :type priority: int
+        :return: (entry, ticket)
+        :rtype: tuple
+        """
+        seq = self.seq
+        self.seq += 1
+        priority = int(priority or 0)
+        record = Journal._record(PUT, seq, time(), priority, sn, body)
+        if self.active.size and self.active.size + len(record) > self.limit:
+            self._rollover()
+        entry = self._append(record)
+        return entry, self.written
+
+    def _append(self, record):
+        """
+        Append a PUT record to the active segment and index the entry.
+        :param record: A PUT record.
+        :type record: str
+        :return: The indexed entry.
+        :rtype: Entry
+        """
+        segment = self.active
+        offset = segment.size
+        header = Journal.HEADER.unpack(record[:Journal.HEADER.size])
+        sn = record[Journal.HEADER.size:Journal.HEADER.size + header[5]]
+        self._output(record)
+        entry = Entry(sn, header[2], header[3], header[4], segment, offset)
+        self._index(entry)
+        segment.records += 1
+        return entry
+
+    def _output(self, record):
+        """
+        Write the record to the active segment.
+        :param record: A record.
+        :type record: str
+        """
+        written = 0
+        while written < len(record):
+            written += os.write(self.fd, record[written:])
+        self.active.size += written
+        self.written += 1
+
+    @synchronized
+    def read(self, entry):
+        """
+        Read the body of an entry.
+        :param entry: An entry.
+        :type entry: Entry
+        :return: The entry body or None when not valid.
+        :rtype: str
+        """
+        entry = self.index.get(entry.sn, entry)
+        fp = open(entry.segment.path, 'rb')
+        try:
+            fp.seek(entry.offset)
+            record = Journal._parse(fp)
+        finally:
+            fp.close()
+        if record is None:
+            log.error('%s corrupt in: %s', entry.sn, entry.segment.path)
+            return
+        return record[-1]
+
+    @synchronized
+    def commit(self, sn):
+        """
+        Commit (close) an entry.
+        The COMMIT record is not synced.  When lost, the entry
+        is restored when the journal is opened.
+        :param sn: The entry serial number.
+        :type sn: str
+        :return: True if committed.  False when not found.
+        :rtype: bool
+        """
+        sn = utf8(sn)
+        entry = self.index.pop(sn, None)
+        if entry is None:
+            return False
+        record = Journal._record(COMMIT, self.seq, 0.0, 0, sn, '')
+        self.seq += 1
+        self._output(record)
+        entry.segment.live -= 1
+        self._reclaim()
+        return True
+
+    def _segment(self):
+        """
+        Start a new (active) segment.
+        """
+        if self.segments:
+            n = self.active.number + 1
+        else:
+            n = 1
+        segment = Segment(self.path, n)
+        self.segments.append(segment)
+        self.fd = os.open(segment.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+
+    def _rollover(self):
+        """
+        Close the active segment and start a new one.
+        The closed segment is synced unless the policy is (never).
+        Sparsely populated segments are compacted.
+        """
+        if self.fsync != Journal.NEVER:
+            os.fsync(self.fd)
+        os.close(self.fd)
+        self._segment()
+        self._compact()
+
+    def _compact(self):
+        """
+        Relocate open entries in sparsely populated segments to the active
+        segment and delete segments that no longer contain open entries.
+        """
+        relocated = 0
+        for segment in self.segments[:-1]:
+            if not segment.live or segment.live >= segment.records * Journal.COMPACT:
+                continue
+            entries = [e for e in self.index.values() if e.segment is segment]
+            for entry in sorted(entries, key=lambda e: e.seq):
+                fp = open(segment.path, 'rb')
+                try:
+                    fp.seek(entry.offset)
+                    record = Journal._parse(fp)
+                finally:
+                    fp.close()
+                if record is None:
+                    continue
+                kind, seq, queued, priority, sn, body = record
+                self._append(Journal._record(PUT, seq, queued, priority, sn, body))
+                relocated += 1
+        if relocated:
+            if self.fsync != Journal.NEVER:
+                os.fsync(self.fd)
+            log.info('journal: %s, %d entries relocated', self.path, relocated)
+        self._reclaim()
+
+    def _reclaim(self):
+        """
+        Delete (oldest) segments that no longer contain open entries.
+        Segments must be deleted in order so that COMMIT records are
+        never deleted before the PUT records they close.
+        """
+        while len(self.segments) > 1:
+            segment = self.segments[0]
+            if segment.live:
+                break
+            unlink(segment.path)
+            self.segments.pop(0)
+            log.debug('journal: %s deleted', segment.path)
+
+    def _sync(self, ticket):
+        """
+        Sync written records according to the fsync policy.
+        The first writer to arrive performs the fsync on behalf of all
+        concurrent writers (group commit).  When batched, the leader waits
+        for the batch interval so that additional writers may join.
+        :param ticket: The write ticket to be synced.
+        :type ticket: int
+        """
+        if self.fsync == Journal.NEVER:
+            return
+        self.__condition.acquire()
+        try:
+            while self.synced < ticket:
+                if self.syncing:
+                    self.__condition.wait()
+                    continue
+                self.syncing = True
+                self.__condition.release()
+                try:
+                    delay = self.delay
+                    if delay:
+                        sleep(delay)
+                    target = self._fsync()
+                finally:
+                    self.__condition.acquire()
+                    self.syncing = False
+                    self.__condition.notifyAll()
+                self.synced = max(self.synced, target)
+        finally:
+            self.__condition.release()
+
+    def _fsync(self):
+        """
+        Fsync the active segment.
+        The descriptor is duplicated so that writers are not blocked.
+        :return: The write ticket covered by the fsync.
+        :rtype: int
+        """
+        self.__mutex.acquire()
+        try:
+            target = self.written
+            fd = os.dup(self.fd)
+        finally:
+            self.__mutex.release()
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        return target
+
+    @synchronized
+    def close(self):
+        """
+        Close the journal.
+        """
+        if self.fd is None:
+            return
+        if self.fsync != Journal.NEVER:
+            os.fsync(self.fd)
+        os.close(self.fd)
+        self.fd = None
+
+    @synchronized
+    def delete(self):
+        """
+        Close the journal and delete all segments.
+        """
+        self.close()
+        for segment in self.segments:
+            unlink(segment.path)
+        self.segments = []
+        self.index = {}
+
+    @synchronized
+    def __len__(self):
+        return len(self.index)
@@ -0,0 +1,210 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+Provides (agent) memoization of remote methods.
+The Return document of successful calls is cached in the goferd
+process so it works with both the direct and fork call models.
+"""
+
+from threading import RLock, Event
+
+from gofer.common import LRU, synchronized
+
+
+class Pending(object):
+    """
+    A call in progress.
+    Identical calls made concurrently wait for the reply.
+    :ivar reply: The reply.
+    :type reply: gofer.rmi.dispatcher.Return
+    """
+
+    def __init__(self):
+        self.reply = None
+        self._done = Event()
+
+    def resolve(self, reply):
+        """
+        Resolve the call and release waiting threads.
+        :param reply: The reply.
+        :type reply: gofer.rmi.dispatcher.Return
+        """
+        self.reply = reply
+        self._done.set()
+
+    def wait(self):
+        """
+        Wait for the call to be resolved.
+        :return: The reply.
+        :rtype: gofer.rmi.dispatcher.Return
+        """
+        self._done.wait()
+        return self.reply
+
+
+class Memo(object):
+    """
+    The cached replies of a remote method.
+    :cvar all: All memos keyed by name.
+    :type all: dict
+    :ivar name: The remote method (qualified) name.
+    :type name: str
+    :ivar entries: The cached replies keyed by call arguments.
+    :type entries: LRU
+    :ivar pending: Calls in progress keyed by call arguments.
+    :type pending: dict
+    :ivar hits: The number of calls answered from the cache.
+    :type hits: int
+    :ivar misses: The number of calls executed.
+    :type misses: int
+    :ivar coalesced: The number of calls that waited on an identical call.
+    :type coalesced: int
+    """
+
+    all = {}
+
+    TTL = 60
+    MAXSIZE = 100
+
+    @staticmethod
+    def stats_all():
+        """
+        Get statistics for all memos.
+        :return: Statistics keyed by name.
+        :rtype: dict
+        """
+        return dict([(m.name, m.stats()) for m in Memo.all.values()])
+
+    def __init__(self, name, ttl=TTL, maxsize=MAXSIZE):
+        """
+        :param name: The remote method (qualified) name.
+        :type name: str
+        :param ttl: The seconds a reply is cached.
+        :type ttl: float
+        :param maxsize: The maximum number of cached replies.
+        :type maxsize: int
+        """
+        self.name = name
+        self.entries = LRU(maxsize, ttl)
+        self.pending = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.__mutex = RLock()
+        Memo.all[name] = self
+
+    @property
+    def ttl(self):
+        return self.entries.ttl
+
+    @property
+    def maxsize(self):
+        return self.entries.maxsize
+
+    def __call__(self, key, fn):
+        """
+        Get the cached reply or execute the call.
+        Only successful replies are cached.  Replies of streamed
+        (generator) calls are not cached because the items have
+        already been sent to the caller.
+        :param key: The encoded call arguments.
+        :type key: str
+        :param fn: Executes the call and returns the reply.
+        :type fn: callable
+        :return: The reply.
+        :rtype: gofer.rmi.dispatcher.Return
+        """
+        reply, pending, owner = self.find(key)
+        if reply is not None:
+            return reply
+        if not owner:
+            reply = pending.wait()
+            if reply is not None and reply.streamed is None:
+                return reply
+            return fn()
+        try:
+            reply = fn()
+            self.add(key, reply)
+            return reply
+        finally:
+            self.resolve(key, pending, reply)
+
+    @synchronized
+    def find(self, key):
+        """
+        Find the cached reply or the pending call.
+        A pending call is created when neither is found.
+        :param key: The encoded call arguments.
+        :type key: str
+        :return: A tuple of: (reply, pending, owner).
+            The owner must execute the call and resolve the pending.
+        :rtype: tuple
+        """
+        reply = self.entries.get(key)
+        if reply is not None:
+            self.hits += 1
+            return reply, None, False
+        pending = self.pending.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return None, pending, False
+        self.misses += 1
+        pending = Pending()
+        self.pending[key] = pending
+        return None, pending, True
+
+    @synchronized
+    def add(self, key, reply):
+        """
+        Cache a successful (not streamed) reply.
+        :param key: The encoded call arguments.
+        :type key: str
+        :param reply: The reply.
+        :type reply: gofer.rmi.dispatcher.Return
+        """
+        if not reply.succeeded() or reply.streamed is not None:
+            return
+        self.entries.put(key, reply)
+
+    @synchronized
+    def resolve(self, key, pending, reply):
+        """
+        Resolve the pending call.
+        :param key: The encoded call arguments.
+        :type key: str
+        :param pending: The pending call.
+        :type pending: Pending
+        :param reply: The reply or None when the call raised.
+        :type reply: gofer.rmi.dispatcher.Return
+        """
+        self.pending.pop(key, None)
+        pending.resolve(reply)
+
+    @synchronized
+    def clear(self):
+        """
+        Clear cached replies.
+        """
+        self.entries.clear()
+
+    @synchronized
+    def stats(self):
+        """
+        Get statistics.
+        :return: dict of: hits, misses, coalesced and size.
+        :rtype: dict
+        """
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            coalesced=self.coalesced,
+            size=len(self.entries))
@@ -15,6 +15,7 @@
 
 import os
 import sys
+import inspect
 
 from logging import getLogger
 from threading import RLock
@@ -57,6 +58,9 @@ class Call(protocol.Call):
             context.cancelled = self._not_cancelled()
             context.progress = Progress(pipe.writer)
             result = self.method(*self.args, **self.kwargs)
+            if inspect.isgenerator(result):
+                # not streamed across the pipe
+                result = list(result)
             reply = protocol.Result(result)
             reply.send(pipe.writer)
         except PipeBroken:
@@ -17,13 +17,19 @@
 Contains request delivery policies.
 """
 
+from time import time
 from logging import getLogger
 from uuid import uuid4
+from threading import Event, RLock
+from collections import deque
+from Queue import Queue, Empty
 
-from gofer.common import Thread, Options, nvl, utf8, released
+from gofer.common import Thread, Options, nvl, utf8, synchronized
 from gofer.messaging import Document, DocumentError
-from gofer.messaging import Producer, Reader, Queue, Exchange
+from gofer.messaging import Pool
 from gofer.rmi.dispatcher import Return, RemoteException
+from gofer.rmi.router import ReplyRouter
+from gofer.rmi.cache import Cache, Key
 from gofer.metrics import Timer
 
 
@@ -184,13 +190,51 @@ class Policy(object):
     def exchange(self):
         return self.options.exchange
 
-    def get_reply(self, sn, reader):
+    @property
+    def priority(self):
+        return int(self.options.priority or 0)
+
+    @property
+    def futures(self):
+        return bool(self.options.futures)
+
+    @property
+    def cache(self):
+        return bool(nvl(self.options.cache, True))
+
+    def cache_key(self, request):
+        """
+        Get the client cache key for the request.
+        Only blocking (synchronous) calls are cached.
+        :param request: A request to send.
+        :type request: object
+        :return: The key or None when not cached.
+        :rtype: gofer.rmi.cache.Key
+        """
+        if not self.cache or self.reply or self.futures:
+            return None
+        if self.wait == Trigger.NOWAIT:
+            return None
+        if not isinstance(request, Document) or not request.classname:
+            return None
+        return Key(
+            self.url,
+            self.address,
+            request.classname,
+            request.method,
+            self.options.user,
+            request.dump())
+
+    def get_reply(self, sn, inbox, key=None):
         """
         Get the reply matched by serial number.
+        Replies are routed to the inbox by the shared reply router.
         :param sn: The request serial number.
         :type sn: str
-        :param reader: A reader.
-        :type reader: gofer.messaging.consumer.Reader
+        :param inbox: The inbox registered with the router.
+        :type inbox: Queue.Queue
+        :param key: The (optional) client cache key.
+        :type key: gofer.rmi.cache.Key
         :return: The matched reply document.
         :rtype: Document
         """
@@ -199,16 +243,16 @@ class Policy(object):
 
         while not Thread.aborted():
             timer.start()
-            document = reader.search(sn, int(timeout))
-            timer.stop()
-            elapsed = timer.duration()
-            if elapsed > timeout:
+            try:
+                document = inbox.get(timeout=timeout)
+            except Empty:
                 raise RequestTimeout(sn, self.wait)
-            else:
-                timeout -= elapsed
+            timer.stop()
+            timeout = max(0.0, timeout - timer.duration())
 
-            if not document:
-                raise RequestTimeout(sn, self.wait)
+            # invalid
+            if isinstance(document, DocumentError):
+                raise document
 
             # rejected
             if document.status == 'rejected':
@@ -227,19 +271,29 @@ class Policy(object):
                 self.on_progress(document)
                 continue
 
+            # streamed items
+            if document.status == 'partial':
+                return Stream(sn, self, inbox, document)
+
             # reply
-            return self.on_reply(document)
+            return self.on_reply(document, key)
         
-    def on_reply(self, document):
+    def on_reply(self, document, key=None):
         """
         Handle the reply.
+        Values returned by methods declared as cacheable
+        are added to the client cache.
         :param document: The reply document.
         :type document: Document
+        :param key: The (optional) client cache key.
+        :type key: gofer.rmi.cache.Key
         :return: The matched reply document.
         :rtype: Document
         """
         reply = Return(document.result)
         if reply.succeeded():
+            if key is not None and reply.cacheable:
+                Cache().put(key, reply.retval, float(reply.cacheable))
             return reply.retval
         else:
             raise RemoteException.instance(reply)
@@ -263,7 +317,6 @@ class Policy(object):
         except Exception:
             log.error('progress callback failed', exc_info=1)
 
-    @released
     def __call__(self, request):
         """
         Send the request then read the reply.
@@ -275,8 +328,13 @@ class Policy(object):
         trigger = Trigger(self, request)
         if self.trigger == Trigger.MANUAL:
             return trigger
-        else:
-            return trigger()
+        key = self.cache_key(request)
+        if key is not None:
+            found, retval = Cache().get(key)
+            if found:
+                return retval
+            trigger.key = key
+        return trigger()
 
 
 class Trigger:
@@ -290,6 +348,8 @@ class Trigger:
     :type _policy: Policy
     :ivar _request: A request to send.
     :type _request: object
+    :ivar key: The (optional) client cache key.
+    :type key: gofer.rmi.cache.Key
     """
 
     MANUAL = 1  # trigger
@@ -306,26 +366,24 @@ class Trigger:
         self._policy = policy
         self._request = request
         self._pending = True
+        self.key = None
 
     @property
     def sn(self):
         return self._sn
 
-    def _send(self, reply=None, queue=None):
+    def _send(self, reply=None, inbox=None):
         """
         Send the request using the specified policy
         object and generated serial number.
         :param reply: The AMQP reply address.
         :type reply: str
-        :param queue: The reply queue for synchronous calls.
-        :type queue: Queue
+        :param inbox: The reply inbox for synchronous calls.
+        :type inbox: Queue.Queue
         """
-        producer = Producer(self._policy.url)
-        producer.authenticator = self._policy.authenticator
-        producer.open()
-
-        try:
-            producer.send(
+        pool = Pool()
+        with pool.lease(self._policy.url, self._policy.authenticator) as lease:
+            lease.producer.send(
                 self._policy.address,
                 self._policy.ttl,
                 # body
@@ -334,25 +392,17 @@ class Trigger:
                 request=self._request,
                 secret=self._policy.secret,
                 pam=self._policy.pam,
-                data=self._policy.data)
-        finally:
-            producer.close()
+                data=self._policy.data,
+                priority=self._policy.priority)
 
         log.debug('sent (%s): %s', self._policy.address, self._request)
 
-        if queue is None:
+        if inbox is None:
             # no reply expected
             return self._sn
 
-        reader = Reader(queue, self._policy.url)
-        reader.authenticator = self._policy.authenticator
-        reader.open()
-
-        try:
-            policy = self._policy
-            return policy.get_reply(self.sn, reader)
-        finally:
-            reader.close()
+        policy = self._policy
+        return policy.get_reply(self.sn, inbox, self.key)
 
     def __call__(self):
         """
@@ -370,24 +420,416 @@ class Trigger:
             return self._send()
 
         # synchronous
-        queue = Queue()
-        queue.durable = False
-        queue.declare(self._policy.url)
-        reply = queue.name
-
-        if self._policy.exchange:
-            exchange = Exchange(self._policy.exchange)
-            exchange.bind(queue, self._policy.url)
-            reply = '/'.join((self._policy.exchange, queue.name))
-
+        router = ReplyRouter.get(
+            self._policy.url,
+            self._policy.exchange,
+            self._policy.authenticator)
+        if self._policy.futures:
+            future = Future(self.sn, self._policy, router)
+            router.register(self.sn, future)
+            try:
+                self._send(reply=router.address)
+            except Exception:
+                router.unregister(self.sn)
+                raise
+            return future
+        inbox = router.register(self.sn)
         try:
-            return self._send(reply=reply, queue=queue)
-        finally:
-            queue.purge(self._policy.url)
-            queue.delete(self._policy.url)
+            retval = self._send(reply=router.address, inbox=inbox)
+        except Exception:
+            router.unregister(self.sn)
+            raise
+        if isinstance(retval, Stream):
+            # unregistered when the stream is closed or expired
+            retval.router = router
+            router.register(self.sn, retval)
+        else:
+            router.unregister(self.sn)
+        return retval
 
     def __unicode__(self):
         return self._sn
 
     def __str__(self):
         return utf8(self)
+
+
+class Stream(object):
+    """
+    An iterator of the items streamed by a generator-returning
+    remote method.  Items are yielded as each partial reply arrives.
+    Registered with the reply router as the inbox for the request and
+    expired (unregistered) when no reply arrives within the wait.
+    :cvar EXPIRED: Queued when expired by the router.
+    :ivar sn: The request serial number.
+    :type sn: str
+    :ivar policy: The invocation policy.
+    :type policy: Policy
+    :ivar inbox: Replies routed to the stream.
+    :type inbox: Queue.Queue
+    :ivar router: The reply router (set by the trigger).
+    :type router: gofer.rmi.router.ReplyRouter
+    :ivar items: Received items not yet yielded.
+    :type items: deque
+    :ivar seq: The sequence number of the last partial reply.
+    :type seq: int
+    :ivar done: The final reply has been received.
+    :type done: bool
+    :ivar deadline: When the stream times out (epoch seconds).
+        Extended as each reply arrives.
+    :type deadline: float
+    """
+
+    EXPIRED = None
+
+    def __init__(self, sn, policy, inbox, document):
+        """
+        :param sn: The request serial number.
+        :type sn: str
+        :param policy: The invocation policy.
+        :type policy: Policy
+        :param inbox: The inbox registered with the router.
+        :type inbox: Queue.Queue
+        :param document: The first partial reply.
+        :type document: Document
+        """
+        self.sn = sn
+        self.policy = policy
+        self.inbox = inbox
+        self.router = None
+        self.items = deque(document.items or [])
+        self.seq = document.seq
+        self.done = False
+        self.deadline = time() + float(policy.wait)
+
+    def put(self, document):
+        """
+        Queue a reply routed by the reply router.
+        :param document: The reply document or rejection.
+        :type document: (Document|DocumentError)
+        """
+        self.deadline = time() + float(self.policy.wait)
+        self.inbox.put(document)
+
+    def expire(self):
+        """
+        No reply within the wait.
+        Unregistered and the reader is notified.
+        """
+        self.unregister()
+        self.inbox.put(Stream.EXPIRED)
+
+    def read(self):
+        """
+        Read the next reply.
+        :raise RequestTimeout: When no reply within the wait.
+        :raise Exception: The exception raised by the remote method.
+        """
+        try:
+            timeout = max(0.0, self.deadline - time())
+            document = self.inbox.get(timeout=timeout)
+        except Empty:
+            document = Stream.EXPIRED
+
+        # expired
+        if document is Stream.EXPIRED:
+            self.close()
+            raise RequestTimeout(self.sn, self.policy.wait)
+
+        # invalid
+        if isinstance(document, DocumentError):
+            self.close()
+            raise document
+
+        # progress reported
+        if document.status == 'progress':
+            self.policy.on_progress(document)
+            return
+
+        # streamed items
+        if document.status == 'partial':
+            if document.seq != self.seq + 1:
+                self.close()
+                raise ValueError('stream: %s, expected: %d' % (self.sn, self.seq + 1))
+            self.seq = document.seq
+            self.items.extend(document.items or [])
+            return
+
+        # reply
+        self.close()
+        reply = Return(document.result)
+        if reply.failed():
+            raise RemoteException.instance(reply)
+
+    def close(self):
+        """
+        Close the stream.
+        Items that arrive later are dropped.
+        """
+        self.done = True
+        self.unregister()
+
+    def unregister(self):
+        """
+        Unregister with the reply router.
+        """
+        if self.router is not None:
+            self.router.unregister(self.sn)
+            self.router = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *unused):
+        self.close()
+
+    def next(self):
+        while not self.items:
+            if self.done:
+                raise StopIteration()
+            self.read()
+        return self.items.popleft()
+
+    def __iter__(self):
+        return self
+
+
+class Future(object):
+    """
+    The (future) result of an RMI call.
+    Registered with the reply router as the inbox for the request.
+    Streamed items are collected and the future resolved with the list.
+    :ivar sn: The request serial number.
+    :type sn: str
+    :ivar policy: The invocation policy.
+    :type policy: gofer.rmi.policy.Policy
+    :ivar router: The reply router.
+    :type router: gofer.rmi.router.ReplyRouter
+    :ivar deadline: When the request times out (epoch seconds).
+    :type deadline: float
+    """
+
+    def __init__(self, sn, policy, router):
+        """
+        :param sn: The request serial number.
+        :type sn: str
+        :param policy: The invocation policy.
+        :type policy: gofer.rmi.policy.Policy
+        :param router: The reply router.
+        :type router: gofer.rmi.router.ReplyRouter
+        """
+        self.sn = sn
+        self.policy = policy
+        self.router = router
+        self.deadline = time() + float(policy.wait)
+        self._done = Event()
+        self._retval = None
+        self._exception = None
+        self._callbacks = []
+        self._items = []
+        self.__mutex = RLock()
+
+    def put(self, document):
+        """
+        Process a reply routed by the reply router.
+        :param document: The reply document or rejection.
+        :type document: (Document|DocumentError)
+        """
+        if isinstance(document, DocumentError):
+            self._resolve(exception=document)
+            return
+        try:
+            # rejected
+            if document.status == 'rejected':
+                raise DocumentError(
+                    document.code,
+                    document.description,
+                    document.document,
+                    document.details)
+
+            # accepted | started
+            if document.status in ('accepted', 'started'):
+                return
+
+            # progress reported
+            if document.status == 'progress':
+                self.policy.on_progress(document)
+                return
+
+            # streamed items
+            if document.status == 'partial':
+                self._items.extend(document.items or [])
+                return
+
+            # reply
+            retval = self.policy.on_reply(document)
+            if Return(document.result).streamed is not None:
+                retval = self._items
+            self._resolve(retval=retval)
+        except Exception, e:
+            self._resolve(exception=e)
+
+    def expire(self):
+        """
+        The request has timed out.
+        """
+        self._resolve(exception=RequestTimeout(self.sn, self.policy.wait))
+
+    def done(self):
+        """
+        Get whether the future has been resolved.
+        :return: True if resolved.
+        :rtype: bool
+        """
+        return self._done.isSet()
+
+    def result(self, timeout=None):
+        """
+        Get the returned value.  Blocks until resolved.
+        :param timeout: The (optional) seconds to wait.
+        :type timeout: float
+        :return: The value returned by the remote method.
+        :raise RequestTimeout: When not resolved within the timeout.
+        :raise Exception: The exception raised by the remote method.
+        """
+        exception = self.exception(timeout)
+        if exception is not None:
+            raise exception
+        return self._retval
+
+    def exception(self, timeout=None):
+        """
+        Get the raised exception.  Blocks until resolved.
+        :param timeout: The (optional) seconds to wait.
+        :type timeout: float
+        :return: The exception or None.
+        :rtype: Exception
+        :raise RequestTimeout: When not resolved within the timeout.
+        """
+        if not self._wait(timeout):
+            raise RequestTimeout(self.sn, timeout)
+        return self._exception
+
+    @synchronized
+    def add_done_callback(self, fn):
+        """
+        Add a callback invoked (with this future) when resolved.
+        Invoked immediately when already resolved.
+        :param fn: A callable.
+        :type fn: callable
+        """
+        if self.done():
+            self._notify(fn)
+        else:
+            self._callbacks.append(fn)
+
+    def _wait(self, timeout):
+        """
+        Wait for the future to be resolved.
+        Expired locally when the reply is late so that callers
+        do not depend on the router noticing the deadline.
+        :param timeout: The (optional) seconds to wait.
+        :type timeout: float
+        :return: True if resolved.
+        :rtype: bool
+        """
+        remaining = max(0.0, self.deadline - time())
+        if timeout is None or timeout >= remaining:
+            self._done.wait(remaining)
+            if not self.done():
+                self.expire()
+        else:
+            self._done.wait(timeout)
+        return self.done()
+
+    @synchronized
+    def _resolve(self, retval=None, exception=None):
+        """
+        Resolve the future and notify callbacks.
+        :param retval: The returned value.
+        :param exception: The raised exception.
+        :type exception: Exception
+        """
+        if self.done():
+            return
+        self.router.unregister(self.sn)
+        self._retval = retval
+        self._exception = exception
+        self._done.set()
+        callbacks = self._callbacks
+        self._callbacks = []
+        for fn in callbacks:
+            self._notify(fn)
+
+    def _notify(self, fn):
+        """
+        Invoke a done callback.
+        :param fn: A callable.
+        :type fn: callable
+        """
+        try:
+            fn(self)
+        except Exception:
+            log.exception(self.sn)
+
+
+def as_completed(futures, timeout=None):
+    """
+    Iterate futures as they are resolved.
+    :param futures: A list of futures.
+    :type futures: list
+    :param timeout: The (optional) total seconds to wait.
+    :type timeout: float
+    :return: A generator of resolved futures.
+    :raise RequestTimeout: When not all resolved within the timeout.
+    """
+    pending = set(futures)
+    resolved = Queue()
+    for future in futures:
+        future.add_done_callback(resolved.put)
+    started = time()
+    while pending:
+        deadline = min(f.deadline for f in pending)
+        wait = max(0.0, deadline - time())
+        if timeout is not None:
+            remaining = timeout - (time() - started)
+            if remaining <= 0:
+                raise RequestTimeout(None, timeout)
+            wait = min(wait, remaining)
+        try:
+            future = resolved.get(timeout=wait)
+        except Empty:
+            now = time()
+            for future in pending:
+                if future.deadline <= now:
+                    future.expire()
+            continue
+        if future in pending:
+            pending.remove(future)
+            yield future
+
+
+def wait_all(futures, timeout=None):
+    """
+    Wait for all futures to be resolved.
+    :param futures: A list of futures.
+    :type futures: list
+    :param timeout: The (optional) total seconds to wait.
+    :type timeout: float
+    :return: A tuple of: (done, pending) futures.
+    :rtype: tuple
+    """
+    try:
+        for _ in as_completed(futures, timeout):
+            pass
+    except RequestTimeout:
+        pass
+    done = [f for f in futures if f.done()]
+    pending = [f for f in futures if not f.done()]
+    return done, pending
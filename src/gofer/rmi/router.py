@@ -0,0 +1,303 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+Provides a shared (process wide) reply queue.
+Synchronous requests share a single reply queue and replies are
+demultiplexed by serial number to the waiting caller (or future).
+Routers are referenced by registered callers.  An unreferenced router
+(thread and auto-deleted queue) is released after being idle.
+"""
+
+from time import time, sleep
+from Queue import Queue as Inbox
+from threading import RLock
+from logging import getLogger
+
+from gofer.common import Thread, synchronized
+from gofer.messaging import Document, DocumentError, Queue, Exchange
+from gofer.messaging.auth import identity
+from gofer.messaging.consumer import ConsumerThread
+
+
+log = getLogger(__name__)
+
+
+class ReplyRouter(ConsumerThread):
+    """
+    Reads replies from a shared reply queue and routes
+    them by serial number to the waiting caller's inbox.
+    :cvar routers: Routers keyed by (url, exchange, identity).
+    :type routers: dict
+    :cvar IDLE: Seconds an unreferenced router is kept before released.
+    :type IDLE: int
+    :ivar key: The key in routers.
+    :type key: tuple
+    :ivar exchange: An (optional) AMQP exchange name.
+    :type exchange: str
+    :ivar inbox: Caller inboxes keyed by serial number.
+        Each registered caller is a reference.
+    :type inbox: dict
+    :ivar used: The last time the router was referenced.
+    :type used: float
+    """
+
+    routers = {}
+
+    IDLE = 300
+
+    __lock = RLock()
+
+    @staticmethod
+    def get(url, exchange=None, authenticator=None):
+        """
+        Get the shared router for the specified broker, exchange and
+        authenticator.  The router (and the reply queue) is created
+        and started on first use.  Routers are keyed by the stable identity
+        of the authenticator.
+        :param url: The broker URL.
+        :type url: str
+        :param exchange: An (optional) AMQP exchange name.
+        :type exchange: str
+        :param authenticator: A message authenticator.
+        :type authenticator: gofer.messaging.auth.Authenticator
+        :return: The started router.
+        :rtype: ReplyRouter
+        """
+        key = (url, exchange, identity(authenticator))
+        ReplyRouter.__lock.acquire()
+        try:
+            router = ReplyRouter.routers.get(key)
+            if router is None or not router.isAlive():
+                router = ReplyRouter(url, exchange, authenticator)
+                router.key = key
+                router.declare()
+                router.start()
+                ReplyRouter.routers[key] = router
+            router.used = time()
+            return router
+        finally:
+            ReplyRouter.__lock.release()
+
+    @staticmethod
+    def release(router):
+        """
+        Release the router when unreferenced and idle longer than IDLE
+        seconds.  The router is removed and shutdown.  The thread
+        terminates and closes the reader which deletes the queue.
+        :param router: The router to be released.
+        :type router: ReplyRouter
+        :return: True if released.
+        :rtype: bool
+        """
+        ReplyRouter.__lock.acquire()
+        try:
+            if not router.idle():
+                return False
+            if ReplyRouter.routers.get(router.key) is router:
+                del ReplyRouter.routers[router.key]
+            router.shutdown()
+            return True
+        finally:
+            ReplyRouter.__lock.release()
+
+    @staticmethod
+    def shutdown_all():
+        """
+        Shutdown all routers.
+        """
+        ReplyRouter.__lock.acquire()
+        try:
+            for router in ReplyRouter.routers.values():
+                router.shutdown()
+            ReplyRouter.routers.clear()
+        finally:
+            ReplyRouter.__lock.release()
+
+    def __init__(self, url, exchange=None, authenticator=None):
+        """
+        :param url: The broker URL.
+        :type url: str
+        :param exchange: An (optional) AMQP exchange name.
+        :type exchange: str
+        :param authenticator: A message authenticator.
+        :type authenticator: gofer.messaging.auth.Authenticator
+        """
+        queue = Queue()
+        queue.durable = False
+        queue.auto_delete = True
+        ConsumerThread.__init__(self, queue, url)
+        self.key = (url, exchange, identity(authenticator))
+        self.exchange = exchange
+        self.authenticator = authenticator
+        self.inbox = {}
+        self.used = time()
+        self.__mutex = RLock()
+
+    @property
+    def address(self):
+        """
+        The AMQP reply address.
+        :rtype: str
+        """
+        if self.exchange:
+            return '/'.join((self.exchange, self.node.name))
+        else:
+            return self.node.name
+
+    def declare(self):
+        """
+        Declare the reply queue and bind the exchange when specified.
+        """
+        self.node.declare(self.url)
+        if self.exchange:
+            exchange = Exchange(self.exchange)
+            exchange.bind(self.node, self.url)
+
+    def open(self):
+        """
+        Declare the reply queue and open the reader.
+        The (auto-deleted) queue is declared each time the reader is
+        opened so that it is recreated after the connection has been
+        lost (broker restarted).
+        """
+        while not Thread.aborted():
+            try:
+                self.declare()
+                self.reader.open()
+                break
+            except Exception:
+                log.exception(self.getName())
+                sleep(30)
+
+    @synchronized
+    def register(self, sn, inbox=None):
+        """
+        Register a caller waiting for replies.
+        Must be called before the request is sent.
+        :param sn: The request serial number.
+        :type sn: str
+        :param inbox: An (optional) inbox.  Anything with put().
+        :type inbox: object
+        :return: The inbox to which replies are routed.
+        :rtype: Queue.Queue
+        """
+        if inbox is None:
+            inbox = Inbox()
+        self.inbox[sn] = inbox
+        self.used = time()
+        return inbox
+
+    @synchronized
+    def unregister(self, sn):
+        """
+        Unregister a caller.
+        Replies for the serial number that arrive later are dropped.
+        :param sn: The request serial number.
+        :type sn: str
+        """
+        self.inbox.pop(sn, None)
+        self.used = time()
+
+    @synchronized
+    def idle(self):
+        """
+        Get whether the router is unreferenced and has been idle
+        longer than IDLE seconds.
+        :return: True if idle.
+        :rtype: bool
+        """
+        return not self.inbox and time() - self.used > self.IDLE
+
+    @synchronized
+    def find(self, sn):
+        """
+        Find the inbox registered for the serial number.
+        :param sn: The request serial number.
+        :type sn: str
+        :return: The inbox or None.
+        """
+        return self.inbox.get(sn)
+
+    def route(self, sn, thing):
+        """
+        Route a reply to the inbox registered for the serial number.
+        :param sn: The request serial number.
+        :type sn: str
+        :param thing: The reply document or rejection.
+        :type thing: (Document|DocumentError)
+        :return: True if routed.
+        :rtype: bool
+        """
+        inbox = self.find(sn)
+        if inbox is None:
+            log.debug('reply: %s, dropped', sn)
+            return False
+        inbox.put(thing)
+        return True
+
+    @synchronized
+    def expired(self):
+        """
+        Get registered inboxes with a deadline that has passed.
+        :return: List of expired inboxes.
+        :rtype: list
+        """
+        now = time()
+        expired = []
+        for inbox in self.inbox.values():
+            deadline = getattr(inbox, 'deadline', None)
+            if deadline is not None and deadline <= now:
+                expired.append(inbox)
+        return expired
+
+    def read(self):
+        """
+        Read and route replies then expire late inboxes.
+        The router is released when idle.
+        """
+        ConsumerThread.read(self)
+        for inbox in self.expired():
+            inbox.expire()
+        if self.idle():
+            ReplyRouter.release(self)
+
+    def dispatch(self, document):
+        """
+        Route the received reply.
+        :param document: The received document.
+        :type document: Document
+        """
+        self.route(document.sn, document)
+
+    def rejected(self, code, description, document, details):
+        """
+        Route the rejected (invalid) reply so the waiting caller
+        fails immediately rather than timing out.
+        :param code: The rejection code.
+        :type code: str
+        :param description: rejection description
+        :type description: str
+        :param document: The received document.
+        :type document: (Document|str)
+        :param details: The explanation.
+        :type details: str
+        """
+        try:
+            if not isinstance(document, Document):
+                parsed = Document()
+                parsed.load(document)
+                document = parsed
+            sn = document.sn
+        except Exception:
+            log.debug('rejected: %s', document)
+            return
+        self.route(sn, DocumentError(code, description, document, details))
@@ -19,13 +19,16 @@ Provides (local) message storage classes.
 
 import os
 
-from time import sleep, time
+from time import time
+from threading import Event, RLock
 from logging import getLogger
-from Queue import Queue, Empty
+from Queue import Empty
 
 from gofer import NAME, Thread
-from gofer.common import mkdir, rmdir, unlink
+from gofer.common import PriorityQueue
+from gofer.common import rmdir, unlink, synchronized
 from gofer.messaging import Document
+from gofer.rmi.journal import Journal, Entry
 from gofer.rmi.tracker import Tracker
 
 
@@ -35,31 +38,33 @@ log = getLogger(__name__)
 class Pending(object):
     """
     Persistent store and queuing for pending requests.
+    Requests are queued by priority.  Requests are written to an
+    append-only journal and restored (in the order written) when opened.
+    The queue is a window over the journal.  At most WINDOW requests are
+    held in memory.  Beyond the window, only the journal entry is queued
+    and the request is read from the journal when gotten.
+    :cvar WINDOW: The maximum number of requests held in memory.
+    :type WINDOW: int
+    :ivar opened: Set when the journal index has been loaded.
+    :type opened: Event
+    :ivar total: The number of journal(ed) requests to be restored.
+    :type total: int
+    :ivar restored: The number of journal(ed) requests restored.
+    :type restored: int
+    :ivar boundary: Entries with a (journal) sequence less than the boundary
+        were journal(ed) before opened.
+    :type boundary: int
+    :ivar held: The number of requests held in memory.
+    :type held: int
     """
 
     PENDING = '/var/lib/%s/messaging/pending' % NAME
-
-    @staticmethod
-    def _write(request, path):
-        """
-        Write a request to the journal.
-        :param request: An AMQP request.
-        :type request: Document
-        :param path: The destination path.
-        :type path: str
-        """
-        fp = open(path, 'w+')
-        try:
-            body = request.dump()
-            fp.write(body)
-            log.debug('wrote [%s]: %s', path, body)
-        finally:
-            fp.close()
+    WINDOW = 100
 
     @staticmethod
     def _read(path):
         """
-        Read a request.
+        Read a request written using the legacy (file per request) layout.
         :param path: The path to the journal file.
         :type path: str
         :return: The read request.
@@ -81,12 +86,12 @@ class Pending(object):
 
     def _list(self):
         """
-        Directory listing sorted by when it was created.
+        Legacy (file per request) directory listing sorted by when it was created.
         :return: A sorted directory listing (absolute paths).
         :rtype: list
         """
         path = os.path.join(Pending.PENDING, self.stream)
-        paths = [os.path.join(path, name) for name in os.listdir(path)]
+        paths = [os.path.join(path, name) for name in os.listdir(path) if name.endswith('.json')]
         return sorted(paths)
 
     def __init__(self, stream):
@@ -95,60 +100,128 @@ class Pending(object):
         :type stream: str
         """
         self.stream = stream
-        self.queue = Queue(maxsize=100)
-        self.is_open = False
-        self.sequential = Sequential()
-        self.journal = {}
+        self.__mutex = RLock()
+        self.queue = PriorityQueue()
+        self.opened = Event()
+        self.journal = Journal(os.path.join(Pending.PENDING, stream))
+        self.total = 0
+        self.restored = 0
+        self.boundary = 0
+        self.held = 0
         self.thread = Thread(target=self._open)
         self.thread.setDaemon(True)
         self.thread.start()
 
+    @property
+    def progress(self):
+        """
+        The restore progress.
+        :return: The progress: {opened:, total:, restored:, queued:, held:}
+        :rtype: dict
+        """
+        return dict(
+            opened=self.opened.isSet(),
+            total=self.total,
+            restored=self.restored,
+            queued=self.queue.qsize(),
+            held=self.held)
+
     def _open(self):
         """
         Open for operations.
-        Load journal(ed) requests. These are requests were in the queuing pipeline
-        when the process was terminated. put() is blocked until this has completed.
+        Load the journal index and queue journal(ed) entries. These are requests
+        were in the queuing pipeline when the process was terminated.  The requests
+        are read from the journal when gotten.  put() is blocked until the index
+        has been loaded.  Restored requests are tracked (by serial number only)
+        when queued so they may be cancelled before dispatched.  The request
+        data is tracked when the request is read from the journal.
         """
-        path = os.path.join(Pending.PENDING, self.stream)
-        mkdir(path)
-        log.info('Using: %s', path)
+        log.info('Using: %s', self.journal.path)
+        entries = self.journal.open()
+        entries.extend(self._migrate())
+        self.total = len(entries)
+        self.boundary = self.journal.seq
+        self.opened.set()
+        log.info('Restoring: %d requests', self.total)
+        tracker = Tracker()
+        for entry in entries:
+            tracker.add(entry.sn, None)
+            self.queue.put(entry)
+
+    def _migrate(self):
+        """
+        Migrate requests written using the legacy (file per request) layout
+        into the journal.  Each file is deleted once written to the journal.
+        :return: The migrated journal entries.
+        :rtype: list
+        """
+        entries = []
         for path in self._list():
-            log.info('Restoring: %s', path)
             request = Pending._read(path)
-            if not request:
-                # read failed
-                continue
-            self._put(request, path)
-        self.is_open = True
+            if request and request.sn not in self.journal.index:
+                entry = self.journal.write(request.sn, request.dump(request.wire_codec), request.priority)
+                entries.append(entry)
+                log.info('Migrated: %s', path)
+            unlink(path)
+        return entries
+
+    def _restore(self, entry):
+        """
+        Read a journal entry.
+        :param entry: A journal entry.
+        :type entry: gofer.rmi.journal.Entry
+        :return: The restored request.
+        :rtype: Document
+        """
+        body = self.journal.read(entry)
+        try:
+            request = Document()
+            request.load(body)
+            return request
+        except (TypeError, ValueError):
+            log.error('%s corrupt (discarded)', entry.sn)
+            self.journal.commit(entry.sn)
+            Tracker().remove(entry.sn)
 
     def put(self, request):
         """
         Enqueue a pending request.
-        This is blocked until the _open() has re-queued journal(ed) entries.
+        This is blocked until the _open() has loaded the journal index.
+        The request is written using the codec it was received in.
         :param request: An AMQP request.
         :type request: Document
         """
-        while not self.is_open:
-            # block until opened
-            sleep(1)
-        fn = self.sequential.next()
-        path = os.path.join(Pending.PENDING, self.stream, fn)
-        Pending._write(request, path)
-        self._put(request, path)
+        self.opened.wait()
+        entry = self.journal.write(request.sn, request.dump(request.wire_codec), request.priority)
+        self._put(request, entry)
 
     def get(self):
         """
         Get the next pending request to be dispatched.
-        Blocks until a request is available.
+        Blocks until a request is available.  Requests not held
+        in memory are read from the journal and tracked.
         :return: The next pending request.
         :rtype: Document
         :raise Empty: on thread aborted.
         """
         while not Thread.aborted():
             try:
-                return self.queue.get(timeout=10)
+                item = self.queue.get(timeout=10)
             except Empty:
-                pass
+                continue
+            if not isinstance(item, Entry):
+                self._release()
+                return item
+            if item.seq < self.boundary:
+                self.restored += 1
+                if self.restored == self.total or not self.restored % 1000:
+                    log.info('Restored: %d/%d requests', self.restored, self.total)
+            request = self._restore(item)
+            if not request:
+                # read failed
+                continue
+            self._track(request)
+            return request
         # aborted
         raise Empty()
 
@@ -159,21 +232,20 @@ class Pending(object):
         :param sn: A request serial number.
         :param sn: str
         """
-        try:
-            path = self.journal.pop(sn)
-            unlink(path)
+        if self.journal.commit(sn):
             log.debug('%s committed', sn)
-        except KeyError:
+        else:
             log.warn('%s not found for commit', sn)
 
     def delete(self):
         """
         Drain the queue and delete the store.
         """
-        self.is_open = False
+        self.opened.clear()
         self.thread.abort()
         self.thread.join()
         self._drain()
+        self.journal.delete()
         path = os.path.join(Pending.PENDING, self.stream)
         rmdir(path)
         log.info('%s, deleted', path)
@@ -182,7 +254,7 @@ class Pending(object):
         """
         Drain the queue.
         """
-        self.is_open = False
+        self.opened.clear()
         while not Thread.aborted():
             try:
                 request = self.queue.get(timeout=1)
@@ -190,49 +262,48 @@ class Pending(object):
             except Empty:
                 break
 
-    def _put(self, request, jnl_path):
+    def _put(self, request, entry):
         """
         Enqueue the request.
+        The request is queued (held in memory) when the window is not full.
+        Otherwise, the journal entry is queued.
         :param request: An AMQP request.
         :type request: Document
-        :param jnl_path: Path to the associated journal file.
-        :type jnl_path: str
+        :param entry: The associated journal entry.
+        :type entry: gofer.rmi.journal.Entry
         """
-        request.ts = time()
-        tracker = Tracker()
-        tracker.add(request.sn, request.data)
-        self.journal[request.sn] = jnl_path
-        self.queue.put(request)
-
-
-class Sequential(object):
-    """
-    Generate unique, sequential file names for journal entries.
-    :ivar n: Appended to the new in the unlikely that subsequent calls
-        to time() returns the same value.
-    :type n: int
-    :ivar last: The last time() value.
-    :type last: float
-    """
+        self._track(request)
+        if self._hold():
+            self.queue.put(request)
+        else:
+            self.queue.put(entry)
 
-    FORMAT = '%f-%04d.json'
+    @synchronized
+    def _hold(self):
+        """
+        Reserve space in the window.
+        :return: True if reserved.  False when the window is full.
+        :rtype: bool
+        """
+        if self.held < Pending.WINDOW:
+            self.held += 1
+            return True
+        else:
+            return False
 
-    def __init__(self):
-        self.n = 0
-        self.last = 0.0
+    @synchronized
+    def _release(self):
+        """
+        Release space in the window.
+        """
+        self.held -= 1
 
-    def next(self):
+    def _track(self, request):
         """
-        Get next (sequential) name to be used for the next journal file.
-        :return: The next (sequential) name.
-        :rtype: str
+        Track the request.
+        :param request: An AMQP request.
+        :type request: Document
         """
-        now = time()
-        if now > self.last:
-            self.n = 0
-        else:
-            self.n += 1
-        self.last = now
-        val = Sequential.FORMAT % (now, self.n)
-        val = val.replace('.', '-', 1)
-        return val
+        request.ts = time()
+        tracker = Tracker()
+        tracker.add(request.sn, request.data)
@@ -20,10 +20,12 @@ classes on which we invoke methods.
 """
 
 from new import classobj
-from threading import RLock
 
-from gofer.common import Options, synchronized
+from gofer.common import Options
 from gofer.rmi.policy import Policy
+from gofer.rmi.batch import Batch
+from gofer.rmi.fanout import Scatter
+from gofer.rmi.aio import AsyncPolicy
 from gofer.rmi.dispatcher import Request
 
 
@@ -99,8 +101,6 @@ class Stub:
     :type __url: str
     :ivar __address: The AMQP address
     :type __address: str
-    :ivar __mutex: The mutex prevents concurrent calls.
-    :type __mutex: RLock
     :ivar __policy: The invocation policy.
     :type __policy: Policy
     :ivar __cntr: The constructor arguments.
@@ -118,18 +118,25 @@ class Stub:
         """
         self.__url = url
         self.__address = address
-        self.__mutex = RLock()
-        self.__policy = Policy(url, address, options)
+        if options.fanout:
+            self.__policy = Scatter(url, address, options)
+        elif options.loop:
+            self.__policy = AsyncPolicy(url, address, options)
+        else:
+            self.__policy = Policy(url, address, options)
         self.__cntr = None
 
-    @synchronized
     def __send(self, request):
         """
         Send the request using the configured request method.
+        Within a batch, the request is added to the batch.
         :param request: An RMI request.
         :type request: str
         """
         request.cntr = self.__cntr
+        batch = Batch.current()
+        if batch is not None:
+            return batch.add(self.__policy, request)
         return self.__policy(request)
 
     def __getattr__(self, name):
@@ -14,18 +14,35 @@ Request tracker classes.
 """
 import os
 
+from time import time
 from threading import RLock
+from logging import getLogger
 
 from gofer import Singleton, synchronized, NAME
-from gofer.common import mkdir
+from gofer.common import unlink
+from gofer.rmi.journal import Journal, Segment
+from gofer.metrics import Memory
+
+
+log = getLogger(__name__)
 
 
 class Tracker:
     """
     Request tracker used to track information about
-    active RMI requests.
+    active RMI requests.  Requests are removed when the transaction
+    is committed or discarded.  Orphaned requests (tracked longer than TTL)
+    are swept periodically as requests are added.
+    :cvar TTL: The time (seconds) a request may be tracked before swept.
+    :type TTL: int
+    :cvar SWEEP: The interval (seconds) between sweeps.
+    :type SWEEP: int
     :ivar __all: All known requests by serial number.
     :type __all: dict
+    :ivar __added: The time added by serial number.
+    :type __added: dict
+    :ivar __index: The locator index.
+    :type __index: Index
     :ivar __cancelled: Cancelled requests.
     :type __cancelled: Canceled
     :ivar __mutex: The object mutex.
@@ -34,10 +51,16 @@ class Tracker:
 
     __metaclass__ = Singleton
 
+    TTL = 86400
+    SWEEP = 60
+
     def __init__(self):
         self.__all = dict()
+        self.__added = dict()
+        self.__index = Index()
         self.__cancelled = Canceled()
         self.__mutex = RLock()
+        self.swept = time()
 
     @synchronized
     def add(self, sn, locator):
@@ -49,20 +72,31 @@ class Tracker:
             on RMI requests.
         :type locator: object
         """
+        if sn in self.__all:
+            self.__index.remove(sn, self.__all[sn])
         self.__all[sn] = locator
+        self.__index.add(sn, locator)
+        self.__added[sn] = time()
+        if time() - self.swept > Tracker.SWEEP:
+            self.sweep()
 
     @synchronized
     def find(self, criteria):
         """
         Find serial numbers matching user defined (any) data.
+        The criteria selects candidates using the index when possible.
+        Otherwise, all known requests are matched.
         :param criteria: The object used to match RMI requests.
         :type criteria: gofer.rmi.criteria.Criteria
         :return: The list of matching serial numbers.
         :rtype: list
         """
         matched = []
-        for sn, locator in self.__all.items():
-            if criteria.match(locator):
+        selected = criteria.select(self.__index)
+        if selected is None:
+            selected = self.__all.keys()
+        for sn in selected:
+            if criteria.match(self.__all[sn]):
                 matched.append(sn)
         return matched
 
@@ -82,6 +116,23 @@ class Tracker:
         else:
             raise Exception('serial number (%s), not-found' % sn)
 
+    @synchronized
+    def cancel_matching(self, criteria):
+        """
+        Cancel all RMI requests matching the criteria.
+        Matching and cancellation are performed in a single locked pass.
+        :param criteria: The object used to match RMI requests.
+        :type criteria: gofer.rmi.criteria.Criteria
+        :return: The list of cancelled serial numbers (not already cancelled).
+        :rtype: list
+        """
+        cancelled = []
+        for sn in self.find(criteria):
+            if sn not in self.__cancelled:
+                cancelled.append(sn)
+        self.__cancelled.add_all(cancelled)
+        return cancelled
+
     @synchronized
     def cancelled(self, sn):
         """
@@ -100,13 +151,220 @@ class Tracker:
         :param sn: An RMI serial number.
         :type sn: str
         """
-        self.__all.pop(sn, 0)
+        if sn in self.__all:
+            self.__index.remove(sn, self.__all.pop(sn))
+        self.__added.pop(sn, None)
         self.__cancelled.delete(sn)
 
+    @synchronized
+    def sweep(self, ttl=None):
+        """
+        Remove (orphaned) requests tracked longer than the TTL.
+        :param ttl: The TTL (seconds).  Default: TTL.
+        :type ttl: int
+        :return: The list of removed serial numbers.
+        :rtype: list
+        """
+        now = time()
+        expired = now - (ttl or Tracker.TTL)
+        swept = [(a, sn) for sn, a in self.__added.iteritems() if a <= expired]
+        swept = [sn for a, sn in sorted(swept)]
+        for sn in swept:
+            self.remove(sn)
+        self.swept = now
+        if swept:
+            log.info('Tracker: %d orphaned requests swept', len(swept))
+        return swept
+
+    @synchronized
+    def stats(self):
+        """
+        Get tracking statistics.
+        :return: {tracked:, cancelled:, memory:} where memory is the
+            approximate size (bytes) of the tracked locators.
+        :rtype: dict
+        """
+        return dict(
+            tracked=len(self.__all),
+            cancelled=len(self.__cancelled),
+            memory=Memory.sizeof(self.__all, formatted=False))
+
+
+class Index(object):
+    """
+    Hash indexes on tracked locators.
+    Only hashable values are indexed.
+    :ivar values: Serial numbers by (hashable) locator.
+    :type values: dict
+    :ivar keys: Serial numbers by value by key for dict locators.
+    :type keys: dict
+    :ivar keyed: Serial numbers by key for dict locators.
+    :type keyed: dict
+    :ivar dicts: Serial numbers of (non-empty) dict locators.
+    :type dicts: set
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.keys = {}
+        self.keyed = {}
+        self.dicts = set()
+
+    def add(self, sn, locator):
+        """
+        Index a locator.
+        :param sn: An RMI serial number.
+        :type sn: str
+        :param locator: The locator to index.
+        :type locator: object
+        """
+        if isinstance(locator, dict):
+            if not locator:
+                return
+            self.dicts.add(sn)
+            for k, v in locator.items():
+                try:
+                    hash(v)
+                except TypeError:
+                    # not hashable
+                    continue
+                self.keys.setdefault(k, {}).setdefault(v, set()).add(sn)
+                self.keyed.setdefault(k, set()).add(sn)
+        else:
+            try:
+                self.values.setdefault(locator, set()).add(sn)
+            except TypeError:
+                # not hashable
+                pass
+
+    def remove(self, sn, locator):
+        """
+        Remove a locator from the index.
+        :param sn: An RMI serial number.
+        :type sn: str
+        :param locator: The indexed locator.
+        :type locator: object
+        """
+        if isinstance(locator, dict):
+            self.dicts.discard(sn)
+            for k, v in locator.items():
+                values = self.keys.get(k)
+                if values is None:
+                    continue
+                try:
+                    Index._discard(values, v, sn)
+                except TypeError:
+                    # not hashable
+                    continue
+                if not values:
+                    del self.keys[k]
+                Index._discard(self.keyed, k, sn)
+        else:
+            try:
+                Index._discard(self.values, locator, sn)
+            except TypeError:
+                # not hashable
+                pass
+
+    @staticmethod
+    def _discard(index, key, sn):
+        """
+        Discard a serial number from an index.
+        Empty sets are deleted.
+        :param index: An index.
+        :type index: dict
+        :param key: The index key.
+        :param sn: An RMI serial number.
+        :type sn: str
+        """
+        selected = index.get(key)
+        if selected is None:
+            return
+        selected.discard(sn)
+        if not selected:
+            del index[key]
+
+    def lookup(self, key, value):
+        """
+        Select dict locators by key and value.
+        :param key: A dict key.
+        :param value: A (hashable) value.
+        :return: The selected serial numbers.
+        :rtype: set
+        :raise TypeError: When value is not hashable.
+        """
+        return set(self.keys.get(key, {}).get(value, ()))
+
+    def unkeyed(self, key):
+        """
+        Get the number of dict locators that do not have the key (indexed).
+        :param key: A dict key.
+        :return: The number of dict locators.
+        :rtype: int
+        """
+        return len(self.dicts) - len(self.keyed.get(key, ()))
+
+    def matched(self, key, value, candidates=None):
+        """
+        Select dict locators that have the key with the value or do not
+        have the key (indexed).  When candidates are specified, they are
+        filtered.  Otherwise, the locators without the key are selected
+        only when there are any.
+        :param key: A dict key.
+        :param value: A (hashable) value.
+        :param candidates: The (optional) serial numbers already selected.
+        :type candidates: set
+        :return: The selected serial numbers.
+        :rtype: set
+        :raise TypeError: When value is not hashable.
+        """
+        found = self.keys.get(key, {}).get(value, ())
+        keyed = self.keyed.get(key, ())
+        if candidates is not None:
+            return set([sn for sn in candidates if sn in found or sn not in keyed])
+        if len(keyed) == len(self.dicts):
+            return set(found)
+        return self.dicts.difference(keyed).union(found)
+
+    def equal(self, value):
+        """
+        Select locators that may be equal to the specified value.
+        :param value: A value.
+        :return: The selected serial numbers or None when the
+            index cannot be used.
+        :rtype: set
+        """
+        if isinstance(value, dict):
+            if not value:
+                return None
+            selected = None
+            for k, v in value.items():
+                try:
+                    matched = self.lookup(k, v)
+                except TypeError:
+                    # not hashable
+                    return None
+                if selected is None:
+                    selected = matched
+                else:
+                    selected &= matched
+                if not selected:
+                    break
+            return selected
+        try:
+            return set(self.values.get(value, ()))
+        except TypeError:
+            # not hashable
+            return None
+
 
 class Canceled(object):
     """
     Persistent collection of canceled requests by serial number.
+    Serial numbers are added to and deleted from an append-only journal.
+    The collection is rebuilt from the journal index when constructed.
+    :ivar journal: The cancellation journal.
+    :type journal: Journal
     :ivar collection: The set canceled requests (serial number).
     :type collection: set
     """
@@ -114,8 +372,28 @@ class Canceled(object):
     PATH = '/var/lib/%s/messaging/canceled' % NAME
 
     def __init__(self):
-        mkdir(Canceled.PATH)
-        self.collection = set(os.listdir(Canceled.PATH))
+        self.journal = Journal(Canceled.PATH)
+        self.journal.open()
+        self.collection = set(self.journal.index)
+        self._migrate()
+
+    def _migrate(self):
+        """
+        Migrate serial numbers written using the legacy (file per
+        serial number) layout into the journal.
+        """
+        migrated = []
+        for name in os.listdir(Canceled.PATH):
+            if Segment.number(name) is not None:
+                continue
+            if name not in self.collection:
+                self.collection.add(name)
+                self.journal.write(name, '', sync=False)
+            migrated.append(name)
+        if migrated:
+            self.journal.sync()
+        for name in migrated:
+            unlink(os.path.join(Canceled.PATH, name))
 
     def add(self, sn):
         """
@@ -123,12 +401,19 @@ class Canceled(object):
         :param sn: A canceled request serial number.
         :rtype: str
         """
-        self.collection.add(sn)
-        fp = open(os.path.join(Canceled.PATH, sn), 'w+')
-        try:
-            fp.write(sn)
-        finally:
-            fp.close()
+        self.add_all([sn])
+
+    def add_all(self, sn_list):
+        """
+        Add a batch of serial numbers.
+        The journal is synced once for the batch.
+        :param sn_list: A list of canceled request serial numbers.
+        :type sn_list: list
+        """
+        for sn in sn_list:
+            self.collection.add(sn)
+            self.journal.write(sn, '', sync=False)
+        self.journal.sync()
 
     def delete(self, sn):
         """
@@ -140,10 +425,10 @@ class Canceled(object):
             self.collection.remove(sn)
         except KeyError:
             pass
-        try:
-            os.unlink(os.path.join(Canceled.PATH, sn))
-        except OSError:
-            pass
+        self.journal.commit(sn)
 
     def __contains__(self, sn):
         return sn in self.collection
+
+    def __len__(self):
+        return len(self.collection)
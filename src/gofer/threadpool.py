@@ -17,11 +17,14 @@
 Thread Pool classes.
 """
 
+from time import time
 from uuid import uuid4
 from Queue import Queue, Empty
+from collections import deque
+from threading import RLock
 from logging import getLogger
 
-from gofer.common import Thread, released, utf8
+from gofer.common import Thread, PriorityQueue, released, synchronized, utf8
 
 
 log = getLogger(__name__)
@@ -32,17 +35,24 @@ class Worker(Thread):
     Pool (worker) thread.
     :ivar queue: The work input queue..
     :type queue: Queue
+    :ivar pool: The (optional) pool to which the worker belongs.
+    :type pool: ThreadPool
     """
 
     HALT = 0
     
-    def __init__(self, worker_id, queue):
+    def __init__(self, worker_id, queue, pool=None):
         """
         :param worker_id: The worker id in the pool.
         :type worker_id: int
+        :param queue: The work input queue.
+        :type queue: Queue
+        :param pool: The (optional) pool to which the worker belongs.
+        :type pool: ThreadPool
         """
         Thread.__init__(self, name='worker-%d' % worker_id)
         self.queue = queue
+        self.pool = pool
         self.setDaemon(True)
 
     @released
@@ -51,7 +61,10 @@ class Worker(Thread):
         Main run loop; processes input queue.
         """
         while not Thread.aborted():
-            message = self.queue.get()
+            message = self.next()
+            if message is None:
+                # retired
+                return
             if message == Worker.HALT:
                 self.queue.put(message)
                 return
@@ -61,6 +74,34 @@ class Worker(Thread):
             except Exception:
                 log.exception(utf8(call))
 
+    def next(self):
+        """
+        Get the next message from the input queue.
+        Workers in an elastic pool are retired when they have been
+        idle longer than the pool idle timeout.
+        :return: The next message or None when retired.
+        """
+        pool = self.pool
+        if pool is None:
+            return self.queue.get()
+        if pool.elastic:
+            timeout = pool.timeout
+        else:
+            timeout = None
+        pool.idle(1)
+        try:
+            while True:
+                try:
+                    message = self.queue.get(timeout=timeout)
+                    break
+                except Empty:
+                    if pool.retire(self):
+                        return None
+        finally:
+            pool.idle(-1)
+        pool.waited(message)
+        return message
+
 
 class Call(object):
     """
@@ -73,9 +114,13 @@ class Call(object):
     :type args: list
     :ivar kwargs: The list of keyword args passed to the callable.
     :type kwargs: dict
+    :ivar queued: When the call was queued.
+    :type queued: float
+    :ivar priority: The call priority.  Higher priority calls are executed first.
+    :type priority: int
     """
 
-    def __init__(self, fn, args=None, kwargs=None):
+    def __init__(self, fn, args=None, kwargs=None, priority=0):
         """
         :param fn: The function/method to be executed.
         :type fn: callable
@@ -83,11 +128,15 @@ class Call(object):
         :type args: tuple
         :param kwargs: The list of keyword args passed to the callable.
         :type kwargs: dict
+        :param priority: The call priority.
+        :type priority: int
         """
         self.id = str(uuid4())
         self.fn = fn
         self.args = args or []
         self.kwargs = kwargs or {}
+        self.queued = time()
+        self.priority = priority or 0
 
     def __call__(self):
         """
@@ -116,32 +165,148 @@ class Call(object):
 class ThreadPool(object):
     """
     A load distributed thread pool.
+    Calls are queued by priority.
+    The pool is elastic when the *maximum* exceeds the *capacity*.  Workers
+    are added (up to the maximum) when a call is queued and no workers are idle
+    or when the queue wait (percentile) exceeds the *latency*.  Workers that
+    have been idle longer than *timeout* seconds are retired (down to the capacity).
     :ivar queue: The pool request queue.
-    :type queue: Queue
+    :type queue: PriorityQueue
     :ivar threads: List of: Worker
     :type threads: list
+    :ivar capacity: The minimum # of workers.
+    :type capacity: int
+    :ivar maximum: The maximum # of workers.
+    :type maximum: int
+    :ivar timeout: The idle worker timeout (seconds).
+    :type timeout: int
+    :ivar latency: The queue wait (seconds) used to trigger adding workers.
+    :type latency: float
+    :ivar waits: The recent queue wait (seconds) samples.
+    :type waits: deque
+    :ivar available: The # of idle workers.
+    :type available: int
     """
 
-    def __init__(self, capacity=1, backlog=100):
+    PERCENTILE = 90
+    SAMPLES = 100
+
+    def __init__(self, capacity=1, backlog=100, maximum=None, timeout=60, latency=1.0):
         """
         :param capacity: The # of workers.
         :type capacity: int
         :param backlog: Limit the queued calls.
         :type backlog: int
+        :param maximum: The (optional) maximum # of workers.
+        :type maximum: int
+        :param timeout: The idle worker timeout (seconds).
+        :type timeout: int
+        :param latency: The queue wait (seconds) used to trigger adding workers.
+        :type latency: float
         """
+        self.__mutex = RLock()
         self.capacity = capacity
-        self.queue = Queue(backlog)
+        self.maximum = max(capacity, maximum or capacity)
+        self.timeout = timeout
+        self.latency = latency
+        self.queue = PriorityQueue(backlog)
         self.threads = []
+        self.waits = deque(maxlen=ThreadPool.SAMPLES)
+        self.available = 0
+        self.halted = False
+        self.worker_id = 0
+
+    @property
+    def elastic(self):
+        return self.maximum > self.capacity
 
+    @synchronized
     def start(self):
         """
         Start the pool.
         Populate the pool with started worker threads.
         """
-        for worker_id in range(self.capacity):
-            thread = Worker(worker_id, self.queue)
-            self.threads.append(thread)
-            thread.start()
+        self.halted = False
+        while len(self.threads) < self.capacity:
+            self.add()
+
+    @synchronized
+    def add(self):
+        """
+        Add a started worker.
+        :return: The added worker.
+        :rtype: Worker
+        """
+        thread = Worker(self.worker_id, self.queue, self)
+        self.worker_id += 1
+        self.threads.append(thread)
+        thread.start()
+        return thread
+
+    @synchronized
+    def grow(self):
+        """
+        Add a worker when the pool is elastic and below the maximum.
+        """
+        if self.halted or len(self.threads) >= self.maximum:
+            return
+        thread = self.add()
+        log.debug('pool: %s, added: %s', self, thread.getName())
+
+    @synchronized
+    def retire(self, worker):
+        """
+        Retire an idle worker when the pool is above the capacity.
+        :param worker: An idle worker.
+        :type worker: Worker
+        :return: True if retired.
+        :rtype: bool
+        """
+        if self.halted or len(self.threads) <= self.capacity:
+            return False
+        self.threads.remove(worker)
+        log.debug('pool: %s, retired: %s', self, worker.getName())
+        return True
+
+    @synchronized
+    def idle(self, n):
+        """
+        Update the idle worker count.
+        :param n: The increment.
+        :type n: int
+        """
+        self.available += n
+
+    @synchronized
+    def waited(self, message):
+        """
+        A message has been taken from the queue by a worker.
+        The time the call has waited in the queue is sampled and the
+        pool grows when the percentile exceeds the latency.  The samples
+        are cleared after growing so the pool grows again only when calls
+        queued after the worker was added wait longer than the latency.
+        :param message: The message taken from the queue.
+        """
+        if not isinstance(message, Call):
+            return
+        self.waits.append(time() - message.queued)
+        if not self.elastic:
+            return
+        if self.percentile() > self.latency:
+            self.grow()
+            self.waits.clear()
+
+    def percentile(self):
+        """
+        Get the queue wait (percentile) for recent calls.
+        :return: The queue wait (seconds).
+        :rtype: float
+        """
+        waits = sorted(self.waits)
+        if not waits:
+            return 0.0
+        index = (len(waits) - 1) * ThreadPool.PERCENTILE // 100
+        return waits[index]
 
     def run(self, fn, *args, **kwargs):
         """
@@ -157,6 +322,18 @@ class ThreadPool(object):
         :rtype str
         """
         call = Call(fn, args, kwargs)
+        return self.put(call)
+
+    def put(self, call):
+        """
+        Schedule a call.
+        :param call: A call to schedule.
+        :type call: Call
+        :return The call.
+        :rtype Call
+        """
+        if self.elastic and not self.available:
+            self.grow()
         self.queue.put(call)
         return call
 
@@ -171,15 +348,19 @@ class ThreadPool(object):
         :return: List of orphaned calls.  List of: Call.
         :rtype: list
         """
+        self.halted = True
         drained = self.drain()
+        threads = list(self.threads)
         if hard:
-            for t in self.threads:
+            for t in threads:
                 t.abort()
         self.queue.put(Worker.HALT)
-        for t in self.threads:
+        for t in threads:
             if t == Thread.current():
                 continue
             t.join()
+        self.threads = []
+        self.waits.clear()
         return drained
 
     def drain(self):
@@ -215,9 +396,87 @@ class ThreadPool(object):
             'capacity=%d' % len(self),
             'queued: %d/%d' % (self.queue.qsize(), self.queue.maxsize)
         ]
+        if self.elastic:
+            description.append('range: %d-%d' % (self.capacity, self.maximum))
+            description.append('idle: %d' % self.available)
         return ' '.join(description)
 
 
+class KeyedPool(object):
+    """
+    A thread pool that executes calls with the same key in order.
+    Each key is assigned to a worker (by hash) with its own queue so
+    calls for different keys run in parallel.
+    :ivar queues: The input queue for each worker.
+    :type queues: list
+    :ivar threads: List of: Worker
+    :type threads: list
+    """
+
+    def __init__(self, capacity=1, backlog=100):
+        """
+        :param capacity: The # of workers.
+        :type capacity: int
+        :param backlog: Limit the queued calls (per worker).
+        :type backlog: int
+        """
+        self.__mutex = RLock()
+        self.queues = [Queue(backlog) for _ in range(max(1, capacity))]
+        self.threads = []
+
+    @synchronized
+    def start(self):
+        """
+        Start the pool.
+        Populate the pool with started worker threads.
+        """
+        if self.threads:
+            return
+        for worker_id, queue in enumerate(self.queues):
+            thread = Worker(worker_id, queue)
+            self.threads.append(thread)
+            thread.start()
+
+    def run(self, key, fn, *args, **kwargs):
+        """
+        Schedule a call.
+        :param key: Calls with the same key are executed in order.
+        :type key: str
+        :param fn: A function/method to execute.
+        :type fn: callable
+        :param args: The args passed to fn()
+        :type args: tuple
+        :param kwargs: The keyword args passed fn()
+        :type kwargs: dict
+        :return The call.
+        :rtype Call
+        """
+        call = Call(fn, args, kwargs)
+        queue = self.queues[hash(key) % len(self.queues)]
+        queue.put(call)
+        return call
+
+    @synchronized
+    def shutdown(self):
+        """
+        Shutdown the pool.
+        Queued calls are completed before the workers terminate.
+        """
+        for queue in self.queues:
+            queue.put(Worker.HALT)
+        for t in self.threads:
+            if t == Thread.current():
+                continue
+            t.join()
+        self.threads = []
+        for queue in self.queues:
+            while not queue.empty():
+                queue.get()
+
+    def __len__(self):
+        return len(self.threads)
+
+
 class Direct:
     """
     Call ignored (trashed).
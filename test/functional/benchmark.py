@@ -0,0 +1,61 @@
+#! /usr/bin/env python
+#
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+Measures synchronous RMI calls-per-second against a running
+agent (see: agent.py) with and without the client connection pool.
+Disabling the pool (Pool.SIZE = 0) opens and closes the broker
+connection on every call.
+"""
+
+from optparse import OptionParser
+
+from gofer.metrics import Timer
+from gofer.proxy import Agent
+from gofer.messaging import Pool
+
+
+def measure(url, address, calls):
+    agent = Agent(url, address)
+    dog = agent.Dog()
+    dog.bark('warmup')
+    timer = Timer()
+    timer.start()
+    for n in range(calls):
+        dog.bark('benchmark')
+    timer.stop()
+    return calls / timer.duration()
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-u', '--url', help='broker URL')
+    parser.add_option('-r', '--address', default='xyz', help='address')
+    parser.add_option('-n', '--calls', default=500, type='int', help='number of calls')
+    opts, args = parser.parse_args()
+
+    size = Pool.SIZE
+    Pool.SIZE = 0
+    Pool().clear()
+    unpooled = measure(opts.url, opts.address, opts.calls)
+    Pool.SIZE = size
+    pooled = measure(opts.url, opts.address, opts.calls)
+    Pool().clear()
+
+    print 'calls: %d' % opts.calls
+    print 'unpooled: %.1f (calls/sec)' % unpooled
+    print '  pooled: %.1f (calls/sec)' % pooled
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+#! /usr/bin/env python
+#
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+Measures the request consumer intake rate (requests/sec) by the number
+of crypto threads.  The authenticator simulates the cost of (RSA) signature
+validation which releases the GIL.  Documents must be dispatched in the
+order received.
+"""
+
+from time import sleep
+from optparse import OptionParser
+
+from gofer.metrics import Timer
+from gofer.messaging import Document, Node
+from gofer.messaging.auth import Authenticator, sign, timing
+from gofer.messaging.adapter.model import Reader
+from gofer.messaging.consumer import ConsumerThread
+from gofer.messaging.model import VERSION
+from gofer.threadpool import ThreadPool
+
+
+THREADS = [0, 1, 2, 4, 8]
+
+
+class TestAuthenticator(Authenticator):
+
+    def __init__(self, cost):
+        self.cost = cost
+
+    def sign(self, digest):
+        return digest
+
+    def validate(self, document, digest, signature):
+        sleep(self.cost)
+
+
+class Message(object):
+
+    def __init__(self, body):
+        self.body = body
+
+    def ack(self):
+        pass
+
+
+class TestReader(Reader):
+
+    def __init__(self, authenticator, bodies):
+        self.authenticator = authenticator
+        self.messages = [Message(b) for b in bodies]
+        self.messages.reverse()
+
+    def get(self, timeout=None):
+        if self.messages:
+            return self.messages.pop()
+
+    def receive(self, timeout=90):
+        message = self.get(timeout)
+        if message:
+            return message, message.body
+        return None, None
+
+
+class TestConsumer(ConsumerThread):
+
+    def __init__(self, reader, pool):
+        ConsumerThread.__init__(self, Node('test'), None, wait=0)
+        self.reader = reader
+        self.pool = pool
+        self.dispatched = []
+
+    def dispatch(self, document):
+        self.dispatched.append(int(document.sn))
+
+
+def measure(threads, cost, calls):
+    authenticator = TestAuthenticator(cost)
+    bodies = []
+    for n in range(calls):
+        document = Document(sn=str(n), version=VERSION, request=dict(method='bark'))
+        bodies.append(sign(authenticator, document.dump()))
+    pool = None
+    if threads:
+        pool = ThreadPool(threads)
+        pool.start()
+    consumer = TestConsumer(TestReader(authenticator, bodies), pool)
+    timer = Timer()
+    timer.start()
+    while len(consumer.dispatched) < calls:
+        consumer.read()
+    timer.stop()
+    if pool:
+        pool.shutdown()
+    assert consumer.dispatched == range(calls)
+    return calls / timer.duration()
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-n', '--calls', default=200, type='int', help='requests per measurement')
+    parser.add_option('-c', '--cost', default=0.002, type='float',
+                      help='validation cost (seconds)')
+    opts, args = parser.parse_args()
+
+    print '%8s %14s' % ('threads', 'requests/sec')
+    for threads in THREADS:
+        rate = measure(threads, opts.cost, opts.calls)
+        print '%8d %14.1f' % (threads, rate)
+    print
+    for operation, stats in sorted(timing.stats().items()):
+        print '%s: %s' % (operation, stats)
+
+
+if __name__ == '__main__':
+    main()
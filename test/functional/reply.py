@@ -0,0 +1,93 @@
+#! /usr/bin/env python
+#
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+Measures the agent cost of building an encoded reply by result size.
+  encoded: the Return is validated (encoded) and then encoded again
+           within the reply envelope.
+  spliced: the encoded Return is spliced into the reply envelope.
+"""
+
+from optparse import OptionParser
+
+from gofer.metrics import Timer, timestamp
+from gofer.messaging import Document
+from gofer.rmi.dispatcher import Return
+
+
+SIZES = [
+    0x400,
+    0x2800,
+    0x19000,
+    0x100000,
+    0xA00000,
+]
+
+TIMESTAMP = timestamp()
+
+
+def result(size):
+    record = dict(name='package', version='1.0', arch='x86_64')
+    n = size / len(Document(record).dump())
+    return [dict(record, name='package-%d' % i) for i in range(n)]
+
+
+def envelope(reply):
+    return Document(
+        sn='123',
+        version='2.0',
+        routing=('agent', 'client'),
+        result=reply,
+        timestamp=TIMESTAMP)
+
+
+def encoded(retval):
+    reply = Return(retval=retval)
+    reply.dump()  # validate
+    return envelope(reply).dump()
+
+
+def spliced(retval):
+    reply = Return.succeed(retval)
+    return envelope(reply).dump()
+
+
+def measure(fn, retval, calls):
+    timer = Timer()
+    timer.start()
+    for n in range(calls):
+        fn(retval)
+    timer.stop()
+    return timer.duration() / calls
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-n', '--calls', default=10, type='int', help='calls per size')
+    opts, args = parser.parse_args()
+
+    print '%10s %14s %14s %8s' % ('size(KB)', 'encoded(ms)', 'spliced(ms)', 'speedup')
+    for size in SIZES:
+        retval = result(size)
+        assert encoded(retval) == spliced(retval)
+        before = measure(encoded, retval, opts.calls)
+        after = measure(spliced, retval, opts.calls)
+        print '%10.1f %14.3f %14.3f %8.2f' % (
+            len(Document(retval=retval).dump()) / 1024.0,
+            before * 1000,
+            after * 1000,
+            before / after)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#! /usr/bin/env python
+#
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+Measures message transport (encode + decode) throughput and the
+bytes sent on the wire by payload size for each compression codec.
+The payload is a JSON document containing a list of (compressible)
+records similar to those returned by remote methods.
+"""
+
+from optparse import OptionParser
+
+from gofer.metrics import Timer
+from gofer.messaging import Document
+from gofer.messaging.transport import Transport, Assembler, NONE
+
+
+SIZES = [
+    0x400,
+    0x2800,
+    0x19000,
+    0x100000,
+    0xA00000,
+]
+
+
+def payload(size):
+    record = dict(name='package', version='1.0', arch='x86_64')
+    n = size / len(Document(record).dump())
+    records = [dict(record, name='package-%d' % i) for i in range(n)]
+    return Document(sn='123', result=dict(retval=records)).dump()
+
+
+def kb(n_bytes):
+    return '%.1f' % (n_bytes / 1024.0)
+
+
+def measure(body, codec, threshold, calls):
+    transport = Transport(threshold=threshold, codec=codec)
+    assembler = Assembler()
+    sent = 0
+    timer = Timer()
+    timer.start()
+    for n in range(calls):
+        encoded = transport.encode(body)
+        sent = sum([len(b) for b in encoded])
+        for chunk in encoded:
+            decoded = assembler.decode(chunk)
+        assert decoded == body
+    timer.stop()
+    throughput = (len(body) * calls) / timer.duration()
+    return throughput, sent, len(encoded)
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-n', '--calls', default=10, type='int', help='calls per size')
+    parser.add_option('-t', '--threshold', default=Transport.THRESHOLD, type='int',
+                      help='compression threshold (bytes)')
+    parser.add_option('-c', '--codecs', default='%s,zlib' % NONE,
+                      help='comma separated list of codecs')
+    opts, args = parser.parse_args()
+
+    print '%10s %6s %14s %10s %7s' % ('size(KB)', 'codec', 'KB/sec', 'sent(KB)', 'chunks')
+    for size in SIZES:
+        body = payload(size)
+        for codec in opts.codecs.split(','):
+            throughput, sent, chunks = measure(body, codec, opts.threshold, opts.calls)
+            print '%10s %6s %14s %10s %7d' % (
+                kb(len(body)),
+                codec,
+                kb(throughput),
+                kb(sent),
+                chunks)
+
+
+if __name__ == '__main__':
+    main()
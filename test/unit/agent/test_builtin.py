@@ -31,10 +31,8 @@ class TestAdmin(TestCase):
     @patch('gofer.agent.builtin.Builder')
     @patch('gofer.agent.builtin.Tracker')
     def test_cancel_criteria(self, tracker, builder):
-        sn = '1234'
         name = 'joe'
         criteria = {'eq': name}
-        tracker.return_value.find.return_value = [sn]
 
         # test
         container = Mock()
@@ -42,9 +40,68 @@ class TestAdmin(TestCase):
         canceled = admin.cancel(criteria=criteria)
 
         # validation
-        builder.return_value.build.assert_called_once_with(criteria)
-        tracker.return_value.cancel.assert_called_once_with(sn)
-        self.assertEqual(canceled, [tracker.return_value.cancel.return_value])
+        builder.return_value.compile.assert_called_once_with(criteria)
+        tracker.return_value.cancel_matching.assert_called_once_with(
+            builder.return_value.compile.return_value)
+        self.assertFalse(tracker.return_value.cancel.called)
+        self.assertEqual(canceled, tracker.return_value.cancel_matching.return_value)
+
+    def test_pools(self):
+        plugins = [
+            Mock(pool='A'),
+            Mock(pool='B'),
+        ]
+        plugins[0].name = 'p1'
+        plugins[1].name = 'p2'
+        container = Mock()
+        container.all.return_value = plugins
+        admin = Admin(container)
+        pools = admin.pools()
+        self.assertEqual(pools, {'p1': repr('A'), 'p2': repr('B')})
+
+    def test_pending(self):
+        plugins = [
+            Mock(),
+            Mock(),
+        ]
+        plugins[0].name = 'p1'
+        plugins[0].scheduler.pending.progress = {'total': 10, 'restored': 2}
+        plugins[1].name = 'p2'
+        plugins[1].scheduler.pending.progress = {'total': 0, 'restored': 0}
+        container = Mock()
+        container.all.return_value = plugins
+        admin = Admin(container)
+        progress = admin.pending()
+        self.assertEqual(
+            progress,
+            {
+                'p1': {'total': 10, 'restored': 2},
+                'p2': {'total': 0, 'restored': 0},
+            })
+
+    @patch('gofer.agent.builtin.Tracker')
+    def test_tracker(self, tracker):
+        container = Mock()
+        admin = Admin(container)
+        stats = admin.tracker()
+        tracker.return_value.stats.assert_called_once_with()
+        self.assertEqual(stats, tracker.return_value.stats.return_value)
+
+    @patch('gofer.agent.builtin.Memo')
+    def test_cached(self, memo):
+        container = Mock()
+        admin = Admin(container)
+        stats = admin.cached()
+        memo.stats_all.assert_called_once_with()
+        self.assertEqual(stats, memo.stats_all.return_value)
+
+    @patch('gofer.agent.builtin.auth')
+    def test_timing(self, auth):
+        container = Mock()
+        admin = Admin(container)
+        stats = admin.timing()
+        auth.timing.stats.assert_called_once_with()
+        self.assertEqual(stats, auth.timing.stats.return_value)
 
     def test_hello(self):
         container = Mock()
@@ -99,6 +156,7 @@ class TestBuiltin(TestCase):
         builtin = Builtin(plugin)
         self.assertEqual(builtin.url, builtin.url)
         self.assertEqual(builtin.authenticator, builtin.authenticator)
+        self.assertEqual(builtin.scheduler, plugin.scheduler)
 
     @patch('gofer.agent.builtin.Dispatcher')
     @patch('gofer.agent.builtin.Admin', Mock())
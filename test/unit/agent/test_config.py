@@ -15,6 +15,8 @@ from unittest import TestCase
 from mock import patch
 
 from gofer.agent.config import AgentConfig, AGENT_SCHEMA, AGENT_DEFAULTS, Graph
+from gofer.agent.config import PLUGIN_SCHEMA, PLUGIN_DEFAULTS
+from gofer.config import Config, PropertyNotValid
 
 
 class TestAgentConfig(TestCase):
@@ -26,3 +28,31 @@ class TestAgentConfig(TestCase):
         cfg.assert_called_once_with(AGENT_DEFAULTS, path)
         cfg.return_value.validate.assert_called_once_with(AGENT_SCHEMA)
         self.assertTrue(isinstance(agent, Graph))
+
+
+class TestPluginSchema(TestCase):
+
+    def config(self, codec=None, compression=None):
+        messaging = {}
+        if codec:
+            messaging['codec'] = codec
+        if compression:
+            messaging['compression'] = compression
+        return Config(PLUGIN_DEFAULTS, {'main': {'enabled': '1'}, 'messaging': messaging})
+
+    def test_codec(self):
+        for codec in ('json', 'binary'):
+            self.config(codec).validate(PLUGIN_SCHEMA)
+
+    def test_codec_not_valid(self):
+        for codec in ('xml', 'json1', 'binaryjson'):
+            self.assertRaises(PropertyNotValid, self.config(codec).validate, PLUGIN_SCHEMA)
+
+    def test_compression(self):
+        for compression in ('none', 'zlib', 'bz2'):
+            self.config(compression=compression).validate(PLUGIN_SCHEMA)
+
+    def test_compression_not_valid(self):
+        for compression in ('gzip', 'zlib2'):
+            config = self.config(compression=compression)
+            self.assertRaises(PropertyNotValid, config.validate, PLUGIN_SCHEMA)
@@ -18,6 +18,14 @@ from gofer.agent.plugin import attach
 from gofer.agent.plugin import Container, Plugin
 
 
+POOL = dict(
+    threads_min=None,
+    threads_max=None,
+    threads_idle=None,
+    threads_wait=None,
+    threads_crypto=None)
+
+
 class TestAttach(TestCase):
 
     def test_call(self):
@@ -121,20 +129,21 @@ class TestPlugin(TestCase):
     @patch('gofer.agent.plugin.ThreadPool')
     def test_init(self, pool, dispatcher, whiteboard, scheduler, delegate):
         threads = 4
-        descriptor = Mock(main=Mock(threads=threads))
+        descriptor = Mock(main=Mock(threads=threads, **POOL))
         path = '/tmp/path'
 
         # test
         plugin = Plugin(descriptor, path)
 
         # validation
-        pool.assert_called_once_with(threads)
+        pool.assert_called_once_with(threads, maximum=threads, timeout=60, latency=1.0)
         dispatcher.assert_called_once_with()
         scheduler.assert_called_once_with(plugin)
         delegate.assert_called_once_with()
         self.assertEqual(plugin.descriptor, descriptor)
         self.assertEqual(plugin.path, path)
         self.assertEqual(plugin.pool, pool.return_value)
+        self.assertEqual(plugin.crypto, None)
         self.assertEqual(plugin.impl, None)
         self.assertEqual(plugin.actions, [])
         self.assertEqual(plugin.dispatcher, dispatcher.return_value)
@@ -144,6 +153,51 @@ class TestPlugin(TestCase):
         self.assertEqual(plugin.authenticator, None)
         self.assertEqual(plugin.consumer, None)
 
+    @patch('gofer.agent.plugin.Delegate', Mock())
+    @patch('gofer.agent.plugin.Scheduler', Mock())
+    @patch('gofer.agent.plugin.Whiteboard', Mock())
+    @patch('gofer.agent.plugin.Dispatcher', Mock())
+    @patch('gofer.agent.plugin.ThreadPool')
+    def test_init_elastic(self, pool):
+        descriptor = Mock(
+            main=Mock(
+                threads=4,
+                threads_min='2',
+                threads_max='10',
+                threads_idle='30',
+                threads_wait='0.5',
+                threads_crypto=None))
+
+        # test
+        plugin = Plugin(descriptor, '')
+
+        # validation
+        pool.assert_called_once_with(2, maximum=10, timeout=30, latency=0.5)
+        self.assertEqual(plugin.pool, pool.return_value)
+
+    @patch('gofer.agent.plugin.Scheduler')
+    @patch('gofer.agent.plugin.ThreadPool')
+    @patch('gofer.agent.plugin.Whiteboard', Mock())
+    def test_crypto(self, pool, scheduler):
+        pools = [Mock(), Mock()]
+        pool.side_effect = pools
+        descriptor = Mock(main=Mock(threads=4, **dict(POOL, threads_crypto='2')))
+        scheduler.return_value.isAlive.side_effect = [False, True]
+
+        # test
+        plugin = Plugin(descriptor, '')
+        plugin.attach = Mock()
+        plugin.detach = Mock()
+        plugin.start()
+        plugin.shutdown()
+
+        # validation
+        pool.assert_called_with(2)
+        self.assertEqual(plugin.pool, pools[0])
+        self.assertEqual(plugin.crypto, pools[1])
+        pools[1].start.assert_called_once_with()
+        pools[1].shutdown.assert_called_once_with()
+
     @patch('gofer.agent.plugin.BrokerModel')
     @patch('gofer.agent.plugin.Connector')
     @patch('gofer.agent.plugin.Whiteboard', Mock())
@@ -156,7 +210,8 @@ class TestPlugin(TestCase):
                 threads=4,
                 latency=0.5,
                 forward='a, b, c',
-                accept='d, e, f'),
+                accept='d, e, f',
+                **POOL),
             messaging=Mock(
                 uuid='x99',
                 url='amqp://localhost')
@@ -198,7 +253,7 @@ class TestPlugin(TestCase):
     @patch('gofer.agent.plugin.Whiteboard', Mock())
     @patch('gofer.agent.plugin.ThreadPool', Mock())
     def test_start(self, scheduler):
-        descriptor = Mock(main=Mock(threads=4))
+        descriptor = Mock(main=Mock(threads=4, **POOL))
         scheduler.return_value.isAlive.return_value = False
 
         # test
@@ -214,7 +269,7 @@ class TestPlugin(TestCase):
     @patch('gofer.agent.plugin.Whiteboard', Mock())
     @patch('gofer.agent.plugin.ThreadPool', Mock())
     def test_start_already_started(self, scheduler):
-        descriptor = Mock(main=Mock(threads=4))
+        descriptor = Mock(main=Mock(threads=4, **POOL))
         scheduler.return_value.isAlive.return_value = True
 
         # test
@@ -230,7 +285,7 @@ class TestPlugin(TestCase):
     @patch('gofer.agent.plugin.ThreadPool')
     @patch('gofer.agent.plugin.Whiteboard', Mock())
     def test_shutdown(self, pool, scheduler):
-        descriptor = Mock(main=Mock(threads=4))
+        descriptor = Mock(main=Mock(threads=4, **POOL))
         scheduler.return_value.isAlive.return_value = True
 
         # test
@@ -248,7 +303,7 @@ class TestPlugin(TestCase):
     @patch('gofer.agent.plugin.ThreadPool')
     @patch('gofer.agent.plugin.Whiteboard', Mock())
     def test_shutdown_not_running(self, pool, scheduler):
-        descriptor = Mock(main=Mock(threads=4))
+        descriptor = Mock(main=Mock(threads=4, **POOL))
         scheduler.return_value.isAlive.return_value = False
 
         # test
@@ -271,14 +326,21 @@ class TestPlugin(TestCase):
         descriptor = Mock(
             main=Mock(
                 enabled='1',
-                threads=4),
+                threads=4,
+                **POOL),
             messaging=Mock(
                 uuid='x99',
                 url='amqp://localhost',
                 cacert='ca',
                 clientkey='key',
                 clientcert='crt',
-                heartbeat='8')
+                heartbeat='8',
+                codec='binary',
+                compression='bz2',
+                compression_threshold='100',
+                chunk_size='1000',
+                reassembly_memory='10000',
+                reassembly_timeout='60')
         )
 
         # test
@@ -293,6 +355,12 @@ class TestPlugin(TestCase):
         self.assertEqual(connector.ssl.client_key, descriptor.messaging.clientkey)
         self.assertEqual(connector.ssl.client_certificate, descriptor.messaging.clientcert)
         self.assertEqual(connector.ssl.host_validation, descriptor.messaging.host_validation)
+        self.assertEqual(connector.codec, descriptor.messaging.codec)
+        self.assertEqual(connector.compression, 'bz2')
+        self.assertEqual(connector.compression_threshold, 100)
+        self.assertEqual(connector.chunk_size, 1000)
+        self.assertEqual(connector.reassembly_memory, 10000)
+        self.assertEqual(connector.reassembly_timeout, 60)
 
     @patch('gofer.agent.plugin.Node')
     @patch('gofer.agent.plugin.RequestConsumer')
@@ -302,9 +370,10 @@ class TestPlugin(TestCase):
     @patch('gofer.agent.plugin.Whiteboard', Mock())
     def test_attach(self, pool, model, consumer, node):
         queue = 'test'
-        descriptor = Mock(main=Mock(threads=4))
+        descriptor = Mock(main=Mock(threads=4, **POOL))
         pool.return_value.run.side_effect = lambda fn: fn()
         model.return_value.queue = queue
+        model.return_value.priority_queue = None
 
         # test
         plugin = Plugin(descriptor, '')
@@ -324,33 +393,75 @@ class TestPlugin(TestCase):
         self.assertEqual(consumer.authenticator, plugin.authenticator)
         self.assertEqual(plugin.consumer, consumer)
 
+    @patch('gofer.agent.plugin.Node')
+    @patch('gofer.agent.plugin.RequestConsumer')
+    @patch('gofer.agent.plugin.BrokerModel')
+    @patch('gofer.agent.plugin.ThreadPool')
+    @patch('gofer.agent.plugin.Scheduler', Mock())
+    @patch('gofer.agent.plugin.Whiteboard', Mock())
+    def test_attach_priority(self, pool, model, consumer, node):
+        descriptor = Mock(main=Mock(threads=4, **POOL))
+        pool.return_value.run.side_effect = lambda fn: fn()
+        model.return_value.queue = 'test'
+        model.return_value.priority_queue = 'test.priority'
+        consumers = [Mock(), Mock()]
+        consumer.side_effect = consumers
+
+        # test
+        plugin = Plugin(descriptor, '')
+        plugin.authenticator = Mock()
+        plugin.detach = Mock()
+        plugin.refresh = Mock()
+        plugin.attach()
+
+        # validation
+        self.assertEqual(
+            node.call_args_list,
+            [
+                (('test',), {}),
+                (('test.priority',), {}),
+            ])
+        self.assertEqual(
+            consumer.call_args_list,
+            [
+                ((node.return_value, plugin), {}),
+                ((node.return_value, plugin, model.PRIORITY), {}),
+            ])
+        for c in consumers:
+            c.start.assert_called_once_with()
+            self.assertEqual(c.authenticator, plugin.authenticator)
+        self.assertEqual(plugin.consumer, consumers[0])
+        self.assertEqual(plugin.priority_consumer, consumers[1])
+
     @patch('gofer.agent.plugin.BrokerModel')
     @patch('gofer.agent.plugin.ThreadPool', Mock())
     @patch('gofer.agent.plugin.Scheduler', Mock())
     @patch('gofer.agent.plugin.Whiteboard', Mock())
     def test_detach(self, model):
-        descriptor = Mock(main=Mock(threads=4))
+        descriptor = Mock(main=Mock(threads=4, **POOL))
         consumer = Mock()
 
         # test
         plugin = Plugin(descriptor, '')
         plugin.consumer = consumer
+        plugin.priority_consumer = consumer
         plugin.detach()
 
         # validation
-        consumer.shutdown.assert_called_once_with()
-        consumer.join.assert_called_once_with()
+        self.assertEqual(consumer.shutdown.call_count, 2)
+        self.assertEqual(consumer.join.call_count, 2)
         model.assert_called_with(plugin)
         model = model.return_value
         model.teardown.assert_called_once_with()
         self.assertEqual(plugin.consumer, None)
+        self.assertEqual(plugin.priority_consumer, None)
 
     @patch('gofer.agent.plugin.BrokerModel')
     @patch('gofer.agent.plugin.ThreadPool', Mock())
     @patch('gofer.agent.plugin.Scheduler', Mock())
     @patch('gofer.agent.plugin.Whiteboard', Mock())
     def test_detach_not_attached(self, model):
-        descriptor = Mock(main=Mock(threads=4))
+        descriptor = Mock(main=Mock(threads=4, **POOL))
 
         # test
         plugin = Plugin(descriptor, '')
@@ -364,7 +475,7 @@ class TestPlugin(TestCase):
     @patch('gofer.agent.plugin.Scheduler', Mock())
     @patch('gofer.agent.plugin.Whiteboard', Mock())
     def test_detach_no_teardown(self, model):
-        descriptor = Mock(main=Mock(threads=4))
+        descriptor = Mock(main=Mock(threads=4, **POOL))
         consumer = Mock()
 
         # test
@@ -382,7 +493,7 @@ class TestPlugin(TestCase):
     @patch('gofer.agent.plugin.Scheduler', Mock())
     @patch('gofer.agent.plugin.Whiteboard', Mock())
     def test_provides(self):
-        descriptor = Mock(main=Mock(threads=4))
+        descriptor = Mock(main=Mock(threads=4, **POOL))
 
         # test
         plugin = Plugin(descriptor, '')
@@ -13,7 +13,7 @@ from unittest import TestCase
 
 from mock import patch, Mock
 
-from gofer.agent.rmi import Scheduler, Transaction, Context
+from gofer.agent.rmi import Scheduler, Transaction, Context, Task, BatchDispatch
 from gofer.messaging import Document
 
 
@@ -33,13 +33,14 @@ class TestScheduler(TestCase):
         self.assertEqual(scheduler.builtin, builtin.return_value)
 
     @patch('gofer.common.Thread.aborted')
+    @patch('gofer.agent.rmi.Call')
     @patch('gofer.agent.rmi.Transaction')
     @patch('gofer.agent.rmi.Scheduler.select_plugin')
     @patch('gofer.agent.rmi.Task')
     @patch('gofer.agent.rmi.Pending')
     @patch('gofer.agent.rmi.Builtin')
     @patch('threading.Thread.setDaemon', Mock())
-    def test_run(self, builtin, pending, task, select_plugin, tx, aborted):
+    def test_run(self, builtin, pending, task, select_plugin, tx, call, aborted):
         builtin.return_value = Mock(name='builtin')
         plugin = Mock(name='plugin')
         task_list = [
@@ -50,10 +51,15 @@ class TestScheduler(TestCase):
             Mock(name='tx-1'),
             Mock(name='tx-2'),
         ]
+        call_list = [
+            Mock(name='call-1'),
+            Mock(name='call-2'),
+        ]
         request_list = [
             Document(sn=1),
-            Document(sn=2),
+            Document(sn=2, priority=5),
         ]
+        call.side_effect = call_list
         task.side_effect = task_list
         tx.side_effect = tx_list
         aborted.side_effect = [False, False, True]
@@ -66,8 +72,14 @@ class TestScheduler(TestCase):
         scheduler.run()
 
         # validation
-        builtin.return_value.pool.run.assert_called_once_with(task_list[0])
-        plugin.pool.run.assert_called_once_with(task_list[1])
+        builtin.return_value.pool.put.assert_called_once_with(call_list[0])
+        plugin.pool.put.assert_called_once_with(call_list[1])
+        self.assertEqual(
+            call.call_args_list,
+            [
+                ((task_list[0],), {'priority': None}),
+                ((task_list[1],), {'priority': 5}),
+            ])
         self.assertEqual(
             select_plugin.call_args_list,
             [
@@ -87,13 +99,14 @@ class TestScheduler(TestCase):
                 ((tx_list[1],), {}),
             ])
 
+    @patch('gofer.agent.rmi.Tracker')
     @patch('gofer.agent.rmi.Pending')
     @patch('gofer.agent.rmi.Scheduler.select_plugin')
     @patch('gofer.common.Thread.aborted')
     @patch('gofer.agent.rmi.Task', Mock())
     @patch('gofer.agent.rmi.Builtin', Mock())
     @patch('threading.Thread.setDaemon', Mock())
-    def test_run_raised(self, aborted, select_plugin, pending):
+    def test_run_raised(self, aborted, select_plugin, pending, tracker):
         plugin = Mock()
         sn = 1234
         pending.return_value.get.return_value = Document(sn=sn)
@@ -106,6 +119,7 @@ class TestScheduler(TestCase):
 
         # validation
         pending.return_value.commit.assert_called_once_with(sn)
+        tracker.return_value.remove.assert_called_once_with(sn)
 
     @patch('gofer.agent.rmi.Pending', Mock())
     @patch('threading.Thread.setDaemon', Mock())
@@ -129,6 +143,33 @@ class TestScheduler(TestCase):
                 (('A',), {})
             ])
 
+    @patch('gofer.agent.rmi.Pending', Mock())
+    @patch('threading.Thread.setDaemon', Mock())
+    @patch('gofer.agent.rmi.Builtin')
+    def test_select_plugin_batched(self, builtin):
+        plugin = Mock()
+        request = Document(request={'batch': [{'classname': 'A'}, {'classname': 'B'}]})
+        scheduler = Scheduler(plugin)
+        builtin.return_value.provides.return_value = False
+        selected = scheduler.select_plugin(request)
+        self.assertEqual(selected, plugin)
+        builtin.return_value.provides.assert_called_once_with('A')
+
+    @patch('gofer.agent.rmi.Pending', Mock())
+    @patch('threading.Thread.setDaemon', Mock())
+    @patch('gofer.agent.rmi.Builtin')
+    def test_select_plugin_batched_mixed(self, builtin):
+        plugin = Mock()
+        request = Document(request={'batch': [{'classname': 'A'}, {'classname': 'B'}]})
+        scheduler = Scheduler(plugin)
+        builtin.return_value.provides.side_effect = lambda n: n == 'A'
+        selected = scheduler.select_plugin(request)
+        self.assertEqual(selected, plugin)
+        builtin.return_value.provides.side_effect = None
+        builtin.return_value.provides.return_value = True
+        selected = scheduler.select_plugin(request)
+        self.assertEqual(selected, builtin.return_value)
+
     @patch('gofer.agent.rmi.Pending')
     @patch('threading.Thread.setDaemon', Mock())
     @patch('gofer.agent.rmi.Builtin', Mock())
@@ -151,6 +192,141 @@ class TestScheduler(TestCase):
         abort.assert_called_once_with()
 
 
+class TestTask(TestCase):
+
+    @patch('gofer.agent.rmi.Producer')
+    def test_producer(self, producer):
+        producer.return_value.codec = 'json'
+        plugin = Mock()
+        request = Document()
+        request.load(Document(sn=1).dump('binary'))
+        _producer = Task._producer(plugin, request)
+        producer.assert_called_once_with(plugin.url)
+        self.assertEqual(_producer.authenticator, plugin.authenticator)
+        self.assertEqual(_producer.origin, plugin.node)
+        self.assertEqual(_producer.codec, 'binary')
+
+    @patch('gofer.agent.rmi.Producer')
+    def test_producer_not_loaded(self, producer):
+        producer.return_value.codec = 'binary'
+        _producer = Task._producer(Mock(), Document(sn=1))
+        self.assertEqual(_producer.codec, 'binary')
+
+    def test_dispatch(self):
+        plugin = Mock()
+        request = Document(sn=1, request={'classname': 'A'})
+        task = Task(Mock(plugin=plugin))
+        result = task.dispatch(request)
+        plugin.dispatch.assert_called_once_with(request)
+        self.assertEqual(result, plugin.dispatch.return_value)
+
+    @patch('gofer.agent.rmi.BatchDispatch')
+    def test_dispatch_batched(self, dispatch):
+        plugin = Mock()
+        request = Document(sn=1, request={'batch': [{'classname': 'A'}]})
+        task = Task(Mock(plugin=plugin))
+        context = Context(1, Mock(), Mock(), Mock())
+        Context.set(context)
+        try:
+            result = task.dispatch(request)
+        finally:
+            Context.set()
+        batch_context = dispatch.call_args[0][2]
+        dispatch.assert_called_once_with(plugin, request, batch_context)
+        self.assertEqual(batch_context.sn, context.sn)
+        self.assertEqual(batch_context.progress, context.progress)
+        self.assertEqual(batch_context.cancelled, context.cancelled)
+        self.assertEqual(batch_context.stream, None)
+        self.assertEqual(result, dispatch.return_value.return_value)
+        self.assertFalse(plugin.dispatch.called)
+
+
+class TestBatchDispatch(TestCase):
+
+    def request(self, parallel=False):
+        calls = [
+            {'classname': 'A', 'method': 'a'},
+            {'classname': 'B', 'method': 'b'},
+        ]
+        return Document(sn=1, secret='s', request={'batch': calls, 'parallel': parallel})
+
+    def plugin(self):
+        plugin = Mock()
+        plugin.scheduler.select_plugin.return_value = plugin
+        return plugin
+
+    def test_init(self):
+        plugin = self.plugin()
+        context = Mock()
+        dispatch = BatchDispatch(plugin, self.request(), context)
+        self.assertEqual(dispatch.plugin, plugin)
+        self.assertEqual(dispatch.context, context)
+        self.assertFalse(dispatch.parallel)
+        self.assertEqual([c.request.classname for c in dispatch.calls], ['A', 'B'])
+        self.assertEqual([c.secret for c in dispatch.calls], ['s', 's'])
+        self.assertEqual(dispatch.results, [None, None])
+        self.assertEqual(dispatch.plugins, [plugin, plugin])
+
+    def test_init_codec(self):
+        request = Document()
+        request.load(self.request().dump('binary'))
+        dispatch = BatchDispatch(self.plugin(), request)
+        self.assertEqual([c.wire_codec for c in dispatch.calls], ['binary', 'binary'])
+
+    def test_call(self):
+        plugin = self.plugin()
+        plugin.dispatch.side_effect = [dict(retval=1), ValueError()]
+        context = Mock()
+        dispatch = BatchDispatch(plugin, self.request(), context)
+        contexts = []
+        plugin.dispatch.side_effect = \
+            lambda d: contexts.append(Context.current()) or dict(retval=d.request.classname)
+        result = dispatch()
+        self.assertEqual(result.retval, [dict(retval='A'), dict(retval='B')])
+        self.assertEqual(contexts, [context, context])
+        self.assertFalse(plugin.pool.put.called)
+
+    def test_call_raised(self):
+        plugin = self.plugin()
+        plugin.dispatch.side_effect = ValueError('x')
+        dispatch = BatchDispatch(plugin, self.request())
+        result = dispatch()
+        self.assertEqual(result.retval[0]['xclass'], 'ValueError')
+        self.assertEqual(len(result.retval), 2)
+
+    def test_call_parallel(self):
+        plugin = self.plugin()
+        plugin.dispatch.side_effect = lambda d: dict(retval=d.request.classname)
+        dispatch = BatchDispatch(plugin, self.request(True))
+        result = dispatch()
+        # queued call runs (claimed) by the calling thread
+        call = plugin.pool.put.call_args[0][0]
+        self.assertEqual(call.args, (1,))
+        call()
+        self.assertEqual(plugin.dispatch.call_count, 2)
+        self.assertEqual(result.retval, [dict(retval='A'), dict(retval='B')])
+
+    def test_call_routed(self):
+        plugin = self.plugin()
+        builtin = Mock()
+        plugin.scheduler.select_plugin.side_effect = \
+            lambda d: builtin if d.request.classname == 'A' else plugin
+        builtin.dispatch.return_value = dict(retval='builtin')
+        plugin.dispatch.return_value = dict(retval='plugin')
+        dispatch = BatchDispatch(plugin, self.request(True))
+        result = dispatch()
+        self.assertEqual(dispatch.plugins, [builtin, plugin])
+        call = plugin.pool.put.call_args[0][0]
+        self.assertEqual(call.args, (1,))
+        self.assertFalse(builtin.pool.put.called)
+        self.assertEqual(result.retval, [dict(retval='builtin'), dict(retval='plugin')])
+
+    def test_claim(self):
+        dispatch = BatchDispatch(self.plugin(), self.request())
+        self.assertTrue(dispatch.claim(0))
+        self.assertFalse(dispatch.claim(0))
+
+
 class TestTransaction(TestCase):
 
     def test_init(self):
@@ -170,7 +346,8 @@ class TestTransaction(TestCase):
         tx = Transaction(plugin, pending, request)
         self.assertEqual(tx.id, sn)
 
-    def test_commit(self):
+    @patch('gofer.agent.rmi.Tracker')
+    def test_commit(self, tracker):
         sn = 1234
         plugin = Mock()
         pending = Mock()
@@ -178,8 +355,10 @@ class TestTransaction(TestCase):
         tx = Transaction(plugin, pending, request)
         tx.commit()
         pending.commit.assert_called_once_with(sn)
+        tracker.return_value.remove.assert_called_once_with(sn)
 
-    def test_discard(self):
+    @patch('gofer.agent.rmi.Tracker')
+    def test_discard(self, tracker):
         sn = 1234
         plugin = Mock()
         pending = Mock()
@@ -187,6 +366,7 @@ class TestTransaction(TestCase):
         tx = Transaction(plugin, pending, request)
         tx.discard()
         pending.commit.assert_called_once_with(sn)
+        tracker.return_value.remove.assert_called_once_with(sn)
 
 
 class TestContext(TestCase):
@@ -14,10 +14,10 @@ from unittest import TestCase
 
 from mock import patch, Mock
 
-from gofer.messaging import Document
+from gofer.messaging import Document, LazyDocument
 from gofer.messaging.auth import ValidationFailed, Authenticator
-from gofer.messaging.auth import sign, validate
-from gofer.messaging.auth import peal, load, encode, decode
+from gofer.messaging.auth import sign, validate, identity
+from gofer.messaging.auth import peal, load, encode, decode, SIGNED
 
 
 class Test(TestCase):
@@ -50,10 +50,25 @@ class TestAuthenticator(TestCase):
         self.assertRaises(NotImplementedError, auth.validate, document, digest, signature)
 
 
+class TestIdentity(TestCase):
+
+    def test_none(self):
+        self.assertEqual(identity(None), None)
+
+    def test_id(self):
+        authenticator = Mock(id='A')
+        self.assertEqual(identity(authenticator), 'A')
+
+    def test_class(self):
+        self.assertEqual(
+            identity(Authenticator()),
+            'gofer.messaging.auth.Authenticator')
+        self.assertEqual(identity(Authenticator()), identity(Authenticator()))
+
+
 class TestSign(TestCase):
 
-    @patch('gofer.messaging.auth.encode', side_effect=encode)
-    def test_sign(self, encode):
+    def test_sign(self):
         message = '{"A":1}'
         signature = 'KLAJDF988R'
         authenticator = Mock()
@@ -66,8 +81,30 @@ class TestSign(TestCase):
         h = sha256()
         h.update(message)
         authenticator.sign.assert_called_once_with(h.hexdigest())
-        encode.assert_called_once_with(signature)
-        self.assertEqual(signed, '{"message": "{\\"A\\":1}", "signature": "S0xBSkRGOTg4Ug=="}')
+        self.assertEqual(signed, SIGNED + '\x00\x00\x00\x0a' + signature + message)
+
+    @patch('gofer.messaging.auth.timing')
+    def test_timing(self, _timing):
+        authenticator = Mock()
+        authenticator.sign.return_value = 'KLAJDF988R'
+        signed = sign(authenticator, '{"A":1}')
+        validate(authenticator, signed)
+        self.assertEqual(
+            _timing.call_args_list, [(('sign',), {}), (('validate',), {})])
+
+    def test_sign_codec(self):
+        message = Document(A=1).dump('binary')
+        authenticator = Mock()
+        authenticator.sign.return_value = 'KLAJDF988R'
+
+        # functional test
+        signed = sign(authenticator, message)
+
+        # validation
+        document, original, signature = peal(signed)
+        self.assertEqual(original, message)
+        self.assertEqual(document.A, 1)
+        self.assertEqual(signature, encode('KLAJDF988R'))
 
     def test_no_authenticator(self):
         message = 'howdy partner'
@@ -97,6 +134,21 @@ class TestValidation(TestCase):
         decode.assert_called_once_with(signature)
         self.assertEqual(1, validated['A'])
 
+    def test_validate_detached(self):
+        message = '{"A":1}'
+        authenticator = Mock()
+        authenticator.sign.return_value = 'KLAJDF988R'
+        signed = sign(authenticator, message)
+
+        # functional test
+        validated = validate(authenticator, signed)
+
+        # validation
+        h = sha256()
+        h.update(message)
+        authenticator.validate.assert_called_once_with(validated, h.hexdigest(), 'KLAJDF988R')
+        self.assertEqual(1, validated['A'])
+
     @patch('gofer.messaging.auth.Document')
     def test_validate_failed(self, _document):
         _document.return_value = Document()
@@ -140,6 +192,29 @@ class TestPeal(TestCase):
         self.assertEqual(original, '{"A":1}')
         self.assertEqual(signature, 'test-signature')
 
+    def test_detached(self):
+        message = SIGNED + '\x00\x00\x00\x02XY' + '{"A":1}'
+        document, original, signature = peal(message)
+        self.assertEqual(document['A'], 1)
+        self.assertEqual(original, '{"A":1}')
+        self.assertEqual(signature, encode('XY'))
+
+    def test_factory(self):
+        message = '{"A":1}'
+        document, original, signature = peal(message, LazyDocument)
+        self.assertTrue(isinstance(document, LazyDocument))
+        message = SIGNED + '\x00\x00\x00\x02XY' + '{"A":1}'
+        document, original, signature = peal(message, LazyDocument)
+        self.assertTrue(isinstance(document, LazyDocument))
+        self.assertEqual(document['A'], 1)
+
+    def test_detached_truncated(self):
+        message = SIGNED + '\x00\x00'
+        document, original, signature = peal(message)
+        self.assertEqual(document.__dict__, {})
+        self.assertEqual(original, '')
+        self.assertEqual(signature, '')
+
     def test_unsigned(self):
         message = '{"A":1}'
         document, original, signature = peal(message)
@@ -0,0 +1,199 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from unittest import TestCase
+
+from mock import patch, Mock
+
+from gofer.common import Options
+from gofer.messaging import codec
+from gofer.messaging.codec import MAGIC, Codec, Json, MsgPack, Binary
+from gofer.messaging.codec import Fragment, Splicer
+
+
+THING = {
+    'none': None,
+    'bool': [True, False],
+    'int': [0, -1, 18, Binary.MAX_INT, Binary.MIN_INT],
+    'long': [Binary.MAX_INT + 1, Binary.MIN_INT - 1],
+    'float': 1.5,
+    'str': 'hello',
+    'unicode': u'\xe9t\xe9',
+    'list': [1, [2, 3], {}],
+    'dict': {'a': {'b': 1}},
+}
+
+
+class TestEncoder(TestCase):
+
+    def test_options(self):
+        thing = Options(a=1)
+        self.assertEqual(codec.encoder(thing), thing.__dict__)
+
+    def test_fields(self):
+        class Thing(Options):
+            def __fields__(self):
+                return {'b': 2}
+        self.assertEqual(codec.encoder(Thing(a=1)), {'b': 2})
+
+    def test_fragment(self):
+        fragment = Fragment([1])
+        self.assertEqual(codec.encoder(fragment), fragment.thing)
+
+    def test_not_supported(self):
+        self.assertRaises(TypeError, codec.encoder, object())
+
+
+class TestFragment(TestCase):
+
+    def test_init(self):
+        fragment = Fragment({'a': 1})
+        self.assertEqual(fragment.thing, {'a': 1})
+        self.assertEqual(len(fragment.token), 32)
+        self.assertEqual(fragment.encoded, {'json': '{"a": 1}'})
+
+    def test_init_invalid(self):
+        self.assertRaises(TypeError, Fragment, object())
+
+    def test_encode(self):
+        fragment = Fragment({'a': 1})
+        binary = codec.find('binary')
+        encoded = fragment.encode(binary)
+        self.assertEqual(encoded, binary.dumps({'a': 1}))
+        self.assertEqual(fragment.encoded['binary'], encoded)
+
+    def test_nested(self):
+        fragment = Fragment([Fragment(1), Fragment('a')])
+        self.assertEqual(fragment.encoded['json'], '[1, "a"]')
+
+
+class TestSplicer(TestCase):
+
+    def test_call(self):
+        fragment = Fragment(1)
+        splicer = Splicer()
+        self.assertEqual(splicer(fragment), fragment.token)
+        self.assertEqual(splicer(Options(a=1)), {'a': 1})
+        self.assertEqual(splicer.fragments, [fragment])
+
+    def test_splice(self):
+        fragment = Fragment([1, 2])
+        fragment.encoded['json'] = '"spliced"'
+        self.assertEqual(codec.dumps({'a': fragment, 'b': 1}), '{"a": "spliced", "b": 1}')
+
+    def test_splice_binary(self):
+        fragment = Fragment([1, 2])
+        thing = {'a': fragment, 'b': u'x'}
+        encoded = codec.dumps(thing, 'binary')
+        self.assertEqual(codec.loads(encoded), {'a': [1, 2], 'b': u'x'})
+        self.assertTrue('binary' in fragment.encoded)
+
+
+class TestCodec(TestCase):
+
+    def test_abstract(self):
+        self.assertRaises(NotImplementedError, Codec().dumps, {})
+        self.assertRaises(NotImplementedError, Codec().loads, '')
+
+
+class TestJson(TestCase):
+
+    def test_dumps(self):
+        thing = Options(b=[Options(x=(1, 2))], a=None)
+        self.assertEqual(Json().dumps(thing), '{"a": null, "b": [{"x": [1, 2]}]}')
+
+    def test_dumps_last(self):
+        thing = Options(b=1, a=2, c=Options(y=1, x=2))
+        self.assertEqual(
+            Json().dumps(thing, last=('c', 'a')), '{"b": 1, "c": {"x": 2, "y": 1}, "a": 2}')
+        self.assertEqual(Json().dumps({'a': 1}, last=('a', 'b')), '{"a": 1}')
+        self.assertEqual(Json().dumps([1], last=('a',)), '[1]')
+
+    def test_loads(self):
+        self.assertEqual(Json().loads('{"a": [1]}'), {'a': [1]})
+
+
+class TestMsgPack(TestCase):
+
+    @patch('gofer.messaging.codec.msgpack')
+    def test_dumps(self, msgpack):
+        thing = Options(a=1)
+        encoded = MsgPack().dumps(thing)
+        msgpack.packb.assert_called_once_with(
+            thing, default=codec.encoder, use_bin_type=True)
+        self.assertEqual(encoded, msgpack.packb.return_value)
+
+    @patch('gofer.messaging.codec.msgpack')
+    def test_loads(self, msgpack):
+        thing = MsgPack().loads('123')
+        msgpack.unpackb.assert_called_once_with('123', raw=False)
+        self.assertEqual(thing, msgpack.unpackb.return_value)
+
+
+class TestBinary(TestCase):
+
+    def test_round_trip(self):
+        binary = Binary()
+        self.assertEqual(binary.loads(binary.dumps(THING)), THING)
+
+    def test_options(self):
+        binary = Binary()
+        thing = Options(a=Options(b=(1, 2)))
+        self.assertEqual(binary.loads(binary.dumps(thing)), {'a': {'b': [1, 2]}})
+
+    def test_not_supported(self):
+        self.assertRaises(TypeError, Binary().dumps, {'a': object()})
+
+    def test_truncated(self):
+        binary = Binary()
+        encoded = binary.dumps(THING)
+        for n in (0, 1, 5, len(encoded) - 1):
+            self.assertRaises(ValueError, binary.loads, encoded[:n])
+
+    def test_invalid(self):
+        binary = Binary()
+        self.assertRaises(ValueError, binary.loads, 'X')
+        self.assertRaises(ValueError, binary.loads, 'NN')
+        self.assertRaises(ValueError, binary.loads, 'l\x00\x00\x00\x01x')
+
+
+class TestRegistry(TestCase):
+
+    def test_register(self):
+        _codec = Mock(NAME='test')
+        codec.register(_codec)
+        try:
+            self.assertEqual(codec.find('test'), _codec)
+        finally:
+            del codec.codecs['test']
+
+    def test_find(self):
+        self.assertTrue(isinstance(codec.find(), Json))
+        self.assertTrue(isinstance(codec.find('binary'), Binary))
+        self.assertRaises(ValueError, codec.find, 'xx')
+
+    def test_dumps(self):
+        thing = {'a': 1}
+        self.assertEqual(codec.dumps(thing), '{"a": 1}')
+        encoded = codec.dumps(thing, 'binary')
+        self.assertEqual(encoded, MAGIC + 'binary' + MAGIC + Binary().dumps(thing))
+
+    def test_loads(self):
+        thing = {'a': 1}
+        self.assertEqual(codec.loads('{"a": 1}'), thing)
+        self.assertEqual(codec.loads(codec.dumps(thing, 'binary')), thing)
+        self.assertRaises(ValueError, codec.loads, MAGIC + 'binary')
+        self.assertRaises(ValueError, codec.loads, MAGIC + 'xx' + MAGIC)
+        self.assertRaises(TypeError, codec.loads, None)
+
+    def test_name(self):
+        self.assertEqual(codec.name('{}'), 'json')
+        self.assertEqual(codec.name(codec.dumps({}, 'binary')), 'binary')
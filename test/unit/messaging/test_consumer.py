@@ -15,7 +15,7 @@ from unittest import TestCase
 from mock import Mock, patch
 
 from gofer.messaging import Node
-from gofer.messaging.consumer import ConsumerThread, Consumer
+from gofer.messaging.consumer import ConsumerThread, Consumer, Authentication
 from gofer.messaging import DocumentError, ValidationFailed
 
 
@@ -31,6 +31,8 @@ class TestConsumerThread(TestCase):
         self.assertTrue(isinstance(consumer, Thread))
         self.assertTrue(consumer.daemon)
         self.assertEqual(consumer.reader,  None)
+        self.assertEqual(consumer.pool, None)
+        self.assertEqual(len(consumer.pending), 0)
 
     @patch('gofer.common.Thread.abort')
     def test_shutdown(self, abort):
@@ -79,11 +81,14 @@ class TestConsumerThread(TestCase):
         consumer = ConsumerThread(node, url)
         consumer.reader = Mock()
 
+        consumer.pending.append(Mock())
+
         # test
         consumer.close()
 
         # validation
         consumer.reader.close.assert_called_once_with()
+        self.assertEqual(len(consumer.pending), 0)
 
     def test_close_exception(self):
         url = 'test-url'
@@ -121,6 +126,7 @@ class TestConsumerThread(TestCase):
         consumer = ConsumerThread(node, url)
         consumer.reader = Mock()
         consumer.reader.next.return_value = (message, document)
+        consumer.prepare = Mock()
         consumer.dispatch = Mock()
 
         # test
@@ -128,6 +134,28 @@ class TestConsumerThread(TestCase):
 
         # validate
         consumer.reader.next.assert_called_once_with(consumer.wait)
+        consumer.prepare.assert_called_once_with(document)
+        consumer.dispatch.assert_called_once_with(document)
+        message.ack.assert_called_once_with()
+
+    def test_read_pool(self):
+        url = 'test-url'
+        node = Node('test-queue')
+        message = Mock()
+        document = Mock()
+        consumer = ConsumerThread(node, url)
+        consumer.pool = Mock()
+        consumer.authenticated = Mock(return_value=(message, document))
+        consumer.reader = Mock()
+        consumer.prepare = Mock()
+        consumer.dispatch = Mock()
+
+        # test
+        consumer.read()
+
+        # validate
+        self.assertFalse(consumer.reader.next.called)
+        self.assertFalse(consumer.prepare.called)
         consumer.dispatch.assert_called_once_with(document)
         message.ack.assert_called_once_with()
 
@@ -225,3 +253,107 @@ class TestConsumer(TestCase):
         # validation
         self.assertEqual(consumer.node, node)
         self.assertEqual(consumer.url, url)
+
+
+class TestAuthentication(TestCase):
+
+    def test_call(self):
+        consumer = Mock()
+        message = Mock()
+        authentication = Authentication(consumer, message, 'body')
+
+        # test
+        authentication()
+
+        # validate
+        document = consumer.reader.authenticate.return_value
+        consumer.reader.authenticate.assert_called_once_with('body')
+        consumer.prepare.assert_called_once_with(document)
+        self.assertTrue(authentication.finished.isSet())
+        self.assertEqual(authentication.result(), (message, document))
+        self.assertFalse(message.ack.called)
+
+    def test_call_failed(self):
+        consumer = Mock()
+        consumer.reader.authenticate.side_effect = ValidationFailed(details='test')
+        message = Mock()
+        authentication = Authentication(consumer, message, 'body')
+
+        # test
+        authentication()
+
+        # validate
+        self.assertFalse(consumer.prepare.called)
+        self.assertTrue(authentication.finished.isSet())
+        self.assertRaises(ValidationFailed, authentication.result)
+        message.ack.assert_called_once_with()
+
+    def test_call_exception(self):
+        consumer = Mock()
+        consumer.prepare.side_effect = ValueError
+        message = Mock()
+        authentication = Authentication(consumer, message, 'body')
+
+        # test
+        authentication()
+
+        # validate
+        self.assertRaises(ValueError, authentication.result)
+        self.assertFalse(message.ack.called)
+
+
+class TestPipeline(TestCase):
+
+    def consumer(self, received):
+        consumer = ConsumerThread(Node('test-queue'), 'test-url', wait=0.01)
+        consumer.POLL = 0.01
+        consumer.pool = Mock(capacity=1)
+        consumer.reader = Mock()
+        consumer.reader.receive.side_effect = received
+        consumer.reader.authenticate.side_effect = lambda body: Mock(body=body)
+        return consumer
+
+    def test_ordered(self):
+        messages = [Mock(), Mock()]
+        received = [(messages[0], '1'), (messages[1], '2')]
+        consumer = self.consumer(received)
+        consumer.pool.run.side_effect = lambda call: None
+
+        # test
+        self.assertEqual(consumer.authenticated(), (None, None))
+        pending = list(consumer.pending)
+        pending[1]()
+        self.assertEqual(consumer.authenticated(), (None, None))
+        pending[0]()
+        message, document = consumer.authenticated()
+
+        # validate
+        self.assertEqual(message, messages[0])
+        self.assertEqual(document.body, '1')
+        message, document = consumer.authenticated()
+        self.assertEqual(message, messages[1])
+        self.assertEqual(document.body, '2')
+        self.assertEqual(len(consumer.pending), 0)
+        calls = consumer.reader.receive.call_args_list
+        self.assertEqual(calls, [((consumer.wait,), {}), ((consumer.POLL,), {})])
+
+    def test_nothing(self):
+        consumer = self.consumer([(None, None)])
+        self.assertEqual(consumer.authenticated(), (None, None))
+        self.assertFalse(consumer.pool.run.called)
+
+    def test_rejected(self):
+        message = Mock()
+        consumer = self.consumer([(message, '1')])
+        consumer.reader.authenticate.side_effect = ValidationFailed(details='test')
+        consumer.pool.run.side_effect = lambda call: call()
+        consumer.rejected = Mock()
+        consumer.dispatch = Mock()
+
+        # test
+        consumer.read()
+
+        # validate
+        message.ack.assert_called_once_with()
+        self.assertTrue(consumer.rejected.called)
+        self.assertFalse(consumer.dispatch.called)
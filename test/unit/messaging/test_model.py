@@ -11,8 +11,13 @@
 
 from unittest import TestCase
 
-from gofer.messaging.model import VERSION, Document, validate
-from gofer.messaging.model import ModelError, DocumentError, VersionError
+from json.decoder import JSONDecoder
+
+from mock import patch
+
+from gofer.messaging.model import VERSION, Document, LazyDocument, validate
+from gofer.messaging.model import raw_scanner
+from gofer.messaging.model import ModelError, DocumentError, VersionError, DecodeError
 
 
 class TestExceptions(TestCase):
@@ -73,6 +78,29 @@ class TestDocument(TestCase):
         document = Document()
         document.load(s)
         self.assertEqual(document.__dict__, {'A': 1})
+        self.assertEqual(document.wire_codec, 'json')
+
+    def test_load_codec(self):
+        s = Document(A=1).dump('binary')
+        document = Document()
+        document.load(s)
+        self.assertEqual(document.__dict__, {'A': 1})
+        self.assertEqual(document.wire_codec, 'binary')
+        self.assertEqual(Document(A=1).wire_codec, None)
+
+    def test_codec_field(self):
+        document = Document()
+        document.load(Document(codec='zlib').dump('binary'))
+        self.assertEqual(document.codec, 'zlib')
+        self.assertEqual(document.wire_codec, 'binary')
+
+    def test_copy_codec(self):
+        document = Document()
+        document.load(Document(A=1).dump('binary'))
+        copied = Document(document)
+        self.assertEqual(copied.__dict__, {'A': 1})
+        self.assertEqual(copied.wire_codec, 'binary')
+        self.assertEqual(Document({'A': 1}).wire_codec, None)
 
     def test_dump(self):
         document = Document(
@@ -90,3 +118,102 @@ class TestDocument(TestCase):
             s,
             '{"A": 1, "B": 2, "C": {"a": 1, "b": 2}, "D": {"x": 10, "y": 20}, '
             '"E": [1, {}, {}], "F": 10, "G": "howdy", "H": true}')
+
+    def test_dump_payload_last(self):
+        document = Document(sn='1', result=Document(retval=1), version=VERSION, z=2)
+        self.assertEqual(
+            document.dump(),
+            '{"sn": "1", "version": "%s", "z": 2, "result": {"retval": 1}}' % VERSION)
+
+    def test_dump_codec(self):
+        document = Document(A=1, B=Document(a=[1, 2]))
+        s = document.dump('binary')
+        self.assertTrue(s.startswith('\x00binary\x00'))
+        self.assertEqual(Document().load(s).__dict__, {'A': 1, 'B': {'a': [1, 2]}})
+
+
+class TestScanner(TestCase):
+
+    def test_raw_scanner(self):
+        scan = raw_scanner(JSONDecoder())
+        s = '{"a": [1, 2], "b": 3}'
+        self.assertEqual(scan(s, 6), ([1, 2], 12))
+        self.assertRaises(ValueError, scan, s, 5)
+
+    def test_lazy_document(self):
+        s = Document(sn='1', version=VERSION, data={'a': 1}, request=Document(method='bark')).dump()
+        with patch.object(LazyDocument, 'scan', staticmethod(raw_scanner(JSONDecoder()))):
+            document = LazyDocument()
+            document.load(s)
+            self.assertEqual(document.__dict__, {'sn': '1', 'version': VERSION, 'data': {'a': 1}})
+            self.assertEqual(document.request, {'method': 'bark'})
+
+
+class TestLazyDocument(TestCase):
+
+    def test_load(self):
+        s = Document(sn='1', version=VERSION, request=Document(method='bark')).dump()
+        document = LazyDocument()
+        document.load(s)
+        self.assertEqual(document.__dict__, {'sn': '1', 'version': VERSION})
+        self.assertEqual(document._pending, (s, s.index('"request"')))
+        self.assertEqual(document.wire_codec, 'json')
+
+    def test_load_codec(self):
+        s = Document(sn='1', version=VERSION, request=Document(method='bark')).dump('binary')
+        document = LazyDocument()
+        document.load(s)
+        self.assertEqual(document.request, {'method': 'bark'})
+        self.assertEqual(document.wire_codec, 'binary')
+
+    def test_load_not_lazy(self):
+        # payload not last
+        s = '{"request": {"method": "bark"}, "sn": "1", "version": "%s"}' % VERSION
+        document = LazyDocument()
+        document.load(s)
+        self.assertEqual(document.request, {'method': 'bark'})
+        self.assertEqual(document._pending, None)
+        # empty
+        document = LazyDocument()
+        document.load(' { } ')
+        self.assertEqual(document.__dict__, {})
+        self.assertEqual(document._pending, None)
+
+    def test_load_codec(self):
+        s = Document(sn='1', version=VERSION, result=Document(retval=1)).dump('binary')
+        document = LazyDocument()
+        document.load(s)
+        self.assertEqual(document.result, {'retval': 1})
+        self.assertEqual(document._pending, None)
+
+    def test_load_invalid(self):
+        document = LazyDocument()
+        self.assertRaises(TypeError, document.load, '[1]')
+        self.assertRaises(ValueError, document.load, '{"sn": 1')
+
+    def test_materialize(self):
+        s = Document(sn='1', version=VERSION, result=Document(retval=[1, 2])).dump()
+        document = LazyDocument()
+        document.load(s)
+        self.assertEqual(document.materialize(), document)
+        self.assertEqual(
+            document.__dict__,
+            {'sn': '1', 'version': VERSION, 'result': {'retval': [1, 2]}})
+        self.assertEqual(document._pending, None)
+
+    def test_materialize_failed(self):
+        s = '{"sn": "1", "version": "%s", "result": {"retval": [1, 2}' % VERSION
+        document = LazyDocument()
+        document.load(s)
+        self.assertEqual(document.sn, '1')
+        self.assertRaises(DecodeError, document.materialize)
+
+    def test_access(self):
+        s = Document(sn='1', version=VERSION, result=Document(retval=1)).dump()
+        document = LazyDocument()
+        document.load(s)
+        self.assertEqual(document.result, {'retval': 1})
+        document = LazyDocument()
+        document.load(s)
+        self.assertEqual(document['result'], {'retval': 1})
+        self.assertEqual(document.request, None)
@@ -0,0 +1,218 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+import os
+import zlib
+
+from base64 import b64encode
+from unittest import TestCase
+
+from mock import patch, Mock
+
+from gofer.messaging import Document
+from gofer.messaging.transport import PREFIX, NONE
+from gofer.messaging.transport import Codec, codecs, register
+from gofer.messaging.transport import Transport, Partial, Assembler, TransportError
+
+
+def body(size):
+    return Document(sn='123', data=b64encode(os.urandom(size))[:size]).dump()
+
+
+class TestCodecs(TestCase):
+
+    def test_codecs(self):
+        self.assertEqual(codecs[NONE].compress('abc'), 'abc')
+        self.assertEqual(codecs['zlib'].decompress(codecs['zlib'].compress('abc')), 'abc')
+        self.assertEqual(codecs['bz2'].decompress(codecs['bz2'].compress('abc')), 'abc')
+
+    def test_register(self):
+        codec = Codec('test', str.upper, str.lower)
+        register(codec)
+        try:
+            self.assertEqual(codecs['test'], codec)
+        finally:
+            del codecs['test']
+
+
+class TestTransport(TestCase):
+
+    def test_init(self):
+        transport = Transport()
+        self.assertEqual(transport.threshold, Transport.THRESHOLD)
+        self.assertEqual(transport.codec, Transport.CODEC)
+        self.assertEqual(transport.chunk, Transport.CHUNK)
+
+    def test_disabled(self):
+        transport = Transport(threshold=0)
+        _body = body(0x20000)
+        self.assertEqual(transport.encode(_body), [_body])
+
+    def test_below_threshold(self):
+        transport = Transport(threshold=100, codec='zlib')
+        _body = body(10)
+        self.assertEqual(transport.encode(_body), [_body])
+
+    def test_compressed(self):
+        transport = Transport(threshold=100, codec='zlib')
+        _body = 'A' * 1000
+        encoded = transport.encode(_body)
+        self.assertEqual(len(encoded), 1)
+        self.assertTrue(encoded[0].startswith(PREFIX))
+        document = Document()
+        document.load(encoded[0])
+        self.assertEqual(document.transport['codec'], 'zlib')
+        self.assertFalse('chunk' in document.transport)
+        self.assertEqual(zlib.decompress(document.transport['payload'].decode('base64')), _body)
+
+    def test_chunked(self):
+        transport = Transport(threshold=100, codec=NONE, chunk=100)
+        _body = body(1000)
+        encoded = transport.encode(_body)
+        self.assertTrue(len(encoded) > 1)
+        chunks = []
+        for n, encoded in enumerate(encoded):
+            document = Document()
+            document.load(encoded)
+            _id, index, total = document.transport['chunk']
+            self.assertEqual(index, n)
+            chunks.append(document.transport['payload'])
+        self.assertEqual(''.join(chunks).decode('base64'), _body)
+
+
+class TestPartial(TestCase):
+
+    def test_add(self):
+        partial = Partial('zlib', 2)
+        partial.add(1, 'BB')
+        partial.add(1, 'BB')
+        self.assertFalse(partial.complete())
+        partial.add(0, 'A')
+        self.assertTrue(partial.complete())
+        self.assertEqual(partial.size, 3)
+        self.assertEqual(partial.payload(), 'ABB')
+
+    def test_add_message(self):
+        message = Mock()
+        partial = Partial('zlib', 2)
+        self.assertTrue(partial.add(0, 'A', message))
+        self.assertFalse(partial.add(0, 'A', Mock()))
+        self.assertEqual(partial.messages, [message])
+
+
+class TestAssembler(TestCase):
+
+    def test_not_encoded(self):
+        assembler = Assembler()
+        self.assertEqual(assembler.decode('{"sn": 1}'), '{"sn": 1}')
+        self.assertEqual(assembler.decode(None), None)
+
+    def test_compressed(self):
+        _body = body(0x20000)
+        encoded = Transport(codec='zlib').encode(_body)
+        self.assertEqual(len(encoded), 1)
+        self.assertEqual(Assembler().decode(encoded[0]), _body)
+
+    def test_chunked(self):
+        _body = body(5000)
+        encoded = Transport(threshold=100, codec='zlib', chunk=500).encode(_body)
+        encoded.reverse()
+        assembler = Assembler()
+        for chunk in encoded[:-1]:
+            self.assertEqual(assembler.decode(chunk), None)
+        self.assertEqual(assembler.decode(encoded[-1]), _body)
+        self.assertEqual(len(assembler.partial), 0)
+
+    def test_chunked_acked(self):
+        _body = body(300)
+        encoded = Transport(threshold=0, codec=NONE, chunk=100).encode(_body)
+        messages = [Mock(body=b) for b in encoded]
+        assembler = Assembler()
+        for message in messages[:-1]:
+            self.assertEqual(assembler.decode(message.body, message), None)
+        # duplicate
+        duplicate = Mock(body=encoded[0])
+        assembler.decode(duplicate.body, duplicate)
+        duplicate.ack.assert_called_once_with()
+        for message in messages:
+            self.assertFalse(message.ack.called)
+        decoded, held = assembler.reassemble(messages[-1].body, messages[-1])
+        self.assertEqual(decoded, _body)
+        self.assertEqual(held, messages[:-1])
+        for message in messages:
+            self.assertFalse(message.ack.called)
+
+    def test_reassemble_not_encoded(self):
+        assembler = Assembler()
+        self.assertEqual(assembler.reassemble('{"sn": 1}', Mock()), ('{"sn": 1}', []))
+
+    def test_reassemble_invalid_acked(self):
+        encoded = Transport(threshold=0, codec=NONE, chunk=100).encode(body(300))
+        messages = []
+        for chunk in encoded:
+            document = Document()
+            document.load(chunk)
+            # not compressed
+            document.transport['codec'] = 'zlib'
+            messages.append(Mock(body=document.dump()))
+        assembler = Assembler()
+        for message in messages[:-1]:
+            assembler.reassemble(message.body, message)
+        self.assertRaises(TransportError, assembler.reassemble, messages[-1].body, messages[-1])
+        for message in messages[:-1]:
+            message.ack.assert_called_once_with()
+        self.assertFalse(messages[-1].ack.called)
+
+    def test_discarded_acked(self):
+        encoded = Transport(threshold=0, codec=NONE, chunk=100).encode(body(300))
+        messages = [Mock(body=b) for b in encoded]
+        assembler = Assembler()
+        assembler.decode(messages[0].body, messages[0])
+        assembler.discard(list(assembler.partial)[0])
+        messages[0].ack.assert_called_once_with()
+        assembler.decode(messages[1].body, messages[1])
+        messages[1].ack.assert_called_once_with()
+
+    def test_invalid(self):
+        assembler = Assembler()
+        self.assertRaises(TransportError, assembler.decode, PREFIX + '}')
+        encoded = Transport(threshold=0, codec=NONE).encode('{}')[0]
+        self.assertRaises(TransportError, assembler.decode, encoded.replace(NONE, 'xx'))
+
+    @patch('gofer.messaging.transport.time')
+    def test_purge(self, time):
+        time.return_value = 0
+        assembler = Assembler(timeout=10)
+        encoded = Transport(threshold=0, codec=NONE, chunk=10).encode(body(100))
+        assembler.decode(encoded[0])
+        self.assertEqual(len(assembler.partial), 1)
+        time.return_value = 11
+        assembler.purge()
+        self.assertEqual(len(assembler.partial), 0)
+        self.assertEqual(assembler.decode(encoded[1]), None)
+        self.assertEqual(len(assembler.partial), 0)
+
+    def test_evict(self):
+        transport = Transport(threshold=0, codec=NONE, chunk=100)
+        first = transport.encode(body(1000))
+        second = transport.encode(body(1000))
+        assembler = Assembler(memory=300)
+        assembler.decode(first[0])
+        assembler.decode(first[1])
+        assembler.decode(second[0])
+        assembler.decode(second[1])
+        self.assertEqual(len(assembler.partial), 1)
+        self.assertTrue(assembler.size <= 300)
+        # first discarded
+        for chunk in first[2:]:
+            self.assertEqual(assembler.decode(chunk), None)
+        self.assertEqual(len(assembler.partial), 1)
+        self.assertEqual(len(assembler.discarded), 1)
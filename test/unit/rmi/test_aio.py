@@ -0,0 +1,214 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from unittest import TestCase
+
+from mock import patch, Mock
+
+from gofer.common import Options
+from gofer.messaging import Document
+from gofer.rmi.aio import awaitable, chain, bridge, AsyncPolicy
+from gofer.rmi.policy import Future, Trigger
+
+
+class LoopFuture(object):
+
+    def __init__(self):
+        self._done = False
+        self._result = None
+        self._exception = None
+        self._callbacks = []
+
+    def done(self):
+        return self._done
+
+    def set_result(self, result):
+        self._result = result
+        self._resolved()
+
+    def set_exception(self, exception):
+        self._exception = exception
+        self._resolved()
+
+    def result(self):
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def exception(self):
+        return self._exception
+
+    def add_done_callback(self, fn):
+        self._callbacks.append(fn)
+        if self._done:
+            fn(self)
+
+    def _resolved(self):
+        self._done = True
+        for fn in self._callbacks:
+            fn(self)
+
+
+class Loop(object):
+
+    def __init__(self):
+        self.tasks = []
+
+    def create_future(self):
+        return LoopFuture()
+
+    def call_soon_threadsafe(self, fn, *args):
+        fn(*args)
+
+    def run_in_executor(self, executor, fn, *args):
+        future = LoopFuture()
+        try:
+            future.set_result(fn(*args))
+        except Exception, e:
+            future.set_exception(e)
+        return future
+
+    def create_task(self, coroutine):
+        self.tasks.append(coroutine)
+
+
+class TestFunctions(TestCase):
+
+    def test_awaitable(self):
+        def fn():
+            yield 1
+        self.assertTrue(awaitable(fn()))
+        self.assertTrue(awaitable(Mock(__await__=Mock())))
+        self.assertFalse(awaitable(None))
+        self.assertFalse(awaitable(18))
+
+    def test_chain(self):
+        future = Mock()
+        future.exception.return_value = None
+        waiter = LoopFuture()
+        chain(future, waiter)
+        future.exception.assert_called_once_with(0)
+        self.assertEqual(waiter.result(), future.result.return_value)
+
+    def test_chain_raised(self):
+        future = Mock()
+        future.exception.return_value = ValueError()
+        waiter = LoopFuture()
+        chain(future, waiter)
+        self.assertEqual(waiter.exception(), future.exception.return_value)
+
+    def test_chain_cancelled(self):
+        future = Mock()
+        waiter = Mock()
+        waiter.done.return_value = True
+        chain(future, waiter)
+        self.assertFalse(waiter.set_result.called)
+        self.assertFalse(waiter.set_exception.called)
+
+    def test_bridge(self):
+        loop = Loop()
+        future = Future('123', Mock(wait=10), Mock())
+        waiter = bridge(future, loop)
+        self.assertFalse(waiter.done())
+        future._resolve(retval=18)
+        self.assertEqual(waiter.result(), 18)
+
+    def test_bridge_waiter(self):
+        loop = Loop()
+        future = Future('123', Mock(wait=10), Mock())
+        waiter = loop.create_future()
+        self.assertTrue(bridge(future, loop, waiter) is waiter)
+        future._resolve(retval=18)
+        self.assertEqual(waiter.result(), 18)
+
+
+class TestAsyncPolicy(TestCase):
+
+    def test_properties(self):
+        loop = Loop()
+        policy = AsyncPolicy('', 'a1', Options(loop=loop))
+        self.assertEqual(policy.loop, loop)
+        self.assertTrue(policy.futures)
+
+    def test_on_progress(self):
+        loop = Loop()
+        loop.call_soon_threadsafe = Mock()
+        reporter = Mock()
+        policy = AsyncPolicy('', 'a1', Options(loop=loop, progress=reporter))
+        document = Document(sn='1', data=2, total=3, completed=1, details='hello')
+        policy.on_progress(document)
+        report = dict(sn='1', data=2, total=3, completed=1, details='hello')
+        loop.call_soon_threadsafe.assert_called_once_with(policy.report, reporter, report)
+
+    def test_on_progress_not_callable(self):
+        loop = Mock()
+        policy = AsyncPolicy('', 'a1', Options(loop=loop))
+        policy.on_progress(Document(sn='1'))
+        self.assertFalse(loop.call_soon_threadsafe.called)
+
+    def test_report(self):
+        loop = Loop()
+        coroutine = Mock(__await__=Mock())
+        reporter = Mock(return_value=coroutine)
+        policy = AsyncPolicy('', 'a1', Options(loop=loop))
+        policy.report(reporter, {})
+        reporter.assert_called_once_with({})
+        self.assertEqual(loop.tasks, [coroutine])
+
+    def test_report_failed(self):
+        loop = Loop()
+        reporter = Mock(side_effect=ValueError)
+        policy = AsyncPolicy('', 'a1', Options(loop=loop))
+        policy.report(reporter, {})
+        self.assertEqual(loop.tasks, [])
+
+    @patch('gofer.rmi.aio.Trigger')
+    def test_call(self, trigger):
+        loop = Loop()
+        future = Future('123', Mock(wait=10), Mock())
+        trigger.return_value.return_value = future
+        policy = AsyncPolicy('', 'a1', Options(loop=loop))
+        waiter = policy(Mock())
+        self.assertFalse(waiter.done())
+        future._resolve(retval=18)
+        self.assertEqual(waiter.result(), 18)
+
+    @patch('gofer.rmi.aio.bridge')
+    @patch('gofer.rmi.aio.Trigger')
+    def test_call_bridged(self, trigger, bridge):
+        loop = Loop()
+        future = Future('123', Mock(wait=10), Mock())
+        trigger.return_value.return_value = future
+        policy = AsyncPolicy('', 'a1', Options(loop=loop))
+        waiter = policy(Mock())
+        bridge.assert_called_once_with(future, loop, waiter)
+
+    @patch('gofer.rmi.aio.Trigger')
+    def test_call_asynchronous(self, trigger):
+        loop = Loop()
+        trigger.return_value.return_value = '123'
+        policy = AsyncPolicy('', 'a1', Options(loop=loop))
+        waiter = policy(Mock())
+        self.assertEqual(waiter.result(), '123')
+
+    @patch('gofer.rmi.aio.Trigger')
+    def test_call_send_failed(self, trigger):
+        loop = Loop()
+        trigger.return_value.side_effect = ValueError
+        policy = AsyncPolicy('', 'a1', Options(loop=loop))
+        waiter = policy(Mock())
+        self.assertTrue(isinstance(waiter.exception(), ValueError))
+
+    @patch('gofer.rmi.aio.Trigger')
+    def test_call_manual(self, trigger):
+        trigger.MANUAL = Trigger.MANUAL
+        policy = AsyncPolicy('', 'a1', Options(loop=Loop(), trigger=Trigger.MANUAL))
+        self.assertEqual(policy(Mock()), trigger.return_value)
@@ -11,6 +11,132 @@
 
 from unittest import TestCase
 
+from mock import patch, Mock
 
-class Test(TestCase):
-    pass
\ No newline at end of file
+from gofer.messaging import Document, Node
+from gofer.rmi.async import Blacklist, ReplyConsumer, Partial, Listener
+from gofer.rmi.dispatcher import Return
+
+
+class TestBlacklist(TestCase):
+
+    def test_init(self):
+        blacklist = Blacklist(10, 20)
+        self.assertEqual(blacklist.maxsize, 10)
+        self.assertEqual(blacklist.ttl, 20)
+        self.assertEqual(len(blacklist), 0)
+
+    def test_add(self):
+        blacklist = Blacklist()
+        blacklist.add('1')
+        blacklist.add('2')
+        self.assertTrue('1' in blacklist)
+        self.assertTrue('2' in blacklist)
+        self.assertFalse('3' in blacklist)
+        self.assertEqual(len(blacklist), 2)
+
+    def test_maxsize(self):
+        blacklist = Blacklist(maxsize=2)
+        blacklist.add('1')
+        blacklist.add('2')
+        blacklist.add('1')
+        blacklist.add('3')
+        self.assertEqual(blacklist.entries.keys(), ['1', '3'])
+
+    @patch('gofer.common.time')
+    def test_expired(self, time):
+        time.return_value = 100
+        blacklist = Blacklist(ttl=10)
+        blacklist.add('1')
+        time.return_value = 105
+        blacklist.add('2')
+        self.assertTrue('1' in blacklist)
+        time.return_value = 110
+        self.assertFalse('1' in blacklist)
+        self.assertTrue('2' in blacklist)
+
+    def test_clear(self):
+        blacklist = Blacklist()
+        blacklist.add('1')
+        blacklist.clear()
+        self.assertEqual(len(blacklist), 0)
+
+
+class TestReplyConsumer(TestCase):
+
+    def test_init(self):
+        consumer = ReplyConsumer(Node('test'))
+        self.assertTrue(isinstance(consumer.blacklist, Blacklist))
+        self.assertEqual(consumer.pool, None)
+
+    @patch('gofer.rmi.async.KeyedPool')
+    def test_init_threads(self, pool):
+        consumer = ReplyConsumer(Node('test'), threads=3)
+        pool.assert_called_once_with(3)
+        self.assertEqual(consumer.pool, pool.return_value)
+
+    @patch('gofer.rmi.async.Consumer.start')
+    @patch('gofer.rmi.async.KeyedPool')
+    def test_start(self, pool, start):
+        listener = Mock()
+        consumer = ReplyConsumer(Node('test'), threads=3)
+        consumer.blacklist.add('1')
+        consumer.start(listener)
+        self.assertEqual(consumer.listener, listener)
+        self.assertEqual(len(consumer.blacklist), 0)
+        pool.return_value.start.assert_called_once_with()
+        start.assert_called_once_with(consumer)
+
+    @patch('gofer.rmi.async.Consumer.shutdown')
+    @patch('gofer.rmi.async.KeyedPool')
+    def test_shutdown(self, pool, shutdown):
+        consumer = ReplyConsumer(Node('test'), threads=3)
+        consumer.shutdown()
+        shutdown.assert_called_once_with(consumer)
+        pool.return_value.shutdown.assert_called_once_with()
+
+    def test_notify(self):
+        reply = Mock()
+        consumer = ReplyConsumer(Node('test'))
+        consumer.listener = Mock()
+        consumer.notify(reply)
+        reply.notify.assert_called_once_with(consumer.listener)
+
+    @patch('gofer.rmi.async.KeyedPool')
+    def test_notify_pool(self, pool):
+        reply = Mock(sn='123')
+        consumer = ReplyConsumer(Node('test'), threads=3)
+        consumer.listener = Mock()
+        consumer.notify(reply)
+        pool.return_value.run.assert_called_once_with(
+            reply.sn, reply.notify, consumer.listener)
+
+    def test_dispatch(self):
+        listener = Mock()
+        consumer = ReplyConsumer(Node('test'))
+        consumer.listener = listener
+        document = Document(sn='1', routing=['a', 'b'], result=Return.succeed(18))
+        consumer.dispatch(document)
+        consumer.dispatch(document)
+        self.assertEqual(listener.call_count, 1)
+        self.assertEqual(listener.call_args[0][0].retval, 18)
+        self.assertTrue('1' in consumer.blacklist)
+
+    def test_dispatch_partial(self):
+        listener = Mock()
+        consumer = ReplyConsumer(Node('test'))
+        consumer.listener = listener
+        document = Document(sn='1', routing=['a', 'b'], status='partial', seq=0, items=[1, 2])
+        consumer.dispatch(document)
+        reply = listener.call_args[0][0]
+        self.assertTrue(isinstance(reply, Partial))
+        self.assertEqual(reply.seq, 0)
+        self.assertEqual(reply.items, [1, 2])
+        self.assertFalse('1' in consumer.blacklist)
+
+    def test_partial_listener(self):
+        listener = Mock()
+        reply = Partial(Document(sn='1', routing=['a', 'b'], seq=0, items=[1]))
+        reply.notify(Listener())
+        reply.notify(listener)
+        listener.assert_called_once_with(reply)
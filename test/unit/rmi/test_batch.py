@@ -0,0 +1,167 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from unittest import TestCase
+
+from mock import Mock
+
+from gofer.common import Options
+from gofer.rmi.batch import Batch, Group, Result, batched, unbatched
+from gofer.rmi.dispatcher import Request
+from gofer.rmi.policy import Future
+from gofer.rmi.stub import Builder
+
+
+class TestFunctions(TestCase):
+
+    def test_batched(self):
+        self.assertTrue(batched({'batch': []}))
+        self.assertFalse(batched({'classname': 'A'}))
+        self.assertFalse(batched(None))
+
+    def test_unbatched(self):
+        calls = unbatched({'batch': [{'classname': 'A'}]})
+        self.assertTrue(isinstance(calls[0], Request))
+        self.assertEqual(calls[0].classname, 'A')
+
+
+class TestGroup(TestCase):
+
+    def test_add(self):
+        group = Group(Mock())
+        result = group.add(1)
+        self.assertTrue(isinstance(result, Result))
+        self.assertEqual(result.index, 0)
+        self.assertEqual(group.add(2).index, 1)
+        self.assertEqual(group.requests, [1, 2])
+
+    def test_accepts(self):
+        group = Group(Mock(options=Options(secret='xyz', exchange='amq.direct')))
+        self.assertTrue(group.accepts(Mock(options=Options(secret='xyz', exchange='amq.direct'))))
+        self.assertFalse(group.accepts(Mock(options=Options(secret='xyz'))))
+        self.assertFalse(group.accepts(Mock(options=Options(secret='abc', exchange='amq.direct'))))
+
+    def test_accepts_sending(self):
+        progress = Mock()
+        group = Group(Mock(options=Options(ttl=10, priority=1, progress=progress)))
+        self.assertTrue(group.accepts(Mock(options=Options(ttl=10, priority=1, progress=progress))))
+        self.assertFalse(group.accepts(Mock(options=Options(ttl=20, priority=1, progress=progress))))
+        self.assertFalse(group.accepts(Mock(options=Options(ttl=10, priority=2, progress=progress))))
+        self.assertFalse(group.accepts(Mock(options=Options(ttl=10, priority=1, progress=Mock()))))
+
+    def test_send(self):
+        policy = Mock()
+        group = Group(policy)
+        group.add(Request(classname='A'))
+        group.send(True)
+        request = policy.call_args[0][0]
+        self.assertEqual([r.classname for r in request.batch], ['A'])
+        self.assertTrue(request.parallel)
+        self.assertEqual(group.reply, policy.return_value)
+
+    def test_send_failed(self):
+        policy = Mock(side_effect=ValueError)
+        group = Group(policy)
+        result = group.add(Request(classname='A'))
+        group.send(False)
+        self.assertRaises(ValueError, result.result)
+
+    def test_wait(self):
+        group = Group(Mock())
+        results = [group.add(n) for n in range(2)]
+        group.reply = [
+            dict(retval=18),
+            dict(exval='', xmodule='exceptions', xclass='ValueError', xstate={}, xargs=[1]),
+        ]
+        self.assertEqual(results[0].result(), 18)
+        self.assertEqual(results[0].exception(), None)
+        self.assertRaises(ValueError, results[1].result)
+
+    def test_wait_future(self):
+        group = Group(Mock())
+        result = group.add(1)
+        future = Mock(spec=Future)
+        future.result.return_value = [dict(retval=18)]
+        group.reply = future
+        self.assertEqual(result.result(), 18)
+
+    def test_wait_future_failed(self):
+        group = Group(Mock())
+        result = group.add(1)
+        future = Mock(spec=Future)
+        future.result.side_effect = ValueError
+        group.reply = future
+        self.assertTrue(isinstance(result.exception(), ValueError))
+
+    def test_wait_async(self):
+        group = Group(Mock())
+        result = group.add(1)
+        group.reply = '1234'
+        self.assertRaises(ValueError, result.result)
+
+
+class TestBatch(TestCase):
+
+    def test_context(self):
+        with Batch(parallel=True) as batch:
+            self.assertTrue(Batch.current() is batch)
+            self.assertRaises(ValueError, Batch().__enter__)
+        self.assertEqual(Batch.current(), None)
+
+    def test_grouped(self):
+        batch = Batch()
+        p1 = Mock(url='u', address='a1')
+        p2 = Mock(url='u', address='a2')
+        batch.add(p1, 1)
+        batch.add(p2, 2)
+        batch.add(p1, 3)
+        self.assertEqual(batch.groups[('u', 'a1')].requests, [1, 3])
+        self.assertEqual(batch.groups[('u', 'a2')].requests, [2])
+
+    def test_options(self):
+        batch = Batch()
+        p1 = Mock(url='u', address='a1', options=Options(user='jeff', wait=10))
+        p2 = Mock(url='u', address='a1', options=Options(user='jeff', wait=10))
+        p3 = Mock(url='u', address='a1', options=Options(user='jeff', wait=0))
+        batch.add(p1, 1)
+        batch.add(p2, 2)
+        self.assertRaises(ValueError, batch.add, p3, 3)
+        self.assertEqual(batch.groups[('u', 'a1')].requests, [1, 2])
+
+    def test_send(self):
+        policy = Mock(url='u', address='a1')
+        with Batch() as batch:
+            batch.add(policy, Request(classname='A'))
+        self.assertEqual(policy.call_count, 1)
+        self.assertEqual(batch.replies, {('u', 'a1'): policy.return_value})
+
+    def test_not_sent(self):
+        policy = Mock(url='u', address='a1')
+        try:
+            with Batch() as batch:
+                batch.add(policy, Request(classname='A'))
+                raise KeyError()
+        except KeyError:
+            pass
+        self.assertFalse(policy.called)
+        self.assertEqual(Batch.current(), None)
+
+    def test_stub(self):
+        builder = Builder()
+        dog = builder('Dog', 'u', 'a1', Mock())
+        with Batch() as batch:
+            result = dog.bark('hello')
+        group = batch.groups[('u', 'a1')]
+        self.assertTrue(result.group is group)
+        request = group.requests[0]
+        self.assertEqual(request.classname, 'Dog')
+        self.assertEqual(request.method, 'bark')
+        self.assertEqual(request.args, ('hello',))
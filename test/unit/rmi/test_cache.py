@@ -0,0 +1,103 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from unittest import TestCase
+
+from mock import patch
+
+from gofer.rmi.cache import Key, Cache
+
+
+class TestKey(TestCase):
+
+    def test_init(self):
+        key = Key('url', 'a1', 'Dog', 'bark', None, '{}')
+        self.assertEqual(key, ('url', 'a1', 'Dog', 'bark', None, '{}'))
+        self.assertEqual(key, Key('url', 'a1', 'Dog', 'bark', None, '{}'))
+        self.assertEqual(hash(key), hash(Key('url', 'a1', 'Dog', 'bark', None, '{}')))
+
+    def test_matched(self):
+        key = Key('url', 'a1', 'Dog', 'bark', None, '{}')
+        self.assertTrue(key.matched())
+        self.assertTrue(key.matched(address='a1'))
+        self.assertTrue(key.matched('url', 'a1', 'Dog', 'bark'))
+        self.assertFalse(key.matched(address='a2'))
+        self.assertFalse(key.matched(classname='Dog', method='wag'))
+
+
+class TestCache(TestCase):
+
+    def key(self, method='bark', address='a1'):
+        return Key('url', address, 'Dog', method, None, '{}')
+
+    def test_init(self):
+        cache = Cache.__new__(Cache)
+        cache.__init__(10)
+        self.assertEqual(cache.maxsize, 10)
+        self.assertEqual(len(cache.entries), 0)
+        self.assertEqual(cache.hits, 0)
+        self.assertEqual(cache.misses, 0)
+
+    def test_singleton(self):
+        self.assertTrue(Cache() is Cache())
+
+    def test_get(self):
+        cache = Cache.__new__(Cache)
+        cache.__init__()
+        value = [1, 2]
+        cache.put(self.key(), value, 10)
+        found, cached = cache.get(self.key())
+        self.assertTrue(found)
+        self.assertEqual(cached, value)
+        self.assertFalse(cached is value)
+        self.assertEqual(cache.stats(), dict(hits=1, misses=0, size=1))
+
+    def test_get_missed(self):
+        cache = Cache.__new__(Cache)
+        cache.__init__()
+        self.assertEqual(cache.get(self.key()), (False, None))
+        self.assertEqual(cache.stats(), dict(hits=0, misses=1, size=0))
+
+    @patch('gofer.common.time')
+    def test_get_expired(self, time):
+        time.return_value = 100
+        cache = Cache.__new__(Cache)
+        cache.__init__()
+        cache.put(self.key(), 18, 10)
+        time.return_value = 110
+        self.assertEqual(cache.get(self.key()), (False, None))
+        self.assertEqual(cache.stats(), dict(hits=0, misses=1, size=0))
+
+    def test_lru(self):
+        cache = Cache.__new__(Cache)
+        cache.__init__(2)
+        cache.put(self.key('a'), 1, 10)
+        cache.put(self.key('b'), 2, 10)
+        cache.get(self.key('a'))
+        cache.put(self.key('c'), 3, 10)
+        self.assertEqual(cache.entries.keys(), [self.key('a'), self.key('c')])
+
+    def test_invalidate(self):
+        cache = Cache.__new__(Cache)
+        cache.__init__()
+        cache.put(self.key('a', 'a1'), 1, 10)
+        cache.put(self.key('b', 'a1'), 2, 10)
+        cache.put(self.key('a', 'a2'), 3, 10)
+        self.assertEqual(cache.invalidate(address='a1'), 2)
+        self.assertEqual(cache.entries.keys(), [self.key('a', 'a2')])
+
+    def test_clear(self):
+        cache = Cache.__new__(Cache)
+        cache.__init__()
+        cache.put(self.key(), 1, 10)
+        cache.get(self.key())
+        cache.clear()
+        self.assertEqual(cache.stats(), dict(hits=0, misses=0, size=0))
@@ -11,6 +11,66 @@
 
 from unittest import TestCase
 
+from mock import Mock, patch
 
-class Test(TestCase):
-    pass
\ No newline at end of file
+from gofer.messaging import Document, Node
+from gofer.rmi.consumer import RequestConsumer
+
+
+class TestRequestConsumer(TestCase):
+
+    def test_init(self):
+        node = Node('test')
+        plugin = Mock(url='amqp://host')
+        consumer = RequestConsumer(node, plugin, 9)
+        self.assertEqual(consumer.node, node)
+        self.assertEqual(consumer.url, plugin.url)
+        self.assertEqual(consumer.scheduler, plugin.scheduler)
+        self.assertEqual(consumer.pool, plugin.crypto)
+        self.assertEqual(consumer.priority, 9)
+        self.assertEqual(consumer.origin, plugin.node)
+
+    def test_prepare(self):
+        plugin = Mock(url='amqp://host')
+        request = Document(sn=1)
+        consumer = RequestConsumer(Node('test'), plugin)
+        consumer.send = Mock()
+        consumer.prepare(request)
+        consumer.send.assert_called_once_with(request, 'accepted')
+        self.assertFalse(plugin.scheduler.add.called)
+
+    @patch('gofer.rmi.consumer.Producer')
+    def test_send(self, producer):
+        plugin = Mock(url='amqp://host')
+        request = Document()
+        request.load(Document(sn='1', replyto='q1', data=2).dump('binary'))
+        consumer = RequestConsumer(Node('test'), plugin)
+        consumer.send(request, 'accepted')
+        producer = producer.return_value
+        self.assertEqual(producer.codec, 'binary')
+        self.assertEqual(producer.send.call_args[0], ('q1',))
+        self.assertEqual(producer.send.call_args[1]['status'], 'accepted')
+        producer.close.assert_called_once_with()
+
+    def test_dispatch(self):
+        plugin = Mock(url='amqp://host')
+        request = Document(sn=1)
+        consumer = RequestConsumer(Node('test'), plugin)
+        consumer.send = Mock()
+        consumer.dispatch(request)
+        self.assertFalse(consumer.send.called)
+        plugin.scheduler.add.assert_called_once_with(request)
+        self.assertEqual(request.priority, None)
+
+    def test_dispatch_priority(self):
+        plugin = Mock(url='amqp://host')
+        requests = [
+            Document(sn=1),
+            Document(sn=2, priority=20),
+        ]
+        consumer = RequestConsumer(Node('test'), plugin, 9)
+        consumer.send = Mock()
+        for request in requests:
+            consumer.dispatch(request)
+        self.assertEqual(requests[0].priority, 9)
+        self.assertEqual(requests[1].priority, 20)
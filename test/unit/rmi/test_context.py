@@ -2,7 +2,7 @@ from unittest import TestCase
 
 from mock import Mock, patch
 
-from gofer.rmi.context import Context, Progress, Cancelled
+from gofer.rmi.context import Context, Progress, Stream, Cancelled
 
 
 MODULE = 'gofer.rmi.context'
@@ -24,6 +24,7 @@ class TestContext(TestCase):
         self.assertEqual(context.sn, sn)
         self.assertEqual(context.progress, progress)
         self.assertEqual(context.cancelled, cancelled)
+        self.assertEqual(context.stream, None)
 
     def test_set(self):
         context = Context('1', Mock(), Mock())
@@ -83,6 +84,41 @@ class TestProgress(TestCase):
         self.assertFalse(producer.send.called)
 
 
+class TestStream(TestCase):
+
+    def test_init(self):
+        request = Mock()
+        producer = Mock()
+        stream = Stream(request, producer, 10)
+        self.assertEqual(stream.request, request)
+        self.assertEqual(stream.producer, producer)
+        self.assertEqual(stream.chunk, 10)
+
+    def test_call(self):
+        request = Mock(sn=1, data=2, replyto=3)
+        producer = Mock()
+        stream = Stream(request, producer, 2)
+
+        # test
+        sent = stream(iter(range(5)))
+
+        # validation
+        self.assertEqual(sent, 5)
+        calls = producer.send.call_args_list
+        self.assertEqual(len(calls), 3)
+        for seq, items in enumerate([[0, 1], [2, 3], [4]]):
+            self.assertEqual(calls[seq][0], (request.replyto,))
+            self.assertEqual(
+                calls[seq][1],
+                dict(sn=1, data=2, status='partial', seq=seq, items=items))
+
+    def test_call_empty(self):
+        producer = Mock()
+        stream = Stream(Mock(), producer)
+        self.assertEqual(stream(iter([])), 0)
+        self.assertFalse(producer.send.called)
+
+
 class TestCancelled(TestCase):
 
     @patch(MODULE + '.Tracker')
@@ -93,17 +129,3 @@ class TestCancelled(TestCase):
         tracker.assert_called_once_with()
         tracker.return_value.cancelled.assert_called_once_with(sn)
         self.assertEqual(r, tracker.return_value.cancelled.return_value)
-
-    @patch(MODULE + '.Tracker')
-    def test_del(self, tracker):
-        sn = '1'
-        cancelled = Cancelled(sn)
-        cancelled.__del__()
-        tracker.return_value.remove.assert_called_once_with(sn)
-
-    @patch(MODULE + '.Tracker')
-    def test_del_key_error(self, tracker):
-        sn = '1'
-        tracker.return_value.remove.side_effect = KeyError()
-        cancelled = Cancelled(sn)
-        cancelled.__del__()
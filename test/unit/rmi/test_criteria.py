@@ -14,6 +14,7 @@ from unittest import TestCase
 from mock import Mock
 
 from gofer.rmi.criteria import *
+from gofer.rmi.tracker import Index
 
 
 class TestCriteria(TestCase):
@@ -113,8 +114,150 @@ class TestMatch(TestCase):
         self.assertFalse(_or.match(2))
 
 
+class TestSelect(TestCase):
+
+    def setUp(self):
+        self.index = Index()
+        self.index.add('1', {'id': 44, 'age': 88})
+        self.index.add('2', {'id': 44})
+        self.index.add('3', {'age': 18})
+        self.index.add('4', {'id': [1]})
+        self.index.add('5', 10)
+        self.index.add('6', [10])
+
+    def test_criteria(self):
+        criteria = Criteria(1)
+        self.assertEqual(criteria.select(self.index), None)
+
+    def test_match(self):
+        match = Match({'id': 44})
+        # missing key is selected
+        self.assertEqual(match.select(self.index), set(['1', '2', '3', '4']))
+        match = Match({'id': 44, 'age': 18})
+        self.assertEqual(match.select(self.index), set(['2', '3', '4']))
+        match = Match({'id': [1]})
+        self.assertEqual(match.select(self.index), None)
+        match = Match(88)
+        self.assertEqual(match.select(self.index), set())
+
+    def test_eq(self):
+        eq = Equal({'id': 44})
+        self.assertEqual(eq.select(self.index), set(['1', '2']))
+        eq = Equal(10)
+        self.assertEqual(eq.select(self.index), set(['5']))
+        eq = Equal([10])
+        self.assertEqual(eq.select(self.index), None)
+        eq = Equal({})
+        self.assertEqual(eq.select(self.index), None)
+
+    def test_in(self):
+        _in = In([10, {'age': 18}])
+        self.assertEqual(_in.select(self.index), set(['3', '5']))
+        _in = In([10, [10]])
+        self.assertEqual(_in.select(self.index), None)
+        _in = In('abc')
+        self.assertEqual(_in.select(self.index), None)
+
+    def test_scanned(self):
+        for criteria in (NotEqual(1), Greater(1), Less(1)):
+            self.assertEqual(criteria.select(self.index), None)
+
+    def test_and(self):
+        _and = And((Equal({'id': 44}), Match({'age': 18})))
+        self.assertEqual(_and.select(self.index), set(['2']))
+        _and = And((Equal({'id': 44}), Greater(1)))
+        self.assertEqual(_and.select(self.index), set(['1', '2']))
+        _and = And((Greater(1), Equal(10)))
+        self.assertEqual(_and.select(self.index), set(['5']))
+        _and = And((Greater(1), Less(3)))
+        self.assertEqual(_and.select(self.index), None)
+
+    def test_or(self):
+        _or = Or((Equal({'id': 44}), Equal(10)))
+        self.assertEqual(_or.select(self.index), set(['1', '2', '5']))
+        _or = Or((Equal(10), Greater(1)))
+        self.assertEqual(_or.select(self.index), None)
+
+
+class TestCompile(TestCase):
+
+    def test_criteria(self):
+        criteria = Criteria(1)
+        self.assertEqual(criteria.compile(), criteria.match)
+
+    def test_match(self):
+        match = Match({'id': 44, 'age': 88}).compile()
+        self.assertTrue(match({'id': 44}))
+        self.assertTrue(match({'id': 44, 'age': 88}))
+        self.assertTrue(match({'age': 88}))
+        self.assertFalse(match({'id': 88}))
+        self.assertFalse(match(88))
+        self.assertFalse(match({}))
+        match = Match(88).compile()
+        self.assertFalse(match({'id': 44}))
+        match = Match({}).compile()
+        self.assertFalse(match({'id': 44}))
+
+    def test_operators(self):
+        self.assertTrue(Equal(1).compile()(1))
+        self.assertFalse(Equal(1).compile()(2))
+        self.assertTrue(NotEqual(1).compile()(2))
+        self.assertFalse(NotEqual(1).compile()(1))
+        self.assertTrue(Greater(1).compile()(2))
+        self.assertFalse(Greater(1).compile()(1))
+        self.assertTrue(Less(2).compile()(1))
+        self.assertFalse(Less(2).compile()(2))
+        self.assertTrue(In([1, 2]).compile()(1))
+        self.assertFalse(In([1, 2]).compile()(3))
+
+    def test_and_or(self):
+        _and = And((Greater(1), Less(3))).compile()
+        self.assertTrue(_and(2))
+        self.assertFalse(_and(3))
+        _or = Or((Equal(1), Equal(3))).compile()
+        self.assertTrue(_or(3))
+        self.assertFalse(_or(2))
+
+    def test_compiled(self):
+        index = Index()
+        index.add('1', 10)
+        criteria = Equal(10)
+        compiled = Compiled(criteria)
+        self.assertEqual(compiled.criteria, criteria)
+        self.assertTrue(compiled.match(10))
+        self.assertFalse(compiled(11))
+        self.assertEqual(compiled.select(index), set(['1']))
+        self.assertEqual(compiled.compile(), compiled.predicate)
+
+
 class TestBuilder(TestCase):
 
+    def setUp(self):
+        Builder.CACHE.clear()
+
+    def tearDown(self):
+        Builder.CACHE.clear()
+
+    def test_compile(self):
+        b = Builder()
+        q = {'or': ({'eq': 1}, {'match': {'id': 1, 'age': 2}})}
+        compiled = b.compile(q)
+        self.assertTrue(isinstance(compiled, Compiled))
+        self.assertTrue(compiled.match(1))
+        self.assertTrue(compiled.match({'id': 1}))
+        self.assertFalse(compiled.match(2))
+        # cached
+        q = {'or': ({'eq': 1}, {'match': {'age': 2, 'id': 1}})}
+        self.assertTrue(b.compile(q) is compiled)
+        self.assertEqual(len(Builder.CACHE), 1)
+
+    def test_compile_not_cached(self):
+        b = Builder()
+        q = {'eq': object()}
+        compiled = b.compile(q)
+        self.assertTrue(isinstance(compiled, Compiled))
+        self.assertEqual(len(Builder.CACHE), 0)
+
     def test_build(self):
         b = Builder()
         # no criteria
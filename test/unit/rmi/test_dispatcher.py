@@ -11,6 +11,108 @@
 
 from unittest import TestCase
 
+from mock import Mock
 
-class Test(TestCase):
-    pass
\ No newline at end of file
+from gofer.decorators import remote, cached
+from gofer.rmi.context import Context
+from gofer.messaging import Document
+from gofer.rmi.dispatcher import RMI, Request, Return
+
+
+class Dog(object):
+
+    @remote
+    def bark(self, n):
+        return 'woof' * n
+
+    @remote
+    def list(self, n):
+        for i in range(n):
+            yield i
+
+    @cached
+    @remote
+    def cached_list(self, n):
+        for i in range(n):
+            yield i
+
+
+class TestReturn(TestCase):
+
+    def test_succeed(self):
+        reply = Return.succeed([1, 2])
+        self.assertEqual(reply.__dict__, {'retval': [1, 2]})
+        self.assertEqual(reply._fragment.thing, reply.retval)
+        self.assertEqual(reply._fragment.encoded, {'json': '[1, 2]'})
+
+    def test_succeed_invalid(self):
+        self.assertRaises(TypeError, Return.succeed, object())
+
+    def test_fields(self):
+        reply = Return.succeed(18)
+        reply.cacheable = 10
+        fields = reply.__fields__()
+        self.assertEqual(fields['retval'], reply._fragment)
+        self.assertEqual(fields['cacheable'], 10)
+        self.assertEqual(reply.__dict__, {'retval': 18, 'cacheable': 10})
+
+    def test_fields_replaced(self):
+        reply = Return.succeed(18)
+        reply.retval = 19
+        self.assertEqual(reply.__fields__(), reply.__dict__)
+
+    def test_fields_not_encoded(self):
+        reply = Return(retval=18)
+        self.assertEqual(reply.__fields__(), reply.__dict__)
+
+    def test_spliced(self):
+        reply = Return.succeed({'a': [1, 2]})
+        reply._fragment.encoded['json'] = '"spliced"'
+        document = Document(sn='1', result=reply)
+        self.assertEqual(document.dump(), '{"sn": "1", "result": {"retval": "spliced"}}')
+
+
+class TestRMI(TestCase):
+
+    def tearDown(self):
+        Context.set()
+
+    def rmi(self, method, *args):
+        request = Request(classname='Dog', method=method, args=args, kws={})
+        return RMI(request, None, {'Dog': Dog})
+
+    def test_call(self):
+        reply = self.rmi('bark', 2)()
+        self.assertEqual(reply.retval, 'woofwoof')
+        self.assertEqual(reply.streamed, None)
+
+    def test_call_generator(self):
+        reply = self.rmi('list', 3)()
+        self.assertEqual(reply.retval, [0, 1, 2])
+        self.assertEqual(reply.streamed, None)
+
+    def test_call_streamed(self):
+        stream = Mock(return_value=3)
+        Context.set(Context('1', Mock(), Mock(), stream))
+        reply = self.rmi('list', 3)()
+        self.assertEqual(reply.retval, None)
+        self.assertEqual(reply.streamed, 3)
+        self.assertEqual(list(stream.call_args[0][0]), [0, 1, 2])
+
+    def test_call_cached_generator(self):
+        reply = self.rmi('cached_list', 3)()
+        self.assertEqual(reply.retval, [0, 1, 2])
+        self.assertTrue(self.rmi('cached_list', 3)() is reply)
+
+    def test_call_cached_streamed(self):
+        streamed = []
+
+        def stream(generator):
+            streamed.append(list(generator))
+            return len(streamed[-1])
+
+        Context.set(Context('1', Mock(), Mock(), stream))
+        self.rmi('cached_list', 4)()
+        reply = self.rmi('cached_list', 4)()
+        self.assertEqual(reply.streamed, 4)
+        self.assertEqual(streamed, [[0, 1, 2, 3], [0, 1, 2, 3]])
@@ -0,0 +1,333 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from threading import Timer
+from unittest import TestCase
+
+from mock import patch, Mock
+
+from gofer.common import Options
+from gofer.messaging import Document, DocumentError
+from gofer.rmi.dispatcher import Return
+from gofer.rmi.fanout import AgentReply, Gather, Scatter
+
+
+class TestAgentReply(TestCase):
+
+    def test_init(self):
+        reply = AgentReply('a1', '123', AgentReply.SUCCEEDED, retval=18)
+        self.assertEqual(reply.agent, 'a1')
+        self.assertEqual(reply.sn, '123')
+        self.assertEqual(reply.status, AgentReply.SUCCEEDED)
+        self.assertEqual(reply.retval, 18)
+        self.assertEqual(reply.exception, None)
+
+    def test_succeeded(self):
+        self.assertTrue(AgentReply('a1', '1', AgentReply.SUCCEEDED).succeeded())
+        self.assertFalse(AgentReply('a1', '1', AgentReply.FAILED).succeeded())
+        self.assertFalse(AgentReply('a1', '1', AgentReply.TIMED_OUT).succeeded())
+
+    def test_result(self):
+        reply = AgentReply('a1', '1', AgentReply.SUCCEEDED, retval=18)
+        self.assertEqual(reply.result(), 18)
+
+    def test_result_raised(self):
+        reply = AgentReply('a1', '1', AgentReply.FAILED, exception=ValueError())
+        self.assertRaises(ValueError, reply.result)
+
+
+class TestGather(TestCase):
+
+    def gather(self, wait=10):
+        policy = Mock(wait=wait)
+        router = Mock()
+        return Gather(policy, router)
+
+    @patch('gofer.rmi.fanout.time')
+    def test_init(self, time):
+        time.return_value = 100
+        policy = Mock(wait=10)
+        router = Mock()
+        gather = Gather(policy, router)
+        self.assertEqual(gather.policy, policy)
+        self.assertEqual(gather.router, router)
+        self.assertEqual(gather.expected, {})
+        self.assertEqual(gather.replied, set())
+        self.assertEqual(gather.deadlines, {})
+        self.assertEqual(gather.deadline, None)
+        self.assertEqual(gather.sn, [])
+
+    @patch('gofer.rmi.fanout.time')
+    def test_deadline(self, time):
+        time.return_value = 100
+        gather = self.gather()
+        gather.register('1', 'a1')
+        time.return_value = 105
+        gather.register('2', 'a2')
+        self.assertEqual(gather.deadlines, {'1': 110, '2': 115})
+        self.assertEqual(gather.deadline, 110)
+        # extended
+        gather.put(Document(sn='1', status='progress'))
+        self.assertEqual(gather.deadlines, {'1': 115, '2': 115})
+        # replied
+        gather.put(Document(sn='2', result=Return.succeed(2)))
+        self.assertEqual(gather.deadlines, {'1': 115})
+
+    def test_register(self):
+        gather = self.gather()
+        gather.register('1', 'a1')
+        gather.register('2')
+        self.assertEqual(gather.sn, ['1', '2'])
+        self.assertEqual(gather.expected, {'1': 'a1'})
+        gather.router.register.assert_any_call('1', gather)
+        gather.router.register.assert_any_call('2', gather)
+
+    def test_unregister(self):
+        gather = self.gather()
+        gather.register('1', 'a1')
+        gather.register('2', 'a2')
+        gather.unregister()
+        gather.router.unregister.assert_any_call('1')
+        gather.router.unregister.assert_any_call('2')
+
+    def test_agent(self):
+        gather = self.gather()
+        gather.register('1', 'a1')
+        self.assertEqual(gather.agent(Document(sn='1', routing=['x', 'y'])), 'a1')
+        self.assertEqual(gather.agent(Document(sn='2', routing=['x', 'y'])), 'x')
+        self.assertEqual(gather.agent(Document(sn='2', routing=[None, 'y'])), '2')
+        self.assertEqual(gather.agent(Document(sn='2')), '2')
+
+    def test_put_succeeded(self):
+        gather = self.gather()
+        gather.register('1', 'a1')
+        gather.put(Document(sn='1', result=Return.succeed(18)))
+        reply = gather._queue.get(block=False)
+        self.assertEqual(reply.agent, 'a1')
+        self.assertEqual(reply.status, AgentReply.SUCCEEDED)
+        self.assertEqual(reply.retval, 18)
+        self.assertEqual(gather.replied, set(['a1']))
+
+    def test_put_failed(self):
+        gather = self.gather()
+        gather.register('1', 'a1')
+        try:
+            raise ValueError('That was bad')
+        except ValueError:
+            gather.put(Document(sn='1', result=Return.exception()))
+        reply = gather._queue.get(block=False)
+        self.assertEqual(reply.status, AgentReply.FAILED)
+        self.assertTrue(isinstance(reply.exception, Exception))
+
+    def test_put_partial(self):
+        gather = self.gather()
+        gather.register('1', 'a1')
+        gather.put(Document(sn='1', status='partial', seq=0, items=[1, 2]))
+        gather.put(Document(sn='1', status='partial', seq=1, items=[3]))
+        self.assertTrue(gather._queue.empty())
+        gather.put(Document(sn='1', result=dict(retval=None, streamed=3)))
+        reply = gather._queue.get(block=False)
+        self.assertEqual(reply.retval, [1, 2, 3])
+        self.assertEqual(gather.items, {})
+
+    def test_put_rejected(self):
+        gather = self.gather()
+        gather.register('1', 'a1')
+        gather.put(Document(sn='1', status='rejected', code=1, description='bad'))
+        reply = gather._queue.get(block=False)
+        self.assertEqual(reply.status, AgentReply.FAILED)
+        self.assertTrue(isinstance(reply.exception, DocumentError))
+
+    def test_put_error(self):
+        gather = self.gather()
+        gather.register('1', 'a1')
+        error = DocumentError(1, 'bad', Document(sn='1'), {})
+        gather.put(error)
+        reply = gather._queue.get(block=False)
+        self.assertEqual(reply.status, AgentReply.FAILED)
+        self.assertEqual(reply.exception, error)
+
+    def test_put_status(self):
+        gather = self.gather()
+        gather.register('1', 'a1')
+        gather.put(Document(sn='1', status='accepted'))
+        gather.put(Document(sn='1', status='started'))
+        self.assertTrue(gather._queue.empty())
+
+    def test_put_progress(self):
+        gather = self.gather()
+        gather.register('1', 'a1')
+        document = Document(sn='1', status='progress')
+        gather.put(document)
+        gather.policy.on_progress.assert_called_once_with(document)
+        self.assertTrue(gather._queue.empty())
+
+    def test_put_duplicate(self):
+        gather = self.gather()
+        gather.put(Document(sn='1', routing=['a1', 'q'], result=Return.succeed(1)))
+        gather.put(Document(sn='1', routing=['a1', 'q'], result=Return.succeed(2)))
+        self.assertEqual(gather._queue.qsize(), 1)
+
+    def test_expire(self):
+        gather = self.gather()
+        gather.register('1', 'a1')
+        gather.register('2', 'a2')
+        gather.deadlines['1'] = 0
+        gather.expire()
+        gather.router.unregister.assert_called_once_with('1')
+        reply = gather._queue.get(block=False)
+        self.assertEqual(reply.agent, 'a1')
+        self.assertEqual(reply.status, AgentReply.TIMED_OUT)
+        self.assertEqual(gather.replied, set(['a1']))
+        self.assertEqual(gather.deadlines.keys(), ['2'])
+
+    def test_expire_topic(self):
+        gather = self.gather()
+        gather.register('1')
+        gather.deadlines['1'] = 0
+        gather.expire()
+        gather.router.unregister.assert_called_once_with('1')
+        self.assertEqual(gather._queue.get(block=False), Gather.EXPIRED)
+
+    def test_done(self):
+        gather = self.gather()
+        self.assertFalse(gather.done())
+        gather.register('1', 'a1')
+        self.assertFalse(gather.done())
+        gather.replied.add('a1')
+        self.assertTrue(gather.done())
+
+    def test_iter(self):
+        gather = self.gather()
+        gather.register('1', 'a1')
+        gather.register('2', 'a2')
+        gather.put(Document(sn='2', result=Return.succeed(2)))
+        gather.put(Document(sn='1', result=Return.succeed(1)))
+        replies = list(gather)
+        self.assertEqual([r.agent for r in replies], ['a2', 'a1'])
+        self.assertEqual([r.retval for r in replies], [2, 1])
+        gather.router.unregister.assert_any_call('1')
+        gather.router.unregister.assert_any_call('2')
+
+    def test_iter_timed_out(self):
+        gather = self.gather(wait=0)
+        gather.register('1', 'a1')
+        gather.register('2', 'a2')
+        gather.put(Document(sn='2', result=Return.succeed(2)))
+        replies = list(gather)
+        self.assertEqual([r.agent for r in replies], ['a2', 'a1'])
+        self.assertEqual(replies[1].status, AgentReply.TIMED_OUT)
+
+    def test_iter_expired(self):
+        gather = self.gather()
+        gather.register('1', 'a1')
+        gather.deadlines['1'] = 0
+        gather.expire()
+        replies = list(gather)
+        self.assertEqual(len(replies), 1)
+        self.assertEqual(replies[0].status, AgentReply.TIMED_OUT)
+
+    def test_iter_topic(self):
+        gather = self.gather()
+        gather.register('1')
+        gather.put(Document(sn='1', routing=['a1', 'q'], result=Return.succeed(1)))
+        gather.put(Document(sn='1', routing=['a2', 'q'], result=Return.succeed(2)))
+        gather.deadlines['1'] = 0
+        gather.expire()
+        replies = list(gather)
+        self.assertEqual([r.agent for r in replies], ['a1', 'a2'])
+
+    def test_iter_agent_timed_out(self):
+        gather = self.gather()
+        gather.register('1', 'a1')
+        gather.register('2', 'a2')
+        gather.deadlines['1'] = 0
+        reply = Document(sn='2', result=Return.succeed(2))
+        timer = Timer(0.1, gather.put, (reply,))
+        timer.start()
+        replies = list(gather)
+        timer.join()
+        self.assertEqual([r.agent for r in replies], ['a1', 'a2'])
+        self.assertEqual(
+            [r.status for r in replies],
+            [AgentReply.TIMED_OUT, AgentReply.SUCCEEDED])
+        self.assertEqual(replies[1].retval, 2)
+
+    def test_results(self):
+        gather = self.gather()
+        gather.register('1', 'a1')
+        gather.put(Document(sn='1', result=Return.succeed(1)))
+        results = gather.results()
+        self.assertEqual(results.keys(), ['a1'])
+        self.assertEqual(results['a1'].retval, 1)
+
+
+class TestScatter(TestCase):
+
+    @patch('gofer.rmi.fanout.Trigger')
+    @patch('gofer.rmi.fanout.ReplyRouter')
+    def test_call(self, router, trigger):
+        url = 'qpid+amqp://host'
+        addresses = ['a1', 'a2']
+        options = Options(wait=10)
+        triggers = [Mock(sn='1'), Mock(sn='2')]
+        trigger.side_effect = triggers
+        request = Mock()
+
+        # test
+        policy = Scatter(url, addresses, options)
+        gather = policy(request)
+
+        # validation
+        router.get.assert_called_once_with(url, policy.exchange, policy.authenticator)
+        _router = router.get.return_value
+        self.assertTrue(isinstance(gather, Gather))
+        self.assertEqual(gather.expected, {'1': 'a1', '2': 'a2'})
+        self.assertEqual(trigger.call_count, 2)
+        for n, address in enumerate(addresses):
+            self.assertEqual(trigger.call_args_list[n][0][0].address, address)
+            self.assertEqual(trigger.call_args_list[n][0][1], request)
+        for t in triggers:
+            t._send.assert_called_once_with(reply=_router.address)
+
+    @patch('gofer.rmi.fanout.Trigger')
+    @patch('gofer.rmi.fanout.ReplyRouter')
+    def test_call_topic(self, router, trigger):
+        trigger.return_value = Mock(sn='1')
+        request = Mock()
+
+        # test
+        policy = Scatter('', 'amq.topic', Options(wait=10))
+        gather = policy(request)
+
+        # validation
+        trigger.assert_called_once_with(policy, request)
+        self.assertEqual(gather.sn, ['1'])
+        self.assertEqual(gather.expected, {})
+        trigger.return_value._send.assert_called_once_with(
+            reply=router.get.return_value.address)
+
+    @patch('gofer.rmi.fanout.Trigger')
+    @patch('gofer.rmi.fanout.ReplyRouter')
+    def test_call_send_failed(self, router, trigger):
+        trigger.return_value = Mock(sn='1')
+        trigger.return_value._send.side_effect = ValueError
+
+        # test
+        policy = Scatter('', ['a1'], Options(wait=10))
+        gather = policy(Mock())
+
+        # validation
+        replies = list(gather)
+        self.assertEqual(len(replies), 1)
+        self.assertEqual(replies[0].agent, 'a1')
+        self.assertEqual(replies[0].status, AgentReply.FAILED)
+        self.assertTrue(isinstance(replies[0].exception, ValueError))
@@ -0,0 +1,207 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+import os
+import shutil
+
+from unittest import TestCase
+from tempfile import mkdtemp
+
+from mock import patch
+
+from gofer.rmi.journal import Journal, Segment
+
+
+class TestSegment(TestCase):
+
+    def test_number(self):
+        self.assertEqual(Segment.number('0000000012.jnl'), 12)
+        self.assertEqual(Segment.number('0000000012.json'), None)
+        self.assertEqual(Segment.number('abc.jnl'), None)
+
+    def test_init(self):
+        segment = Segment('/tmp', 3)
+        self.assertEqual(segment.path, '/tmp/0000000003.jnl')
+        self.assertEqual(segment.number, 3)
+        self.assertEqual(segment.size, 0)
+        self.assertEqual(segment.records, 0)
+        self.assertEqual(segment.live, 0)
+
+
+class TestJournal(TestCase):
+
+    def setUp(self):
+        self.path = mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def listdir(self):
+        return sorted(os.listdir(self.path))
+
+    def test_init(self):
+        journal = Journal(self.path, fsync='50', segment=1024)
+        self.assertEqual(journal.path, self.path)
+        self.assertEqual(journal.fsync, '50')
+        self.assertEqual(journal.limit, 1024)
+        self.assertEqual(journal.delay, 0.05)
+        self.assertEqual(journal.segments, [])
+        self.assertEqual(journal.index, {})
+
+    def test_init_defaults(self):
+        journal = Journal(self.path)
+        self.assertEqual(journal.fsync, Journal.FSYNC)
+        self.assertEqual(journal.limit, Journal.SEGMENT)
+        self.assertEqual(journal.delay, 0.0)
+
+    def test_defaults_applied(self):
+        journal = Journal(self.path)
+        fsync = Journal.FSYNC
+        segment = Journal.SEGMENT
+        Journal.FSYNC = '20'
+        Journal.SEGMENT = 2048
+        try:
+            self.assertEqual(journal.fsync, '20')
+            self.assertEqual(journal.limit, 2048)
+            self.assertEqual(journal.delay, 0.02)
+            journal = Journal(self.path, fsync='always', segment=1024)
+            self.assertEqual(journal.fsync, 'always')
+            self.assertEqual(journal.limit, 1024)
+        finally:
+            Journal.FSYNC = fsync
+            Journal.SEGMENT = segment
+
+    def test_write_read(self):
+        journal = Journal(self.path)
+        self.assertEqual(journal.open(), [])
+        entry = journal.write(u'123', '{"A": 1}', 3)
+        self.assertEqual(entry.sn, '123')
+        self.assertEqual(entry.seq, 0)
+        self.assertEqual(entry.priority, 3)
+        self.assertEqual(journal.read(entry), '{"A": 1}')
+        self.assertEqual(len(journal), 1)
+        self.assertEqual(self.listdir(), ['0000000001.jnl'])
+
+    def test_restore(self):
+        journal = Journal(self.path)
+        journal.open()
+        for sn in ('1', '2', '3'):
+            journal.write(sn, 'body-%s' % sn)
+        journal.commit('2')
+        journal.close()
+        journal = Journal(self.path)
+        entries = journal.open()
+        self.assertEqual([e.sn for e in entries], ['1', '3'])
+        self.assertEqual([journal.read(e) for e in entries], ['body-1', 'body-3'])
+        self.assertEqual(journal.seq, 4)
+
+    def test_restore_torn(self):
+        journal = Journal(self.path)
+        journal.open()
+        journal.write('1', 'body-1')
+        journal.write('2', 'body-2')
+        journal.close()
+        path = journal.active.path
+        size = os.path.getsize(path)
+        fp = open(path, 'r+b')
+        fp.truncate(size - 3)
+        fp.close()
+        journal = Journal(self.path)
+        entries = journal.open()
+        self.assertEqual([e.sn for e in entries], ['1'])
+        self.assertEqual(os.path.getsize(path), entries[0].segment.size)
+
+    def test_commit(self):
+        journal = Journal(self.path)
+        journal.open()
+        journal.write('1', 'body')
+        self.assertTrue(journal.commit(u'1'))
+        self.assertFalse(journal.commit('1'))
+        self.assertEqual(len(journal), 0)
+
+    def test_rollover(self):
+        journal = Journal(self.path, segment=100)
+        journal.open()
+        journal.write('1', 'x' * 60)
+        journal.write('2', 'x' * 60)
+        journal.write('3', 'x' * 60)
+        self.assertEqual(len(journal.segments), 3)
+        # segments deleted oldest first
+        journal.commit('2')
+        self.assertEqual(len(journal.segments), 3)
+        journal.commit('1')
+        self.assertEqual(len(journal.segments), 1)
+        self.assertEqual(self.listdir(), ['0000000003.jnl'])
+
+    def test_compact(self):
+        journal = Journal(self.path, segment=500)
+        journal.open()
+        for n in range(5):
+            journal.write(str(n), 'x' * 60)
+        for n in range(1, 5):
+            journal.commit(str(n))
+        self.assertEqual(len(journal.segments), 1)
+        # rollover relocates entry 0
+        journal.write('5', 'x' * 300)
+        self.assertEqual(len(journal.segments), 1)
+        entry = journal.index['0']
+        self.assertEqual(entry.seq, 0)
+        self.assertTrue(entry.segment is journal.active)
+        self.assertEqual(journal.read(entry), 'x' * 60)
+        journal.close()
+        journal = Journal(self.path)
+        entries = journal.open()
+        self.assertEqual([e.sn for e in entries], ['0', '5'])
+
+    @patch('gofer.rmi.journal.os.fsync')
+    def test_fsync_never(self, fsync):
+        journal = Journal(self.path, fsync=Journal.NEVER)
+        journal.open()
+        journal.write('1', 'body')
+        self.assertFalse(fsync.called)
+
+    @patch('gofer.rmi.journal.os.fsync')
+    def test_fsync_always(self, fsync):
+        journal = Journal(self.path, fsync=Journal.ALWAYS)
+        journal.open()
+        journal.write('1', 'body')
+        journal.write('2', 'body')
+        self.assertEqual(fsync.call_count, 2)
+        self.assertEqual(journal.synced, 2)
+
+    @patch('gofer.rmi.journal.sleep')
+    @patch('gofer.rmi.journal.os.fsync')
+    def test_fsync_batched(self, fsync, sleep):
+        journal = Journal(self.path, fsync='20')
+        journal.open()
+        journal.write('1', 'body')
+        sleep.assert_called_once_with(0.02)
+        self.assertEqual(fsync.call_count, 1)
+
+    @patch('gofer.rmi.journal.os.fsync')
+    def test_sync_shared(self, fsync):
+        journal = Journal(self.path, fsync=Journal.ALWAYS)
+        journal.open()
+        journal._write('1', 'body', 0)
+        journal._write('2', 'body', 0)
+        journal._sync(1)
+        # both writes covered by a single fsync
+        journal._sync(2)
+        self.assertEqual(fsync.call_count, 1)
+
+    def test_delete(self):
+        journal = Journal(self.path, segment=100)
+        journal.open()
+        journal.write('1', 'x' * 60)
+        journal.write('2', 'x' * 60)
+        journal.delete()
+        self.assertEqual(self.listdir(), [])
+        self.assertEqual(len(journal), 0)
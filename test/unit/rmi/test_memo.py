@@ -0,0 +1,135 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from time import sleep
+from threading import Thread
+from unittest import TestCase
+
+from mock import patch, Mock
+
+from gofer.rmi.memo import Memo, Pending
+
+
+class Reply(object):
+
+    def __init__(self, succeeded=True, streamed=None):
+        self._succeeded = succeeded
+        self.streamed = streamed
+
+    def succeeded(self):
+        return self._succeeded
+
+
+class TestPending(TestCase):
+
+    def test_resolve(self):
+        pending = Pending()
+        reply = Mock()
+        pending.resolve(reply)
+        self.assertEqual(pending.wait(), reply)
+
+
+class TestMemo(TestCase):
+
+    def tearDown(self):
+        Memo.all.clear()
+
+    def test_init(self):
+        memo = Memo('test.fn', 10, 20)
+        self.assertEqual(memo.name, 'test.fn')
+        self.assertEqual(memo.ttl, 10)
+        self.assertEqual(memo.maxsize, 20)
+        self.assertEqual(Memo.all, {'test.fn': memo})
+
+    def test_call(self):
+        reply = Reply()
+        fn = Mock(return_value=reply)
+        memo = Memo('test.fn')
+        self.assertEqual(memo('k', fn), reply)
+        self.assertEqual(memo('k', fn), reply)
+        self.assertEqual(fn.call_count, 1)
+        self.assertEqual(memo.stats(), dict(hits=1, misses=1, coalesced=0, size=1))
+        self.assertEqual(memo.pending, {})
+
+    def test_call_failed(self):
+        reply = Reply(False)
+        fn = Mock(return_value=reply)
+        memo = Memo('test.fn')
+        memo('k', fn)
+        memo('k', fn)
+        self.assertEqual(fn.call_count, 2)
+        self.assertEqual(memo.stats(), dict(hits=0, misses=2, coalesced=0, size=0))
+
+    def test_call_raised(self):
+        fn = Mock(side_effect=ValueError)
+        memo = Memo('test.fn')
+        self.assertRaises(ValueError, memo, 'k', fn)
+        self.assertEqual(memo.pending, {})
+
+    @patch('gofer.common.time')
+    def test_call_expired(self, time):
+        time.return_value = 100
+        fn = Mock(return_value=Reply())
+        memo = Memo('test.fn', ttl=10)
+        memo('k', fn)
+        time.return_value = 110
+        memo('k', fn)
+        self.assertEqual(fn.call_count, 2)
+
+    def test_call_streamed(self):
+        fn = Mock(return_value=Reply(streamed=3))
+        memo = Memo('test.fn')
+        memo('k', fn)
+        memo('k', fn)
+        self.assertEqual(fn.call_count, 2)
+        self.assertEqual(memo.stats()['size'], 0)
+
+    def test_maxsize(self):
+        fn = Mock(return_value=Reply())
+        memo = Memo('test.fn', maxsize=2)
+        memo('a', fn)
+        memo('b', fn)
+        memo('a', fn)
+        memo('c', fn)
+        self.assertEqual(memo.entries.keys(), ['a', 'c'])
+
+    def test_coalesced(self):
+        reply = Reply()
+        calls = []
+
+        def fn():
+            calls.append(1)
+            sleep(0.2)
+            return reply
+
+        memo = Memo('test.fn')
+        replies = []
+        threads = [Thread(target=lambda: replies.append(memo('k', fn))) for _ in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(replies, [reply, reply, reply])
+        self.assertEqual(memo.stats()['misses'], 1)
+        self.assertEqual(memo.stats()['coalesced'] + memo.stats()['hits'], 2)
+
+    def test_clear(self):
+        memo = Memo('test.fn')
+        memo('k', Mock(return_value=Reply()))
+        memo.clear()
+        self.assertEqual(memo.stats()['size'], 0)
+
+    def test_stats_all(self):
+        Memo('test.fn1')
+        Memo('test.fn2')
+        stats = Memo.stats_all()
+        self.assertEqual(sorted(stats.keys()), ['test.fn1', 'test.fn2'])
@@ -10,8 +10,18 @@
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
 
+from time import time
+from Queue import Queue
 from unittest import TestCase
-from gofer.rmi.policy import Timeout
+
+from mock import patch, Mock
+
+from gofer.common import Options
+from gofer.messaging import Document, DocumentError
+from gofer.rmi.cache import Key
+from gofer.rmi.dispatcher import Request
+from gofer.rmi.policy import Timeout, Policy, Trigger, RequestTimeout
+from gofer.rmi.policy import Future, Stream, as_completed, wait_all
 
 
 class TimeoutTests(TestCase):
@@ -91,3 +101,371 @@ class TimeoutTests(TestCase):
         self.assertRaises(ValueError, Timeout, 'x')
         self.assertRaises(ValueError, Timeout, '10x')
         self.assertRaises(ValueError, Timeout, '')
+
+
+class TestPolicy(TestCase):
+
+    def policy(self, **options):
+        return Policy('', 'q1', Mock(**options))
+
+    def test_get_reply(self):
+        policy = self.policy(wait=10, progress=Mock())
+        inbox = Queue()
+        inbox.put(Document(sn='1', status='accepted'))
+        inbox.put(Document(sn='1', status='progress', total=2, completed=1))
+        inbox.put(Document(sn='1', result=dict(retval=18)))
+        retval = policy.get_reply('1', inbox)
+        self.assertEqual(retval, 18)
+        self.assertEqual(policy.progress.call_count, 1)
+
+    def test_get_reply_timeout(self):
+        policy = self.policy(wait=0)
+        self.assertRaises(RequestTimeout, policy.get_reply, '1', Queue())
+
+    def test_get_reply_rejected(self):
+        policy = self.policy(wait=10)
+        inbox = Queue()
+        inbox.put(Document(sn='1', status='rejected', code='400'))
+        self.assertRaises(DocumentError, policy.get_reply, '1', inbox)
+
+    def test_get_reply_invalid(self):
+        policy = self.policy(wait=10)
+        inbox = Queue()
+        inbox.put(DocumentError('400', '', Document(), ''))
+        self.assertRaises(DocumentError, policy.get_reply, '1', inbox)
+
+    def test_get_reply_partial(self):
+        policy = self.policy(wait=10)
+        inbox = Queue()
+        inbox.put(Document(sn='1', status='partial', seq=0, items=[1, 2]))
+        stream = policy.get_reply('1', inbox)
+        self.assertTrue(isinstance(stream, Stream))
+        self.assertEqual(list(stream.items), [1, 2])
+
+    def test_cache_key(self):
+        policy = Policy('url', 'q1', Options(wait=10, user='jeff'))
+        request = Request(classname='Dog', method='bark', args=['hello'])
+        key = policy.cache_key(request)
+        self.assertEqual(key, Key('url', 'q1', 'Dog', 'bark', 'jeff', request.dump()))
+
+    def test_cache_key_not_cached(self):
+        request = Request(classname='Dog', method='bark')
+        for options in (
+                Options(cache=False),
+                Options(reply='a1'),
+                Options(futures=True),
+                Options(wait=0)):
+            policy = Policy('url', 'q1', options)
+            self.assertEqual(policy.cache_key(request), None)
+        policy = Policy('url', 'q1', Options())
+        self.assertEqual(policy.cache_key(Request(batch=[])), None)
+
+    @patch('gofer.rmi.policy.Cache')
+    def test_on_reply_cacheable(self, cache):
+        policy = self.policy()
+        key = Mock()
+        document = Document(result=dict(retval=18, cacheable=30))
+        retval = policy.on_reply(document, key)
+        self.assertEqual(retval, 18)
+        cache.return_value.put.assert_called_once_with(key, 18, 30.0)
+
+    @patch('gofer.rmi.policy.Cache')
+    def test_on_reply_not_cacheable(self, cache):
+        policy = self.policy()
+        policy.on_reply(Document(result=dict(retval=18)), Mock())
+        policy.on_reply(Document(result=dict(retval=18, cacheable=30)))
+        self.assertFalse(cache.return_value.put.called)
+
+    @patch('gofer.rmi.policy.Trigger')
+    @patch('gofer.rmi.policy.Cache')
+    def test_call_cached(self, cache, trigger):
+        trigger.MANUAL = Trigger.MANUAL
+        trigger.NOWAIT = Trigger.NOWAIT
+        cache.return_value.get.return_value = (True, 18)
+        policy = Policy('url', 'q1', Options())
+        retval = policy(Request(classname='Dog', method='bark'))
+        self.assertEqual(retval, 18)
+        self.assertFalse(trigger.return_value.called)
+
+    @patch('gofer.rmi.policy.Trigger')
+    @patch('gofer.rmi.policy.Cache')
+    def test_call_not_cached(self, cache, trigger):
+        trigger.MANUAL = Trigger.MANUAL
+        trigger.NOWAIT = Trigger.NOWAIT
+        cache.return_value.get.return_value = (False, None)
+        policy = Policy('url', 'q1', Options())
+        request = Request(classname='Dog', method='bark')
+        retval = policy(request)
+        self.assertEqual(retval, trigger.return_value.return_value)
+        self.assertEqual(trigger.return_value.key, policy.cache_key(request))
+
+
+class TestStream(TestCase):
+
+    def stream(self, *documents):
+        policy = Policy('', 'q1', Options(wait=10))
+        inbox = Queue()
+        for document in documents:
+            inbox.put(document)
+        first = Document(sn='1', status='partial', seq=0, items=[1, 2])
+        stream = Stream('1', policy, inbox, first)
+        stream.router = Mock()
+        return stream
+
+    def test_iter(self):
+        stream = self.stream(
+            Document(sn='1', status='partial', seq=1, items=[3]),
+            Document(sn='1', status='progress'),
+            Document(sn='1', status='partial', seq=2, items=[4, 5]),
+            Document(sn='1', result=dict(retval=None, streamed=5)))
+        router = stream.router
+        self.assertEqual(list(stream), [1, 2, 3, 4, 5])
+        router.unregister.assert_called_once_with('1')
+        self.assertTrue(stream.done)
+
+    def test_iter_raised(self):
+        stream = self.stream(
+            Document(sn='1', result=dict(exval='bad', xclass='ValueError', xstate={}, xargs=[])))
+        self.assertEqual(next(stream), 1)
+        self.assertEqual(next(stream), 2)
+        self.assertRaises(Exception, next, stream)
+        self.assertTrue(stream.done)
+
+    def test_iter_missing(self):
+        stream = self.stream(
+            Document(sn='1', status='partial', seq=2, items=[3]))
+        router = stream.router
+        stream.items.clear()
+        self.assertRaises(ValueError, next, stream)
+        router.unregister.assert_called_once_with('1')
+
+    def test_iter_timeout(self):
+        stream = self.stream()
+        router = stream.router
+        stream.deadline = 0
+        stream.items.clear()
+        self.assertRaises(RequestTimeout, next, stream)
+        router.unregister.assert_called_once_with('1')
+
+    def test_iter_expired(self):
+        stream = self.stream()
+        router = stream.router
+        stream.expire()
+        router.unregister.assert_called_once_with('1')
+        self.assertFalse(stream.done)
+        self.assertEqual(next(stream), 1)
+        self.assertEqual(next(stream), 2)
+        self.assertRaises(RequestTimeout, next, stream)
+        self.assertTrue(stream.done)
+
+    def test_deadline(self):
+        stream = self.stream()
+        self.assertTrue(stream.deadline > time() + 5)
+        stream.deadline = 0
+        document = Document(sn='1', status='partial', seq=1, items=[3])
+        stream.put(document)
+        self.assertTrue(stream.deadline > time() + 5)
+        self.assertTrue(stream.inbox.get_nowait() is document)
+
+    def test_context(self):
+        stream = self.stream()
+        router = stream.router
+        with stream:
+            pass
+        router.unregister.assert_called_once_with('1')
+        self.assertTrue(stream.done)
+
+    def test_del(self):
+        stream = self.stream()
+        router = stream.router
+        del stream
+        router.unregister.assert_called_once_with('1')
+
+    def test_close(self):
+        stream = self.stream()
+        router = stream.router
+        stream.close()
+        stream.close()
+        router.unregister.assert_called_once_with('1')
+        self.assertEqual(stream.router, None)
+
+
+class TestTrigger(TestCase):
+
+    @patch('gofer.rmi.policy.Pool')
+    @patch('gofer.rmi.policy.ReplyRouter')
+    def test_synchronous(self, router, pool):
+        router = router.get.return_value
+        router.address = 'reply'
+        policy = Mock(reply=None, wait=10, exchange='amq.direct', futures=False)
+        trigger = Trigger(policy, Mock())
+        retval = trigger()
+        router.register.assert_called_once_with(trigger.sn)
+        router.unregister.assert_called_once_with(trigger.sn)
+        lease = pool.return_value.lease
+        lease.assert_called_once_with(policy.url, policy.authenticator)
+        producer = lease.return_value.__enter__.return_value.producer
+        self.assertEqual(producer.send.call_args[1]['replyto'], 'reply')
+        policy.get_reply.assert_called_once_with(
+            trigger.sn, router.register.return_value, None)
+        self.assertEqual(retval, policy.get_reply.return_value)
+
+    @patch('gofer.rmi.policy.Pool')
+    @patch('gofer.rmi.policy.ReplyRouter')
+    def test_synchronous_failed(self, router, pool):
+        router = router.get.return_value
+        policy = Mock(reply=None, wait=10, futures=False)
+        policy.get_reply.side_effect = RequestTimeout('1', 10)
+        trigger = Trigger(policy, Mock())
+        self.assertRaises(RequestTimeout, trigger)
+        router.unregister.assert_called_once_with(trigger.sn)
+
+    @patch('gofer.rmi.policy.Pool')
+    @patch('gofer.rmi.policy.ReplyRouter')
+    def test_synchronous_stream(self, router, pool):
+        router = router.get.return_value
+        policy = Mock(reply=None, wait=10, futures=False)
+        stream = Stream('1', policy, Mock(), Document(seq=0, items=[]))
+        policy.get_reply.return_value = stream
+        trigger = Trigger(policy, Mock())
+        retval = trigger()
+        self.assertEqual(retval, stream)
+        self.assertEqual(stream.router, router)
+        router.register.assert_called_with(trigger.sn, stream)
+        self.assertFalse(router.unregister.called)
+
+    @patch('gofer.rmi.policy.Pool')
+    @patch('gofer.rmi.policy.ReplyRouter')
+    def test_futures(self, router, pool):
+        router = router.get.return_value
+        policy = Mock(reply=None, wait=10, futures=True)
+        trigger = Trigger(policy, Mock())
+        future = trigger()
+        self.assertTrue(isinstance(future, Future))
+        self.assertEqual(future.sn, trigger.sn)
+        router.register.assert_called_once_with(trigger.sn, future)
+        self.assertFalse(router.unregister.called)
+        self.assertFalse(policy.get_reply.called)
+
+    @patch('gofer.rmi.policy.Pool')
+    @patch('gofer.rmi.policy.ReplyRouter')
+    def test_futures_send_failed(self, router, pool):
+        router = router.get.return_value
+        lease = pool.return_value.lease.return_value.__enter__.return_value
+        lease.producer.send.side_effect = ValueError
+        policy = Mock(reply=None, wait=10, futures=True)
+        trigger = Trigger(policy, Mock())
+        self.assertRaises(ValueError, trigger)
+        router.unregister.assert_called_once_with(trigger.sn)
+
+    @patch('gofer.rmi.policy.Pool')
+    @patch('gofer.rmi.policy.ReplyRouter')
+    def test_asynchronous(self, router, pool):
+        policy = Mock(reply='q2', wait=10)
+        trigger = Trigger(policy, Mock())
+        self.assertEqual(trigger(), trigger.sn)
+        self.assertFalse(router.get.called)
+        producer = pool.return_value.lease.return_value.__enter__.return_value.producer
+        self.assertEqual(producer.send.call_args[1]['replyto'], 'q2')
+
+
+class TestFuture(TestCase):
+
+    def future(self, wait=10):
+        policy = Policy('', 'q1', Mock(wait=wait, progress=None))
+        return Future('1', policy, Mock())
+
+    def test_init(self):
+        future = self.future()
+        self.assertEqual(future.sn, '1')
+        self.assertFalse(future.done())
+
+    def test_put(self):
+        future = self.future()
+        callback = Mock()
+        future.add_done_callback(callback)
+        future.put(Document(sn='1', status='accepted'))
+        future.put(Document(sn='1', status='progress'))
+        self.assertFalse(future.done())
+        future.put(Document(sn='1', result=dict(retval=18)))
+        self.assertTrue(future.done())
+        self.assertEqual(future.result(), 18)
+        self.assertEqual(future.exception(), None)
+        callback.assert_called_once_with(future)
+        future.router.unregister.assert_called_once_with('1')
+
+    def test_put_partial(self):
+        future = self.future()
+        future.put(Document(sn='1', status='partial', seq=0, items=[1, 2]))
+        future.put(Document(sn='1', status='partial', seq=1, items=[3]))
+        self.assertFalse(future.done())
+        future.put(Document(sn='1', result=dict(retval=None, streamed=3)))
+        self.assertEqual(future.result(), [1, 2, 3])
+
+    def test_put_rejected(self):
+        future = self.future()
+        future.put(Document(sn='1', status='rejected', code='400'))
+        self.assertRaises(DocumentError, future.result)
+
+    def test_put_invalid(self):
+        future = self.future()
+        future.put(DocumentError('400', '', Document(), ''))
+        self.assertRaises(DocumentError, future.result)
+
+    def test_put_raised(self):
+        future = self.future()
+        future.policy.on_reply = Mock(side_effect=ValueError)
+        future.put(Document(sn='1', result={}))
+        self.assertTrue(isinstance(future.exception(), ValueError))
+
+    def test_resolved_once(self):
+        future = self.future()
+        future.put(Document(sn='1', result=dict(retval=18)))
+        future.expire()
+        self.assertEqual(future.result(), 18)
+
+    def test_result_timeout(self):
+        future = self.future()
+        self.assertRaises(RequestTimeout, future.result, 0)
+        self.assertFalse(future.done())
+
+    def test_result_expired(self):
+        future = self.future(wait=0)
+        self.assertRaises(RequestTimeout, future.result)
+        self.assertTrue(future.done())
+
+    def test_callback_done(self):
+        future = self.future()
+        future.expire()
+        callback = Mock(side_effect=ValueError)
+        future.add_done_callback(callback)
+        callback.assert_called_once_with(future)
+
+    def test_as_completed(self):
+        futures = [self.future() for n in range(3)]
+        futures[1].put(Document(sn='1', result=dict(retval=1)))
+        completed = as_completed(futures, 10)
+        self.assertTrue(completed.next() is futures[1])
+        futures[2].expire()
+        self.assertTrue(completed.next() is futures[2])
+        futures[0].expire()
+        self.assertTrue(completed.next() is futures[0])
+        self.assertRaises(StopIteration, completed.next)
+
+    def test_as_completed_expired(self):
+        futures = [self.future(wait=0)]
+        completed = list(as_completed(futures))
+        self.assertEqual(completed, futures)
+        self.assertRaises(RequestTimeout, futures[0].result)
+
+    def test_as_completed_timeout(self):
+        futures = [self.future()]
+        completed = as_completed(futures, 0)
+        self.assertRaises(RequestTimeout, completed.next)
+
+    def test_wait_all(self):
+        futures = [self.future() for n in range(2)]
+        futures[0].expire()
+        done, pending = wait_all(futures, 0)
+        self.assertEqual(done, futures[:1])
+        self.assertEqual(pending, futures[1:])
@@ -0,0 +1,238 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from unittest import TestCase
+
+from mock import patch, Mock
+
+from gofer.messaging import Document, DocumentError
+from gofer.rmi.router import ReplyRouter
+
+
+class TestReplyRouter(TestCase):
+
+    def setUp(self):
+        ReplyRouter.routers.clear()
+
+    def tearDown(self):
+        ReplyRouter.routers.clear()
+
+    def test_init(self):
+        url = 'qpid+amqp://host'
+        authenticator = Mock()
+        router = ReplyRouter(url, 'amq.direct', authenticator)
+        self.assertEqual(router.url, url)
+        self.assertEqual(router.exchange, 'amq.direct')
+        self.assertEqual(router.authenticator, authenticator)
+        self.assertFalse(router.node.durable)
+        self.assertTrue(router.node.auto_delete)
+        self.assertEqual(router.inbox, {})
+        self.assertTrue(router.isDaemon())
+
+    def test_address(self):
+        router = ReplyRouter('', 'amq.direct')
+        self.assertEqual(router.address, 'amq.direct/%s' % router.node.name)
+        router = ReplyRouter('')
+        self.assertEqual(router.address, router.node.name)
+
+    @patch('gofer.rmi.router.Exchange')
+    @patch('gofer.rmi.router.Queue')
+    def test_declare(self, queue, exchange):
+        url = 'qpid+amqp://host'
+        router = ReplyRouter(url, 'amq.direct')
+        router.declare()
+        queue.return_value.declare.assert_called_once_with(url)
+        exchange.assert_called_once_with('amq.direct')
+        exchange.return_value.bind.assert_called_once_with(queue.return_value, url)
+
+    @patch('gofer.rmi.router.Exchange')
+    @patch('gofer.rmi.router.Queue')
+    def test_declare_no_exchange(self, queue, exchange):
+        router = ReplyRouter('')
+        router.declare()
+        queue.return_value.declare.assert_called_once_with('')
+        self.assertFalse(exchange.called)
+
+    def test_open(self):
+        router = ReplyRouter('')
+        router.declare = Mock()
+        router.reader = Mock()
+        router.open()
+        router.declare.assert_called_once_with()
+        router.reader.open.assert_called_once_with()
+
+    @patch('gofer.rmi.router.sleep')
+    def test_open_reconnect(self, sleep):
+        # the (auto-deleted) queue is declared again when reopened
+        router = ReplyRouter('')
+        router.declare = Mock(side_effect=[ValueError, None])
+        router.reader = Mock()
+        router.open()
+        sleep.assert_called_once_with(30)
+        self.assertEqual(router.declare.call_count, 2)
+        router.reader.open.assert_called_once_with()
+
+    @patch('gofer.rmi.router.ReplyRouter.start')
+    @patch('gofer.rmi.router.ReplyRouter.declare')
+    def test_get(self, declare, start):
+        url = 'qpid+amqp://host'
+        router = ReplyRouter.get(url, 'amq.direct')
+        declare.assert_called_once_with()
+        start.assert_called_once_with()
+        self.assertEqual(ReplyRouter.routers, {(url, 'amq.direct', None): router})
+
+    @patch('gofer.rmi.router.ReplyRouter.isAlive')
+    @patch('gofer.rmi.router.ReplyRouter.start')
+    @patch('gofer.rmi.router.ReplyRouter.declare')
+    def test_get_shared(self, declare, start, alive):
+        alive.return_value = True
+        router = ReplyRouter.get('')
+        self.assertTrue(ReplyRouter.get('') is router)
+        self.assertFalse(ReplyRouter.get('', 'amq.direct') is router)
+        self.assertEqual(start.call_count, 2)
+
+    @patch('gofer.rmi.router.ReplyRouter.isAlive')
+    @patch('gofer.rmi.router.ReplyRouter.start')
+    @patch('gofer.rmi.router.ReplyRouter.declare')
+    def test_get_authenticator(self, declare, start, alive):
+        alive.return_value = True
+        router = ReplyRouter.get('', authenticator=Mock(id='A'))
+        self.assertTrue(ReplyRouter.get('', authenticator=Mock(id='A')) is router)
+        self.assertFalse(ReplyRouter.get('', authenticator=Mock(id='B')) is router)
+        self.assertEqual(router.key, ('', None, 'A'))
+
+    @patch('gofer.rmi.router.ReplyRouter.isAlive')
+    @patch('gofer.rmi.router.ReplyRouter.start')
+    @patch('gofer.rmi.router.ReplyRouter.declare')
+    def test_get_dead(self, declare, start, alive):
+        alive.return_value = False
+        router = ReplyRouter.get('')
+        self.assertFalse(ReplyRouter.get('') is router)
+
+    @patch('gofer.rmi.router.ReplyRouter.shutdown')
+    def test_shutdown_all(self, shutdown):
+        ReplyRouter.routers[1] = ReplyRouter('')
+        ReplyRouter.shutdown_all()
+        shutdown.assert_called_once_with()
+        self.assertEqual(ReplyRouter.routers, {})
+
+    @patch('gofer.rmi.router.ReplyRouter.shutdown')
+    def test_release(self, shutdown):
+        router = ReplyRouter('')
+        router.used = 0
+        ReplyRouter.routers[router.key] = router
+        self.assertTrue(ReplyRouter.release(router))
+        shutdown.assert_called_once_with()
+        self.assertEqual(ReplyRouter.routers, {})
+
+    @patch('gofer.rmi.router.ReplyRouter.shutdown')
+    def test_release_referenced(self, shutdown):
+        router = ReplyRouter('')
+        router.register('1')
+        router.used = 0
+        ReplyRouter.routers[router.key] = router
+        self.assertFalse(ReplyRouter.release(router))
+        self.assertFalse(shutdown.called)
+        self.assertEqual(ReplyRouter.routers, {router.key: router})
+
+    @patch('gofer.rmi.router.ReplyRouter.shutdown')
+    def test_release_not_idle(self, shutdown):
+        router = ReplyRouter('')
+        ReplyRouter.routers[router.key] = router
+        self.assertFalse(ReplyRouter.release(router))
+        self.assertFalse(shutdown.called)
+
+    def test_idle(self):
+        router = ReplyRouter('')
+        self.assertFalse(router.idle())
+        router.used = 0
+        self.assertTrue(router.idle())
+        router.register('1')
+        router.used = 0
+        self.assertFalse(router.idle())
+        router.unregister('1')
+        self.assertFalse(router.idle())
+
+    def test_register(self):
+        router = ReplyRouter('')
+        inbox = router.register('123')
+        self.assertEqual(router.inbox, {'123': inbox})
+        router.unregister('123')
+        router.unregister('123')
+        self.assertEqual(router.inbox, {})
+
+    def test_register_inbox(self):
+        router = ReplyRouter('')
+        inbox = Mock()
+        self.assertTrue(router.register('123', inbox) is inbox)
+        router.route('123', 1)
+        inbox.put.assert_called_once_with(1)
+
+    @patch('gofer.rmi.router.time')
+    def test_expired(self, _time):
+        _time.return_value = 10
+        router = ReplyRouter('')
+        router.register('1')
+        router.register('2', Mock(deadline=20))
+        late = router.register('3', Mock(deadline=5))
+        self.assertEqual(router.expired(), [late])
+
+    @patch('gofer.rmi.router.ConsumerThread.read')
+    def test_read(self, read):
+        router = ReplyRouter('')
+        late = router.register('1', Mock(deadline=0))
+        router.read()
+        read.assert_called_once_with(router)
+        late.expire.assert_called_once_with()
+
+    @patch('gofer.rmi.router.ReplyRouter.release')
+    @patch('gofer.rmi.router.ConsumerThread.read')
+    def test_read_idle(self, read, release):
+        router = ReplyRouter('')
+        router.read()
+        self.assertFalse(release.called)
+        router.used = 0
+        router.read()
+        release.assert_called_once_with(router)
+
+    def test_dispatch(self):
+        router = ReplyRouter('')
+        inbox = router.register('123')
+        document = Document(sn='123')
+        router.dispatch(document)
+        self.assertTrue(inbox.get_nowait() is document)
+
+    def test_dispatch_dropped(self):
+        router = ReplyRouter('')
+        inbox = router.register('123')
+        self.assertFalse(router.route('456', Document(sn='456')))
+        self.assertTrue(inbox.empty())
+
+    def test_rejected(self):
+        router = ReplyRouter('')
+        inbox = router.register('123')
+        router.rejected('400', 'bad', '{"sn": "123"}', 'details')
+        error = inbox.get_nowait()
+        self.assertTrue(isinstance(error, DocumentError))
+        self.assertEqual(error.code, '400')
+        self.assertEqual(error.document.sn, '123')
+
+    def test_rejected_document(self):
+        router = ReplyRouter('')
+        inbox = router.register('123')
+        router.rejected('400', 'bad', Document(sn='123'), 'details')
+        self.assertTrue(isinstance(inbox.get_nowait(), DocumentError))
+
+    def test_rejected_garbage(self):
+        router = ReplyRouter('')
+        inbox = router.register('123')
+        router.rejected('400', 'bad', '<xml/>', 'details')
+        self.assertTrue(inbox.empty())
@@ -9,23 +9,23 @@
 # have received a copy of GPLv2 along with this software; if not, see
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
+import shutil
+
 from unittest import TestCase
+from tempfile import mkdtemp
+
 from mock import patch, Mock
 
-from gofer.rmi.store import Pending, Sequential
+from gofer.common import Singleton
+from gofer.messaging import Document
+from gofer.rmi.criteria import Builder
+from gofer.rmi.store import Pending
+from gofer.rmi.journal import Journal, Entry
+from gofer.rmi.tracker import Tracker, Canceled
 
 
 class TestPendingQueue(TestCase):
 
-    @patch('__builtin__.open')
-    def test_write(self, _open):
-        request = Mock()
-        path = '/tmp/123'
-        Pending._write(request, path)
-        _open.assert_called_once_with(path, 'w+')
-        _open.return_value.write.assert_called_once_with(request.dump.return_value)
-        _open.return_value.close.assert_called_once_with()
-
     @patch('__builtin__.open')
     @patch('gofer.rmi.store.unlink')
     def test_read(self, unlink, _open):
@@ -52,67 +52,247 @@ class TestPendingQueue(TestCase):
         unlink.assert_called_once_with(path)
         self.assertEqual(document, None)
 
+    @patch('gofer.rmi.store.Journal')
+    @patch('gofer.rmi.store.Thread')
+    def test_init(self, thread, journal):
+        p = Pending('test')
+        journal.assert_called_once_with('%s/test' % Pending.PENDING)
+        thread.assert_called_once_with(target=p._open)
+        thread.return_value.start.assert_called_once_with()
+        self.assertEqual(p.stream, 'test')
+        self.assertEqual(p.journal, journal.return_value)
+        self.assertFalse(p.opened.isSet())
+        self.assertEqual(p.total, 0)
+        self.assertEqual(p.restored, 0)
+
+    @patch('gofer.rmi.store.Thread', Mock())
+    def test_journal_configured(self):
+        # plugins (pending queues) are loaded after the journal is configured
+        fsync = Journal.FSYNC
+        segment = Journal.SEGMENT
+        Journal.FSYNC = 'always'
+        Journal.SEGMENT = 1024
+        try:
+            p = Pending('test')
+            self.assertEqual(p.journal.fsync, 'always')
+            self.assertEqual(p.journal.limit, 1024)
+        finally:
+            Journal.FSYNC = fsync
+            Journal.SEGMENT = segment
+
+    @patch('gofer.rmi.store.Tracker')
+    @patch('gofer.rmi.store.Journal', Mock())
+    @patch('gofer.rmi.store.Thread', Mock())
+    def test_open(self, tracker):
+        entries = [Mock(sn='1'), Mock(sn='2'), Mock(sn='3')]
+        p = Pending('')
+        p.journal.open.return_value = entries[:2]
+        p._migrate = Mock(return_value=entries[2:])
+        p.journal.seq = 3
+        p.queue = Mock()
+        p.queue.qsize.return_value = 3
+        p._open()
+        tracker.return_value.add.assert_has_calls([((e.sn, None), {}) for e in entries])
+        self.assertFalse(p.journal.read.called)
+        p.queue.put.assert_has_calls([((e,), {}) for e in entries])
+        self.assertTrue(p.opened.isSet())
+        self.assertEqual(p.total, 3)
+        self.assertEqual(p.boundary, 3)
+        self.assertEqual(
+            p.progress,
+            {'opened': True, 'total': 3, 'restored': 0, 'queued': 3, 'held': 0})
+
+    @patch('gofer.rmi.store.Tracker')
+    @patch('gofer.rmi.store.Journal', Mock())
+    @patch('gofer.rmi.store.Thread')
+    def test_get(self, thread, tracker):
+        thread.aborted.return_value = False
+        request = Mock()
+        p = Pending('')
+        p.held = 1
+        p.queue = Mock()
+        p.queue.get.return_value = request
+        self.assertEqual(p.get(), request)
+        self.assertFalse(tracker.called)
+        self.assertEqual(p.restored, 0)
+        self.assertEqual(p.held, 0)
+
+    @patch('gofer.rmi.store.Tracker')
+    @patch('gofer.rmi.store.Journal', Mock())
+    @patch('gofer.rmi.store.Thread')
+    def test_get_restored(self, thread, tracker):
+        thread.aborted.return_value = False
+        entries = [Entry('1', 0, 0, 0, Mock(), 0), Entry('2', 1, 0, 0, Mock(), 0)]
+        requests = [None, Mock(sn='2')]
+        p = Pending('')
+        p.total = 2
+        p.boundary = 2
+        p.queue = Mock()
+        p.queue.get.side_effect = entries
+        p._restore = Mock(side_effect=requests)
+        request = p.get()
+        self.assertEqual(request, requests[1])
+        p._restore.assert_has_calls([((e,), {}) for e in entries])
+        tracker.return_value.add.assert_called_once_with(request.sn, request.data)
+        self.assertEqual(p.restored, 2)
+
+    @patch('gofer.rmi.store.Tracker', Mock())
+    @patch('gofer.rmi.store.Journal', Mock())
+    @patch('gofer.rmi.store.Thread')
+    def test_get_spilled(self, thread):
+        thread.aborted.return_value = False
+        entry = Entry('1', 10, 0, 0, Mock(), 0)
+        p = Pending('')
+        p.boundary = 2
+        p.queue = Mock()
+        p.queue.get.return_value = entry
+        p._restore = Mock()
+        request = p.get()
+        self.assertEqual(request, p._restore.return_value)
+        p._restore.assert_called_once_with(entry)
+        self.assertEqual(p.restored, 0)
+
+    @patch('gofer.rmi.store.Tracker')
+    @patch('gofer.rmi.store.Journal', Mock())
+    @patch('gofer.rmi.store.Thread', Mock())
+    def test__put(self, tracker):
+        requests = [Mock(sn='1'), Mock(sn='2')]
+        entries = [Mock(sn='1'), Mock(sn='2')]
+        p = Pending('')
+        p.queue = Mock()
+        p.held = Pending.WINDOW - 1
+        for request, entry in zip(requests, entries):
+            p._put(request, entry)
+        # held
+        p.queue.put.assert_any_call(requests[0])
+        # spilled
+        p.queue.put.assert_any_call(entries[1])
+        self.assertEqual(p.held, Pending.WINDOW)
+        tracker.return_value.add.assert_has_calls([
+            ((r.sn, r.data), {}) for r in requests
+        ])
+
     @patch('gofer.rmi.store.unlink')
+    @patch('gofer.rmi.store.Pending._read')
+    @patch('gofer.rmi.store.Journal', Mock())
     @patch('gofer.rmi.store.Thread', Mock())
-    def test_commit(self, unlink):
+    def test_migrate(self, read, unlink):
+        paths = ['/tmp/1.json', '/tmp/2.json', '/tmp/3.json']
+        requests = [Mock(sn='1'), Mock(sn='2'), None]
+        read.side_effect = requests
+        p = Pending('')
+        p._list = Mock(return_value=paths)
+        p.journal.index = {'2': Mock()}
+        entries = p._migrate()
+        p.journal.write.assert_called_once_with(
+            '1', requests[0].dump.return_value, requests[0].priority)
+        self.assertEqual(entries, [p.journal.write.return_value])
+        unlink.assert_has_calls([((path,), {}) for path in paths])
+
+    @patch('gofer.rmi.store.Journal', Mock())
+    @patch('gofer.rmi.store.Thread', Mock())
+    def test_restore(self):
+        entry = Mock(sn='1')
+        p = Pending('')
+        p.journal.read.return_value = '{"sn": "1"}'
+        request = p._restore(entry)
+        p.journal.read.assert_called_once_with(entry)
+        self.assertEqual(request.sn, '1')
+
+    @patch('gofer.rmi.store.Tracker')
+    @patch('gofer.rmi.store.Journal', Mock())
+    @patch('gofer.rmi.store.Thread', Mock())
+    def test_restore_corrupt(self, tracker):
+        entry = Mock(sn='1')
+        p = Pending('')
+        p.journal.read.return_value = None
+        request = p._restore(entry)
+        p.journal.commit.assert_called_once_with(entry.sn)
+        tracker.return_value.remove.assert_called_once_with(entry.sn)
+        self.assertEqual(request, None)
+
+    @patch('gofer.rmi.store.Journal', Mock())
+    @patch('gofer.rmi.store.Thread', Mock())
+    def test_put(self):
+        request = Mock(sn='1', priority=2)
+        p = Pending('')
+        p.opened.set()
+        p._put = Mock()
+        p.put(request)
+        request.dump.assert_called_once_with(request.wire_codec)
+        p.journal.write.assert_called_once_with(
+            request.sn, request.dump.return_value, request.priority)
+        p._put.assert_called_once_with(request, p.journal.write.return_value)
+
+    @patch('gofer.rmi.store.Journal', Mock())
+    @patch('gofer.rmi.store.Thread', Mock())
+    def test_commit(self):
         sn = '123'
-        path = '/tmp/123'
         p = Pending('')
-        p.journal = {sn: path}
+        p.journal.commit.return_value = True
         p.commit(sn)
-        unlink.assert_called_once_with(path)
-        self.assertEqual(p.journal, {})
+        p.journal.commit.assert_called_once_with(sn)
 
-    @patch('gofer.rmi.store.unlink')
+    @patch('gofer.rmi.store.Journal', Mock())
     @patch('gofer.rmi.store.Thread', Mock())
-    def test_commit_not_found(self, unlink):
-        sn = '123'
-        path = '/tmp/123'
+    def test_commit_not_found(self):
         p = Pending('')
-        p.journal = {sn: path}
+        p.journal.commit.return_value = False
         p.commit('invalid')
-        self.assertFalse(unlink.called)
-        self.assertEqual(p.journal, {sn: path})
+        p.journal.commit.assert_called_once_with('invalid')
+
+    @patch('gofer.rmi.store.rmdir')
+    @patch('gofer.rmi.store.Journal', Mock())
+    @patch('gofer.rmi.store.Thread', Mock())
+    def test_delete(self, rmdir):
+        p = Pending('test')
+        p._drain = Mock()
+        p.delete()
+        p.thread.abort.assert_called_once_with()
+        p._drain.assert_called_once_with()
+        p.journal.delete.assert_called_once_with()
+        rmdir.assert_called_once_with('%s/test' % Pending.PENDING)
 
 
-class TestSequential(TestCase):
+class TestRestoredTracking(TestCase):
 
-    def test_init(self):
+    def setUp(self):
+        Singleton._inst.clear()
+        self.pending = Pending.PENDING
+        self.canceled = Canceled.PATH
+        Pending.PENDING = mkdtemp()
+        Canceled.PATH = mkdtemp()
 
-        s = Sequential()
-        self.assertEqual(s.n, 0)
-        self.assertEqual(s.last, 0.0)
+    def tearDown(self):
+        Singleton._inst.clear()
+        shutil.rmtree(Pending.PENDING)
+        shutil.rmtree(Canceled.PATH)
+        Pending.PENDING = self.pending
+        Canceled.PATH = self.canceled
 
-    @patch('gofer.rmi.store.time')
-    def test_next_time_stopped(self, time):
-        time.return_value = 3.14
-        s = Sequential()
-        values = [
-            s.next(),
-            s.next(),
-            s.next(),
-        ]
-        self.assertEqual(
-                values,
-                [
-                    '3-140000-0000.json',
-                    '3-140000-0001.json',
-                    '3-140000-0002.json'
-                ])
-
-    @patch('gofer.rmi.store.time')
-    def test_next_time_moving(self, time):
-        time.side_effect = [3.14, 3.15, 3.16]
-        s = Sequential()
-        values = [
-            s.next(),
-            s.next(),
-            s.next(),
-        ]
-        self.assertEqual(
-                values,
-                [
-                    '3-140000-0000.json',
-                    '3-150000-0000.json',
-                    '3-160000-0000.json'
-                ])
+    @patch('gofer.rmi.store.Thread')
+    def test_cancel_restored(self, thread):
+        thread.aborted.return_value = False
+        p = Pending('test')
+        p.journal.open()
+        request = Document(sn='1', data={'group': 'A'}, request={'method': 'bark'})
+        p.journal.write(request.sn, request.dump(), 0)
+        p.journal.write('2', 'corrupt', 0)
+        p.journal.close()
+
+        # restored (not dequeued)
+        p = Pending('test')
+        p.journal.read = Mock(side_effect=p.journal.read)
+        p._open()
+
+        # validation
+        tracker = Tracker()
+        self.assertFalse(p.journal.read.called)
+        self.assertEqual(p.queue.qsize(), 2)
+        self.assertEqual(tracker.cancel('2'), '2')
+
+        # dequeued
+        criteria = Builder().build({'match': {'group': 'A'}})
+        self.assertEqual(tracker.find(criteria), [])
+        self.assertEqual(p.get().sn, '1')
+        self.assertEqual(tracker.find(criteria), ['1'])
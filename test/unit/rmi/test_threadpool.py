@@ -10,7 +10,209 @@
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
 from unittest import TestCase
+from Queue import Queue, Empty
 
+from mock import patch, Mock
 
-class Test(TestCase):
-    pass
\ No newline at end of file
+from gofer.threadpool import ThreadPool, KeyedPool, Worker, Call
+
+
+class TestWorker(TestCase):
+
+    def test_next(self):
+        queue = Mock()
+        worker = Worker(0, queue)
+        message = worker.next()
+        queue.get.assert_called_once_with()
+        self.assertEqual(message, queue.get.return_value)
+
+    def test_next_pool(self):
+        queue = Mock()
+        pool = Mock(elastic=True, timeout=10)
+        worker = Worker(0, queue, pool)
+        message = worker.next()
+        queue.get.assert_called_once_with(timeout=pool.timeout)
+        pool.waited.assert_called_once_with(queue.get.return_value)
+        self.assertEqual(pool.idle.call_count, 2)
+        self.assertEqual(message, queue.get.return_value)
+
+    def test_next_retired(self):
+        queue = Mock()
+        queue.get.side_effect = Empty
+        pool = Mock(elastic=True, timeout=10)
+        pool.retire.return_value = True
+        worker = Worker(0, queue, pool)
+        message = worker.next()
+        pool.retire.assert_called_once_with(worker)
+        self.assertFalse(pool.waited.called)
+        self.assertEqual(message, None)
+
+    def test_run(self):
+        call = Mock()
+        queue = Queue()
+        queue.put(call)
+        queue.put(Worker.HALT)
+        worker = Worker(0, queue)
+        worker.run()
+        call.assert_called_once_with()
+        self.assertEqual(queue.get(), Worker.HALT)
+
+
+class TestThreadPool(TestCase):
+
+    def test_init(self):
+        pool = ThreadPool(3)
+        self.assertEqual(pool.capacity, 3)
+        self.assertEqual(pool.maximum, 3)
+        self.assertEqual(pool.queue.maxsize, 100)
+        self.assertEqual(pool.threads, [])
+        self.assertFalse(pool.elastic)
+
+    def test_init_elastic(self):
+        pool = ThreadPool(2, maximum=10, timeout=30, latency=0.5)
+        self.assertEqual(pool.capacity, 2)
+        self.assertEqual(pool.maximum, 10)
+        self.assertEqual(pool.timeout, 30)
+        self.assertEqual(pool.latency, 0.5)
+        self.assertTrue(pool.elastic)
+
+    @patch('gofer.threadpool.Worker')
+    def test_start(self, worker):
+        pool = ThreadPool(3)
+        pool.start()
+        self.assertEqual(len(pool), 3)
+        self.assertEqual(worker.return_value.start.call_count, 3)
+
+    @patch('gofer.threadpool.Worker')
+    def test_run(self, worker):
+        fn = Mock()
+        pool = ThreadPool(2, maximum=4)
+        call = pool.run(fn, 1, 2, a=3)
+        self.assertTrue(isinstance(call, Call))
+        self.assertEqual(pool.queue.get(), call)
+        self.assertEqual(len(pool), 1)
+
+    @patch('gofer.threadpool.Worker')
+    def test_run_idle(self, worker):
+        fn = Mock()
+        pool = ThreadPool(2, maximum=4)
+        pool.available = 1
+        pool.run(fn)
+        self.assertEqual(len(pool), 0)
+
+    @patch('gofer.threadpool.Worker')
+    def test_grow(self, worker):
+        pool = ThreadPool(1, maximum=2)
+        pool.grow()
+        pool.grow()
+        pool.grow()
+        self.assertEqual(len(pool), 2)
+
+    @patch('gofer.threadpool.Worker')
+    def test_grow_halted(self, worker):
+        pool = ThreadPool(1, maximum=2)
+        pool.halted = True
+        pool.grow()
+        self.assertEqual(len(pool), 0)
+
+    @patch('gofer.threadpool.Worker')
+    def test_retire(self, worker):
+        pool = ThreadPool(1, maximum=3)
+        pool.threads = [Mock(), Mock()]
+        worker = pool.threads[0]
+        self.assertTrue(pool.retire(worker))
+        self.assertFalse(pool.retire(pool.threads[0]))
+        self.assertEqual(len(pool), 1)
+
+    @patch('gofer.threadpool.time')
+    def test_waited(self, time):
+        time.return_value = 10
+        pool = ThreadPool(1, maximum=3, latency=1)
+        pool.grow = Mock()
+        call = Call(Mock())
+        call.queued = 9.5
+        pool.waited(call)
+        self.assertFalse(pool.grow.called)
+        call.queued = 5
+        pool.waited(call)
+        self.assertFalse(pool.grow.called)
+        pool.waited(call)
+        pool.grow.assert_called_once_with()
+        # cleared after growing
+        self.assertEqual(len(pool.waits), 0)
+        call.queued = 9.5
+        pool.waited(call)
+        pool.grow.assert_called_once_with()
+        self.assertEqual(len(pool.waits), 1)
+
+    def test_waited_not_call(self):
+        pool = ThreadPool(1, maximum=3)
+        pool.waited(Worker.HALT)
+        self.assertEqual(len(pool.waits), 0)
+
+    def test_percentile(self):
+        pool = ThreadPool(1)
+        self.assertEqual(pool.percentile(), 0.0)
+        pool.waits.extend(range(100))
+        self.assertEqual(pool.percentile(), 89)
+
+    def test_shutdown(self):
+        fn = Mock()
+        pool = ThreadPool(3)
+        pool.start()
+        pool.queue.put(Call(fn))
+        pool.waits.append(1)
+        threads = list(pool.threads)
+        pool.shutdown()
+        self.assertTrue(pool.halted)
+        for thread in threads:
+            self.assertFalse(thread.isAlive())
+        self.assertEqual(pool.threads, [])
+        self.assertEqual(len(pool.waits), 0)
+        self.assertEqual(len(pool), 0)
+
+    def test_repr(self):
+        pool = ThreadPool(1, maximum=3)
+        self.assertEqual(repr(pool), 'pool: capacity=0 queued: 0/100 range: 1-3 idle: 0')
+
+
+class TestKeyedPool(TestCase):
+
+    def test_init(self):
+        pool = KeyedPool(3, 10)
+        self.assertEqual(len(pool.queues), 3)
+        self.assertEqual(pool.queues[0].maxsize, 10)
+        self.assertEqual(pool.threads, [])
+
+    @patch('gofer.threadpool.Worker')
+    def test_start(self, worker):
+        pool = KeyedPool(3)
+        pool.start()
+        pool.start()
+        self.assertEqual(worker.call_count, 3)
+        for n, queue in enumerate(pool.queues):
+            worker.assert_any_call(n, queue)
+        self.assertEqual(len(pool), 3)
+        self.assertEqual(worker.return_value.start.call_count, 3)
+
+    def test_run(self):
+        fn = Mock()
+        pool = KeyedPool(3)
+        calls = [pool.run('123', fn, n) for n in range(4)]
+        queue = pool.queues[hash('123') % 3]
+        self.assertEqual(queue.qsize(), 4)
+        self.assertEqual([queue.get() for _ in calls], calls)
+        self.assertEqual(calls[2].args, (2,))
+
+    def test_ordered(self):
+        called = []
+        pool = KeyedPool(4)
+        pool.start()
+        for n in range(20):
+            pool.run(n % 3, called.append, n)
+        pool.shutdown()
+        for key in range(3):
+            ordered = [n for n in called if n % 3 == key]
+            self.assertEqual(ordered, sorted(ordered))
+        self.assertEqual(len(called), 20)
+        self.assertEqual(len(pool), 0)
@@ -9,8 +9,213 @@
 # have received a copy of GPLv2 along with this software; if not, see
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
+import os
+import shutil
+
 from unittest import TestCase
+from tempfile import mkdtemp
+
+from mock import Mock, patch
+
+from gofer.common import Singleton
+from gofer.rmi.criteria import Builder
+from gofer.rmi.tracker import Tracker, Index, Canceled
+
+
+class TestCanceled(TestCase):
+
+    def setUp(self):
+        self.path = Canceled.PATH
+        Canceled.PATH = mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(Canceled.PATH)
+        Canceled.PATH = self.path
+
+    def test_add_delete(self):
+        canceled = Canceled()
+        canceled.add('1')
+        canceled.add_all(['2', '3'])
+        canceled.delete('2')
+        canceled.delete('4')
+        self.assertTrue('1' in canceled)
+        self.assertFalse('2' in canceled)
+        self.assertTrue('3' in canceled)
+        # rebuilt from the journal
+        canceled.journal.close()
+        canceled = Canceled()
+        self.assertEqual(canceled.collection, set(['1', '3']))
+
+    @patch('gofer.rmi.journal.os.fsync')
+    def test_add_all_synced(self, fsync):
+        canceled = Canceled()
+        canceled.journal.fsync = 'always'
+        canceled.add_all(['1', '2', '3'])
+        self.assertEqual(fsync.call_count, 1)
+
+    def test_migrate(self):
+        for sn in ('1', '2'):
+            fp = open(os.path.join(Canceled.PATH, sn), 'w+')
+            fp.write(sn)
+            fp.close()
+        canceled = Canceled()
+        self.assertEqual(canceled.collection, set(['1', '2']))
+        self.assertEqual([n for n in os.listdir(Canceled.PATH) if not n.endswith('.jnl')], [])
+        canceled.journal.close()
+        canceled = Canceled()
+        self.assertEqual(canceled.collection, set(['1', '2']))
+
+
+class TestIndex(TestCase):
+
+    def test_add(self):
+        index = Index()
+        index.add('1', {'id': 44, 'tags': [1]})
+        index.add('2', {'id': 44})
+        index.add('3', 10)
+        index.add('4', {})
+        index.add('5', [1])
+        self.assertEqual(index.keys, {'id': {44: set(['1', '2'])}})
+        self.assertEqual(index.keyed, {'id': set(['1', '2'])})
+        self.assertEqual(index.dicts, set(['1', '2']))
+        self.assertEqual(index.values, {10: set(['3'])})
+
+    def test_remove(self):
+        index = Index()
+        index.add('1', {'id': 44, 'tags': [1]})
+        index.add('2', {'id': 44})
+        index.add('3', 10)
+        index.remove('1', {'id': 44, 'tags': [1]})
+        index.remove('3', 10)
+        index.remove('5', [1])
+        self.assertEqual(index.keys, {'id': {44: set(['2'])}})
+        self.assertEqual(index.keyed, {'id': set(['2'])})
+        self.assertEqual(index.dicts, set(['2']))
+        self.assertEqual(index.values, {})
+        index.remove('2', {'id': 44})
+        self.assertEqual(index.keys, {})
+        self.assertEqual(index.keyed, {})
+        self.assertEqual(index.dicts, set())
+
+    def test_lookup(self):
+        index = Index()
+        index.add('1', {'id': 44})
+        self.assertEqual(index.lookup('id', 44), set(['1']))
+        self.assertEqual(index.lookup('id', 45), set())
+        self.assertEqual(index.lookup('age', 44), set())
+        self.assertRaises(TypeError, index.lookup, 'id', [])
+
+    def test_unkeyed(self):
+        index = Index()
+        index.add('1', {'id': 44})
+        index.add('2', {'age': 10})
+        self.assertEqual(index.unkeyed('id'), 1)
+        self.assertEqual(index.unkeyed('name'), 2)
+        index.add('3', {'id': 10})
+        index.remove('2', {'age': 10})
+        self.assertEqual(index.unkeyed('id'), 0)
+
+    def test_matched(self):
+        index = Index()
+        index.add('1', {'id': 44})
+        index.add('2', {'age': 10})
+        index.add('3', {'id': 10})
+        self.assertEqual(index.matched('id', 44), set(['1', '2']))
+        self.assertEqual(index.matched('name', 44), set(['1', '2', '3']))
+        self.assertEqual(index.matched('id', 44, set(['1', '3'])), set(['1']))
+        self.assertEqual(index.matched('id', 44, set(['2', '3'])), set(['2']))
+        self.assertEqual(index.matched('id', 44, set()), set())
+        self.assertRaises(TypeError, index.matched, 'id', [])
+        index.remove('2', {'age': 10})
+        self.assertEqual(index.matched('id', 44), set(['1']))
+
+
+class TestTracker(TestCase):
+
+    def setUp(self):
+        Singleton._inst.clear()
+
+    def tearDown(self):
+        Singleton._inst.clear()
+
+    @patch('gofer.rmi.tracker.Canceled')
+    def test_find(self, canceled):
+        builder = Builder()
+        tracker = Tracker()
+        tracker.add('1', {'id': 44, 'age': 88})
+        tracker.add('2', {'id': 45, 'age': 10})
+        tracker.add('3', 10)
+        tracker.add('4', {'id': 44, 'age': 20})
+        tracker.add('4', {'id': 46, 'age': 20})
+        tracker.remove('1')
+        # indexed
+        criteria = builder.build({'match': {'id': 45}})
+        self.assertEqual(tracker.find(criteria), ['2'])
+        criteria = builder.build({'in': [10, {'id': 46, 'age': 20}]})
+        self.assertEqual(sorted(tracker.find(criteria)), ['3', '4'])
+        criteria = builder.build({'match': {'id': 44}})
+        self.assertEqual(tracker.find(criteria), [])
+        # scanned
+        criteria = builder.build({'and': ({'gt': 5}, {'lt': 20})})
+        self.assertEqual(tracker.find(criteria), ['3'])
+        # combined
+        criteria = builder.build({'and': ({'match': {'age': 20}}, {'neq': 10})})
+        self.assertEqual(tracker.find(criteria), ['4'])
+
+    @patch('gofer.rmi.tracker.Canceled')
+    def test_cancel_matching(self, canceled):
+        builder = Builder()
+        canceled.return_value.__contains__.side_effect = lambda sn: sn == '2'
+        tracker = Tracker()
+        tracker.add('1', {'id': 44})
+        tracker.add('2', {'id': 44})
+        tracker.add('3', {'id': 45})
+        criteria = builder.compile({'match': {'id': 44}})
+        cancelled = tracker.cancel_matching(criteria)
+        self.assertEqual(cancelled, ['1'])
+        canceled.return_value.add_all.assert_called_once_with(['1'])
+
+    @patch('gofer.rmi.tracker.time')
+    @patch('gofer.rmi.tracker.Canceled')
+    def test_sweep(self, canceled, time):
+        time.return_value = 100
+        tracker = Tracker()
+        tracker.add('1', {'id': 1})
+        time.return_value = 200
+        tracker.add('2', {'id': 2})
+        tracker.add('3', {'id': 3})
+        # re-added
+        time.return_value = 240
+        tracker.add('1', {'id': 1})
+        time.return_value = 250
+        swept = tracker.sweep(100)
+        self.assertEqual(swept, [])
+        time.return_value = 330
+        swept = tracker.sweep(100)
+        self.assertEqual(swept, ['2', '3'])
+        self.assertEqual(tracker.swept, 330)
+        self.assertEqual(tracker.stats()['tracked'], 1)
+        canceled.return_value.delete.assert_any_call('2')
 
+    @patch('gofer.rmi.tracker.time')
+    @patch('gofer.rmi.tracker.Canceled')
+    def test_sweep_on_add(self, canceled, time):
+        time.return_value = 100
+        tracker = Tracker()
+        tracker.sweep = Mock()
+        tracker.add('1', {'id': 1})
+        self.assertFalse(tracker.sweep.called)
+        time.return_value = 100 + Tracker.SWEEP + 1
+        tracker.add('2', {'id': 2})
+        tracker.sweep.assert_called_once_with()
 
-class Test(TestCase):
-    pass
\ No newline at end of file
+    @patch('gofer.rmi.tracker.Canceled')
+    def test_stats(self, canceled):
+        canceled.return_value.__len__.return_value = 1
+        tracker = Tracker()
+        tracker.add('1', {'id': 1})
+        tracker.add('2', {'id': 2})
+        stats = tracker.stats()
+        self.assertEqual(stats['tracked'], 2)
+        self.assertEqual(stats['cancelled'], 1)
+        self.assertTrue(stats['memory'] > 0)
@@ -25,7 +25,7 @@ from gofer.common import Local as GLocal
 from gofer.common import Singleton, ThreadSingleton, Options
 from gofer.common import synchronized, conditional, released
 from gofer.common import mkdir, rmdir, unlink, nvl, valid_path, new, utf8
-from gofer.common import List
+from gofer.common import List, LRU, PriorityQueue
 
 
 class Thing(object):
@@ -556,3 +556,151 @@ class TestLocal(TestCase):
         t.join()
 
         self.assertEqual(l.other, {})
+
+
+class TestLRU(TestCase):
+
+    def test_init(self):
+        lru = LRU(10)
+        self.assertEqual(lru.maxsize, 10)
+        self.assertEqual(len(lru), 0)
+
+    def test_get_put(self):
+        lru = LRU()
+        lru.put('A', 1)
+        self.assertEqual(lru.get('A'), 1)
+        self.assertEqual(lru.get('B'), None)
+        self.assertEqual(lru.get('B', 2), 2)
+        self.assertTrue('A' in lru)
+        self.assertFalse('B' in lru)
+
+    def test_evicted(self):
+        lru = LRU(2)
+        lru.put('A', 1)
+        lru.put('B', 2)
+        lru.get('A')
+        lru.put('C', 3)
+        self.assertEqual(len(lru), 2)
+        self.assertTrue('A' in lru)
+        self.assertFalse('B' in lru)
+        self.assertTrue('C' in lru)
+
+    @patch('gofer.common.time')
+    def test_expired(self, time):
+        time.return_value = 100
+        lru = LRU(ttl=10)
+        lru.put('A', 1)
+        lru.put('B', 2, 20)
+        lru.put('C', 3)
+        time.return_value = 110
+        self.assertFalse('A' in lru)
+        self.assertEqual(lru.get('A'), None)
+        self.assertEqual(lru.pop('C', 4), 4)
+        self.assertEqual(lru.keys(), ['B'])
+        self.assertEqual(lru.get('B'), 2)
+
+    def test_pop(self):
+        lru = LRU()
+        lru.put('A', 1)
+        self.assertEqual(lru.pop('A'), 1)
+        self.assertEqual(lru.pop('A'), None)
+        self.assertEqual(len(lru), 0)
+
+    def test_keys(self):
+        lru = LRU()
+        lru.put('A', 1)
+        lru.put('B', 2)
+        lru.get('A')
+        self.assertEqual(lru.keys(), ['B', 'A'])
+
+    def test_clear(self):
+        lru = LRU()
+        lru.put('A', 1)
+        lru.clear()
+        self.assertEqual(len(lru), 0)
+
+
+class TestPriorityQueue(TestCase):
+
+    def test_priority(self):
+        self.assertEqual(PriorityQueue.priority(Options(priority=3)), 3)
+        self.assertEqual(PriorityQueue.priority(Options(priority='3')), 3)
+        self.assertEqual(PriorityQueue.priority(Options()), 0)
+        self.assertEqual(PriorityQueue.priority(Mock()), 0)
+        self.assertEqual(PriorityQueue.priority(0), 0)
+
+    @patch('gofer.common.time')
+    def test_fifo(self, time):
+        time.return_value = 100
+        queue = PriorityQueue()
+        items = [Options(n=n) for n in range(5)]
+        for item in items:
+            queue.put(item)
+        self.assertEqual([queue.get() for n in range(5)], items)
+
+    @patch('gofer.common.time')
+    def test_priority_order(self, time):
+        time.return_value = 100
+        queue = PriorityQueue()
+        items = [
+            Options(priority=0),
+            Options(priority=5),
+            Options(priority=1),
+            Options(priority=5),
+        ]
+        for item in items:
+            queue.put(item)
+        self.assertEqual(queue.qsize(), 4)
+        self.assertEqual(
+            [queue.get() for n in range(4)],
+            [items[1], items[3], items[2], items[0]])
+
+    @patch('gofer.common.time')
+    def test_aging(self, time):
+        queue = PriorityQueue(aging=10)
+        items = [
+            Options(priority=0),
+            Options(priority=2),
+            Options(priority=3),
+        ]
+        time.side_effect = [100, 125, 131]
+        for item in items:
+            queue.put(item)
+        self.assertEqual(
+            [queue.get() for n in range(3)],
+            [items[0], items[2], items[1]])
+
+    @patch('gofer.common.time')
+    def test_no_aging(self, time):
+        queue = PriorityQueue(aging=0)
+        items = [
+            Options(priority=0),
+            Options(priority=1),
+        ]
+        time.side_effect = [100, 100000]
+        for item in items:
+            queue.put(item)
+        self.assertEqual(
+            [queue.get() for n in range(2)],
+            [items[1], items[0]])
+
+    @patch('gofer.common.time')
+    def test_queued(self, time):
+        time.return_value = 100
+        self.assertEqual(PriorityQueue.queued(Options(queued=3.5)), 3.5)
+        self.assertEqual(PriorityQueue.queued(Options()), 100)
+        self.assertEqual(PriorityQueue.queued(Options(queued='x')), 100)
+
+    @patch('gofer.common.time')
+    def test_restored(self, time):
+        time.return_value = 100
+        queue = PriorityQueue(aging=10)
+        items = [
+            Options(priority=0),
+            Options(priority=0, queued=50),
+        ]
+        for item in items:
+            queue.put(item)
+        self.assertEqual(
+            [queue.get() for n in range(2)],
+            [items[1], items[0]])
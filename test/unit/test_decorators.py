@@ -14,7 +14,8 @@ from unittest import TestCase
 from mock import patch, Mock
 
 from gofer import NAME
-from gofer.decorators import options, remote, direct, fork, pam, user, action
+from gofer.rmi.memo import Memo
+from gofer.decorators import options, remote, cached, direct, fork, pam, user, action
 from gofer.decorators import load, unload, initializer
 from gofer.decorators import DIRECT, FORK
 
@@ -93,6 +94,72 @@ class TestRemote(TestCase):
                 }))
         _remote.add.assert_called_once_with(fn)
 
+    @patch('gofer.decorators.Remote')
+    def test_cacheable(self, _remote):
+        def fn(): pass
+        remote(cacheable=30)(fn)
+        opt = getattr(fn, NAME)
+        self.assertEqual(opt.call.cacheable, 30)
+        _remote.add.assert_called_once_with(fn)
+
+
+class TestCached(TestCase):
+
+    @patch('gofer.decorators.Memo')
+    def test_call(self, memo):
+        def fn(): pass
+        cached(fn)
+        opt = getattr(fn, NAME)
+        memo.assert_called_once_with('%s.fn' % __name__, 60, 100)
+        self.assertEqual(opt.call.memo, memo.return_value)
+
+    @patch('gofer.decorators.Memo')
+    def test_options(self, memo):
+        def fn(): pass
+        cached(ttl=10, maxsize=20)(fn)
+        memo.assert_called_once_with('%s.fn' % __name__, 10, 20)
+
+    def test_same_name(self):
+        class A(object):
+            @cached
+            def fn(self): pass
+
+        class B(object):
+            @cached
+            def fn(self): pass
+
+        memo_a = getattr(A.fn.im_func, NAME).call.memo
+        memo_b = getattr(B.fn.im_func, NAME).call.memo
+        self.assertNotEqual(memo_a.name, memo_b.name)
+        self.assertTrue(Memo.all[memo_a.name] is memo_a)
+        self.assertTrue(Memo.all[memo_b.name] is memo_b)
+
+    def test_name(self):
+        class A(object):
+            @cached
+            def fn(self): pass
+
+            @cached(ttl=10)
+            def fn2(self): pass
+
+        memo = getattr(A.fn.im_func, NAME).call.memo
+        self.assertEqual(memo.name, '%s.A.fn' % __name__)
+        memo = getattr(A.fn2.im_func, NAME).call.memo
+        self.assertEqual(memo.name, '%s.A.fn2' % __name__)
+
+    def test_redecorated(self):
+        def define():
+            class A(object):
+                @cached
+                def fn(self): pass
+            return A
+
+        Memo.all.clear()
+        define()
+        A = define()
+        memo = getattr(A.fn.im_func, NAME).call.memo
+        self.assertEqual(Memo.all, {memo.name: memo})
+
 
 class TestDirect(TestCase):
 
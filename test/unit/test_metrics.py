@@ -15,7 +15,7 @@ from datetime import datetime
 
 from mock import patch
 
-from gofer.metrics import Timer, Memory
+from gofer.metrics import Timer, Memory, Timing
 from gofer.metrics import timestamp
 
 
@@ -165,3 +165,42 @@ class TestMemory(TestCase):
         self.assertEqual(Memory.format(2000), '2 kB')
         self.assertEqual(Memory.format(2000000), '2 mB')
         self.assertEqual(Memory.format(2000000000), '2 gB')
+
+
+class TestTiming(TestCase):
+
+    def test_record(self):
+        timing = Timing()
+        timing.record('sign', 1.0)
+        timing.record('sign', 3.0)
+        timing.record('validate', 0.5)
+        self.assertEqual(
+            timing.stats(),
+            {
+                'sign': dict(count=2, total=4.0, mean=2.0, max=3.0),
+                'validate': dict(count=1, total=0.5, mean=0.5, max=0.5),
+            })
+
+    @patch('time.time')
+    def test_call(self, _time):
+        _time.side_effect = [10.0, 12.5]
+        timing = Timing()
+        with timing('sign') as timer:
+            pass
+        self.assertEqual(timer.duration(), 2.5)
+        self.assertEqual(timing.stats()['sign']['total'], 2.5)
+
+    def test_call_exception(self):
+        timing = Timing()
+        try:
+            with timing('sign'):
+                raise ValueError()
+        except ValueError:
+            pass
+        self.assertEqual(timing.stats()['sign']['count'], 1)
+
+    def test_clear(self):
+        timing = Timing()
+        timing.record('sign', 1.0)
+        timing.clear()
+        self.assertEqual(timing.stats(), {})